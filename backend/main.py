@@ -2,12 +2,15 @@ import sys
 import os
 import shutil
 import pandas as pd
-import zipfile
 import io
 import subprocess
 import tempfile
+import hashlib
+import json
+import uuid
+import asyncio
 from fastapi import FastAPI, UploadFile, File, HTTPException, Body
-from fastapi.responses import FileResponse, StreamingResponse, HTMLResponse
+from fastapi.responses import FileResponse, StreamingResponse, HTMLResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any
@@ -17,9 +20,23 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 # Ahora sí podemos importar tus scripts mágicos
 from procesar_anexo import procesar_anexo
-from procesar_cvs import procesar_cvs
-from logica_fichas import generar_ficha_2_1, generar_ficha_2_2
+from cache_anexos import CacheAnexos, hash_archivo
+from cache_fichas import CacheFichas
+from cache_cvs import CacheExperiencias
+from cache_plantillas import plantillas
+from salidas import AlmacenSalidas, escritura_atomica
+from cola_trabajos import ColaTrabajos, TrabajoCancelado
+from procesar_cvs import procesar_cvs, VERSION_PARSER_CV
+from fichas_paralelo import GeneradorFichas
+from lotes_fichas import RegistroLotes, GENERADO, SIN_CAMBIOS, SIN_DATOS, ERROR
+from logica_fichas import fichas_2_1_por_persona, fichas_2_2_por_colaboracion
+from zip_streaming import zip_en_streaming, leer_en_trozos
 from validador import ValidadorFichas, validar_antes_generar
+from validacion_incremental import AlmacenValidaciones
+from historial_datos import AlmacenHistoriales, ConflictoVersion, PoliticaRetencion, ARCHIVOS_TABLAS
+from cache_datos import CacheDatos
+from almacen_tablas import almacen, ValoresFueraDeEsquema
+from catalogo import CatalogoProyectos
 
 # Modelos Pydantic
 class UpdateDataRequest(BaseModel):
@@ -27,6 +44,31 @@ class UpdateDataRequest(BaseModel):
     cliente_nif: str = None
     proyecto_acronimo: str = None
 
+class CambioFila(BaseModel):
+    fila: int = None
+    valores: Dict[str, Any] = {}
+    op: str = "update"  # update | insert | delete
+
+class OperacionFila(BaseModel):
+    op: str  # insert | update | delete
+    id: str = None
+    valores: Dict[str, Any] = None
+    quitar: List[str] = None
+    antes_de: str = None
+
+class PatchDataRequest(BaseModel):
+    operaciones: List[OperacionFila]
+    cliente_nif: str
+    proyecto_acronimo: str = None
+    version_base: int = None  # si se indica y la tabla ha cambiado desde entonces: 409
+
+class ValidateDiffRequest(BaseModel):
+    tabla: str  # personal | colaboraciones | facturas
+    cambios: List[CambioFila]
+    cliente_nif: str = None
+    proyecto_acronimo: str = None
+    sesion: str = None  # token devuelto por la primera llamada de la edición
+
 # Inicializamos la APP (El restaurante)
 app = FastAPI(title="Generador de Fichas API", version="1.0")
 
@@ -39,6 +81,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Cache"],
 )
 
 # Definimos rutas (Directorios)
@@ -47,9 +90,65 @@ INPUT_DIR = os.path.join(BASE_DIR, 'inputs')
 PROYECTOS_DIR = os.path.join(BASE_DIR, 'proyectos')
 os.makedirs(PROYECTOS_DIR, exist_ok=True)
 
+# Caché de anexos procesados (clave = SHA-256 del .xlsx + versión del extractor)
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+ANEXO_CACHE_MAX_MB = int(os.environ.get('ANEXO_CACHE_MAX_MB', '200'))
+cache_anexos = CacheAnexos(os.path.join(CACHE_DIR, 'anexos'), max_bytes=ANEXO_CACHE_MAX_MB * 1024 * 1024)
+
+# Caché de fichas generadas (clave = hash de JSONs + plantilla + parámetros + versión del generador)
+FICHAS_CACHE_MAX_MB = int(os.environ.get('FICHAS_CACHE_MAX_MB', '200'))
+cache_fichas = CacheFichas(os.path.join(CACHE_DIR, 'fichas'), max_bytes=FICHAS_CACHE_MAX_MB * 1024 * 1024)
+
+# Caché de la experiencia extraída de los CVs (clave = SHA-256 del PDF + versión del parser)
+CV_CACHE_MAX_MB = int(os.environ.get('CV_CACHE_MAX_MB', '50'))
+cache_cvs = CacheExperiencias(os.path.join(CACHE_DIR, 'cvs'), VERSION_PARSER_CV, max_bytes=CV_CACHE_MAX_MB * 1024 * 1024)
+
+# Cola de trabajos en segundo plano (ver endpoints /jobs)
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', '2'))
+cola_trabajos = ColaTrabajos(max_workers=JOBS_WORKERS)
+JOBS_OUTPUT_DIR = os.path.join(BASE_DIR, 'outputs', 'trabajos')
+
+# Carpetas de salida por cliente/proyecto y generación (ver /fichas)
+salidas = AlmacenSalidas(
+    os.path.join(BASE_DIR, 'outputs', 'fichas'),
+    max_versiones=int(os.environ.get('SALIDAS_MAX_VERSIONES', '5')),
+    max_dias=int(os.environ.get('SALIDAS_MAX_DIAS', '7')),
+)
+
+# Generación de las fichas 2.1 y 2.2 a la vez en un pool de procesos (FICHAS_WORKERS
+# procesos, 0 = uno por CPU; la Ficha 2.1 se reparte en trozos de FICHAS_TROZO_2_1 personas)
+generador_fichas = GeneradorFichas()
+
+# Firma de las entradas de cada proyecto en el último lote (ver /download-fichas-lote)
+registro_lotes = RegistroLotes(os.path.join(CACHE_DIR, 'lotes.json'))
+
+# Estados de validación incremental por sesión de edición (ver /validate-diff)
+VALIDACIONES_MAX_SESIONES = int(os.environ.get('VALIDACIONES_MAX_SESIONES', '32'))
+validaciones = AlmacenValidaciones(max_sesiones=VALIDACIONES_MAX_SESIONES)
+
+# Historial de cambios por fila de las tablas de cada cliente/proyecto (ver PATCH /personal...)
+historiales = AlmacenHistoriales(
+    cada=int(os.environ.get('HISTORIAL_CADA', '50')),
+    retencion=PoliticaRetencion(
+        versiones_completas=int(os.environ.get('HISTORIAL_VERSIONES_COMPLETAS', '500')),
+        max_copias=int(os.environ.get('HISTORIAL_MAX_COPIAS', '100')),
+    ),
+    max_historiales=int(os.environ.get('HISTORIAL_MAX_ABIERTOS', '64')),
+)
+
+# Tablas de los proyectos ya parseadas, compartidas por todos los endpoints (se
+# invalidan solas si el archivo cambia en disco; ver /cache-datos/stats)
+DATOS_CACHE_MAX_MB = int(os.environ.get('DATOS_CACHE_MAX_MB', '256'))
+cache_datos = CacheDatos(max_bytes=DATOS_CACHE_MAX_MB * 1024 * 1024)
+
+# Índice de clientes y proyectos (lo mantienen los endpoints de /clientes; ver /catalogo/reconstruir)
+catalogo = CatalogoProyectos(os.path.join(PROYECTOS_DIR, 'catalogo.sqlite3'), PROYECTOS_DIR)
+
 def get_client_dir(client_nif: str):
     """Obtiene la carpeta del cliente, creándola si no existe."""
     client_dir = os.path.join(PROYECTOS_DIR, f"Cliente_{client_nif}")
+    if not os.path.isdir(client_dir):
+        catalogo.registrar_cliente(client_nif)
     os.makedirs(client_dir, exist_ok=True)
     os.makedirs(os.path.join(client_dir, 'data'), exist_ok=True)
     os.makedirs(os.path.join(client_dir, 'history'), exist_ok=True)
@@ -59,18 +158,21 @@ def get_project_dir(client_nif: str, proyecto_acronimo: str):
     """Obtiene la carpeta del proyecto dentro del cliente, creándola si no existe."""
     client_dir = os.path.join(PROYECTOS_DIR, f"Cliente_{client_nif}")
     project_dir = os.path.join(client_dir, proyecto_acronimo)
+    if not os.path.isdir(project_dir):
+        catalogo.registrar_proyecto(client_nif, proyecto_acronimo)
     os.makedirs(project_dir, exist_ok=True)
     os.makedirs(os.path.join(project_dir, 'data'), exist_ok=True)
     os.makedirs(os.path.join(project_dir, 'history'), exist_ok=True)
     return project_dir
 
-def save_to_history(client_dir: str, data_type: str, data: List[Dict]):
-    """Guarda una copia con timestamp en el historial."""
-    from datetime import datetime
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    history_file = os.path.join(client_dir, 'history', f"{data_type}_{timestamp}.json")
-    df = pd.DataFrame(data)
-    df.to_json(history_file, orient='records', force_ascii=False, date_format='iso')
+def open_history(client_dir: str, data_type: str):
+    """
+    Historial de cambios de una tabla, puesto al día con el JSON actual
+    (la primera vez guarda una copia base; después solo diferencias).
+    """
+    historial = historiales.obtener(client_dir, data_type)
+    historial.sincronizar()
+    return historial
 
 def save_client_name(client_nif: str, nombre: str):
     """Guarda el nombre del cliente en un archivo de configuración."""
@@ -80,51 +182,9 @@ def save_client_name(client_nif: str, nombre: str):
     config = {'nombre': nombre}
     with open(config_file, 'w', encoding='utf-8') as f:
         json.dump(config, f, ensure_ascii=False, indent=2)
+    catalogo.registrar_cliente(client_nif, nombre)
     print(f"💾 SAVE_CLIENT_NAME: NIF={client_nif}, nombre='{nombre}', archivo={config_file}")
 
-def get_client_name(client_nif: str):
-    """Obtiene el nombre del cliente desde el archivo de configuración."""
-    client_dir = os.path.join(PROYECTOS_DIR, f"Cliente_{client_nif}")
-    config_file = os.path.join(client_dir, 'config.json')
-    
-    print(f"🔍 GET_CLIENT_NAME: NIF={client_nif}")
-    print(f"   📁 client_dir={client_dir}")
-    print(f"   📄 config_file={config_file}")
-    print(f"   ✓ config_file existe={os.path.exists(config_file)}")
-    
-    # Primero intenta leer el nombre desde config.json
-    if os.path.exists(config_file):
-        try:
-            import json
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                print(f"   ✓ config.json cargado: {config}")
-                if 'nombre' in config and config['nombre']:
-                    nombre = config['nombre']
-                    print(f"   ✅ Nombre encontrado en config.json: '{nombre}'")
-                    return nombre
-        except Exception as e:
-            print(f"   ❌ Error leyendo config.json: {e}")
-    
-    # Si no existe nombre en config, intenta obtenerlo del personal.json
-    personal_file = os.path.join(client_dir, 'data', 'personal.json')
-    print(f"   📄 personal_file={personal_file}, existe={os.path.exists(personal_file)}")
-    
-    if os.path.exists(personal_file):
-        try:
-            df = pd.read_json(personal_file)
-            print(f"   ✓ personal.json cargado ({len(df)} registros)")
-            if not df.empty and 'Nombre' in df.columns:
-                nombre = df.iloc[0].get('Nombre', client_nif)
-                print(f"   ✅ Nombre encontrado en personal.json: '{nombre}'")
-                return nombre
-        except Exception as e:
-            print(f"   ❌ Error leyendo personal.json: {e}")
-    
-    # Si no encuentra nada, retorna el NIF
-    print(f"   ⚠️ No se encontró nombre, usando NIF: '{client_nif}'")
-    return client_nif
-
 # --- ENDPOINTS (LOS PLATOS DE LA CARTA) ---
 
 @app.get("/")
@@ -133,38 +193,14 @@ def read_root():
     return {"mensaje": "¡Hola! La API de Fichas está funcionando 🚀"}
 
 @app.get("/clientes")
-def list_clients():
-    """Lista todos los clientes (carpetas en /proyectos)."""
-    try:
-        print(f"\n📋 LIST_CLIENTS ENDPOINT")
-        
-        if not os.path.exists(PROYECTOS_DIR):
-            print(f"   ⚠️ PROYECTOS_DIR no existe: {PROYECTOS_DIR}")
-            return {"clientes": []}
-        
-        print(f"   📁 PROYECTOS_DIR: {PROYECTOS_DIR}")
-        folders = os.listdir(PROYECTOS_DIR)
-        print(f"   📂 Carpetas encontradas: {folders}")
-        
-        clientes = []
-        for folder in folders:
-            if folder.startswith("Cliente_"):
-                nif = folder.replace("Cliente_", "")
-                print(f"   🔍 Procesando cliente: {nif}")
-                nombre = get_client_name(nif)
-                print(f"      ✅ Nombre obtenido: '{nombre}'")
-                
-                clientes.append({
-                    "nif": nif,
-                    "nombre": nombre,
-                    "folder": folder
-                })
-        
-        print(f"   ✅ Total de clientes: {len(clientes)}")
-        return {"clientes": sorted(clientes, key=lambda x: x['nif'])}
-    except Exception as e:
-        print(f"   ❌ Error en list_clients: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+def list_clients(buscar: str = None, despues_de: str = None, limite: int = None):
+    """
+    Lista los clientes desde el catálogo, ordenados por NIF.
+    - buscar: filtra por NIF o nombre (contiene; con 1-2 caracteres, empieza por)
+    - limite + despues_de: paginación; `siguiente` es el despues_de de la página siguiente
+    """
+    clientes, siguiente = catalogo.listar_clientes(buscar=buscar, despues_de=despues_de, limite=limite)
+    return {"clientes": clientes, "siguiente": siguiente}
 
 @app.post("/clientes")
 def create_client(nif: str, nombre: str = None):
@@ -189,6 +225,7 @@ def create_client(nif: str, nombre: str = None):
         
         # Crear la carpeta del cliente
         os.makedirs(client_dir, exist_ok=True)
+        catalogo.registrar_cliente(nif)
         print(f"   ✅ Carpeta de cliente creada: {client_dir}")
         
         # Guardar el nombre si se proporciona
@@ -212,28 +249,13 @@ def create_client(nif: str, nombre: str = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/clientes/{cliente_nif}/proyectos")
-def list_proyectos(cliente_nif: str):
-    """Lista todos los proyectos de un cliente."""
-    try:
-        cliente_nif = cliente_nif.strip()
-        client_dir = os.path.join(PROYECTOS_DIR, f"Cliente_{cliente_nif}")
-        
-        if not os.path.exists(client_dir):
-            return {"proyectos": []}
-        
-        proyectos = []
-        for folder in os.listdir(client_dir):
-            folder_path = os.path.join(client_dir, folder)
-            # Excluir carpetas 'data' y 'history'
-            if os.path.isdir(folder_path) and folder not in ['data', 'history']:
-                proyectos.append({
-                    "acronimo": folder,
-                    "path": folder_path
-                })
-        
-        return {"proyectos": sorted(proyectos, key=lambda x: x['acronimo'])}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def list_proyectos(cliente_nif: str, buscar: str = None, despues_de: str = None, limite: int = None):
+    """Lista los proyectos de un cliente desde el catálogo (misma paginación que /clientes)."""
+    cliente_nif = cliente_nif.strip()
+    client_dir = os.path.join(PROYECTOS_DIR, f"Cliente_{cliente_nif}")
+    acronimos, siguiente = catalogo.listar_proyectos(cliente_nif, buscar=buscar, despues_de=despues_de, limite=limite)
+    proyectos = [{"acronimo": acronimo, "path": os.path.join(client_dir, acronimo)} for acronimo in acronimos]
+    return {"proyectos": proyectos, "siguiente": siguiente}
 
 @app.post("/clientes/{cliente_nif}/nombre")
 def set_client_name(cliente_nif: str, nombre: str = None):
@@ -313,6 +335,8 @@ def delete_client(cliente_nif: str):
         
         # Eliminar la carpeta completa del cliente
         shutil.rmtree(client_dir)
+        catalogo.eliminar_cliente(cliente_nif)
+        registro_lotes.olvidar(f"Cliente_{cliente_nif}/")
         
         print(f"✅ Cliente {cliente_nif} eliminado correctamente")
         return {
@@ -325,12 +349,41 @@ def delete_client(cliente_nif: str):
         print(f"❌ Error eliminando cliente: {e}")
         raise HTTPException(status_code=500, detail=f"Error eliminando cliente: {str(e)}")
 
+@app.delete("/clientes/{cliente_nif}/proyectos/{proyecto_acronimo}")
+def delete_proyecto(cliente_nif: str, proyecto_acronimo: str):
+    """
+    Elimina un proyecto del cliente con todos sus datos.
+    Nota: Esta acción es irreversible.
+    """
+    cliente_nif = cliente_nif.strip()
+    proyecto_acronimo = proyecto_acronimo.strip().upper()
+    client_dir = os.path.join(PROYECTOS_DIR, f"Cliente_{cliente_nif}")
+    project_dir = os.path.join(client_dir, proyecto_acronimo)
+    if proyecto_acronimo in ('DATA', 'HISTORY', 'CVS') or not os.path.isdir(project_dir):
+        raise HTTPException(status_code=404, detail=f"Proyecto {proyecto_acronimo} no encontrado")
+
+    print(f"\n🗑️  ELIMINANDO PROYECTO: {cliente_nif} / {proyecto_acronimo}")
+    shutil.rmtree(project_dir)
+    catalogo.eliminar_proyecto(cliente_nif, proyecto_acronimo)
+    registro_lotes.olvidar(f"Cliente_{cliente_nif}/{proyecto_acronimo}")
+    return {
+        "status": "success",
+        "message": f"Proyecto {proyecto_acronimo} y todos sus datos han sido eliminados"
+    }
+
+@app.post("/catalogo/reconstruir")
+def rebuild_catalogo():
+    """Rehace el catálogo de clientes y proyectos recorriendo las carpetas de /proyectos."""
+    clientes, proyectos = catalogo.reconstruir()
+    return {"status": "success", "clientes": clientes, "proyectos": proyectos}
+
 @app.post("/upload-anexo")
-async def upload_anexo(file: UploadFile = File(...), cliente_nif: str = None, proyecto_acronimo: str = None):
+def upload_anexo(file: UploadFile = File(...), cliente_nif: str = None, proyecto_acronimo: str = None):
     """
     1. Recibe el archivo Anexo II y opcionalmente cliente_nif + proyecto_acronimo (como parámetros query).
     2. Lo guarda en la carpeta inputs.
-    3. Ejecuta tu script 'procesar_anexo.py'.
+    3. Ejecuta tu script 'procesar_anexo.py', salvo que el mismo archivo ya se
+       haya procesado antes: entonces restaura los JSONs desde la caché de anexos.
     4. Retorna los metadatos extraídos (incluyendo el año fiscal).
     5. Si se proporciona cliente_nif y proyecto_acronimo, los JSONs se guardan en la carpeta del proyecto.
     """
@@ -350,51 +403,18 @@ async def upload_anexo(file: UploadFile = File(...), cliente_nif: str = None, pr
         print(f"📌 Tipo MIME: {file.content_type}")
         print(f"📌 Input DIR: {INPUT_DIR}")
         
-        # Guardar el archivo subido
-        file_location = os.path.join(INPUT_DIR, "Anexo_Subido.xlsx")
-        print(f"💾 Guardando en: {file_location}")
-        
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        file_size = os.path.getsize(file_location)
-        print(f"✅ Archivo guardado. Tamaño: {file_size} bytes")
-        
-        # Ejecutar tu lógica de extracción PROCESANDO ESPECÍFICAMENTE EL ARCHIVO SUBIDO
-        print(f"🍳 Cocinando: Procesando Anexo_Subido.xlsx...")
-        metadata = procesar_anexo(archivo_especifico="Anexo_Subido.xlsx", cliente_nif=cliente_nif, proyecto_acronimo=proyecto_acronimo)
-        print(f"✅ Anexo procesado exitosamente")
-        print(f"📊 Metadatos extraídos: {metadata}")
-        
-        # Verificar archivos generados
-        if cliente_nif:
-            if proyecto_acronimo:
-                project_dir = get_project_dir(cliente_nif, proyecto_acronimo)
-                output_dir = os.path.join(project_dir, 'data')
-                print(f"📁 Archivos guardados en: {output_dir}")
-            else:
-                client_dir = get_client_dir(cliente_nif)
-                output_dir = os.path.join(client_dir, 'data')
-                print(f"📁 Archivos guardados en: {output_dir}")
-        else:
-            output_dir = INPUT_DIR
-            print(f"📁 Archivos guardados en: {output_dir}")
-        
-        output_files = ['Excel_Personal_2.1.json', 'Excel_Colaboraciones_2.2.json', 'Excel_Facturas_2.2.json']
-        for out_file in output_files:
-            out_path = os.path.join(output_dir, out_file)
-            if os.path.exists(out_path):
-                file_size = os.path.getsize(out_path)
-                print(f"   ✅ {out_file} ({file_size} bytes)")
-            else:
-                print(f"   ⚠️ {out_file} NO ENCONTRADO")
-        
-        print(f"{'='*60}\n")
-        return {
-            "status": "success",
-            "message": "Anexo procesado y Excels generados",
-            "metadata": metadata or {"anio_fiscal": 2024, "nif_cliente": "", "entidad_solicitante": ""}
-        }
+        with reserva_datos(cliente_nif, proyecto_acronimo):
+            # Guardar el archivo subido
+            file_location = os.path.join(INPUT_DIR, "Anexo_Subido.xlsx")
+            print(f"💾 Guardando en: {file_location}")
+            
+            with open(file_location, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer)
+            
+            file_size = os.path.getsize(file_location)
+            print(f"✅ Archivo guardado. Tamaño: {file_size} bytes")
+            
+            return procesar_anexo_subido("Anexo_Subido.xlsx", cliente_nif, proyecto_acronimo)
     except Exception as e:
         print(f"❌ ERROR EN UPLOAD-ANEXO: {str(e)}")
         import traceback
@@ -402,6 +422,82 @@ async def upload_anexo(file: UploadFile = File(...), cliente_nif: str = None, pr
         print(f"{'='*60}\n")
         raise HTTPException(status_code=500, detail=str(e))
 
+def procesar_anexo_subido(nombre_archivo: str, cliente_nif: str = None, proyecto_acronimo: str = None):
+    """
+    Procesa un Anexo ya guardado en INPUT_DIR (o lo restaura de la caché de
+    anexos) y devuelve la respuesta de /upload-anexo.
+    """
+    file_location = os.path.join(INPUT_DIR, nombre_archivo)
+    
+    # Directorio donde procesar_anexo deja los JSONs
+    if cliente_nif:
+        if proyecto_acronimo:
+            project_dir = get_project_dir(cliente_nif, proyecto_acronimo)
+            output_dir = os.path.join(project_dir, 'data')
+        else:
+            client_dir = get_client_dir(cliente_nif)
+            output_dir = os.path.join(client_dir, 'data')
+    else:
+        output_dir = INPUT_DIR
+    
+    # Si este mismo archivo ya se procesó, restaurar el resultado de la caché
+    clave_cache = cache_anexos.clave(file_location)
+    metadata = cache_anexos.restaurar(clave_cache, output_dir)
+    desde_cache = metadata is not None
+    if desde_cache:
+        print(f"♻️ Cache HIT ({clave_cache[:12]}...): tablas restauradas sin reprocesar")
+    else:
+        # Ejecutar tu lógica de extracción PROCESANDO ESPECÍFICAMENTE EL ARCHIVO SUBIDO
+        print(f"🍳 Cocinando: Procesando {nombre_archivo}...")
+        metadata = procesar_anexo(archivo_especifico=nombre_archivo, cliente_nif=cliente_nif, proyecto_acronimo=proyecto_acronimo)
+        print(f"✅ Anexo procesado exitosamente")
+        if metadata:
+            cache_anexos.guardar(clave_cache, output_dir)
+    print(f"📊 Metadatos extraídos: {metadata}")
+    print(f"📁 Archivos guardados en: {output_dir}")
+    
+    output_files = ['Excel_Personal_2.1.json', 'Excel_Colaboraciones_2.2.json', 'Excel_Facturas_2.2.json']
+    for out_file in output_files:
+        out_path = os.path.join(output_dir, out_file)
+        if almacen.existe(out_path):
+            file_size = os.path.getsize(almacen.archivo(out_path))
+            print(f"   ✅ {out_file} ({file_size} bytes)")
+        else:
+            print(f"   ⚠️ {out_file} NO ENCONTRADO")
+    
+    print(f"{'='*60}\n")
+    return {
+        "status": "success",
+        "message": "Anexo procesado y Excels generados",
+        "metadata": metadata or {"anio_fiscal": 2024, "nif_cliente": "", "entidad_solicitante": ""},
+        "cache": "hit" if desde_cache else "miss"
+    }
+
+@app.get("/cache-anexos/stats")
+def cache_anexos_stats():
+    """Estadísticas de la caché de anexos procesados (aciertos, fallos, ocupación)."""
+    return cache_anexos.estadisticas()
+
+@app.get("/cache-cvs/stats")
+def cache_cvs_stats():
+    """Estadísticas de la caché de experiencias extraídas de los CVs (aciertos, fallos, ocupación)."""
+    return cache_cvs.estadisticas()
+
+@app.get("/cache-datos/stats")
+def cache_datos_stats():
+    """Estadísticas de la caché en memoria de tablas de los proyectos."""
+    return cache_datos.estadisticas()
+
+@app.get("/cache-fichas/stats")
+def cache_fichas_stats():
+    """Estadísticas de la caché de fichas generadas (aciertos, fallos, ocupación)."""
+    return cache_fichas.estadisticas()
+
+@app.get("/cache-plantillas/stats")
+def cache_plantillas_stats():
+    """Estadísticas de la caché de plantillas .docx de este proceso (los procesos del pool llevan la suya)."""
+    return plantillas.estadisticas()
+
 @app.post("/upload-cvs")
 async def upload_cvs(files: List[UploadFile] = File(...), cliente_nif: str = None, proyecto_acronimo: str = None):
     """
@@ -409,6 +505,8 @@ async def upload_cvs(files: List[UploadFile] = File(...), cliente_nif: str = Non
     - Si se proporciona cliente_nif + proyecto_acronimo: Guarda en Cliente_{nif}/{proyecto}/cvs/
     - Si solo cliente_nif: Guarda en Cliente_{nif}/cvs/ (compatibilidad hacia atrás)
     - Si nada: Guarda en inputs/cvs (compatibilidad hacia atrás)
+    Los PDFs idénticos (mismo nombre y mismo contenido) no se reescriben, para
+    que /process-cvs los reutilice desde la caché de CVs.
     """
     # Limpiar parámetros
     if cliente_nif:
@@ -444,9 +542,10 @@ async def upload_cvs(files: List[UploadFile] = File(...), cliente_nif: str = Non
         os.makedirs(cvs_dir)
         print(f"📁 Creada carpeta CVs: {cvs_dir}")
     
-    # IMPORTANTE: Limpiar CVs anteriores del proyecto para evitar mezcla
+    # IMPORTANTE: Limpiar CVs anteriores del proyecto que no vienen en esta subida
     if cliente_nif and proyecto_acronimo:
-        existing_cvs = [f for f in os.listdir(cvs_dir) if f.endswith('.pdf')]
+        nombres_nuevos = {file.filename for file in files}
+        existing_cvs = [f for f in os.listdir(cvs_dir) if f.endswith('.pdf') and f not in nombres_nuevos]
         if existing_cvs:
             print(f"🗑️ Eliminando {len(existing_cvs)} CVs anteriores del proyecto...")
             for old_cv in existing_cvs:
@@ -457,29 +556,43 @@ async def upload_cvs(files: List[UploadFile] = File(...), cliente_nif: str = Non
                     print(f"   ⚠️ Error al eliminar {old_cv}: {e}")
         
     saved_files = []
+    unchanged_files = []
     for i, file in enumerate(files):
         print(f"   [{i+1}/{len(files)}] Guardando: {file.filename}")
         file_location = os.path.join(cvs_dir, file.filename)
         try:
+            contenido = await file.read()
+            if os.path.exists(file_location) and \
+                    hash_archivo(file_location) == hashlib.sha256(contenido).hexdigest():
+                print(f"      ♻️ Sin cambios: no se reescribe")
+                unchanged_files.append(file.filename)
+                saved_files.append(file.filename)
+                continue
             with open(file_location, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+                buffer.write(contenido)
             file_size = os.path.getsize(file_location)
             print(f"      ✅ Guardado: {file_size} bytes")
             saved_files.append(file.filename)
         except Exception as e:
             print(f"      ❌ Error: {e}")
     
-    print(f"✅ UPLOAD-CVs completado: {len(saved_files)} archivos guardados")
+    print(f"✅ UPLOAD-CVs completado: {len(saved_files)} archivos ({len(unchanged_files)} sin cambios)")
     print(f"{'='*60}\n")
-    return {"status": "success", "files": saved_files}
+    return {"status": "success", "files": saved_files, "unchanged": unchanged_files}
 
 @app.post("/process-cvs")
-def trigger_process_cvs(cliente_nif: str = None, proyecto_acronimo: str = None):
+def trigger_process_cvs(cliente_nif: str = None, proyecto_acronimo: str = None, workers: int = None):
     """
     Dispara el script de lectura de CVs.
     Si se proporciona cliente_nif y proyecto_acronimo, procesa CVs para ese proyecto específico.
     Si solo cliente_nif, procesa para ese cliente (compatibilidad hacia atrás).
+    workers: nº de procesos para extraer los PDFs (por defecto CV_WORKERS; 1 = secuencial).
     """
+    with reserva_datos(cliente_nif, proyecto_acronimo):
+        return procesar_cvs_proyecto(cliente_nif, proyecto_acronimo, workers)
+
+def procesar_cvs_proyecto(cliente_nif: str = None, proyecto_acronimo: str = None, workers: int = None, progreso=None):
+    """Lógica de /process-cvs; progreso se pasa a procesar_cvs (ver /jobs/process-cvs)."""
     print(f"\n{'='*60}")
     print(f"🔄 PROCESS-CVs INICIADO")
     print(f"{'='*60}")
@@ -495,10 +608,13 @@ def trigger_process_cvs(cliente_nif: str = None, proyecto_acronimo: str = None):
         print(f"📌 Modo: Sin cliente (INPUT_DIR)")
     
     try:
-        procesar_cvs(cliente_nif=cliente_nif, proyecto_acronimo=proyecto_acronimo)
+        procesar_cvs(cliente_nif=cliente_nif, proyecto_acronimo=proyecto_acronimo, workers=workers, progreso=progreso, cache=cache_cvs)
         print(f"✅ PROCESS-CVs completado exitosamente")
         print(f"{'='*60}\n")
         return {"status": "success", "message": "CVs leídos e integrados en el Excel"}
+    except TrabajoCancelado:
+        print(f"🛑 PROCESS-CVs cancelado (Personal sin cambios)")
+        raise
     except Exception as e:
         print(f"❌ Error en PROCESS-CVs: {e}")
         import traceback
@@ -506,14 +622,30 @@ def trigger_process_cvs(cliente_nif: str = None, proyecto_acronimo: str = None):
         print(f"{'='*60}\n")
         raise HTTPException(status_code=500, detail=str(e))
 
+def leer_tabla_datos(ruta: str, columnas: str = None):
+    """La tabla (del caché de datos) o, si se piden `columnas` (separadas por comas), solo esas."""
+    if columnas:
+        return cache_datos.leer_columnas(ruta, [c.strip() for c in columnas.split(",") if c.strip()])
+    return cache_datos.leer(ruta)
+
+def tabla_guardada(ruta: str, filas: int = None):
+    """Tras escribir una tabla: olvida su copia en el caché de datos."""
+    cache_datos.invalidar(ruta, filas=filas)
+
+def guardar_tabla(ruta: str, df):
+    """Guarda la tabla en el almacén (su .parquet, ver almacen_tablas). Lanza ValoresFueraDeEsquema si no cumple el esquema."""
+    almacen.guardar(ruta, df)
+    tabla_guardada(ruta, filas=len(df))
+
 @app.get("/personal")
-def get_personal_data(cliente_nif: str = None, proyecto_acronimo: str = None):
+def get_personal_data(cliente_nif: str = None, proyecto_acronimo: str = None, columnas: str = None):
     """
     Lee los datos de personal. 
     - Si cliente_nif y proyecto_acronimo se proporcionan, los obtiene de la carpeta del proyecto.
     - Si solo cliente_nif se proporciona, los obtiene de la carpeta del cliente.
     - Si el cliente no tiene datos, devuelve lista vacía (cliente nuevo).
     - Si no se proporciona cliente_nif, obtiene del INPUT_DIR (comportamiento heredado para compatibilidad).
+    - columnas: opcional, solo esas columnas separadas por comas (p. ej. "Nombre,Apellidos" para listados)
     """
     # Limpiar parámetros
     if cliente_nif:
@@ -539,13 +671,13 @@ def get_personal_data(cliente_nif: str = None, proyecto_acronimo: str = None):
             print(f"📁 Buscando datos del cliente en: {json_path}")
         
         # Si el cliente no tiene datos guardados, devolvemos lista vacía (cliente nuevo)
-        if not os.path.exists(json_path):
+        if not almacen.existe(json_path):
             print(f"⚠️ Cliente nuevo (sin datos guardados). Devolviendo lista vacía")
             print(f"{'='*60}\n")
             return []
         
         print(f"✅ Archivo encontrado")
-        df = pd.read_json(json_path)
+        df = leer_tabla_datos(json_path, columnas)
     else:
         json_path = os.path.join(INPUT_DIR, "Excel_Personal_2.1.json")
         excel_path = os.path.join(INPUT_DIR, "Excel_Personal_2.1.xlsx")
@@ -553,12 +685,12 @@ def get_personal_data(cliente_nif: str = None, proyecto_acronimo: str = None):
         print(f"   JSON: {json_path}")
         print(f"   EXCEL: {excel_path}")
         
-        if os.path.exists(json_path):
+        if almacen.existe(json_path):
             print(f"✅ Encontrado: {os.path.basename(json_path)}")
-            df = pd.read_json(json_path)
+            df = leer_tabla_datos(json_path, columnas)
         elif os.path.exists(excel_path):
             print(f"✅ Encontrado: {os.path.basename(excel_path)}")
-            df = pd.read_excel(excel_path)
+            df = leer_tabla_datos(excel_path, columnas)
         else:
             print(f"❌ NO ENCONTRADO")
             print(f"{'='*60}\n")
@@ -580,7 +712,7 @@ def get_personal_data(cliente_nif: str = None, proyecto_acronimo: str = None):
     return datos
 
 @app.post("/update-personal")
-async def update_personal_data(request: UpdateDataRequest):
+def update_personal_data(request: UpdateDataRequest):
     """
     Recibe los datos MODIFICADOS desde el Frontend y sobrescribe el archivo.
     - Si cliente_nif + proyecto_acronimo se proporcionan, guarda en Cliente_{nif}/{proyecto}/data/
@@ -595,12 +727,13 @@ async def update_personal_data(request: UpdateDataRequest):
             request.proyecto_acronimo = request.proyecto_acronimo.strip().upper()
         
         df = pd.DataFrame(request.data)
+        historial = None
         
         if request.cliente_nif and request.proyecto_acronimo:
             # Modo PROYECTO: Guardar en Cliente_{nif}/{proyecto}/data/
             project_dir = get_project_dir(request.cliente_nif, request.proyecto_acronimo)
             json_path = os.path.join(project_dir, 'data', 'Excel_Personal_2.1.json')
-            save_to_history(project_dir, 'personal', request.data)
+            historial = open_history(project_dir, 'personal')
             print(f"\n{'='*60}")
             print(f"💾 UPDATE-PERSONAL INICIADO (MODO PROYECTO)")
             print(f"{'='*60}")
@@ -611,7 +744,7 @@ async def update_personal_data(request: UpdateDataRequest):
             # Modo CLIENTE: Guardar en Cliente_{nif}/data/
             client_dir = get_client_dir(request.cliente_nif)
             json_path = os.path.join(client_dir, 'data', 'Excel_Personal_2.1.json')
-            save_to_history(client_dir, 'personal', request.data)
+            historial = open_history(client_dir, 'personal')
             print(f"\n{'='*60}")
             print(f"💾 UPDATE-PERSONAL INICIADO (MODO CLIENTE)")
             print(f"{'='*60}")
@@ -626,28 +759,36 @@ async def update_personal_data(request: UpdateDataRequest):
             print(f"{'='*60}")
             print(f"📁 Guardando en: {json_path}")
             
-            if os.path.exists(json_path):
+            if almacen.existe(json_path):
                 formato = "JSON"
             else:
                 json_path = excel_path
                 formato = "Excel"
         
-        df.to_json(json_path, orient='records', force_ascii=False, date_format='iso')
+        with reserva_datos(request.cliente_nif, request.proyecto_acronimo):
+            guardar_tabla(json_path, df)
+            if historial:
+                historial.sincronizar(origen="update")
         print(f"✅ Datos guardados correctamente")
         print(f"{'='*60}\n")
         return {"status": "success", "message": f"Datos guardados correctamente"}
+    except ValoresFueraDeEsquema as e:
+        print(f"❌ ERROR: {e}")
+        print(f"{'='*60}\n")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"❌ ERROR: {e}")
         print(f"{'='*60}\n")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/colaboraciones")
-def get_colaboraciones_data(cliente_nif: str = None, proyecto_acronimo: str = None):
+def get_colaboraciones_data(cliente_nif: str = None, proyecto_acronimo: str = None, columnas: str = None):
     """
     Lee los datos de colaboraciones.
     - Si cliente_nif y proyecto_acronimo se proporcionan, los obtiene de la carpeta del proyecto.
     - Si solo cliente_nif se proporciona, los obtiene de la carpeta del cliente.
     - Si el cliente no tiene datos, devuelve lista vacía (cliente nuevo).
+    - columnas: opcional, solo esas columnas separadas por comas
     """
     # Limpiar parámetros
     if cliente_nif:
@@ -664,17 +805,17 @@ def get_colaboraciones_data(cliente_nif: str = None, proyecto_acronimo: str = No
             client_dir = get_client_dir(cliente_nif)
             json_path = os.path.join(client_dir, 'data', 'Excel_Colaboraciones_2.2.json')
         # Si el cliente/proyecto no tiene datos guardados, devolvemos lista vacía
-        if not os.path.exists(json_path):
+        if not almacen.existe(json_path):
             return []
-        df = pd.read_json(json_path)
+        df = leer_tabla_datos(json_path, columnas)
     else:
         json_path = os.path.join(INPUT_DIR, "Excel_Colaboraciones_2.2.json")
         excel_path = os.path.join(INPUT_DIR, "Excel_Colaboraciones_2.2.xlsx")
         
-        if os.path.exists(json_path):
-            df = pd.read_json(json_path)
+        if almacen.existe(json_path):
+            df = leer_tabla_datos(json_path, columnas)
         elif os.path.exists(excel_path):
-            df = pd.read_excel(excel_path)
+            df = leer_tabla_datos(excel_path, columnas)
         else:
             raise HTTPException(status_code=404, detail="No existe archivo de Colaboraciones. Sube el Anexo primero.")
     
@@ -683,7 +824,7 @@ def get_colaboraciones_data(cliente_nif: str = None, proyecto_acronimo: str = No
     return datos
 
 @app.post("/update-colaboraciones")
-async def update_colaboraciones_data(request: UpdateDataRequest):
+def update_colaboraciones_data(request: UpdateDataRequest):
     """
     Recibe los datos MODIFICADOS de colaboraciones y sobrescribe el archivo.
     Automáticamente rellena la columna "NIF 2" con el cliente_nif del usuario.
@@ -707,41 +848,48 @@ async def update_colaboraciones_data(request: UpdateDataRequest):
                 item["NIF 2"] = request.cliente_nif
         
         df = pd.DataFrame(request.data)
+        historial = None
         
         if request.cliente_nif and request.proyecto_acronimo:
             # Modo PROYECTO: Guardar en Cliente_{nif}/{proyecto}/data/
             project_dir = get_project_dir(request.cliente_nif, request.proyecto_acronimo)
             json_path = os.path.join(project_dir, 'data', 'Excel_Colaboraciones_2.2.json')
-            save_to_history(project_dir, 'colaboraciones', request.data)
+            historial = open_history(project_dir, 'colaboraciones')
         elif request.cliente_nif:
             # Modo CLIENTE: Guardar en Cliente_{nif}/data/
             client_dir = get_client_dir(request.cliente_nif)
             json_path = os.path.join(client_dir, 'data', 'Excel_Colaboraciones_2.2.json')
-            save_to_history(client_dir, 'colaboraciones', request.data)
+            historial = open_history(client_dir, 'colaboraciones')
         else:
             # Comportamiento heredado: guardar en INPUT_DIR
             json_path = os.path.join(INPUT_DIR, "Excel_Colaboraciones_2.2.json")
             excel_path = os.path.join(INPUT_DIR, "Excel_Colaboraciones_2.2.xlsx")
             
-            if os.path.exists(json_path):
+            if almacen.existe(json_path):
                 formato = "JSON"
             else:
                 json_path = excel_path
                 formato = "Excel"
         
-        df.to_json(json_path, orient='records', force_ascii=False, date_format='iso')
+        with reserva_datos(request.cliente_nif, request.proyecto_acronimo):
+            guardar_tabla(json_path, df)
+            if historial:
+                historial.sincronizar(origen="update")
         print(f"   ✅ Colaboraciones guardadas con NIF 2 = {request.cliente_nif if request.cliente_nif else '[vacío]'}")
         return {"status": "success", "message": f"Datos guardados correctamente"}
+    except ValoresFueraDeEsquema as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/facturas")
-def get_facturas_data(cliente_nif: str = None, proyecto_acronimo: str = None):
+def get_facturas_data(cliente_nif: str = None, proyecto_acronimo: str = None, columnas: str = None):
     """
     Lee los datos de facturas.
     - Si cliente_nif y proyecto_acronimo se proporcionan, los obtiene de la carpeta del proyecto.
     - Si solo cliente_nif se proporciona, los obtiene de la carpeta del cliente.
     - Si el cliente no tiene datos, devuelve lista vacía (cliente nuevo).
+    - columnas: opcional, solo esas columnas separadas por comas
     """
     # Limpiar parámetros
     if cliente_nif:
@@ -758,17 +906,17 @@ def get_facturas_data(cliente_nif: str = None, proyecto_acronimo: str = None):
             client_dir = get_client_dir(cliente_nif)
             json_path = os.path.join(client_dir, 'data', 'Excel_Facturas_2.2.json')
         # Si el cliente/proyecto no tiene datos guardados, devolvemos lista vacía
-        if not os.path.exists(json_path):
+        if not almacen.existe(json_path):
             return []
-        df = pd.read_json(json_path)
+        df = leer_tabla_datos(json_path, columnas)
     else:
         json_path = os.path.join(INPUT_DIR, "Excel_Facturas_2.2.json")
         excel_path = os.path.join(INPUT_DIR, "Excel_Facturas_2.2.xlsx")
         
-        if os.path.exists(json_path):
-            df = pd.read_json(json_path)
+        if almacen.existe(json_path):
+            df = leer_tabla_datos(json_path, columnas)
         elif os.path.exists(excel_path):
-            df = pd.read_excel(excel_path)
+            df = leer_tabla_datos(excel_path, columnas)
         else:
             raise HTTPException(status_code=404, detail="No existe archivo de Facturas. Sube el Anexo primero.")
     
@@ -844,7 +992,7 @@ def save_metadata(cliente_nif: str = None, entidad_solicitante: str = None,
         }
         
         # Guardar
-        with open(metadata_path, 'w', encoding='utf-8') as f:
+        with reserva_datos(cliente_nif), open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
         
         print(f"✅ Metadata guardada correctamente")
@@ -854,7 +1002,7 @@ def save_metadata(cliente_nif: str = None, entidad_solicitante: str = None,
         raise HTTPException(status_code=500, detail=f"Error guardando metadata: {str(e)}")
 
 @app.post("/update-facturas")
-async def update_facturas_data(request: UpdateDataRequest):
+def update_facturas_data(request: UpdateDataRequest):
     """
     Recibe los datos MODIFICADOS de facturas y sobrescribe el archivo.
     - Si cliente_nif + proyecto_acronimo se proporcionan, guarda en Cliente_{nif}/{proyecto}/data/
@@ -869,33 +1017,162 @@ async def update_facturas_data(request: UpdateDataRequest):
             request.proyecto_acronimo = request.proyecto_acronimo.strip().upper()
         
         df = pd.DataFrame(request.data)
+        historial = None
         
         if request.cliente_nif and request.proyecto_acronimo:
             # Modo PROYECTO: Guardar en Cliente_{nif}/{proyecto}/data/
             project_dir = get_project_dir(request.cliente_nif, request.proyecto_acronimo)
             json_path = os.path.join(project_dir, 'data', 'Excel_Facturas_2.2.json')
-            save_to_history(project_dir, 'facturas', request.data)
+            historial = open_history(project_dir, 'facturas')
         elif request.cliente_nif:
             # Modo CLIENTE: Guardar en Cliente_{nif}/data/
             client_dir = get_client_dir(request.cliente_nif)
             json_path = os.path.join(client_dir, 'data', 'Excel_Facturas_2.2.json')
-            save_to_history(client_dir, 'facturas', request.data)
+            historial = open_history(client_dir, 'facturas')
         else:
             # Comportamiento heredado: guardar en INPUT_DIR
             json_path = os.path.join(INPUT_DIR, "Excel_Facturas_2.2.json")
             excel_path = os.path.join(INPUT_DIR, "Excel_Facturas_2.2.xlsx")
             
-            if os.path.exists(json_path):
+            if almacen.existe(json_path):
                 formato = "JSON"
             else:
                 json_path = excel_path
                 formato = "Excel"
         
-        df.to_json(json_path, orient='records', force_ascii=False, date_format='iso')
+        with reserva_datos(request.cliente_nif, request.proyecto_acronimo):
+            guardar_tabla(json_path, df)
+            if historial:
+                historial.sincronizar(origen="update")
         return {"status": "success", "message": f"Datos guardados correctamente"}
+    except ValoresFueraDeEsquema as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- CAMBIOS POR FILA E HISTORIAL ---
+# En lugar de reenviar la tabla entera a /update-*, el frontend puede mandar
+# solo las filas insertadas/modificadas/borradas, identificadas por un id
+# estable (GET /filas/{tabla}). El historial guarda esos lotes, no copias.
+
+def history_dir(cliente_nif: str, proyecto_acronimo: str = None):
+    """Carpeta del cliente o del proyecto cuyos data/ e history/ se usan."""
+    if not cliente_nif or not cliente_nif.strip():
+        raise HTTPException(status_code=400, detail="cliente_nif es obligatorio")
+    cliente_nif = cliente_nif.strip()
+    if proyecto_acronimo and proyecto_acronimo.strip():
+        return get_project_dir(cliente_nif, proyecto_acronimo.strip().upper())
+    return get_client_dir(cliente_nif)
+
+def patch_tabla(tabla: str, request: PatchDataRequest):
+    operaciones = [
+        {k: v for k, v in operacion.model_dump().items() if v is not None}
+        for operacion in request.operaciones
+    ]
+    if tabla == "colaboraciones":
+        # Igual que /update-colaboraciones: NIF 2 es el NIF del cliente
+        for operacion in operaciones:
+            if operacion["op"] == "insert":
+                operacion.setdefault("valores", {})["NIF 2"] = request.cliente_nif.strip()
+    historial = historiales.obtener(history_dir(request.cliente_nif, request.proyecto_acronimo), tabla)
+    with reserva_datos(request.cliente_nif, request.proyecto_acronimo):
+        try:
+            version, insertados = historial.aplicar(operaciones, version_base=request.version_base)
+        except ConflictoVersion as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        tabla_guardada(historial.ruta_datos, filas=len(historial.filas))
+    print(f"💾 PATCH {tabla}: {len(operaciones)} operación(es) → versión {version}")
+    return {"status": "success", "version": version, "ids_insertados": insertados}
+
+@app.patch("/personal")
+def patch_personal_data(request: PatchDataRequest):
+    """Aplica inserciones/cambios/borrados de filas de Personal por id (ver GET /filas/personal)."""
+    return patch_tabla("personal", request)
+
+@app.patch("/colaboraciones")
+def patch_colaboraciones_data(request: PatchDataRequest):
+    """Aplica inserciones/cambios/borrados de filas de Colaboraciones por id."""
+    return patch_tabla("colaboraciones", request)
+
+@app.patch("/facturas")
+def patch_facturas_data(request: PatchDataRequest):
+    """Aplica inserciones/cambios/borrados de filas de Facturas por id."""
+    return patch_tabla("facturas", request)
+
+def historial_tabla(tabla: str, cliente_nif: str, proyecto_acronimo: str = None):
+    try:
+        return historiales.obtener(history_dir(cliente_nif, proyecto_acronimo), tabla)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/export-json/{tabla}")
+def export_json(tabla: str, cliente_nif: str = None, proyecto_acronimo: str = None):
+    """
+    La tabla (personal, colaboraciones o facturas) como JSON orient='records',
+    el formato de siempre, generado desde su almacén columnar (ver almacen_tablas).
+    Sin cliente_nif, la de INPUT_DIR.
+    """
+    if tabla not in ARCHIVOS_TABLAS:
+        raise HTTPException(status_code=404, detail=f"Tabla desconocida: {tabla}. Use una de {', '.join(ARCHIVOS_TABLAS)}")
+    data_dir = os.path.join(history_dir(cliente_nif, proyecto_acronimo), 'data') if cliente_nif else INPUT_DIR
+    ruta = os.path.join(data_dir, ARCHIVOS_TABLAS[tabla])
+    if not almacen.existe(ruta):
+        raise HTTPException(status_code=404, detail=f"No hay datos de {tabla}")
+    return Response(
+        almacen.exportar_json(ruta),
+        media_type="application/json",
+        headers={"Content-Disposition": f"attachment; filename={ARCHIVOS_TABLAS[tabla]}"},
+    )
+
+@app.get("/almacen/stats")
+def almacen_stats():
+    """Estado del almacén columnar de tablas (lecturas de Parquet y del JSON, y migraciones desde JSON)."""
+    return almacen.estadisticas()
+
+@app.post("/almacen/migrar")
+def migrar_almacen():
+    """Importa a Parquet los JSON de tablas de todos los proyectos que aún no lo estén (o estén en un formato anterior)."""
+    return almacen.migrar_todo(PROYECTOS_DIR)
+
+@app.get("/filas/{tabla}")
+def get_filas(tabla: str, cliente_nif: str = None, proyecto_acronimo: str = None):
+    """Filas actuales de la tabla con su id estable y la versión (para version_base)."""
+    version, ids, filas = historial_tabla(tabla, cliente_nif, proyecto_acronimo).estado()
+    return {"version": version, "ids": ids, "data": filas}
+
+@app.get("/historial/{tabla}")
+def get_historial(tabla: str, cliente_nif: str = None, proyecto_acronimo: str = None, limite: int = None):
+    """Versiones que se conservan de la tabla (fecha, origen y nº de operaciones); `limite`: solo las últimas."""
+    historial = historial_tabla(tabla, cliente_nif, proyecto_acronimo)
+    versiones = historial.versiones(limite)
+    return {"version": historial.version, "versiones": versiones}
+
+@app.get("/historial/{tabla}/{version}")
+def get_version(tabla: str, version: int, cliente_nif: str = None, proyecto_acronimo: str = None):
+    """Reconstruye la tabla tal y como estaba en una versión."""
+    try:
+        ids, filas = historial_tabla(tabla, cliente_nif, proyecto_acronimo).reconstruir(version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"version": version, "ids": ids, "data": filas}
+
+@app.post("/historial/{tabla}/{version}/restaurar")
+def restaurar_version(tabla: str, version: int, cliente_nif: str = None, proyecto_acronimo: str = None):
+    """Vuelve a dejar la tabla como estaba en `version`; queda registrado como una versión nueva."""
+    with reserva_datos(cliente_nif, proyecto_acronimo):
+        try:
+            historial = historial_tabla(tabla, cliente_nif, proyecto_acronimo)
+            nueva = historial.restaurar(version)
+        except ValoresFueraDeEsquema as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        tabla_guardada(historial.ruta_datos, filas=len(historial.filas))
+    print(f"⏪ {tabla}: restaurada la versión {version} → versión {nueva}")
+    return {"status": "success", "version": nueva}
+
 @app.get("/check-available-fichas")
 def check_available_fichas(cliente_nif: str = None, proyecto_acronimo: str = None):
     """
@@ -937,39 +1214,36 @@ def check_available_fichas(cliente_nif: str = None, proyecto_acronimo: str = Non
         json_facturas = os.path.join(data_dir, "Excel_Facturas_2.2.json")
         
         print(f"\n   📄 Archivos esperados:")
-        print(f"      - {os.path.basename(json_personal)}: {os.path.exists(json_personal)}")
-        print(f"      - {os.path.basename(json_colaboraciones)}: {os.path.exists(json_colaboraciones)}")
-        print(f"      - {os.path.basename(json_facturas)}: {os.path.exists(json_facturas)}")
+        print(f"      - {os.path.basename(json_personal)}: {almacen.existe(json_personal)}")
+        print(f"      - {os.path.basename(json_colaboraciones)}: {almacen.existe(json_colaboraciones)}")
+        print(f"      - {os.path.basename(json_facturas)}: {almacen.existe(json_facturas)}")
         
         # Contar datos en cada JSON
         personal_count = 0
         colaboraciones_count = 0
         facturas_count = 0
         
-        if os.path.exists(json_personal):
+        if almacen.existe(json_personal):
             try:
-                df_personal = pd.read_json(json_personal)
-                personal_count = len(df_personal)
+                personal_count = cache_datos.contar(json_personal)
                 print(f"      ✓ Personal: {personal_count} registros")
             except Exception as e:
                 print(f"      ❌ Error leyendo Personal: {e}")
         else:
             print(f"      ❌ Personal no encontrado en {json_personal}")
         
-        if os.path.exists(json_colaboraciones):
+        if almacen.existe(json_colaboraciones):
             try:
-                df_colab = pd.read_json(json_colaboraciones)
-                colaboraciones_count = len(df_colab)
+                colaboraciones_count = cache_datos.contar(json_colaboraciones)
                 print(f"      ✓ Colaboraciones: {colaboraciones_count} registros")
             except Exception as e:
                 print(f"      ❌ Error leyendo Colaboraciones: {e}")
         else:
             print(f"      ❌ Colaboraciones no encontrado en {json_colaboraciones}")
         
-        if os.path.exists(json_facturas):
+        if almacen.existe(json_facturas):
             try:
-                df_fact = pd.read_json(json_facturas)
-                facturas_count = len(df_fact)
+                facturas_count = cache_datos.contar(json_facturas)
                 print(f"      ✓ Facturas: {facturas_count} registros")
             except Exception as e:
                 print(f"      ❌ Error leyendo Facturas: {e}")
@@ -1023,6 +1297,14 @@ def generate_fichas(cliente_nif: str = None, proyecto_acronimo: str = None, payl
     - Si no se proporciona cliente_nif, usa los datos del INPUT_DIR (compatibilidad hacia atrás).
     Retorna información sobre qué fichas se pueden generar y por qué.
     """
+    return generar_fichas_proyecto(cliente_nif, proyecto_acronimo, payload)
+
+def generar_fichas_proyecto(cliente_nif: str = None, proyecto_acronimo: str = None, payload: Dict[str, Any] = None, progreso=None):
+    """
+    Lógica de /generate-fichas. progreso(porcentaje, mensaje), si se indica
+    (p. ej. Trabajo.avanzar), se llama antes y después de generar.
+    """
+    progreso = progreso or (lambda *args, **kwargs: None)
     try:
         # Limpiar parámetros
         if cliente_nif:
@@ -1043,8 +1325,7 @@ def generate_fichas(cliente_nif: str = None, proyecto_acronimo: str = None, payl
             print(f"\n📄 GENERATE-FICHAS usando INPUT_DIR (sin cliente_nif)")
             data_dir = INPUT_DIR
         
-        output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
-        os.makedirs(output_dir, exist_ok=True)
+        generacion = salidas.nueva(cliente_nif, proyecto_acronimo)
         
         # Rutas de JSONs
         json_personal = os.path.join(data_dir, "Excel_Personal_2.1.json")
@@ -1056,17 +1337,17 @@ def generate_fichas(cliente_nif: str = None, proyecto_acronimo: str = None, payl
         plantilla_2_2 = os.path.join(INPUT_DIR, "2.2.docx")
         
         # Salidas
-        salida_2_1 = os.path.join(output_dir, "Ficha_2_1.docx")
-        salida_2_2 = os.path.join(output_dir, "Ficha_2_2.docx")
+        salida_2_1 = generacion.ruta("Ficha_2_1.docx")
+        salida_2_2 = generacion.ruta("Ficha_2_2.docx")
         
         generadas = []
         errores = []
         avisos = []
         
         # Verificar disponibilidad de datos
-        tiene_personal = os.path.exists(json_personal)
-        tiene_colaboraciones = os.path.exists(json_colaboraciones)
-        tiene_facturas = os.path.exists(json_facturas)
+        tiene_personal = almacen.existe(json_personal)
+        tiene_colaboraciones = almacen.existe(json_colaboraciones)
+        tiene_facturas = almacen.existe(json_facturas)
         
         # Verificar si hay datos dentro de los JSONs (no vacíos)
         personal_count = 0
@@ -1075,8 +1356,7 @@ def generate_fichas(cliente_nif: str = None, proyecto_acronimo: str = None, payl
         
         if tiene_personal:
             try:
-                df_personal = pd.read_json(json_personal)
-                personal_count = len(df_personal)
+                personal_count = cache_datos.contar(json_personal)
                 if personal_count == 0:
                     avisos.append("Ficha 2.1: No hay registros de personal")
             except:
@@ -1084,15 +1364,13 @@ def generate_fichas(cliente_nif: str = None, proyecto_acronimo: str = None, payl
         
         if tiene_colaboraciones:
             try:
-                df_colab = pd.read_json(json_colaboraciones)
-                colaboraciones_count = len(df_colab)
+                colaboraciones_count = cache_datos.contar(json_colaboraciones)
             except:
                 pass
         
         if tiene_facturas:
             try:
-                df_fact = pd.read_json(json_facturas)
-                facturas_count = len(df_fact)
+                facturas_count = cache_datos.contar(json_facturas)
             except:
                 pass
         
@@ -1101,36 +1379,39 @@ def generate_fichas(cliente_nif: str = None, proyecto_acronimo: str = None, payl
         if payload and 'anio_fiscal' in payload:
             anio_fiscal = payload.get('anio_fiscal', 2024)
         
-        # Generar Ficha 2.1 (solo requiere personal)
+        # Las fichas a generar se lanzan a la vez (ver GeneradorFichas.en_paralelo)
+        tareas = []
+        
+        # Ficha 2.1 (solo requiere personal)
         if tiene_personal and personal_count > 0 and os.path.exists(plantilla_2_1):
-            try:
-                generar_ficha_2_1(json_personal, plantilla_2_1, salida_2_1, anio_fiscal, 'ACR')
-                generadas.append("Ficha_2_1.docx")
-                print(f"✅ Ficha 2.1 generada ({personal_count} personas)")
-            except Exception as e:
-                errores.append(f"Error en Ficha 2.1: {str(e)}")
-                print(f"❌ Error en Ficha 2.1: {e}")
+            tareas.append(("Ficha 2.1", "Ficha_2_1.docx", f"{personal_count} personas",
+                           lambda: generar_2_1(json_personal, plantilla_2_1, salida_2_1, anio_fiscal)))
         elif not tiene_personal or personal_count == 0:
             avisos.append("Ficha 2.1: No hay datos de personal. Cargue un Anexo primero.")
         
-        # Generar Ficha 2.2 (requiere colaboraciones y facturas)
+        # Ficha 2.2 (requiere colaboraciones y facturas)
         if tiene_colaboraciones and tiene_facturas and os.path.exists(plantilla_2_2):
-            try:
-                cliente_nombre = None
-                cliente_nif_val = None
-                if payload:
-                    cliente_nombre = payload.get('cliente_nombre') or payload.get('entidad_solicitante')
-                    cliente_nif_val = payload.get('cliente_nif') or payload.get('nif_cliente')
-
-                generar_ficha_2_2(json_colaboraciones, json_facturas, plantilla_2_2, salida_2_2, cliente_nombre=cliente_nombre, cliente_nif=cliente_nif_val, anio=anio_fiscal)
-                generadas.append("Ficha_2_2.docx")
-                print(f"✅ Ficha 2.2 generada ({colaboraciones_count} colaboraciones, {facturas_count} facturas)")
-            except Exception as e:
-                errores.append(f"Error en Ficha 2.2: {str(e)}")
-                print(f"❌ Error en Ficha 2.2: {e}")
+            cliente_nombre = None
+            cliente_nif_val = None
+            if payload:
+                cliente_nombre = payload.get('cliente_nombre') or payload.get('entidad_solicitante')
+                cliente_nif_val = payload.get('cliente_nif') or payload.get('nif_cliente')
+            tareas.append(("Ficha 2.2", "Ficha_2_2.docx", f"{colaboraciones_count} colaboraciones, {facturas_count} facturas",
+                           lambda: generar_2_2(json_colaboraciones, json_facturas, plantilla_2_2, salida_2_2, anio_fiscal, cliente_nombre=cliente_nombre, cliente_nif=cliente_nif_val)))
         elif not tiene_colaboraciones or not tiene_facturas:
             avisos.append("Ficha 2.2: No hay datos de colaboraciones o facturas.")
         
+        progreso(20, f"Generando {len(tareas)} fichas")
+        resultados = generador_fichas.en_paralelo([tarea for *_, tarea in tareas])
+        progreso(95, "Fichas generadas")
+        for (ficha, archivo, detalle, _), (_, error) in zip(tareas, resultados):
+            if error is None:
+                generadas.append(archivo)
+                print(f"✅ {ficha} generada ({detalle})")
+            else:
+                errores.append(f"Error en {ficha}: {str(error)}")
+                print(f"❌ Error en {ficha}: {error}")
+        
         if not generadas:
             raise HTTPException(status_code=400, detail=" | ".join(avisos or errores or ["No se puede generar ninguna ficha"]))
         
@@ -1138,6 +1419,7 @@ def generate_fichas(cliente_nif: str = None, proyecto_acronimo: str = None, payl
             "status": "success",
             "message": f"Fichas generadas: {', '.join(generadas)}",
             "files": generadas,
+            "generacion_id": generacion.id,
             "avisos": avisos,
             "puede_generar_2_1": "Ficha_2_1.docx" in generadas,
             "puede_generar_2_2": "Ficha_2_2.docx" in generadas,
@@ -1147,7 +1429,7 @@ def generate_fichas(cliente_nif: str = None, proyecto_acronimo: str = None, payl
                 "facturas": facturas_count
             }
         }
-    except HTTPException:
+    except (HTTPException, TrabajoCancelado):
         raise
     except Exception as e:
         print(f"❌ Error en generate_fichas: {e}")
@@ -1177,15 +1459,14 @@ def generate_ficha_2_1_only(cliente_nif: str = None, proyecto_acronimo: str = No
         else:
             data_dir = INPUT_DIR
         
-        output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
-        os.makedirs(output_dir, exist_ok=True)
+        generacion = salidas.nueva(cliente_nif, proyecto_acronimo)
         
         json_personal = os.path.join(data_dir, "Excel_Personal_2.1.json")
         plantilla_2_1 = os.path.join(INPUT_DIR, "2.1.docx")
-        salida_2_1 = os.path.join(output_dir, "Ficha_2_1.docx")
+        salida_2_1 = generacion.ruta("Ficha_2_1.docx")
         
         # Verificar datos
-        if not os.path.exists(json_personal):
+        if not almacen.existe(json_personal):
             return {
                 "success": False,
                 "status": "error",
@@ -1195,8 +1476,8 @@ def generate_ficha_2_1_only(cliente_nif: str = None, proyecto_acronimo: str = No
             }
         
         try:
-            df_personal = pd.read_json(json_personal)
-            if len(df_personal) == 0:
+            n_personal = cache_datos.contar(json_personal)
+            if n_personal == 0:
                 return {
                     "success": False,
                     "status": "error",
@@ -1221,14 +1502,15 @@ def generate_ficha_2_1_only(cliente_nif: str = None, proyecto_acronimo: str = No
         # Generar Ficha 2.1
         if os.path.exists(plantilla_2_1):
             try:
-                generar_ficha_2_1(json_personal, plantilla_2_1, salida_2_1, anio_fiscal, 'ACR')
-                print(f"✅ Ficha 2.1 generada ({len(df_personal)} personas)")
+                generar_2_1(json_personal, plantilla_2_1, salida_2_1, anio_fiscal)
+                print(f"✅ Ficha 2.1 generada ({n_personal} personas)")
                 return {
                     "success": True,
                     "status": "success",
-                    "message": f"✅ Ficha 2.1 generada ({len(df_personal)} personas)",
+                    "message": f"✅ Ficha 2.1 generada ({n_personal} personas)",
                     "aviso": None,
-                    "file": "Ficha_2_1.docx"
+                    "file": "Ficha_2_1.docx",
+                    "generacion_id": generacion.id
                 }
             except Exception as e:
                 print(f"❌ Error al generar Ficha 2.1: {e}")
@@ -1281,16 +1563,15 @@ def generate_ficha_2_2_only(cliente_nif: str = None, proyecto_acronimo: str = No
         else:
             data_dir = INPUT_DIR
         
-        output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
-        os.makedirs(output_dir, exist_ok=True)
+        generacion = salidas.nueva(cliente_nif, proyecto_acronimo)
         
         json_colaboraciones = os.path.join(data_dir, "Excel_Colaboraciones_2.2.json")
         json_facturas = os.path.join(data_dir, "Excel_Facturas_2.2.json")
         plantilla_2_2 = os.path.join(INPUT_DIR, "2.2.docx")
-        salida_2_2 = os.path.join(output_dir, "Ficha_2_2.docx")
+        salida_2_2 = generacion.ruta("Ficha_2_2.docx")
         
         # Verificar datos
-        if not os.path.exists(json_colaboraciones) or not os.path.exists(json_facturas):
+        if not almacen.existe(json_colaboraciones) or not almacen.existe(json_facturas):
             return {
                 "success": False,
                 "status": "error",
@@ -1300,9 +1581,9 @@ def generate_ficha_2_2_only(cliente_nif: str = None, proyecto_acronimo: str = No
             }
         
         try:
-            df_colab = pd.read_json(json_colaboraciones)
-            df_fact = pd.read_json(json_facturas)
-            if len(df_colab) == 0 and len(df_fact) == 0:
+            n_colaboraciones = cache_datos.contar(json_colaboraciones)
+            n_facturas = cache_datos.contar(json_facturas)
+            if n_colaboraciones == 0 and n_facturas == 0:
                 return {
                     "success": False,
                     "status": "error",
@@ -1333,14 +1614,15 @@ def generate_ficha_2_2_only(cliente_nif: str = None, proyecto_acronimo: str = No
                     cliente_nombre = payload.get('cliente_nombre') or payload.get('entidad_solicitante')
                     cliente_nif_val = payload.get('cliente_nif') or payload.get('nif_cliente')
 
-                generar_ficha_2_2(json_colaboraciones, json_facturas, plantilla_2_2, salida_2_2, cliente_nombre=cliente_nombre, cliente_nif=cliente_nif_val, anio=anio_fiscal)
-                print(f"✅ Ficha 2.2 generada ({len(df_colab)} colaboraciones, {len(df_fact)} facturas)")
+                generar_2_2(json_colaboraciones, json_facturas, plantilla_2_2, salida_2_2, anio_fiscal, cliente_nombre=cliente_nombre, cliente_nif=cliente_nif_val)
+                print(f"✅ Ficha 2.2 generada ({n_colaboraciones} colaboraciones, {n_facturas} facturas)")
                 return {
                     "success": True,
                     "status": "success",
-                    "message": f"✅ Ficha 2.2 generada ({len(df_colab)} colaboraciones, {len(df_fact)} facturas)",
+                    "message": f"✅ Ficha 2.2 generada ({n_colaboraciones} colaboraciones, {n_facturas} facturas)",
                     "aviso": None,
-                    "file": "Ficha_2_2.docx"
+                    "file": "Ficha_2_2.docx",
+                    "generacion_id": generacion.id
                 }
             except Exception as e:
                 print(f"❌ Error al generar Ficha 2.2: {e}")
@@ -1371,15 +1653,18 @@ def generate_ficha_2_2_only(cliente_nif: str = None, proyecto_acronimo: str = No
 
 
 @app.get("/download-fichas")
-async def download_fichas(cliente_nif: str = None, proyecto_acronimo: str = None):
+async def download_fichas(cliente_nif: str = None, proyecto_acronimo: str = None, dividir: bool = False):
     """
     Descarga todas las fichas generadas como un ZIP, REGENERÁNDOLAS con datos frescos.
     
-    Esto asegura que el ZIP contenga las firmas más recientes.
+    Esto asegura que el ZIP contenga las firmas más recientes. El ZIP se envía
+    en trozos a medida que se comprime (ver zip_streaming.py).
     
     Parámetros:
       - cliente_nif: opcional, para usar datos del cliente específico
       - proyecto_acronimo: opcional, para usar datos del proyecto específico (requiere cliente_nif)
+      - dividir: si es true, el ZIP incluye además una Ficha 2.1 por persona
+        (carpeta Ficha_2_1/) y una Ficha 2.2 por colaboración (carpeta Ficha_2_2/)
     """
     try:
         # Limpiar parámetros
@@ -1388,92 +1673,14 @@ async def download_fichas(cliente_nif: str = None, proyecto_acronimo: str = None
         if proyecto_acronimo:
             proyecto_acronimo = proyecto_acronimo.strip().upper()
         
-        # Determinar data_dir (igual que en generate-fichas)
-        if cliente_nif:
-            if proyecto_acronimo:
-                print(f"\n⬇️ DOWNLOAD-FICHAS: Regenerando para cliente {cliente_nif} / proyecto {proyecto_acronimo}")
-                project_dir = get_project_dir(cliente_nif, proyecto_acronimo)
-                data_dir = os.path.join(project_dir, 'data')
-            else:
-                print(f"\n⬇️ DOWNLOAD-FICHAS: Regenerando para cliente {cliente_nif}")
-                data_dir = os.path.join(get_client_dir(cliente_nif), 'data')
-        else:
-            print(f"\n⬇️ DOWNLOAD-FICHAS: Regenerando desde INPUT_DIR")
-            data_dir = INPUT_DIR
-        
-        output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
-        os.makedirs(output_dir, exist_ok=True)
-        
-        print(f"   📂 Data dir: {data_dir} (existe: {os.path.exists(data_dir)})")
-        
-        # Rutas de JSONs
-        json_personal = os.path.join(data_dir, "Excel_Personal_2.1.json")
-        json_colaboraciones = os.path.join(data_dir, "Excel_Colaboraciones_2.2.json")
-        json_facturas = os.path.join(data_dir, "Excel_Facturas_2.2.json")
-        
-        # Plantillas
-        plantilla_2_1 = os.path.join(INPUT_DIR, "2.1.docx")
-        plantilla_2_2 = os.path.join(INPUT_DIR, "2.2.docx")
-        
-        # Salidas
-        salida_2_1 = os.path.join(output_dir, "Ficha_2_1.docx")
-        salida_2_2 = os.path.join(output_dir, "Ficha_2_2.docx")
-        
-        # Año fiscal
-        anio_fiscal = 2024
-        
-        # Determinar qué fichas se pueden generar
-        tiene_personal = os.path.exists(json_personal)
-        tiene_colaboraciones = os.path.exists(json_colaboraciones)
-        tiene_facturas = os.path.exists(json_facturas)
-        
-        generadas = []
-        
-        # REGENERAR Ficha 2.1
-        if tiene_personal and os.path.exists(plantilla_2_1):
-            try:
-                df_personal = pd.read_json(json_personal)
-                personal_count = len(df_personal)
-                if personal_count > 0:
-                    print(f"   🔄 Regenerando Ficha 2.1 ({personal_count} personas)...")
-                    generar_ficha_2_1(json_personal, plantilla_2_1, salida_2_1, anio_fiscal, 'ACR')
-                    generadas.append(salida_2_1)
-                    print(f"   ✅ Ficha 2.1 regenerada")
-            except Exception as e:
-                print(f"   ❌ Error regenerando Ficha 2.1: {e}")
-        
-        # REGENERAR Ficha 2.2
-        if tiene_colaboraciones and tiene_facturas and os.path.exists(plantilla_2_2):
-            try:
-                df_colab = pd.read_json(json_colaboraciones)
-                df_fact = pd.read_json(json_facturas)
-                if len(df_colab) > 0 and len(df_fact) > 0:
-                    print(f"   🔄 Regenerando Ficha 2.2 ({len(df_colab)} colaboraciones, {len(df_fact)} facturas)...")
-                    print(f"   ℹ️ NIF 2 será rellenado con: {cliente_nif if cliente_nif else '[no proporcionado]'}")
-                    generar_ficha_2_2(json_colaboraciones, json_facturas, plantilla_2_2, salida_2_2, cliente_nombre=None, cliente_nif=cliente_nif, anio=anio_fiscal)
-                    generadas.append(salida_2_2)
-                    print(f"   ✅ Ficha 2.2 regenerada")
-            except Exception as e:
-                print(f"   ❌ Error regenerando Ficha 2.2: {e}")
-        
-        if not generadas:
-            raise HTTPException(status_code=400, detail="No hay datos para generar fichas")
-        
-        # Crear un ZIP en memoria
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for file_path in generadas:
-                if os.path.exists(file_path):
-                    arcname = os.path.basename(file_path)
-                    zip_file.write(file_path, arcname=arcname)
-        
-        zip_buffer.seek(0)
-        
-        print(f"   📥 ZIP creado con {len(generadas)} fichas")
+        trozos, desde_cache = regenerar_fichas_zip(cliente_nif, proyecto_acronimo, dividir)
         return StreamingResponse(
-            iter([zip_buffer.getvalue()]),
+            trozos,
             media_type="application/zip",
-            headers={"Content-Disposition": "attachment; filename=fichas.zip"}
+            headers={
+                "Content-Disposition": "attachment; filename=fichas.zip",
+                "X-Cache": "hit" if desde_cache else "miss",
+            }
         )
     except HTTPException:
         raise
@@ -1482,6 +1689,361 @@ async def download_fichas(cliente_nif: str = None, proyecto_acronimo: str = None
         raise HTTPException(status_code=500, detail=f"Error al descargar fichas: {str(e)}")
 
 
+@app.get("/download-fichas-lote")
+def download_fichas_lote(clientes: str = None, forzar: bool = False):
+    """
+    Descarga en un único ZIP las fichas de todos los proyectos de uno o varios
+    clientes, generando los proyectos a la vez y enviando cada uno en cuanto
+    termina (ver fichas_lote).
+    
+    Parámetros:
+      - clientes: NIFs de los clientes, separados por comas
+      - forzar: si es true, regenera también los proyectos sin cambios desde el último lote
+        (sin forzar, sus fichas salen de la caché de fichas)
+    """
+    try:
+        trozos, _ = fichas_lote(clientes, forzar)
+        return StreamingResponse(
+            trozos,
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=fichas_lote.zip"}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error en download_fichas_lote: {e}")
+        raise HTTPException(status_code=500, detail=f"Error al generar el lote de fichas: {str(e)}")
+
+
+def generar_ficha_cacheada(tipo: str, entradas: list, parametros: dict, salida: str, generar):
+    """
+    Deja en `salida` la ficha `tipo`: la copia de la caché de fichas si ya se
+    generó con las mismas entradas y parámetros, o llama a generar(ruta) y la
+    guarda en la caché. La ficha se escribe en un temporal y se renombra, así
+    que `salida` nunca queda a medias. Devuelve (clave, desde_cache).
+    """
+    clave = cache_fichas.clave(tipo, entradas, parametros)
+    with escritura_atomica(salida) as temporal:
+        desde_cache = cache_fichas.restaurar(clave, temporal)
+        if not desde_cache:
+            generar(temporal)
+    if desde_cache:
+        print(f"   ⚡ Ficha {tipo} servida desde la caché de fichas")
+    else:
+        cache_fichas.guardar(clave, salida)
+    return clave, desde_cache
+
+
+def generar_2_1(json_personal, plantilla_2_1, salida_2_1, anio_fiscal):
+    """Ficha 2.1 en `salida_2_1` (ver generar_ficha_cacheada)."""
+    return generar_ficha_cacheada(
+        "2.1", [almacen.archivo(json_personal), plantilla_2_1], {"anio": anio_fiscal, "acronimo": 'ACR'}, salida_2_1,
+        lambda ruta: generador_fichas.ficha_2_1(json_personal, plantilla_2_1, ruta, anio_fiscal, 'ACR', lector=cache_datos.leer)
+    )
+
+
+def generar_2_2(json_colaboraciones, json_facturas, plantilla_2_2, salida_2_2, anio_fiscal, cliente_nombre=None, cliente_nif=None):
+    """Ficha 2.2 en `salida_2_2` (ver generar_ficha_cacheada)."""
+    return generar_ficha_cacheada(
+        "2.2", [almacen.archivo(json_colaboraciones), almacen.archivo(json_facturas), plantilla_2_2],
+        {"anio": anio_fiscal, "cliente_nombre": cliente_nombre, "cliente_nif": cliente_nif}, salida_2_2,
+        lambda ruta: generador_fichas.ficha_2_2(json_colaboraciones, json_facturas, plantilla_2_2, ruta, cliente_nombre=cliente_nombre, cliente_nif=cliente_nif, anio=anio_fiscal, lector=cache_datos.leer)
+    )
+
+
+def _zip_y_guardar(clave_zip, entradas):
+    """
+    Trozos del ZIP de `entradas` a medida que se comprimen. Se van copiando a
+    un temporal y, si el ZIP se envía entero, queda guardado en la caché de fichas.
+    """
+    temporal = os.path.join(tempfile.gettempdir(), f"fichas_{uuid.uuid4().hex}.zip")
+    try:
+        with open(temporal, 'wb') as copia:
+            for trozo in zip_en_streaming(entradas):
+                copia.write(trozo)
+                yield trozo
+        cache_fichas.guardar(clave_zip, temporal)
+        print(f"   📥 ZIP enviado ({os.path.getsize(temporal)} bytes)")
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def _con_fichas_divididas(entradas, divisiones):
+    """
+    Las `entradas` de las fichas completas y, detrás, las de cada (carpeta,
+    fichas) de `divisiones`: fichas(directorio) genera las fichas por
+    persona/colaboración una a una mientras el ZIP se va enviando.
+    """
+    yield from entradas
+    with tempfile.TemporaryDirectory() as directorio:
+        for carpeta, fichas in divisiones:
+            try:
+                for nombre, ruta in fichas(directorio):
+                    yield f"{carpeta}/{nombre}", ruta
+            except Exception as e:
+                print(f"   ❌ Error generando las fichas de {carpeta}/: {e}")
+
+
+def rutas_fichas(data_dir: str):
+    """Rutas de los JSONs de `data_dir` y de las plantillas de las fichas."""
+    return {
+        "personal": os.path.join(data_dir, "Excel_Personal_2.1.json"),
+        "colaboraciones": os.path.join(data_dir, "Excel_Colaboraciones_2.2.json"),
+        "facturas": os.path.join(data_dir, "Excel_Facturas_2.2.json"),
+        "plantilla_2_1": os.path.join(INPUT_DIR, "2.1.docx"),
+        "plantilla_2_2": os.path.join(INPUT_DIR, "2.2.docx"),
+    }
+
+
+def tareas_fichas(rutas: dict, generacion, cliente_nif: str = None, anio_fiscal: int = 2024):
+    """
+    (ficha, salida, generar) de cada ficha que se puede generar con los datos
+    de `rutas` en la carpeta de `generacion`: la 2.1 si hay personal y la 2.2
+    si hay colaboraciones y facturas (y sus plantillas).
+    """
+    json_personal, json_colaboraciones, json_facturas = rutas["personal"], rutas["colaboraciones"], rutas["facturas"]
+    plantilla_2_1, plantilla_2_2 = rutas["plantilla_2_1"], rutas["plantilla_2_2"]
+    salida_2_1 = generacion.ruta("Ficha_2_1.docx")
+    salida_2_2 = generacion.ruta("Ficha_2_2.docx")
+    tareas = []
+    
+    # REGENERAR Ficha 2.1
+    if almacen.existe(json_personal) and os.path.exists(plantilla_2_1):
+        try:
+            personal_count = cache_datos.contar(json_personal)
+            if personal_count > 0:
+                print(f"   🔄 Regenerando Ficha 2.1 ({personal_count} personas)...")
+                tareas.append(("Ficha 2.1", salida_2_1, lambda: generar_2_1(json_personal, plantilla_2_1, salida_2_1, anio_fiscal)))
+        except Exception as e:
+            print(f"   ❌ Error regenerando Ficha 2.1: {e}")
+    
+    # REGENERAR Ficha 2.2
+    if almacen.existe(json_colaboraciones) and almacen.existe(json_facturas) and os.path.exists(plantilla_2_2):
+        try:
+            n_colaboraciones = cache_datos.contar(json_colaboraciones)
+            n_facturas = cache_datos.contar(json_facturas)
+            if n_colaboraciones > 0 and n_facturas > 0:
+                print(f"   🔄 Regenerando Ficha 2.2 ({n_colaboraciones} colaboraciones, {n_facturas} facturas)...")
+                print(f"   ℹ️ NIF 2 será rellenado con: {cliente_nif if cliente_nif else '[no proporcionado]'}")
+                tareas.append(("Ficha 2.2", salida_2_2, lambda: generar_2_2(json_colaboraciones, json_facturas, plantilla_2_2, salida_2_2, anio_fiscal, cliente_nif=cliente_nif)))
+        except Exception as e:
+            print(f"   ❌ Error regenerando Ficha 2.2: {e}")
+    return tareas
+
+
+def regenerar_fichas_zip(cliente_nif: str = None, proyecto_acronimo: str = None, dividir: bool = False):
+    """
+    Regenera las fichas con los datos actuales y devuelve (trozos del ZIP,
+    desde_cache) (usado por /download-fichas y por su versión en segundo
+    plano): los trozos son un iterador de bytes que se envía o se escribe sin
+    tener el ZIP entero en memoria.
+    Las fichas cuyos datos, plantilla y parámetros no han cambiado (y el ZIP
+    que las contiene) salen de la caché de fichas sin volver a generarse.
+    Con `dividir` el ZIP incluye también una ficha por persona y por
+    colaboración, que se generan mientras se envía.
+    """
+    # Determinar data_dir (igual que en generate-fichas)
+    if cliente_nif:
+        if proyecto_acronimo:
+            print(f"\n⬇️ DOWNLOAD-FICHAS: Regenerando para cliente {cliente_nif} / proyecto {proyecto_acronimo}")
+            project_dir = get_project_dir(cliente_nif, proyecto_acronimo)
+            data_dir = os.path.join(project_dir, 'data')
+        else:
+            print(f"\n⬇️ DOWNLOAD-FICHAS: Regenerando para cliente {cliente_nif}")
+            data_dir = os.path.join(get_client_dir(cliente_nif), 'data')
+    else:
+        print(f"\n⬇️ DOWNLOAD-FICHAS: Regenerando desde INPUT_DIR")
+        data_dir = INPUT_DIR
+    
+    generacion = salidas.nueva(cliente_nif, proyecto_acronimo)
+    
+    print(f"   📂 Data dir: {data_dir} (existe: {os.path.exists(data_dir)})")
+    
+    rutas = rutas_fichas(data_dir)
+    json_personal, json_colaboraciones, json_facturas = rutas["personal"], rutas["colaboraciones"], rutas["facturas"]
+    plantilla_2_1, plantilla_2_2 = rutas["plantilla_2_1"], rutas["plantilla_2_2"]
+    salida_2_1 = generacion.ruta("Ficha_2_1.docx")
+    salida_2_2 = generacion.ruta("Ficha_2_2.docx")
+    anio_fiscal = 2024
+    
+    generadas = []
+    claves = []
+    tareas = tareas_fichas(rutas, generacion, cliente_nif, anio_fiscal)  # se regeneran a la vez
+    
+    resultados = generador_fichas.en_paralelo([generar for _, _, generar in tareas])
+    for (ficha, salida, _), (resultado, error) in zip(tareas, resultados):
+        if error is None:
+            generadas.append(salida)
+            claves.append(resultado[0])
+            print(f"   ✅ {ficha} regenerada")
+        else:
+            print(f"   ❌ Error regenerando {ficha}: {error}")
+    
+    if not generadas:
+        raise HTTPException(status_code=400, detail="No hay datos para generar fichas")
+    
+    # El ZIP depende solo de las fichas que contiene (las divididas salen de los mismos datos)
+    clave_zip = cache_fichas.clave("zip", [], {"fichas": claves, "dividir": dividir})
+    en_cache = cache_fichas.localizar(clave_zip, ".zip")
+    if en_cache is not None:
+        print(f"   ⚡ ZIP servido desde la caché de fichas")
+        return leer_en_trozos(en_cache), True
+    
+    entradas = [(os.path.basename(ruta), ruta) for ruta in generadas]
+    if dividir:
+        # Los datos se leen ya, para que las fichas divididas correspondan a las completas
+        divisiones = []
+        if salida_2_1 in generadas:
+            df_personal = cache_datos.leer(json_personal)
+            divisiones.append(("Ficha_2_1", lambda directorio: fichas_2_1_por_persona(
+                df_personal, json_personal, plantilla_2_1, directorio, anio_fiscal, 'ACR')))
+        if salida_2_2 in generadas:
+            df_colab = cache_datos.leer(json_colaboraciones)
+            df_facturas = cache_datos.leer(json_facturas)
+            divisiones.append(("Ficha_2_2", lambda directorio: fichas_2_2_por_colaboracion(
+                df_colab, df_facturas, json_colaboraciones, json_facturas, plantilla_2_2, directorio,
+                cliente_nif=cliente_nif, anio=anio_fiscal)))
+        entradas = _con_fichas_divididas(entradas, divisiones)
+    
+    print(f"   📥 Enviando ZIP con {len(generadas)} fichas{' y sus fichas por persona/colaboración' if dividir else ''}")
+    return _zip_y_guardar(clave_zip, entradas), False
+
+
+# Lote de fichas: todos los proyectos de uno o varios clientes en un único ZIP.
+# Los proyectos se generan a la vez (cada uno con sus fichas 2.1 y 2.2 en el
+# pool de generador_fichas) y cada uno entra en el ZIP en cuanto termina.
+ESTADO_LOTE = "estado_lote.json"
+
+def proyectos_lote(clientes: str):
+    """(cliente_nif, proyecto) de todos los proyectos de los NIFs de `clientes` (separados por comas)."""
+    nifs = list(dict.fromkeys(nif.strip() for nif in (clientes or "").split(",") if nif.strip()))
+    if not nifs:
+        raise HTTPException(status_code=400, detail="Indica al menos un cliente")
+    proyectos = []
+    for nif in nifs:
+        if not catalogo.existe_cliente(nif):
+            raise HTTPException(status_code=404, detail=f"Cliente {nif} no encontrado")
+        acronimos, _ = catalogo.listar_proyectos(nif)
+        proyectos.extend((nif, acronimo) for acronimo in acronimos)
+    return proyectos
+
+
+def firma_proyecto(rutas: dict, cliente_nif: str, anio_fiscal: int):
+    """Firma de las entradas de un proyecto: cambia con sus tablas, las plantillas, los parámetros o la versión del generador."""
+    existentes = [almacen.archivo(ruta) for ruta in rutas.values() if almacen.existe(ruta)]
+    return cache_fichas.clave("lote", existentes, {
+        "archivos": [os.path.basename(ruta) for ruta in existentes],
+        "cliente_nif": cliente_nif,
+        "anio": anio_fiscal,
+    })
+
+
+def fichas_anteriores(carpeta: str, firma: str):
+    """
+    [(nombre, ruta en la caché de fichas)] de las fichas del último lote de un
+    proyecto sin cambios, o None si ha cambiado, no se conocen sus fichas o
+    alguna ya no está en la caché (entonces se vuelve a generar).
+    """
+    if not registro_lotes.sin_cambios(carpeta, firma):
+        return None
+    claves = registro_lotes.fichas(carpeta)
+    if claves is None:
+        return None
+    fichas = [(nombre, cache_fichas.localizar(clave, os.path.splitext(nombre)[1])) for nombre, clave in sorted(claves.items())]
+    return None if any(ruta is None for _, ruta in fichas) else fichas
+
+
+def _generar_proyecto_lote(cliente_nif: str, proyecto: str, rutas: dict, anio_fiscal: int):
+    """
+    Genera las fichas de un proyecto del lote. Devuelve (estado, rutas de las
+    fichas generadas, {nombre: clave en la caché de fichas}).
+    """
+    generacion = salidas.nueva(cliente_nif, proyecto)
+    tareas = tareas_fichas(rutas, generacion, cliente_nif, anio_fiscal)
+    if not tareas:
+        return {"estado": SIN_DATOS}, [], {}
+    
+    generadas, fichas, claves, errores = [], [], {}, []
+    resultados = generador_fichas.en_paralelo([generar for _, _, generar in tareas])
+    for (ficha, salida, _), (resultado, error) in zip(tareas, resultados):
+        if error is None:
+            generadas.append(salida)
+            fichas.append({"nombre": os.path.basename(salida), "desde_cache": resultado[1]})
+            claves[os.path.basename(salida)] = resultado[0]
+        else:
+            errores.append(f"{ficha}: {error}")
+    estado = {"estado": ERROR if errores else GENERADO, "fichas": fichas, "generacion_id": generacion.id}
+    if errores:
+        estado["errores"] = errores
+    return estado, generadas, claves
+
+
+def fichas_lote(clientes: str, forzar: bool = False, progreso=None):
+    """
+    Genera las fichas de todos los proyectos de `clientes` y devuelve (trozos
+    del ZIP, estados). El ZIP tiene una carpeta Cliente_<nif>/<proyecto>/ por
+    proyecto con fichas y, al final, estado_lote.json con el estado de cada
+    proyecto (generado, sin_cambios, sin_datos o error); `estados` se va
+    completando a medida que se envía.
+    Salvo con `forzar`, los proyectos cuyas entradas no han cambiado desde el
+    último lote no se regeneran (sin_cambios): sus fichas de entonces salen
+    de la caché de fichas y entran las primeras en el ZIP. Las firmas se
+    registran cuando el ZIP se ha generado entero; los proyectos con errores
+    se reintentan en el siguiente lote. progreso(hechos, total, proyecto,
+    estado), si se indica, se llama al terminar cada proyecto generado.
+    """
+    anio_fiscal = 2024
+    estados = {}  # "Cliente_<nif>/<proyecto>" -> estado
+    anteriores = []  # (carpeta, [(nombre, ruta en la caché de fichas)])
+    pendientes = []  # (carpeta, cliente_nif, proyecto, rutas, firma)
+    for cliente_nif, proyecto in proyectos_lote(clientes):
+        carpeta = f"Cliente_{cliente_nif}/{proyecto}"
+        rutas = rutas_fichas(os.path.join(PROYECTOS_DIR, f"Cliente_{cliente_nif}", proyecto, 'data'))
+        firma = firma_proyecto(rutas, cliente_nif, anio_fiscal)
+        fichas = None if forzar else fichas_anteriores(carpeta, firma)
+        if fichas is not None:
+            estados[carpeta] = {"estado": SIN_CAMBIOS, "fichas": [{"nombre": nombre, "desde_cache": True} for nombre, _ in fichas]}
+            anteriores.append((carpeta, fichas))
+        else:
+            estados[carpeta] = {"estado": "pendiente"}
+            pendientes.append((carpeta, cliente_nif, proyecto, rutas, firma))
+    
+    print(f"\n📦 LOTE DE FICHAS: {len(estados)} proyectos, {len(pendientes)} por generar")
+    
+    def entradas():
+        for carpeta, fichas in anteriores:
+            for nombre, ruta in fichas:
+                yield f"{carpeta}/{nombre}", ruta
+        
+        firmas, claves_fichas = {}, {}
+        tareas = [
+            lambda cliente_nif=cliente_nif, proyecto=proyecto, rutas=rutas: _generar_proyecto_lote(cliente_nif, proyecto, rutas, anio_fiscal)
+            for _, cliente_nif, proyecto, rutas, _ in pendientes
+        ]
+        for hechos, (indice, resultado, error) in enumerate(generador_fichas.a_medida_que(tareas), start=1):
+            carpeta, _, _, _, firma = pendientes[indice]
+            estado, generadas, claves = resultado if error is None else ({"estado": ERROR, "errores": [str(error)]}, [], {})
+            estados[carpeta] = estado
+            print(f"   {'✅' if estado['estado'] == GENERADO else '⚠️'} {carpeta}: {estado['estado']}")
+            if estado["estado"] in (GENERADO, SIN_DATOS):
+                firmas[carpeta] = firma
+                claves_fichas[carpeta] = claves
+            if progreso:
+                progreso(hechos, len(tareas), carpeta, estado)
+            for ruta in generadas:
+                yield f"{carpeta}/{os.path.basename(ruta)}", ruta
+        
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta_estado = os.path.join(directorio, ESTADO_LOTE)
+            with open(ruta_estado, 'w', encoding='utf-8') as f:
+                json.dump({"forzar": forzar, "proyectos": estados}, f, ensure_ascii=False, indent=2)
+            yield ESTADO_LOTE, ruta_estado
+        registro_lotes.registrar(firmas, claves_fichas)
+    
+    return zip_en_streaming(entradas()), estados
+
+
 @app.get("/download-ficha")
 def download_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str = None):
     """Descarga una ficha individual, REGENERÁNDOLA con datos frescos antes de descargar.
@@ -1516,17 +2078,16 @@ def download_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str =
         print(f"   📂 Usando data_dir: {data_dir}")
         print(f"   ✓ Directorio existe: {os.path.exists(data_dir)}")
         
-        output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
-        os.makedirs(output_dir, exist_ok=True)
+        generacion = salidas.nueva(cliente_nif, proyecto_acronimo)
         
         # Rutas de JSONs (datos frescos desde disco)
         json_personal = os.path.join(data_dir, "Excel_Personal_2.1.json")
         json_colaboraciones = os.path.join(data_dir, "Excel_Colaboraciones_2.2.json")
         json_facturas = os.path.join(data_dir, "Excel_Facturas_2.2.json")
         
-        print(f"   📄 Personal existe: {os.path.exists(json_personal)}")
-        print(f"   📄 Colaboraciones existe: {os.path.exists(json_colaboraciones)}")
-        print(f"   📄 Facturas existe: {os.path.exists(json_facturas)}")
+        print(f"   📄 Personal existe: {almacen.existe(json_personal)}")
+        print(f"   📄 Colaboraciones existe: {almacen.existe(json_colaboraciones)}")
+        print(f"   📄 Facturas existe: {almacen.existe(json_facturas)}")
         
         # Plantillas
         plantilla_2_1 = os.path.join(INPUT_DIR, "2.1.docx")
@@ -1540,14 +2101,13 @@ def download_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str =
         
         # REGENERAR FICHA 2.1
         if "2_1" in ficha_name or "2.1" in ficha_name:
-            salida_2_1 = os.path.join(output_dir, "Ficha_2_1.docx")
+            salida_2_1 = generacion.ruta("Ficha_2_1.docx")
             
-            if not os.path.exists(json_personal):
+            if not almacen.existe(json_personal):
                 raise HTTPException(status_code=400, detail="No hay datos de personal. Cargue un Anexo primero.")
             
             try:
-                df_personal = pd.read_json(json_personal)
-                personal_count = len(df_personal)
+                personal_count = cache_datos.contar(json_personal)
                 print(f"   ✓ Personal: {personal_count} registros")
                 
                 if personal_count == 0:
@@ -1556,9 +2116,9 @@ def download_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str =
                 if not os.path.exists(plantilla_2_1):
                     raise HTTPException(status_code=400, detail="Plantilla 2.1 no encontrada")
                 
-                # REGENERAR con datos frescos
+                # REGENERAR con datos frescos (o desde la caché si no han cambiado)
                 print(f"   🔄 Regenerando Ficha 2.1 con {personal_count} personas...")
-                generar_ficha_2_1(json_personal, plantilla_2_1, salida_2_1, anio_fiscal, 'ACR')
+                _, desde_cache = generar_2_1(json_personal, plantilla_2_1, salida_2_1, anio_fiscal)
                 print(f"   ✅ Ficha 2.1 regenerada exitosamente")
                 
             except HTTPException:
@@ -1571,16 +2131,14 @@ def download_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str =
         
         # REGENERAR FICHA 2.2
         elif "2_2" in ficha_name or "2.2" in ficha_name:
-            salida_2_2 = os.path.join(output_dir, "Ficha_2_2.docx")
+            salida_2_2 = generacion.ruta("Ficha_2_2.docx")
             
-            if not os.path.exists(json_colaboraciones) or not os.path.exists(json_facturas):
+            if not almacen.existe(json_colaboraciones) or not almacen.existe(json_facturas):
                 raise HTTPException(status_code=400, detail="No hay datos de colaboraciones o facturas. Cargue un Anexo primero.")
             
             try:
-                df_colab = pd.read_json(json_colaboraciones)
-                df_fact = pd.read_json(json_facturas)
-                colaboraciones_count = len(df_colab)
-                facturas_count = len(df_fact)
+                colaboraciones_count = cache_datos.contar(json_colaboraciones)
+                facturas_count = cache_datos.contar(json_facturas)
                 print(f"   ✓ Colaboraciones: {colaboraciones_count} registros")
                 print(f"   ✓ Facturas: {facturas_count} registros")
                 
@@ -1593,7 +2151,7 @@ def download_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str =
                 # REGENERAR con datos frescos y cliente_nif para rellenar NIF 2
                 print(f"   🔄 Regenerando Ficha 2.2 con {colaboraciones_count} colaboraciones y {facturas_count} facturas...")
                 print(f"   ℹ️ NIF 2 será rellenado con: {cliente_nif if cliente_nif else '[no proporcionado]'}")
-                generar_ficha_2_2(json_colaboraciones, json_facturas, plantilla_2_2, salida_2_2, cliente_nombre=None, cliente_nif=cliente_nif, anio=anio_fiscal)
+                _, desde_cache = generar_2_2(json_colaboraciones, json_facturas, plantilla_2_2, salida_2_2, anio_fiscal, cliente_nif=cliente_nif)
                 print(f"   ✅ Ficha 2.2 regenerada exitosamente")
                 
             except HTTPException:
@@ -1611,7 +2169,11 @@ def download_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str =
             raise HTTPException(status_code=500, detail="La ficha no fue generada correctamente")
         
         print(f"   📥 Descargando: {os.path.basename(file_path)}")
-        return FileResponse(path=file_path, filename=os.path.basename(file_path), media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+        return FileResponse(
+            path=file_path, filename=os.path.basename(file_path),
+            media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+            headers={"X-Cache": "hit" if desde_cache else "miss"}
+        )
         
     except HTTPException:
         raise
@@ -1620,14 +2182,42 @@ def download_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str =
         raise HTTPException(status_code=500, detail=f"Error al descargar fichero: {str(e)}")
 
 
+def ficha_generada(name: str, cliente_nif: str = None, proyecto_acronimo: str = None, generacion_id: str = None):
+    """Ruta de una ficha ya generada: de la generación indicada o de la última del cliente/proyecto."""
+    generacion = salidas.obtener(generacion_id, cliente_nif, proyecto_acronimo)
+    file_path = generacion.ruta(name) if generacion else None
+    if not file_path or not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Fichero no encontrado")
+    return file_path
+
+
+@app.get("/fichas")
+def list_generaciones(cliente_nif: str = None, proyecto_acronimo: str = None):
+    """Generaciones de fichas que se conservan del cliente/proyecto (la más reciente primero)."""
+    cliente_nif, proyecto_acronimo = _limpiar_parametros(cliente_nif, proyecto_acronimo)
+    return {"generaciones": salidas.listar(cliente_nif, proyecto_acronimo)}
+
+
+@app.get("/fichas/{generacion_id}/{name}")
+def get_ficha_generada(generacion_id: str, name: str, cliente_nif: str = None, proyecto_acronimo: str = None):
+    """Descarga una ficha de una generación concreta, sin regenerarla."""
+    cliente_nif, proyecto_acronimo = _limpiar_parametros(cliente_nif, proyecto_acronimo)
+    file_path = ficha_generada(name, cliente_nif, proyecto_acronimo, generacion_id)
+    return FileResponse(
+        path=file_path, filename=os.path.basename(file_path),
+        media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    )
+
+
 @app.get("/preview-ficha")
-def preview_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str = None):
+def preview_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str = None, generacion_id: str = None):
     """Devuelve una previsualización HTML simple del contenido textual de un .docx.
     No realiza conversiones complejas: extrae párrafos y los devuelve en HTML.
     Parámetros:
       - name: nombre del fichero (por ejemplo: Ficha_2_1.docx)
       - cliente_nif: opcional, para usar datos del cliente específico
       - proyecto_acronimo: opcional, para usar datos del proyecto específico (requiere cliente_nif)
+      - generacion_id: opcional, la generación a mostrar (por defecto la última)
     """
     try:
         from docx import Document as DocxDocument
@@ -1644,12 +2234,9 @@ def preview_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str = N
             else:
                 print(f"\n👁️ PREVIEW-FICHA para cliente: {cliente_nif} - archivo: {name}")
         else:
-            print(f"\n👁️ PREVIEW-FICHA desde OUTPUT_DIR - archivo: {name}")
+            print(f"\n👁️ PREVIEW-FICHA sin cliente - archivo: {name}")
 
-        output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
-        file_path = os.path.join(output_dir, os.path.basename(name))
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="Fichero no encontrado")
+        file_path = ficha_generada(name, cliente_nif, proyecto_acronimo, generacion_id)
 
         doc = DocxDocument(file_path)
         html_parts = ["<div style='font-family:Arial,Helvetica,sans-serif;padding:16px'>"]
@@ -1669,16 +2256,13 @@ def preview_ficha(name: str, cliente_nif: str = None, proyecto_acronimo: str = N
 
 
 @app.get("/preview-ficha-pdf")
-def preview_ficha_pdf(name: str):
+def preview_ficha_pdf(name: str, cliente_nif: str = None, proyecto_acronimo: str = None, generacion_id: str = None):
     """Devuelve el .docx convertido a PDF usando LibreOffice soffice si está disponible.
-    Si no, retorna el HTML de fallback.
+    Si no, retorna el HTML de fallback. Mismos parámetros que /preview-ficha.
     """
     try:
-        output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
-        file_path = os.path.join(output_dir, os.path.basename(name))
-        
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="Fichero no encontrado")
+        cliente_nif, proyecto_acronimo = _limpiar_parametros(cliente_nif, proyecto_acronimo)
+        file_path = ficha_generada(name, cliente_nif, proyecto_acronimo, generacion_id)
 
         # Crear temporal para PDF
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -1794,6 +2378,285 @@ def validate_data(cliente_nif: str = None, proyecto_acronimo: str = None):
         raise HTTPException(status_code=500, detail=f"Error en validación: {str(e)}")
 
 
+@app.post("/validate-diff")
+def validate_diff(request: ValidateDiffRequest):
+    """
+    Revalida solo lo que cambia al editar celdas.
+    - tabla: personal, colaboraciones o facturas.
+    - cambios: [{"fila": 3, "valores": {"Columna": valor}}] (fila 0-based); también
+      {"op": "insert", "fila": 3, "valores": {...}} y {"op": "delete", "fila": 3}.
+    - sesion: token de la edición. Sin él se abre una sesión nueva desde los JSON
+      del proyecto y la respuesta trae su token; las llamadas siguientes de esa
+      edición lo envían para acumular sus cambios.
+    Los cambios se aplican sobre el estado en memoria de la sesión, nunca sobre
+    el de otras ediciones (no se guardan en disco; para eso están /update-*). Si
+    los JSON del proyecto cambian en disco, la sesión se vuelve a cargar de ellos.
+    Una sesión desconocida o caducada da 404: hay que empezar otra sin `sesion`.
+    Retorna lo mismo que /validate, más `sesion`.
+    """
+    try:
+        cliente_nif = request.cliente_nif.strip() if request.cliente_nif else None
+        proyecto_acronimo = request.proyecto_acronimo.strip().upper() if request.proyecto_acronimo else None
+
+        if cliente_nif:
+            if proyecto_acronimo:
+                data_dir = os.path.join(get_project_dir(cliente_nif, proyecto_acronimo), 'data')
+            else:
+                data_dir = os.path.join(get_client_dir(cliente_nif), 'data')
+        else:
+            data_dir = INPUT_DIR
+
+        rutas = [
+            os.path.join(data_dir, "Excel_Personal_2.1.json"),
+            os.path.join(data_dir, "Excel_Colaboraciones_2.2.json"),
+            os.path.join(data_dir, "Excel_Facturas_2.2.json"),
+        ]
+        if not all(almacen.existe(ruta) for ruta in rutas):
+            raise HTTPException(status_code=400, detail="Faltan archivos de datos. Ejecute /upload-anexo primero.")
+
+        if request.sesion:
+            sesion = request.sesion
+            estado = validaciones.obtener(sesion, data_dir, rutas)
+            if estado is None:
+                raise HTTPException(status_code=404, detail="Sesión de validación desconocida o caducada: empiece otra sin 'sesion'")
+        else:
+            sesion, estado = validaciones.crear(data_dir, rutas)
+        try:
+            reevaluadas = estado.aplicar_cambios(
+                request.tabla,
+                [{"op": c.op, "fila": c.fila, "valores": c.valores} for c in request.cambios]
+            )
+        except (ValueError, TypeError, IndexError, KeyError) as e:
+            raise HTTPException(status_code=400, detail=f"Cambios no válidos: {str(e)}")
+        es_valido, resumen = estado.resumen()
+
+        return {
+            "status": "valid" if es_valido else "invalid",
+            "exitosa": es_valido,
+            "resumen": resumen,
+            "puede_generar": es_valido,
+            "reglas_reevaluadas": reevaluadas,
+            "sesion": sesion
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en validación: {str(e)}")
+
+@app.delete("/validate-diff/{sesion}")
+def cerrar_validate_diff(sesion: str):
+    """Descarta una sesión de /validate-diff y los cambios que solo se habían validado."""
+    if not validaciones.olvidar(sesion):
+        raise HTTPException(status_code=404, detail="Sesión de validación desconocida o caducada")
+    return {"status": "success"}
+
+
+# --- TRABAJOS EN SEGUNDO PLANO (/jobs) ---
+# Versiones asíncronas de los endpoints pesados: devuelven un job_id al
+# momento y el trabajo se ejecuta en la cola. Dos trabajos del mismo proyecto
+# nunca se ejecutan a la vez; los de proyectos distintos sí (cada generación
+# de fichas escribe en su propia carpeta de outputs/fichas/). Los endpoints
+# síncronos que escriben en data/ toman su turno con reserva_datos().
+
+def claves_trabajo(cliente_nif: str = None, proyecto_acronimo: str = None):
+    """Claves de serialización: el data/ que toca el trabajo."""
+    if cliente_nif and proyecto_acronimo:
+        return [f"Cliente_{cliente_nif}/{proyecto_acronimo}"]
+    elif cliente_nif:
+        return [f"Cliente_{cliente_nif}"]
+    return ["inputs"]
+
+def _limpiar_parametros(cliente_nif: str = None, proyecto_acronimo: str = None):
+    return (cliente_nif.strip() if cliente_nif else None,
+            proyecto_acronimo.strip().upper() if proyecto_acronimo else None)
+
+def reserva_datos(cliente_nif: str = None, proyecto_acronimo: str = None):
+    """
+    Turno en la cola sobre el data/ del proyecto para un endpoint síncrono que
+    lo escribe: espera a los trabajos en marcha sobre él y los que lleguen
+    después le esperan a él (ver ColaTrabajos.reservar).
+    """
+    return cola_trabajos.reservar(claves_trabajo(*_limpiar_parametros(cliente_nif, proyecto_acronimo)))
+
+def _trabajo_upload_anexo(trabajo, nombre_archivo, cliente_nif, proyecto_acronimo):
+    try:
+        # procesar_anexo guarda cada tabla según la extrae: una vez empezado no se puede cancelar
+        trabajo.avanzar(10, "Procesando Anexo II", cancelable=False)
+        return procesar_anexo_subido(nombre_archivo, cliente_nif, proyecto_acronimo)
+    finally:
+        ruta = os.path.join(INPUT_DIR, nombre_archivo)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+def _trabajo_process_cvs(trabajo, cliente_nif, proyecto_acronimo, workers):
+    trabajo.avanzar(5, "Procesando CVs")
+    return procesar_cvs_proyecto(cliente_nif, proyecto_acronimo, workers, progreso=trabajo.avanzar)
+
+def _trabajo_generate_fichas(trabajo, cliente_nif, proyecto_acronimo, payload):
+    trabajo.avanzar(5, "Comprobando datos")
+    return generar_fichas_proyecto(cliente_nif, proyecto_acronimo, payload, progreso=trabajo.avanzar)
+
+def _trabajo_download_fichas(trabajo, cliente_nif, proyecto_acronimo, dividir=False):
+    trabajo.avanzar(10, "Regenerando fichas")
+    trozos, _ = regenerar_fichas_zip(cliente_nif, proyecto_acronimo, dividir)
+    trabajo.avanzar(90, "Guardando ZIP")
+    os.makedirs(JOBS_OUTPUT_DIR, exist_ok=True)
+    ruta_zip = os.path.join(JOBS_OUTPUT_DIR, f"{trabajo.id}.zip")
+    with open(ruta_zip, 'wb') as f:
+        for trozo in trozos:
+            f.write(trozo)
+    trabajo.archivos.append(ruta_zip)
+    return {"archivo": ruta_zip, "nombre": "fichas.zip", "media_type": "application/zip"}
+
+def _trabajo_download_fichas_lote(trabajo, clientes, forzar=False):
+    trabajo.avanzar(5, "Comprobando proyectos")
+    trozos, estados = fichas_lote(
+        clientes, forzar,
+        progreso=lambda hechos, total, carpeta, estado: trabajo.avanzar(5 + 90 * hechos / total, f"{carpeta}: {estado['estado']}")
+    )
+    os.makedirs(JOBS_OUTPUT_DIR, exist_ok=True)
+    ruta_zip = os.path.join(JOBS_OUTPUT_DIR, f"{trabajo.id}.zip")
+    with open(ruta_zip, 'wb') as f:
+        for trozo in trozos:
+            f.write(trozo)
+    trabajo.archivos.append(ruta_zip)
+    return {"archivo": ruta_zip, "nombre": "fichas_lote.zip", "media_type": "application/zip", "proyectos": estados}
+
+def _trabajo_migrar_tablas(trabajo):
+    trabajo.avanzar(10, "Migrando tablas a Parquet", cancelable=False)
+    resumen = almacen.migrar_todo(PROYECTOS_DIR)
+    print(f"📦 Almacén de tablas: {resumen['migradas']} de {resumen['tablas']} tablas migradas a Parquet")
+    return resumen
+
+# Al arrancar, las tablas JSON de los proyectos se migran al almacén columnar en
+# segundo plano (mientras tanto, las que no lo estén se leen del JSON)
+if os.environ.get('ALMACEN_MIGRAR_AL_ARRANCAR', '1') == '1':
+    cola_trabajos.enviar("migrar-tablas", ["almacen"], _trabajo_migrar_tablas)
+
+@app.post("/jobs/upload-anexo")
+async def job_upload_anexo(file: UploadFile = File(...), cliente_nif: str = None, proyecto_acronimo: str = None):
+    """Como /upload-anexo, pero en segundo plano. Devuelve el job_id."""
+    cliente_nif, proyecto_acronimo = _limpiar_parametros(cliente_nif, proyecto_acronimo)
+    # Nombre único: trabajos de proyectos distintos no comparten el archivo subido
+    nombre_archivo = f"Anexo_Subido_{uuid.uuid4().hex}.xlsx"
+    with open(os.path.join(INPUT_DIR, nombre_archivo), "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    trabajo = cola_trabajos.enviar(
+        "upload-anexo", claves_trabajo(cliente_nif, proyecto_acronimo),
+        _trabajo_upload_anexo, nombre_archivo, cliente_nif, proyecto_acronimo
+    )
+    # Si se cancela antes de empezar, el archivo se borra al salir del historial
+    trabajo.archivos.append(os.path.join(INPUT_DIR, nombre_archivo))
+    return {"job_id": trabajo.id, "estado": trabajo.estado}
+
+@app.post("/jobs/process-cvs")
+def job_process_cvs(cliente_nif: str = None, proyecto_acronimo: str = None, workers: int = None):
+    """Como /process-cvs, pero en segundo plano. Devuelve el job_id."""
+    cliente_nif, proyecto_acronimo = _limpiar_parametros(cliente_nif, proyecto_acronimo)
+    trabajo = cola_trabajos.enviar(
+        "process-cvs", claves_trabajo(cliente_nif, proyecto_acronimo),
+        _trabajo_process_cvs, cliente_nif, proyecto_acronimo, workers
+    )
+    return {"job_id": trabajo.id, "estado": trabajo.estado}
+
+@app.post("/jobs/generate-fichas")
+def job_generate_fichas(cliente_nif: str = None, proyecto_acronimo: str = None, payload: Dict[str, Any] = Body(None)):
+    """Como /generate-fichas, pero en segundo plano. Devuelve el job_id."""
+    cliente_nif, proyecto_acronimo = _limpiar_parametros(cliente_nif, proyecto_acronimo)
+    trabajo = cola_trabajos.enviar(
+        "generate-fichas", claves_trabajo(cliente_nif, proyecto_acronimo),
+        _trabajo_generate_fichas, cliente_nif, proyecto_acronimo, payload
+    )
+    return {"job_id": trabajo.id, "estado": trabajo.estado}
+
+@app.post("/jobs/download-fichas")
+def job_download_fichas(cliente_nif: str = None, proyecto_acronimo: str = None, dividir: bool = False):
+    """Como /download-fichas, pero en segundo plano. El ZIP se obtiene en /jobs/{id}/result."""
+    cliente_nif, proyecto_acronimo = _limpiar_parametros(cliente_nif, proyecto_acronimo)
+    trabajo = cola_trabajos.enviar(
+        "download-fichas", claves_trabajo(cliente_nif, proyecto_acronimo),
+        _trabajo_download_fichas, cliente_nif, proyecto_acronimo, dividir
+    )
+    return {"job_id": trabajo.id, "estado": trabajo.estado}
+
+@app.post("/jobs/download-fichas-lote")
+def job_download_fichas_lote(clientes: str = None, forzar: bool = False):
+    """
+    Como /download-fichas-lote, pero en segundo plano: el mensaje del trabajo
+    indica el último proyecto terminado y su estado. El ZIP se obtiene en /jobs/{id}/result.
+    """
+    proyectos = proyectos_lote(clientes)
+    trabajo = cola_trabajos.enviar(
+        "download-fichas-lote", [claves_trabajo(nif, proyecto)[0] for nif, proyecto in proyectos],
+        _trabajo_download_fichas_lote, clientes, forzar
+    )
+    return {"job_id": trabajo.id, "estado": trabajo.estado}
+
+def _obtener_trabajo(job_id: str):
+    trabajo = cola_trabajos.obtener(job_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo {job_id} no encontrado")
+    return trabajo
+
+@app.get("/jobs")
+def list_jobs(cliente_nif: str = None, proyecto_acronimo: str = None):
+    """Lista los trabajos (más recientes primero), opcionalmente de un cliente/proyecto."""
+    clave = None
+    if cliente_nif:
+        clave = claves_trabajo(*_limpiar_parametros(cliente_nif, proyecto_acronimo))[0]
+    return {"jobs": [t.to_dict() for t in cola_trabajos.listar(clave)]}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Estado y progreso de un trabajo (para polling)."""
+    return _obtener_trabajo(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Estado y progreso de un trabajo como Server-Sent Events hasta que termina."""
+    trabajo = _obtener_trabajo(job_id)
+
+    async def eventos():
+        version = -1
+        while True:
+            terminado = trabajo.finalizado
+            if trabajo.version != version:
+                version = trabajo.version
+                yield f"data: {json.dumps(trabajo.to_dict(), ensure_ascii=False)}\n\n"
+            if terminado:
+                break
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(eventos(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    """Resultado de un trabajo terminado: JSON o, si generó un archivo, el archivo."""
+    trabajo = _obtener_trabajo(job_id)
+    if trabajo.estado == "error":
+        raise HTTPException(status_code=500, detail=trabajo.error)
+    if trabajo.estado != "completado":
+        raise HTTPException(status_code=409, detail=f"El trabajo está '{trabajo.estado}'")
+    resultado = trabajo.resultado
+    if isinstance(resultado, dict) and resultado.get("archivo"):
+        return FileResponse(resultado["archivo"], media_type=resultado.get("media_type"), filename=resultado.get("nombre"))
+    return resultado
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """
+    Cancela un trabajo en cola, o pide a uno en marcha que se detenga en su
+    siguiente punto de control. 409 si ya ha terminado o si está en una etapa
+    que no se puede interrumpir (p. ej. procesando el Anexo o guardando datos).
+    """
+    trabajo = _obtener_trabajo(job_id)
+    if not cola_trabajos.cancelar(job_id):
+        if not trabajo.finalizado:
+            raise HTTPException(status_code=409, detail=f"El trabajo ya no se puede cancelar: {trabajo.mensaje}")
+        raise HTTPException(status_code=409, detail=f"El trabajo ya está '{trabajo.estado}'")
+    return trabajo.to_dict()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark del almacén columnar de tablas frente al JSON orient='records'
+con tablas de personal sintéticas (por defecto 100, 10.000 y 100.000 filas).
+
+Mide el guardado tal y como lo hace el backend: antes, to_json y después
+poner al día el .parquet de al lado (releer el JSON, su SHA-256 y escribir
+el .parquet); ahora, almacen.guardar(ruta, df) con el DataFrame que ya está
+en memoria. También mide la lectura completa (pd.read_json frente al
+.parquet), la lectura de una columna (la que necesita un listado de
+nombres) y el recuento de registros (json.load frente a los metadatos del
+.parquet), y comprueba que los dos caminos guardan la misma tabla.
+
+Uso:
+    python benchmark_almacen_tablas.py [filas ...] [--repeticiones N]
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from almacen_tablas import AlmacenTablas, ruta_parquet
+from cache_anexos import hash_archivo
+
+INPUTS = os.path.join(os.path.dirname(__file__), 'inputs')
+
+
+def tabla_personal(filas):
+    """Tabla de personal de `filas` registros repitiendo las del anexo de ejemplo con nombres distintos."""
+    base = pd.read_json(os.path.join(INPUTS, 'Excel_Personal_2.1.json'))
+    df = pd.concat([base] * (filas // len(base) + 1), ignore_index=True).head(filas)
+    df["Nombre"] = [f"{nombre} {i}" for i, nombre in enumerate(df["Nombre"])]
+    return df
+
+
+def medir(funcion, repeticiones):
+    """Segundos por ejecución (la mejor de `repeticiones`) y el último resultado."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def guardar_antes(almacen, ruta, df):
+    """Guardado anterior: el JSON y, desde él, su copia en .parquet (con el SHA-256 del JSON como firma)."""
+    df.to_json(ruta, orient='records', force_ascii=False, date_format='iso')
+    hash_archivo(ruta)
+    almacen.guardar(ruta, pd.read_json(ruta))
+
+
+def contar_json(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return len(json.load(f))
+
+
+def fila(operacion, t_json, t_parquet):
+    print(f"  {operacion:<18} | {t_json * 1000:9.1f} ms | {t_parquet * 1000:9.1f} ms | {t_json / t_parquet:9.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filas', nargs='*', type=int, default=[100, 10_000, 100_000])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK ALMACÉN DE TABLAS (JSON frente a PARQUET)")
+    print("=" * 70)
+    with tempfile.TemporaryDirectory() as tmp:
+        for filas in args.filas:
+            almacen = AlmacenTablas()
+            df = tabla_personal(filas)
+            ruta_json = os.path.join(tmp, 'antes', str(filas), 'Excel_Personal_2.1.json')
+            ruta = os.path.join(tmp, 'ahora', str(filas), 'Excel_Personal_2.1.json')
+            os.makedirs(os.path.dirname(ruta_json))
+            os.makedirs(os.path.dirname(ruta))
+            t_guardar_antes, _ = medir(lambda: guardar_antes(almacen, ruta_json, df), args.repeticiones)
+            t_guardar, _ = medir(lambda: almacen.guardar(ruta, df), args.repeticiones)
+            igual = almacen.leer(ruta_json).equals(almacen.leer(ruta))
+
+            t_leer_json, _ = medir(lambda: pd.read_json(ruta_json), args.repeticiones)
+            t_leer_pq, _ = medir(lambda: almacen.leer(ruta), args.repeticiones)
+            t_col_json, _ = medir(lambda: pd.read_json(ruta_json)[["Nombre"]], args.repeticiones)
+            t_col_pq, _ = medir(lambda: almacen.leer(ruta, columnas=["Nombre"]), args.repeticiones)
+            t_contar_json, _ = medir(lambda: contar_json(ruta_json), args.repeticiones)
+            t_contar_pq, _ = medir(lambda: almacen.contar(ruta), args.repeticiones)
+
+            tam_json, tam_pq = os.path.getsize(ruta_json), os.path.getsize(ruta_parquet(ruta))
+            print(f"\n📊 {filas:,} filas — JSON {tam_json / 1024:,.0f} KB, Parquet {tam_pq / 1024:,.0f} KB "
+                  f"({'misma tabla' if igual else 'DISTINTA'})")
+            print(f"  {'Operación':<18} | {'JSON':>12} | {'Parquet':>12} | {'Aceleración':>10}")
+            fila("Guardado", t_guardar_antes, t_guardar)
+            fila("Lectura completa", t_leer_json, t_leer_pq)
+            fila("Columna Nombre", t_col_json, t_col_pq)
+            fila("Recuento", t_contar_json, t_contar_pq)
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
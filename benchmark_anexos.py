@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark de lectura de Anexos II sobre 'Dataset de Anexos'.
+
+Compara tres formas de leer las hojas que usa procesar_anexo:
+  - ANTES:     patrón antiguo, el mismo .xlsx se abre hasta cinco veces con
+               pd.read_excel / pd.ExcelFile.
+  - SESIÓN:    LibroAnexo abierto una vez, hojas completas como DataFrame.
+  - STREAMING: LibroAnexo en read_only recorriendo solo las filas necesarias
+               con iter_rows (lo que hace procesar_anexo actualmente).
+
+Además del tiempo medio se muestra el pico de memoria (tracemalloc) de cada
+variante.
+
+Uso:
+    python benchmark_anexos.py [repeticiones]
+"""
+
+import sys
+import os
+import glob
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import pandas as pd
+from libro_anexo import LibroAnexo
+
+DATASET_DIR = os.path.join(os.path.dirname(__file__), 'Dataset de Anexos')
+
+
+def _hojas_externas(nombres):
+    return [h for h in nombres if "externa" in h.lower() or "colabora" in h.lower()]
+
+
+def lectura_antigua(ruta):
+    """Reproduce las lecturas que hacía procesar_anexo antes de LibroAnexo."""
+    pd.read_excel(ruta, sheet_name="Datos solicitud", header=None)   # año fiscal
+    pd.read_excel(ruta, sheet_name="Datos solicitud", header=None)   # NIF / razón social
+    pd.read_excel(ruta, sheet_name="Personal", header=[12, 13])      # Personal
+    nombres = pd.ExcelFile(ruta).sheet_names                         # lista de hojas
+    for hoja in _hojas_externas(nombres):                            # C.Externas
+        pd.read_excel(ruta, sheet_name=hoja, header=None)
+
+
+def lectura_sesion(ruta):
+    """Mismas hojas, servidas por una única sesión LibroAnexo."""
+    with LibroAnexo(ruta) as libro:
+        libro.hoja("Datos solicitud")
+        libro.hoja("Datos solicitud")
+        libro.hoja("Personal", header=[12, 13])
+        for hoja in _hojas_externas(libro.sheet_names):
+            libro.hoja(hoja)
+
+
+def lectura_streaming(ruta):
+    """Recorrido en streaming equivalente al de procesar_anexo."""
+    with LibroAnexo(ruta) as libro:
+        libro.tabla("Datos solicitud")
+        list(libro.filas("Personal", hasta=14))
+        for _ in libro.filas("Personal", desde=15):
+            pass
+        for hoja in _hojas_externas(libro.sheet_names):
+            cabecera = list(libro.filas(hoja, hasta=30))
+            for _ in libro.filas(hoja, desde=len(cabecera) + 1):
+                pass
+
+
+def medir(funcion, ruta, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(ruta)
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def pico_memoria(funcion, ruta):
+    """Pico de memoria (MB) reservada por Python durante una lectura."""
+    tracemalloc.start()
+    funcion(ruta)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico / (1024 * 1024)
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    archivos = sorted(glob.glob(os.path.join(DATASET_DIR, '*.xlsx')))
+    if not archivos:
+        print(f"❌ No hay archivos en {DATASET_DIR}")
+        return
+
+    variantes = [
+        ("ANTES", lectura_antigua),
+        ("SESIÓN", lectura_sesion),
+        ("STREAMING", lectura_streaming),
+    ]
+
+    print("=" * 100)
+    print(f"⏱️  BENCHMARK LECTURA ANEXOS ({len(archivos)} archivos, {repeticiones} repeticiones)")
+    print("=" * 100)
+    print(f"{'ARCHIVO':<45} | " + " | ".join(f"{nombre + ' (s)':>15}" for nombre, _ in variantes))
+    print("-" * 100)
+
+    tiempos = {nombre: 0.0 for nombre, _ in variantes}
+    picos = {nombre: 0.0 for nombre, _ in variantes}
+    for ruta in archivos:
+        columnas = []
+        for nombre, funcion in variantes:
+            t = medir(funcion, ruta, repeticiones)
+            tiempos[nombre] += t
+            picos[nombre] = max(picos[nombre], pico_memoria(funcion, ruta))
+            columnas.append(f"{t:>15.3f}")
+        print(f"{os.path.basename(ruta)[:45]:<45} | " + " | ".join(columnas))
+
+    print("-" * 100)
+    print(f"{'TOTAL (s)':<45} | " + " | ".join(f"{tiempos[n]:>15.3f}" for n, _ in variantes))
+    print(f"{'PICO MEMORIA (MB)':<45} | " + " | ".join(f"{picos[n]:>15.1f}" for n, _ in variantes))
+    base = tiempos["ANTES"]
+    print(f"{'ACELERACIÓN vs ANTES':<45} | " + " | ".join(f"{base / tiempos[n]:>14.1f}x" for n, _ in variantes))
+    print("=" * 100)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark del emparejamiento persona ↔ CV con plantillas sintéticas.
+
+Compara el recorrido antiguo de procesar_cvs (cada persona contra cada PDF,
+normalizando el nombre de archivo y calculando SequenceMatcher en cada par)
+con emparejar_cvs (índice de trigramas + asignación uno a uno).
+
+Los CVs se nombran como en la práctica: 'Nombre Apellido1 Apellido2.pdf',
+a veces sin el segundo apellido, con prefijo 'CV_' o sin tildes, y se
+añade un 20% de archivos que no corresponden a nadie.
+
+Uso:
+    python benchmark_emparejamiento_cvs.py [personas] [archivos]
+"""
+
+import sys
+import os
+import random
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from procesar_cvs import normalizar_texto, puntuar_cv, emparejar_cvs
+
+NOMBRES = [
+    "Alejandro", "Ángel", "Beatriz", "Cristian", "Daniel", "David", "Diego", "Elena",
+    "Eloi", "Erik", "Fernando", "Gemma", "Héctor", "Irene", "Javier", "Jordi", "Laura",
+    "Lucía", "Manuel", "Marta", "Núria", "Óscar", "Pablo", "Raquel", "Sergio", "Sonia",
+]
+APELLIDOS = [
+    "García", "Fernández", "González", "Rodríguez", "López", "Martínez", "Sánchez",
+    "Pérez", "Gómez", "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno",
+    "Muñoz", "Álvarez", "Romero", "Alonso", "Gutiérrez", "Navarro", "Torres", "Domínguez",
+    "Vázquez", "Ramos", "Gil", "Ramírez", "Serrano", "Blanco", "Molina", "Morales",
+    "Suárez", "Ortega", "Delgado", "Castro", "Ortiz", "Rubio", "Marín", "Sanz", "Iglesias",
+    "Navalón", "Palau", "Tarragó", "Guasch", "Clares", "Planellas", "Mardones", "Kormes",
+]
+
+
+def generar_plantilla(n_personas, n_archivos, semilla=42):
+    """Devuelve (nombres 'Nombre Apellidos', archivos de CV barajados)."""
+    rnd = random.Random(semilla)
+    nombres = []
+    vistos = set()
+    while len(nombres) < n_personas:
+        nombre = f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}"
+        if nombre not in vistos:
+            vistos.add(nombre)
+            nombres.append(nombre)
+
+    archivos = []
+    for nombre in nombres[:int(n_archivos * 0.8)]:
+        variante = rnd.random()
+        if variante < 0.2:
+            nombre = " ".join(nombre.split()[:2])
+        elif variante < 0.35:
+            nombre = "CV_" + nombre.replace(" ", "_")
+        elif variante < 0.5:
+            nombre = normalizar_texto(nombre).title()
+        archivos.append(f"{nombre}.pdf")
+    while len(archivos) < n_archivos:
+        archivos.append(f"Candidato {rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {len(archivos)}.pdf")
+    rnd.shuffle(archivos)
+    return nombres, archivos
+
+
+def emparejar_antiguo(nombres, archivos):
+    """Recorrido cuadrático anterior: primer máximo con score >= 2 por persona."""
+    resultado = []
+    for nombre in nombres:
+        nombre_norm = normalizar_texto(nombre)
+        nombre_parts = nombre_norm.split()
+        pdf_match = None
+        max_score = 0
+        for pdf in archivos:
+            c = puntuar_cv(nombre_norm, nombre_parts, pdf, normalizar_texto(pdf))
+            if c['score'] >= 2 and c['score'] > max_score:
+                pdf_match = pdf
+                max_score = c['score']
+        resultado.append(pdf_match)
+    return resultado
+
+
+def main():
+    n_personas = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    n_archivos = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    nombres, archivos = generar_plantilla(n_personas, n_archivos)
+
+    print("=" * 70)
+    print(f"⏱️  BENCHMARK EMPAREJAMIENTO CVs ({n_personas} personas × {n_archivos} archivos)")
+    print("=" * 70)
+
+    inicio = time.perf_counter()
+    antiguo = emparejar_antiguo(nombres, archivos)
+    t_antiguo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    nuevo = [e['archivo'] for e in emparejar_cvs(nombres, archivos)]
+    t_nuevo = time.perf_counter() - inicio
+
+    duplicados_antiguo = sum(1 for a in antiguo if a) - len({a for a in antiguo if a})
+    print(f"{'Antes (cuadrático)':<30}: {t_antiguo:8.3f} s  | "
+          f"{sum(1 for a in antiguo if a)} emparejados, {duplicados_antiguo} PDFs repetidos")
+    print(f"{'Ahora (índice + 1 a 1)':<30}: {t_nuevo:8.3f} s  | "
+          f"{sum(1 for a in nuevo if a)} emparejados, 0 PDFs repetidos")
+    print(f"{'Aceleración':<30}: {t_antiguo / t_nuevo:8.1f}x")
+    print(f"{'Mismo CV que antes':<30}: {sum(1 for a, b in zip(antiguo, nuevo) if a == b)}/{n_personas}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la búsqueda de facturas por colaboración en la Ficha 2.2 según
+el número de entidades y de facturas.
+
+Compara el filtrado anterior (df_facturas[df_facturas["Entidad"] == entidad]
+por cada colaboración y conversión de importes sobre cada trozo) con
+IndiceFacturas (un único groupby y los importes de cada entidad convertidos
+y sumados una vez), y comprueba que las facturas y totales son los mismos.
+Solo se mide la preparación de las facturas, no el renderizado de las tablas.
+
+Uso:
+    python benchmark_facturas_2_2.py [entidades:facturas ...]
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utilidades_docx import IndiceFacturas, facturas_de_tabla
+
+
+def generar_datos(n_entidades, n_facturas, semilla=0):
+    """Colaboraciones y facturas repartidas al azar; uno de cada cinco importes en texto europeo."""
+    rng = np.random.default_rng(semilla)
+    entidades = [f"ENTIDAD {i:05d} S.L." for i in range(n_entidades)]
+    importes = rng.uniform(10, 50000, n_facturas).round(2)
+    df_facturas = pd.DataFrame({
+        "Entidad": rng.choice(entidades, n_facturas),
+        "Nombre factura": [f"Factura {i}" for i in range(n_facturas)],
+        "Importe (€)": [
+            f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") if i % 5 == 0 else v
+            for i, v in enumerate(importes)
+        ],
+    })
+    df_colab = pd.DataFrame({"Razón social": entidades})
+    return df_colab, df_facturas
+
+
+def filtrado_por_colaboracion(df_colab, df_facturas):
+    """Implementación anterior: un filtro booleano sobre todas las facturas por colaboración."""
+    return [
+        facturas_de_tabla(df_facturas[df_facturas["Entidad"] == entidad])
+        for entidad in df_colab["Razón social"]
+    ]
+
+
+def indice_agrupado(df_colab, df_facturas):
+    facturas = IndiceFacturas(df_facturas)
+    return [facturas.de(entidad) for entidad in df_colab["Razón social"]]
+
+
+def medir(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    tamanos = sys.argv[1:] or ["100:2000", "300:5000", "500:10000", "1000:50000"]
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK FACTURAS POR COLABORACIÓN (FICHA 2.2)")
+    print("=" * 70)
+    print(f"{'Entidades':>9} | {'Facturas':>8} | {'Filtrado':>10} | {'Índice':>10} | {'Aceleración':>11} | Resultado")
+    for tamano in tamanos:
+        n_entidades, n_facturas = (int(n) for n in tamano.split(":"))
+        df_colab, df_facturas = generar_datos(n_entidades, n_facturas)
+        t_antes, antes = medir(filtrado_por_colaboracion, df_colab, df_facturas)
+        t_ahora, ahora = medir(indice_agrupado, df_colab, df_facturas)
+        igual = [tuple(map(list, f[:2])) + (f.total,) for f in antes] == [tuple(map(list, f[:2])) + (f.total,) for f in ahora]
+        print(f"{n_entidades:>9} | {n_facturas:>8} | {t_antes:8.3f} s | {t_ahora:8.3f} s | {t_antes / t_ahora:10.1f}x | "
+              f"{'idéntico' if igual else 'DISTINTO'}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la Ficha 2.1 según el número de personas.
+
+Compara la construcción celda a celda (construir_bloque_2_1 por persona,
+como hacía generar_ficha_2_1) con el renderizado por clonado del esqueleto
+(renderizar_bloques_2_1) y comprueba que el XML del documento es el mismo.
+También compara la preparación de los textos: datos_persona_2_1 fila a fila
+(un acceso al DataFrame por campo) frente a la vista personas_2_1 (cada
+columna leída y formateada una vez).
+
+La plantilla de personas se obtiene repitiendo las filas de
+inputs/Excel_Personal_2.1.json.
+
+Uso:
+    python benchmark_ficha_2_1.py [personas ...]
+"""
+
+import sys
+import os
+import time
+
+import pandas as pd
+from docx import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from logica_fichas import datos_persona_2_1, construir_bloque_2_1, renderizar_bloques_2_1
+from vista_fichas import personas_2_1
+
+RUTA_PERSONAL = os.path.join(os.path.dirname(__file__), 'inputs', 'Excel_Personal_2.1.json')
+
+
+def generar_plantilla(n_personas):
+    df = pd.read_json(RUTA_PERSONAL)
+    repeticiones = n_personas // len(df) + 1
+    return pd.concat([df] * repeticiones, ignore_index=True).head(n_personas)
+
+
+def documento_celda_a_celda(personas):
+    doc = Document()
+    for index, datos in enumerate(personas):
+        construir_bloque_2_1(doc, datos)
+        if index < len(personas) - 1:
+            doc.add_page_break()
+    return doc
+
+
+def documento_clonado(personas):
+    doc = Document()
+    renderizar_bloques_2_1(doc, personas)
+    return doc
+
+
+def main():
+    tamanos = [int(n) for n in sys.argv[1:]] or [10, 50, 100, 200]
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK FICHA 2.1 (construcción del documento)")
+    print("=" * 70)
+    print(f"{'Personas':>8} | {'Fila a fila':>11} | {'Vista':>9} | {'Celda a celda':>14} | {'Clonado':>10} | {'Aceleración':>11} | XML")
+    for n in tamanos:
+        df = generar_plantilla(n).sort_values(by='Nombre').reset_index(drop=True)
+
+        inicio = time.perf_counter()
+        personas = [datos_persona_2_1(df, index, 2024) for index in range(len(df))]
+        t_filas = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        vista = personas_2_1(df, 2024)
+        t_vista = time.perf_counter() - inicio
+        assert vista == personas
+
+        inicio = time.perf_counter()
+        antes = documento_celda_a_celda(personas)
+        t_antes = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        ahora = documento_clonado(personas)
+        t_ahora = time.perf_counter() - inicio
+
+        igual = antes.element.xml == ahora.element.xml
+        print(f"{n:>8} | {t_filas:9.3f} s | {t_vista:7.3f} s | {t_antes:12.3f} s | {t_ahora:8.3f} s | {t_antes / t_ahora:10.1f}x | "
+              f"{'idéntico' if igual else 'DISTINTO'}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la generación de las fichas 2.1 y 2.2 según el número de
+personas y de colaboraciones.
+
+Compara la generación secuencial (generar_ficha_2_1 y después
+generar_ficha_2_2, como hacía /generate-fichas) con GeneradorFichas: las dos
+fichas a la vez y la Ficha 2.1 repartida en trozos en un pool de procesos.
+Con N procesos la latencia debería bajar hasta la de la ficha o el trozo más
+lento; con un solo CPU no hay ganancia posible.
+
+Los datos se obtienen repitiendo las filas de inputs/Excel_Personal_2.1.json,
+inputs/Excel_Colaboraciones_2.2.json e inputs/Excel_Facturas_2.2.json.
+
+Uso:
+    python benchmark_generacion_fichas.py [--workers N] [--trozo N] [personas:colaboraciones ...]
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from logica_fichas import generar_ficha_2_1, generar_ficha_2_2
+from fichas_paralelo import GeneradorFichas, FICHAS_WORKERS, TROZO_2_1
+
+INPUTS = os.path.join(os.path.dirname(__file__), 'inputs')
+PLANTILLA_2_1 = os.path.join(INPUTS, '2.1.docx')
+PLANTILLA_2_2 = os.path.join(INPUTS, '2.2.docx')
+
+
+def repetir(nombre, n):
+    df = pd.read_json(os.path.join(INPUTS, nombre))
+    return pd.concat([df] * (n // len(df) + 1), ignore_index=True).head(n)
+
+
+def preparar_datos(directorio, n_personas, n_colaboraciones):
+    """Escribe los JSON de personal, colaboraciones y facturas (sufijo por entidad para que no se repitan)."""
+    personal = repetir('Excel_Personal_2.1.json', n_personas)
+    colaboraciones = repetir('Excel_Colaboraciones_2.2.json', n_colaboraciones)
+    facturas = pd.read_json(os.path.join(INPUTS, 'Excel_Facturas_2.2.json'))
+    originales = pd.read_json(os.path.join(INPUTS, 'Excel_Colaboraciones_2.2.json'))['Razón social'].tolist()
+
+    colaboraciones['Razón social'] = [f"{r} #{i}" for i, r in enumerate(colaboraciones['Razón social'])]
+    por_entidad = []
+    for i, razon in enumerate(colaboraciones['Razón social']):
+        propias = facturas[facturas['Entidad'] == originales[i % len(originales)]].copy()
+        propias['Entidad'] = razon
+        por_entidad.append(propias)
+    facturas = pd.concat(por_entidad, ignore_index=True)
+
+    rutas = {}
+    for clave, df in (('personal', personal), ('colaboraciones', colaboraciones), ('facturas', facturas)):
+        rutas[clave] = os.path.join(directorio, f"{clave}.json")
+        df.to_json(rutas[clave], orient='records', force_ascii=False)
+    return rutas
+
+
+def secuencial(rutas, directorio):
+    generar_ficha_2_1(rutas['personal'], PLANTILLA_2_1, os.path.join(directorio, 'seq_2_1.docx'), 2024, 'ACR')
+    generar_ficha_2_2(rutas['colaboraciones'], rutas['facturas'], PLANTILLA_2_2,
+                      os.path.join(directorio, 'seq_2_2.docx'), anio=2024)
+
+
+def paralelo(generador, rutas, directorio):
+    resultados = generador.en_paralelo([
+        lambda: generador.ficha_2_1(rutas['personal'], PLANTILLA_2_1, os.path.join(directorio, 'par_2_1.docx'), 2024, 'ACR'),
+        lambda: generador.ficha_2_2(rutas['colaboraciones'], rutas['facturas'], PLANTILLA_2_2,
+                                    os.path.join(directorio, 'par_2_2.docx'), anio=2024),
+    ])
+    for _, error in resultados:
+        if error is not None:
+            raise error
+
+
+def silencioso(funcion, *args):
+    """Ejecuta funcion sin la salida por consola de los generadores y devuelve los segundos."""
+    salida = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        inicio = time.perf_counter()
+        funcion(*args)
+        return time.perf_counter() - inicio
+    finally:
+        sys.stdout.close()
+        sys.stdout = salida
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=FICHAS_WORKERS)
+    parser.add_argument('--trozo', type=int, default=TROZO_2_1)
+    parser.add_argument('tamanos', nargs='*', default=['50:10', '200:10', '50:100', '500:50', '1000:200'])
+    args = parser.parse_args()
+
+    generador = GeneradorFichas(workers=args.workers, trozo=args.trozo)
+    silencioso(generador.documento_2_1, [])  # no medir el arranque del pool
+
+    print("=" * 70)
+    print(f"⏱️  BENCHMARK GENERACIÓN FICHAS 2.1 + 2.2 ({args.workers} procesos, trozos de {args.trozo})")
+    print("=" * 70)
+    print(f"{'Personas':>8} | {'Colab.':>6} | {'Secuencial':>11} | {'Paralelo':>9} | {'Aceleración':>11}")
+    try:
+        for tamano in args.tamanos:
+            n_personas, n_colaboraciones = (int(n) for n in tamano.split(':'))
+            with tempfile.TemporaryDirectory() as tmp:
+                rutas = preparar_datos(tmp, n_personas, n_colaboraciones)
+                t_seq = silencioso(secuencial, rutas, tmp)
+                t_par = silencioso(paralelo, generador, rutas, tmp)
+            print(f"{n_personas:>8} | {n_colaboraciones:>6} | {t_seq:9.2f} s | {t_par:7.2f} s | {t_seq / t_par:10.1f}x")
+    finally:
+        generador.cerrar()
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la fusión con la plantilla (fusionar_y_guardar) en fichas 2.1
+pequeñas, donde el coste fijo de la plantilla es la mayor parte del tiempo.
+
+Compara la fusión anterior (Document(plantilla) en cada ficha y estilo
+"Table Grid" sobre todas las tablas del documento final) con la caché de
+plantillas (copia de la plantilla ya abierta y estilo solo en las tablas
+generadas), y comprueba que los .docx resultantes son idénticos. Solo se
+mide la fusión y el guardado, no el renderizado del contenido.
+
+Uso:
+    python benchmark_plantillas.py [personas ...] [--repeticiones N]
+"""
+
+import sys
+import os
+import io
+import time
+import zipfile
+import argparse
+
+import pandas as pd
+from docx import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from logica_fichas import renderizar_bloques_2_1, fusionar_y_guardar
+from vista_fichas import personas_2_1
+
+INPUTS = os.path.join(os.path.dirname(__file__), 'inputs')
+RUTA_PLANTILLA = os.path.join(INPUTS, '2.1.docx')
+
+
+def fusion_sin_cache(doc_generado, ruta_plantilla, ruta_salida):
+    """Implementación anterior: la plantilla se abre y se reestiliza entera en cada ficha."""
+    doc_base = Document(ruta_plantilla)
+    for element in doc_generado.element.body:
+        doc_base.element.body.append(element)
+    for table in doc_base.tables:
+        table.style = "Table Grid"
+    doc_base.save(ruta_salida)
+
+
+def medir(fusion, personas, repeticiones):
+    """Segundos por ficha de la fusión y guardado en memoria (sin el renderizado) y el último .docx."""
+    total = 0.0
+    for _ in range(repeticiones):
+        doc = Document()
+        renderizar_bloques_2_1(doc, personas)
+        salida = io.BytesIO()
+        inicio = time.perf_counter()
+        fusion(doc, RUTA_PLANTILLA, salida)
+        total += time.perf_counter() - inicio
+    return total / repeticiones, salida.getvalue()
+
+
+def contenido(docx):
+    with zipfile.ZipFile(io.BytesIO(docx)) as z:
+        return {n: z.read(n) for n in z.namelist()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('personas', nargs='*', type=int, default=[1, 5, 20])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    df = pd.read_json(os.path.join(INPUTS, 'Excel_Personal_2.1.json'))
+    fusionar_y_guardar(Document(), RUTA_PLANTILLA, io.BytesIO())  # carga la plantilla en la caché
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK FUSIÓN CON PLANTILLA (FICHA 2.1)")
+    print("=" * 70)
+    print(f"{'Personas':>8} | {'Sin caché':>10} | {'Caché':>10} | {'Aceleración':>11} | Resultado")
+    for n in args.personas:
+        personas = personas_2_1(pd.concat([df] * (n // len(df) + 1), ignore_index=True).head(n), 2024)
+        t_antes, antes = medir(fusion_sin_cache, personas, args.repeticiones)
+        t_ahora, ahora = medir(fusionar_y_guardar, personas, args.repeticiones)
+        igual = contenido(antes) == contenido(ahora)
+        print(f"{n:>8} | {t_antes * 1000:7.1f} ms | {t_ahora * 1000:7.1f} ms | {t_antes / t_ahora:10.1f}x | "
+              f"{'idéntico' if igual else 'DISTINTO'}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark de la tabla de costes de la Ficha 2.2 (3. COSTE DE LA
+COLABORACIÓN) según el número de facturas de la entidad.
+
+Compara la construcción anterior (tabla de 34+N filas creada con
+python-docx, anchos por celda, table.cell() para cada acceso y fusiones
+verticales al final) con crear_tabla_coste_colaboracion (plantilla clonada
+y filas de factura añadidas sobre el XML), y comprueba que el XML de la
+tabla es el mismo.
+
+Uso:
+    python benchmark_tabla_coste.py [facturas ...]
+"""
+
+import sys
+import os
+import time
+
+from docx import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utilidades_docx import crear_tabla_coste_colaboracion
+from referencia_tabla_coste import crear_tabla_antigua, generar_facturas
+
+
+def medir(funcion, facturas):
+    """(segundos, xml) o (None, error) si la construcción falla."""
+    doc = Document()
+    inicio = time.perf_counter()
+    try:
+        tabla = funcion(doc, facturas)
+    except RecursionError as e:
+        # La fusión vertical de python-docx es recursiva por fila
+        return None, type(e).__name__
+    return time.perf_counter() - inicio, tabla._element.xml
+
+
+def main():
+    tamanos = [int(n) for n in sys.argv[1:]] or [10, 100, 1000]
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK TABLA DE COSTE FICHA 2.2")
+    print("=" * 70)
+    # La plantilla se construye una vez por proceso: no contarla en la medida
+    t_plantilla, _ = medir(crear_tabla_coste_colaboracion, generar_facturas(0))
+    print(f"Plantilla (una vez por proceso): {t_plantilla:.3f} s")
+    print(f"{'Facturas':>8} | {'Antes':>10} | {'Ahora':>10} | {'Aceleración':>11} | XML")
+    for n in tamanos:
+        facturas = generar_facturas(n)
+        t_antes, xml_antes = medir(crear_tabla_antigua, facturas)
+        t_ahora, xml_ahora = medir(crear_tabla_coste_colaboracion, facturas)
+        if t_antes is None:
+            print(f"{n:>8} | {xml_antes:>10} | {t_ahora:8.3f} s | {'-':>11} | -")
+            continue
+        print(f"{n:>8} | {t_antes:8.3f} s | {t_ahora:8.3f} s | {t_antes / t_ahora:10.1f}x | "
+              f"{'idéntico' if xml_antes == xml_ahora else 'DISTINTO'}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark de ValidadorFichas con plantillas sintéticas.
+
+Compara las reglas anteriores (iterrows y un mensaje por celda, en
+ValidadorFilaAFila) con las reglas por columnas de ValidadorFichas, y
+comprueba que obtener_resumen() da lo mismo.
+
+Las plantillas tienen ~5% de filas con algún problema: campos vacíos,
+números en el nombre, costes <= 0 o no numéricos, costes inconsistentes,
+NIF sospechosos, duplicados y facturas sin colaboración.
+
+Uso:
+    python benchmark_validacion.py [filas ...]
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from validador import ValidadorFichas
+from referencia_validacion import ValidadorFilaAFila, generar_plantilla, validar
+
+
+def main():
+    tamanos = [int(n) for n in sys.argv[1:]] or [1000, 10000]
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK VALIDACIÓN (personal + colaboraciones + facturas)")
+    print("=" * 70)
+    print(f"{'Filas':>8} | {'Fila a fila':>12} | {'Columnas':>10} | {'Aceleración':>11} | Resumen")
+    for n in tamanos:
+        datos = generar_plantilla(n)
+        t_antes, *antes = validar(ValidadorFilaAFila, *datos)
+        t_ahora, *ahora = validar(ValidadorFichas, *datos)
+        print(f"{n:>8} | {t_antes:10.3f} s | {t_ahora:8.3f} s | {t_antes / t_ahora:10.1f}x | "
+              f"{'idéntico' if antes == ahora else 'DISTINTO'}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
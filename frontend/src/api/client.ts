@@ -67,7 +67,8 @@ export const apiService = {
   },
   
   // Client Management
-  listClients: () => api.get('/clientes'),
+  listClients: (buscar?: string, despuesDe?: string, limite?: number) =>
+    api.get('/clientes', { params: { buscar, despues_de: despuesDe, limite } }),
   createClient: (nif: string, nombre?: string) => {
     console.log(`[API] POST /clientes - nif: ${nif} - nombre: ${nombre || 'NONE'}`);
     return api.post('/clientes', null, { 
@@ -86,9 +87,15 @@ export const apiService = {
   },
 
   // Project Management
-  listProyectos: (clienteNif: string) => {
+  listProyectos: (clienteNif: string, buscar?: string, despuesDe?: string, limite?: number) => {
     console.log(`[API] GET /clientes/${clienteNif}/proyectos`);
-    return api.get(`/clientes/${encodeURIComponent(clienteNif)}/proyectos`);
+    return api.get(`/clientes/${encodeURIComponent(clienteNif)}/proyectos`, {
+      params: { buscar, despues_de: despuesDe, limite }
+    });
+  },
+  deleteProyecto: (clienteNif: string, proyectoAcronimo: string) => {
+    console.log(`[API] DELETE /clientes/${clienteNif}/proyectos/${proyectoAcronimo}`);
+    return api.delete(`/clientes/${encodeURIComponent(clienteNif)}/proyectos/${encodeURIComponent(proyectoAcronimo)}`);
   },
   createProyecto: (clienteNif: string, proyectoAcronimo: string) => {
     console.log(`[API] POST /clientes/${clienteNif}/proyectos - acronimo: ${proyectoAcronimo}`);
@@ -98,31 +105,51 @@ export const apiService = {
   },
   
   // Data Management
-  getPersonal: (clienteNif?: string, proyectoAcronimo?: string) => {
+  getPersonal: (clienteNif?: string, proyectoAcronimo?: string, columnas?: string[]) => {
     console.log(`[API] GET /personal - cliente_nif: ${clienteNif || 'NONE'} - proyecto: ${proyectoAcronimo || 'NONE'}`);
-    return api.get('/personal', { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo } });
+    return api.get('/personal', { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo, columnas: columnas?.join(',') } });
   },
   updatePersonal: (data: any[], clienteNif?: string, proyectoAcronimo?: string) => {
     console.log(`[API] POST /update-personal - cliente: ${clienteNif || 'NONE'} - proyecto: ${proyectoAcronimo || 'NONE'} - registros: ${data.length}`);
     return api.post('/update-personal', { data, cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo });
   },
-  getColaboraciones: (clienteNif?: string, proyectoAcronimo?: string) => {
+  getColaboraciones: (clienteNif?: string, proyectoAcronimo?: string, columnas?: string[]) => {
     console.log(`[API] GET /colaboraciones - cliente_nif: ${clienteNif || 'NONE'} - proyecto: ${proyectoAcronimo || 'NONE'}`);
-    return api.get('/colaboraciones', { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo } });
+    return api.get('/colaboraciones', { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo, columnas: columnas?.join(',') } });
   },
   updateColaboraciones: (data: any[], clienteNif?: string, proyectoAcronimo?: string) => {
     console.log(`[API] POST /update-colaboraciones - cliente: ${clienteNif || 'NONE'} - proyecto: ${proyectoAcronimo || 'NONE'} - registros: ${data.length}`);
     return api.post('/update-colaboraciones', { data, cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo });
   },
-  getFacturas: (clienteNif?: string, proyectoAcronimo?: string) => {
+  getFacturas: (clienteNif?: string, proyectoAcronimo?: string, columnas?: string[]) => {
     console.log(`[API] GET /facturas - cliente_nif: ${clienteNif || 'NONE'} - proyecto: ${proyectoAcronimo || 'NONE'}`);
-    return api.get('/facturas', { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo } });
+    return api.get('/facturas', { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo, columnas: columnas?.join(',') } });
   },
   updateFacturas: (data: any[], clienteNif?: string, proyectoAcronimo?: string) => {
     console.log(`[API] POST /update-facturas - cliente: ${clienteNif || 'NONE'} - proyecto: ${proyectoAcronimo || 'NONE'} - registros: ${data.length}`);
     return api.post('/update-facturas', { data, cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo });
   },
 
+  // La tabla en el JSON orient='records' de siempre (compatibilidad con herramientas externas)
+  exportJson: (tabla: 'personal' | 'colaboraciones' | 'facturas', clienteNif?: string, proyectoAcronimo?: string) => {
+    console.log(`[API] GET /export-json/${tabla} - cliente: ${clienteNif || 'NONE'} - proyecto: ${proyectoAcronimo || 'NONE'}`);
+    return api.get(`/export-json/${tabla}`, { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo }, responseType: 'blob' });
+  },
+
+  // Cambios por fila con id estable (ver getFilas); versionBase → 409 si la tabla ha cambiado
+  getFilas: (tabla: 'personal' | 'colaboraciones' | 'facturas', clienteNif: string, proyectoAcronimo?: string) => {
+    console.log(`[API] GET /filas/${tabla} - cliente: ${clienteNif} - proyecto: ${proyectoAcronimo || 'NONE'}`);
+    return api.get(`/filas/${tabla}`, { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo } });
+  },
+  patchTabla: (tabla: 'personal' | 'colaboraciones' | 'facturas', operaciones: any[], clienteNif: string, proyectoAcronimo?: string, versionBase?: number) => {
+    console.log(`[API] PATCH /${tabla} - cliente: ${clienteNif} - proyecto: ${proyectoAcronimo || 'NONE'} - operaciones: ${operaciones.length}`);
+    return api.patch(`/${tabla}`, { operaciones, cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo, version_base: versionBase });
+  },
+  getHistorial: (tabla: 'personal' | 'colaboraciones' | 'facturas', clienteNif: string, proyectoAcronimo?: string, version?: number) => {
+    const url = version === undefined ? `/historial/${tabla}` : `/historial/${tabla}/${version}`;
+    return api.get(url, { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo } });
+  },
+
   // Metadata
   getMetadata: (clienteNif: string) => {
     console.log(`[API] GET /metadata - cliente_nif: ${clienteNif}`);
@@ -139,7 +166,13 @@ export const apiService = {
     console.log(`[API] POST /validate - cliente_nif: ${clienteNif || 'NONE'} - proyecto: ${proyectoAcronimo || 'NONE'}`);
     return api.post('/validate', null, { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo } });
   },
-  
+
+  // Revalida solo las celdas cambiadas: cambios = [{ fila, valores: { columna: valor } }]
+  validateDiff: (tabla: 'personal' | 'colaboraciones' | 'facturas', cambios: any[], clienteNif?: string, proyectoAcronimo?: string) => {
+    console.log(`[API] POST /validate-diff - tabla: ${tabla} - ${cambios.length} cambio(s)`);
+    return api.post('/validate-diff', { tabla, cambios, cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo });
+  },
+
   // Generation
   generateFichas: (clienteNif?: string, proyectoAcronimo?: string, payload?: any) => {
     console.log(`[API] POST /generate-fichas - cliente_nif: ${clienteNif || 'NONE'} - proyecto: ${proyectoAcronimo || 'NONE'}`);
@@ -162,9 +195,13 @@ export const apiService = {
   },
   
   // Download
-  downloadFichas: (clienteNif?: string, proyectoAcronimo?: string, onProgress?: (pct: number) => void) => {
+  downloadFichas: (clienteNif?: string, proyectoAcronimo?: string, onProgress?: (pct: number) => void, dividir?: boolean) => {
     console.log(`[API] GET /download-fichas - cliente: ${clienteNif || 'NONE (INPUT_DIR)'} - proyecto: ${proyectoAcronimo || 'NONE'}`);
-    return api.get('/download-fichas', { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo }, responseType: 'blob', onDownloadProgress: (ev:any) => { if(onProgress && ev.total) onProgress(Math.round((ev.loaded*100)/ev.total)); } });
+    return api.get('/download-fichas', { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo, dividir: dividir || undefined }, responseType: 'blob', onDownloadProgress: (ev:any) => { if(onProgress && ev.total) onProgress(Math.round((ev.loaded*100)/ev.total)); } });
+  },
+  downloadFichasLote: (clientesNif: string[], forzar?: boolean, onProgress?: (bytes: number) => void) => {
+    console.log(`[API] GET /download-fichas-lote - clientes: ${clientesNif.join(', ')}${forzar ? ' (forzar)' : ''}`);
+    return api.get('/download-fichas-lote', { params: { clientes: clientesNif.join(','), forzar: forzar || undefined }, responseType: 'blob', onDownloadProgress: (ev:any) => { if(onProgress) onProgress(ev.loaded); } });
   },
   downloadFicha: (name: string, clienteNif?: string, proyectoAcronimo?: string, onProgress?: (pct: number) => void) => {
     console.log(`[API] GET /download-ficha - cliente: ${clienteNif || 'NONE (INPUT_DIR)'} - proyecto: ${proyectoAcronimo || 'NONE'} - archivo: ${name}`);
@@ -172,14 +209,23 @@ export const apiService = {
   },
   
   // Preview
-  previewFicha: (name: string, clienteNif?: string, proyectoAcronimo?: string) => {
+  previewFicha: (name: string, clienteNif?: string, proyectoAcronimo?: string, generacionId?: string) => {
     console.log(`[API] GET /preview-ficha - cliente: ${clienteNif || 'NONE (INPUT_DIR)'} - proyecto: ${proyectoAcronimo || 'NONE'} - archivo: ${name}`);
-    return api.get('/preview-ficha', { params: { name, cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo } });
+    return api.get('/preview-ficha', { params: { name, cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo, generacion_id: generacionId } });
   },
   previewFichaDocx: (name: string, clienteNif?: string, proyectoAcronimo?: string) => {
     console.log(`[API] GET /download-ficha (arraybuffer) - cliente: ${clienteNif || 'NONE (INPUT_DIR)'} - proyecto: ${proyectoAcronimo || 'NONE'} - archivo: ${name}`);
     return api.get('/download-ficha', { params: { name, cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo }, responseType: 'arraybuffer' });
   },
+
+  // Generated fichas (one folder per generation)
+  listGeneraciones: (clienteNif?: string, proyectoAcronimo?: string) =>
+    api.get('/fichas', { params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo } }),
+  getFichaGenerada: (generacionId: string, name: string, clienteNif?: string, proyectoAcronimo?: string) =>
+    api.get(`/fichas/${encodeURIComponent(generacionId)}/${encodeURIComponent(name)}`, {
+      params: { cliente_nif: clienteNif, proyecto_acronimo: proyectoAcronimo },
+      responseType: 'blob'
+    }),
 };
 
 export default api;
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Referencia para el test y el benchmark de la tabla de costes de la Ficha 2.2:
+la construcción anterior celda a celda (crear_tabla_antigua) y facturas
+sintéticas de una entidad.
+"""
+
+import sys
+import os
+
+import pandas as pd
+from docx.shared import Pt, Cm
+from docx.oxml import OxmlElement, ns
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utilidades_docx import set_cell_color
+
+
+def crear_tabla_antigua(doc, facturas_entidad):
+    """Implementación anterior de crear_tabla_coste_colaboracion (referencia)."""
+    
+    # Función interna formateo (reutilizamos la global para evitar errores)
+    def formatea_numero_local(valor):
+        try:
+            num = float(valor)
+            return f"{num:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        except (ValueError, TypeError):
+            return str(valor)
+
+    total_importe = 0
+    num_facturas = len(facturas_entidad)
+    filas_extra = max(num_facturas - 6, 0)
+    filas_total = 34 + filas_extra
+
+    table = doc.add_table(rows=filas_total, cols=3)
+    table.style = "Table Grid"
+
+    column_widths = [Cm(4.27), Cm(11.24), Cm(2.76)]
+    for row in table.rows:
+        for j in range(3):
+            row.cells[j].width = column_widths[j]
+        row.height = Cm(0.3)
+
+    # --- CORRECCIÓN DEL WARNING AQUÍ ---
+    tbl = table._element
+    tblPr = tbl.find(ns.qn('w:tblPr'))
+    if tblPr is None:
+        tblPr = OxmlElement('w:tblPr')
+        tbl.insert(0, tblPr)
+    # -----------------------------------
+
+    jc = OxmlElement('w:jc')
+    jc.set(ns.qn('w:val'), 'left')
+    tblPr.append(jc)
+
+    tblInd = OxmlElement('w:tblInd')
+    tblInd.set(ns.qn('w:w'), str(int(-0.83 * 567)))
+    tblInd.set(ns.qn('w:type'), 'dxa')
+    tblPr.append(tblInd)
+
+    tblW = OxmlElement('w:tblW')
+    tblW.set(ns.qn('w:w'), str(int(18.33 * 567)))
+    tblW.set(ns.qn('w:type'), 'dxa')
+    tblPr.append(tblW)
+
+    # Texto de cabeceras y partidas
+    text_cells = {
+        (0, 0): "PARTIDA", (0, 1): "CONCEPTO", (0, 2): "IMPORTE (€)",
+        (2, 0): "PERSONAL", (8 + filas_extra, 0): "AMORTIZACIÓN DE ACTIVOS MATERIALES E INMATERIALES",
+        (14 + filas_extra, 0): "MATERIAL FUNGIBLE", (20 + filas_extra, 0): "COLABORACIONES EXTERNAS",
+        (26 + filas_extra, 0): "OTROS GASTOS", (7 + filas_extra, 1): "TOTAL PERSONAL",
+        (13 + filas_extra, 1): "TOTAL AMORTIZACIONES", (19 + filas_extra, 1): "TOTAL MATERIAL",
+        (25 + filas_extra, 1): "TOTAL COLABORACIONES", (31 + filas_extra, 1): "TOTAL OTROS GASTOS",
+        (33 + filas_extra, 0): "TOTAL IMPORTE SUBCONTRATACIÓN DE LA ENTIDAD COLABORADORA"
+    }
+
+    # Aplicar formato
+    for (row, col), text in text_cells.items():
+        cell = table.cell(row, col)
+        cell.text = text
+        run = cell.paragraphs[0].runs[0]
+        run.font.name = "Arial"
+        run.font.size = Pt(10)
+        run.bold = True
+
+    # Colorear celdas
+    cells_to_color = [(0, 0), (0, 1), (0, 2), (2, 0),
+                      (8 + filas_extra, 0), (14 + filas_extra, 0),
+                      (20 + filas_extra, 0), (26 + filas_extra, 0),
+                      (7 + filas_extra, 1), (13 + filas_extra, 1),
+                      (19 + filas_extra, 1), (25 + filas_extra, 1),
+                      (31 + filas_extra, 1), (33 + filas_extra, 0)]
+    for (row, col) in cells_to_color:
+        set_cell_color(table.cell(row, col), "E2EFD9")
+
+    # Fusionar columnas verticales para partidas
+    partidas = [(2, 7 + filas_extra), (8 + filas_extra, 13 + filas_extra),
+                (14 + filas_extra, 19 + filas_extra), (20 + filas_extra, 25 + filas_extra),
+                (26 + filas_extra, 31 + filas_extra)]
+    for start, end in partidas:
+        table.cell(start, 0).merge(table.cell(end, 0))
+
+    table.cell(1, 0).merge(table.cell(1, 2))
+    table.cell(32 + filas_extra, 0).merge(table.cell(32 + filas_extra, 2))
+    table.cell(33 + filas_extra, 0).merge(table.cell(33 + filas_extra, 1))
+
+    # Insertar facturas en la sección de PERSONAL (desde fila 2)
+    for i, (_, factura) in enumerate(facturas_entidad.iterrows()):
+        fila_actual = 2 + i
+        table.cell(fila_actual, 1).text = str(factura.get("Nombre factura", ""))
+        if table.cell(fila_actual, 1).paragraphs:
+            run = table.cell(fila_actual, 1).paragraphs[0].runs[0]
+            run.font.name = "Arial"
+            run.font.size = Pt(10)
+
+        try:
+            val_imp = factura.get("Importe (€)", 0)
+            importe_num = float(val_imp)
+        except ValueError:
+            importe_num = float(str(val_imp).replace(".", "").replace(",", "."))
+
+        total_importe += importe_num
+
+        importe_str = f"{formatea_numero_local(importe_num)} €"
+        table.cell(fila_actual, 2).text = importe_str
+        if table.cell(fila_actual, 2).paragraphs:
+            run = table.cell(fila_actual, 2).paragraphs[0].runs[0]
+            run.font.name = "Arial"
+            run.font.size = Pt(10)
+
+    # Insertar total en fila TOTAL PERSONAL
+    fila_total_personal = 7 + filas_extra
+    table.cell(fila_total_personal, 2).text = f"{formatea_numero_local(total_importe)} €"
+    if table.cell(fila_total_personal, 2).paragraphs:
+        run = table.cell(fila_total_personal, 2).paragraphs[0].runs[0]
+        run.font.name = "Arial"
+        run.font.size = Pt(10)
+        run.bold = True
+
+    # Insertar total general
+    fila_total_general = 33 + filas_extra
+    table.cell(fila_total_general, 2).text = f"{formatea_numero_local(total_importe)} €"
+    if table.cell(fila_total_general, 2).paragraphs:
+        run = table.cell(fila_total_general, 2).paragraphs[0].runs[0]
+        run.font.name = "Arial"
+        run.font.size = Pt(10)
+        run.bold = True
+
+    return table
+
+def generar_facturas(n_facturas):
+    return pd.DataFrame({
+        "Entidad": ["ENTIDAD COLABORADORA S.L."] * n_facturas,
+        "Nombre factura": [f"Factura {i:05d} - servicios de ingeniería" for i in range(n_facturas)],
+        "Importe (€)": [round(100 + i * 37.15, 2) for i in range(n_facturas)],
+    })
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Referencia para los tests y el benchmark de la validación: las reglas
+anteriores fila a fila (ValidadorFilaAFila), plantillas sintéticas con ~5% de
+filas con algún problema (generar_plantilla) y validar() sin el reporte por
+consola.
+"""
+
+import sys
+import os
+import io
+import re
+import random
+import time
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from validador import ValidadorFichas
+
+
+class ValidadorFilaAFila(ValidadorFichas):
+    """Reglas anteriores, fila a fila (referencia)."""
+
+    def limpiar(self):
+        self.errores = []
+        self.advertencias = []
+        self.info = []
+
+    def _validar_campos_obligatorios(self, df: pd.DataFrame, tipo: str):
+        """Verifica que los campos requeridos no estén vacíos."""
+        
+        campos_obligatorios = {
+            "personal": ["Nombre", "Apellidos", "Titulación 1", "Coste horario (€/hora)", "Horas totales"],
+            "colaboraciones": ["Razón social", "NIF", "País de la entidad"],
+            "facturas": ["Entidad", "Nombre factura", "Importe (€)"]
+        }
+        
+        requeridos = campos_obligatorios.get(tipo, [])
+        
+        for idx, row in df.iterrows():
+            fila_num = idx + 1
+            for campo in requeridos:
+                if campo not in df.columns:
+                    continue
+                
+                val = row[campo]
+                # Consideramos vacío: NaN, cadena vacía, None
+                if pd.isna(val) or (isinstance(val, str) and val.strip() == ""):
+                    self.errores.append(
+                        f"❌ Fila {fila_num}: Campo '{campo}' está vacío (obligatorio)"
+                    )
+    
+    def _validar_formatos_personal(self, df: pd.DataFrame):
+        """Valida formatos en datos de Personal."""
+        
+        for idx, row in df.iterrows():
+            fila_num = idx + 1
+            
+            # Validar nombre y apellidos (no números)
+            nombre = str(row.get("Nombre", ""))
+            apellidos = str(row.get("Apellidos", ""))
+            
+            if nombre and re.search(r'\d', nombre):
+                self.advertencias.append(
+                    f"⚠️ Fila {fila_num}: Nombre contiene números: '{nombre}'"
+                )
+            
+            if apellidos and re.search(r'\d', apellidos):
+                self.advertencias.append(
+                    f"⚠️ Fila {fila_num}: Apellidos contienen números: '{apellidos}'"
+                )
+            
+            # Validar coste horario > 0
+            try:
+                coste_horario = float(row.get("Coste horario (€/hora)", 0))
+                if coste_horario <= 0:
+                    self.errores.append(
+                        f"❌ Fila {fila_num}: Coste horario debe ser > 0, se encontró: {coste_horario}"
+                    )
+            except (ValueError, TypeError):
+                self.errores.append(
+                    f"❌ Fila {fila_num}: Coste horario no es un número válido"
+                )
+            
+            # Validar horas totales > 0
+            try:
+                horas = float(row.get("Horas totales", 0))
+                if horas <= 0:
+                    self.errores.append(
+                        f"❌ Fila {fila_num}: Horas totales debe ser > 0, se encontró: {horas}"
+                    )
+            except (ValueError, TypeError):
+                self.errores.append(
+                    f"❌ Fila {fila_num}: Horas totales no es un número válido"
+                )
+    
+    def _validar_consistencia_costes(self, df: pd.DataFrame):
+        """Verifica que Coste total ≈ Coste horario × Horas totales."""
+        
+        for idx, row in df.iterrows():
+            fila_num = idx + 1
+            
+            try:
+                coste_horario = float(row.get("Coste horario (€/hora)", 0))
+                horas = float(row.get("Horas totales", 0))
+                coste_total = float(row.get("Coste total (€)", 0))
+                
+                if horas > 0 and coste_horario > 0:
+                    coste_calculado = coste_horario * horas
+                    diferencia_pct = abs(coste_total - coste_calculado) / coste_calculado * 100
+                    
+                    if diferencia_pct > 1:  # Tolerancia del 1%
+                        self.advertencias.append(
+                            f"⚠️ Fila {fila_num}: Inconsistencia en costes. "
+                            f"Coste total ({coste_total}€) ≠ {coste_horario}€/h × {horas}h = {coste_calculado}€ "
+                            f"(diferencia: {diferencia_pct:.1f}%)"
+                        )
+            except (ValueError, TypeError):
+                pass
+    
+    def _validar_duplicados(self, df: pd.DataFrame, *columnas):
+        """Detecta duplicados en las columnas especificadas."""
+        
+        if len(columnas) == 1:
+            duplicados = df[df.duplicated(subset=columnas, keep=False)]
+            if not duplicados.empty:
+                for idx, row in duplicados.iterrows():
+                    val = row[columnas[0]]
+                    self.advertencias.append(
+                        f"⚠️ Fila {idx + 1}: '{val}' está duplicado en el listado"
+                    )
+        else:
+            duplicados = df[df.duplicated(subset=list(columnas), keep=False)]
+            if not duplicados.empty:
+                self.advertencias.append(
+                    f"⚠️ Se encontraron {len(duplicados)} registros duplicados "
+                    f"por {', '.join(columnas)}"
+                )
+    
+    def _validar_experiencia_laboral(self, df: pd.DataFrame):
+        """Valida que al menos haya experiencia laboral documentada."""
+        
+        personas_sin_experiencia = 0
+        
+        for idx, row in df.iterrows():
+            empresa1 = str(row.get("EMPRESA 1", "")).strip()
+            
+            if not empresa1:
+                personas_sin_experiencia += 1
+        
+        if personas_sin_experiencia > 0:
+            self.advertencias.append(
+                f"⚠️ {personas_sin_experiencia} persona(s) sin experiencia laboral documentada "
+                f"(EMPRESA 1 vacío). Considera procesar sus CVs."
+            )
+    
+    def _validar_nif(self, df: pd.DataFrame):
+        """Valida formato de NIF."""
+        
+        patron_nif = r'^[A-Z0-9]{8,9}$'
+        
+        for idx, row in df.iterrows():
+            nif = str(row.get("NIF", "")).strip().upper()
+            
+            if nif and not re.match(patron_nif, nif):
+                self.advertencias.append(
+                    f"⚠️ Fila {idx + 1}: NIF con formato sospechoso: '{nif}' "
+                    f"(esperado: 8-9 caracteres alfanuméricos)"
+                )
+    
+    def _validar_consistencia_facturas(self, df_colab: pd.DataFrame, df_facturas: pd.DataFrame):
+        """Verifica que todas las facturas tengan una colaboración asociada."""
+        
+        entidades_colab = set(df_colab["Razón social"].unique())
+        entidades_fact = set(df_facturas["Entidad"].unique())
+        
+        facturas_sin_colab = entidades_fact - entidades_colab
+        
+        if facturas_sin_colab:
+            self.advertencias.append(
+                f"⚠️ Hay {len(facturas_sin_colab)} factura(s) sin colaboración asociada: "
+                f"{', '.join(list(facturas_sin_colab)[:3])}{'...' if len(facturas_sin_colab) > 3 else ''}"
+            )
+        
+        # Validar importes > 0
+        for idx, row in df_facturas.iterrows():
+            try:
+                importe = float(row.get("Importe (€)", 0))
+                if importe <= 0:
+                    self.errores.append(
+                        f"❌ Fila {idx + 1} (Facturas): Importe debe ser > 0, se encontró: {importe}"
+                    )
+            except (ValueError, TypeError):
+                self.errores.append(
+                    f"❌ Fila {idx + 1} (Facturas): Importe no es un número válido"
+                )
+
+
+def generar_plantilla(n_filas, semilla=7):
+    """Devuelve (personal, colaboraciones, facturas) con n_filas cada uno."""
+    rnd = random.Random(semilla)
+    personal = []
+    for i in range(n_filas):
+        coste_horario = round(rnd.uniform(20, 80), 2)
+        horas = rnd.randint(50, 1500)
+        fila = {
+            "Nombre": f"Persona{'' if rnd.random() > 0.01 else i}",
+            "Apellidos": f"Apellido {chr(65 + i % 26)}",
+            "Titulación 1": "Ingeniería",
+            "Coste horario (€/hora)": coste_horario,
+            "Horas totales": horas,
+            "Coste total (€)": round(coste_horario * horas * (1 if rnd.random() > 0.02 else 1.3), 2),
+            "EMPRESA 1": "Empresa" if rnd.random() > 0.1 else "",
+        }
+        r = rnd.random()
+        if r < 0.01:
+            fila["Titulación 1"] = "  "
+        elif r < 0.02:
+            fila["Coste horario (€/hora)"] = 0
+        elif r < 0.03:
+            fila["Horas totales"] = None
+        elif r < 0.04:
+            fila["Coste horario (€/hora)"] = "n/d"
+        personal.append(fila)
+
+    colaboraciones = [{
+        "Razón social": f"Entidad {i if rnd.random() > 0.01 else 0}",
+        "NIF": f"B{i:08d}" if rnd.random() > 0.02 else f"B-{i}",
+        "País de la entidad": "España" if rnd.random() > 0.01 else None,
+    } for i in range(n_filas)]
+
+    facturas = [{
+        "Entidad": f"Entidad {rnd.randrange(n_filas) if rnd.random() > 0.001 else 'X'}",
+        "Nombre factura": f"F-{i}",
+        "Importe (€)": round(rnd.uniform(-50, 5000), 2) if rnd.random() > 0.01 else "1.000,00",
+    } for i in range(n_filas)]
+
+    return pd.DataFrame(personal), pd.DataFrame(colaboraciones), pd.DataFrame(facturas)
+
+
+def validar(clase, personal, colaboraciones, facturas):
+    """(segundos, resumen personal, resumen colaboraciones) sin el reporte por consola."""
+    validador = clase()
+    inicio = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        validador.validar_personal(personal)
+        resumen_personal = validador.obtener_resumen()
+        validador.validar_colaboraciones(colaboraciones, facturas)
+        resumen_colab = validador.obtener_resumen()
+    return time.perf_counter() - inicio, resumen_personal, resumen_colab
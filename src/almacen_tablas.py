@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import math
+import numbers
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sin pyarrow las tablas se siguen guardando en JSON
+    pa = pq = None
+
+try:
+    from .salidas import escritura_atomica
+except ImportError:
+    from salidas import escritura_atomica
+
+# Versión del formato de los .parquet. Los de versiones anteriores eran copias
+# del JSON, que seguía siendo el original: se vuelven a importar desde él.
+VERSION_FORMATO = "3"
+CLAVE_METADATOS = b"almacen_tablas"
+
+TEXTO = "texto"
+NUMERO = "numero"
+
+_HISTORIAL = [f"{campo} {n}" for n in range(1, 4) for campo in ("EMPRESA", "PERIODO", "PUESTO")]
+
+# Esquema de cada tabla de los proyectos (columnas conocidas y su tipo)
+ESQUEMAS = {
+    "Excel_Personal_2.1.json": {
+        "Nombre": TEXTO, "Apellidos": TEXTO, "Titulación 1": TEXTO, "Titulación 2": TEXTO,
+        "Coste horario (€/hora)": NUMERO, "Horas totales": NUMERO, "Coste total (€)": NUMERO,
+        "Coste IT (€)": NUMERO, "Horas IT": NUMERO, "Coste I+D (€)": NUMERO, "Horas I+D": NUMERO,
+        "Departamento": TEXTO, "Puesto actual": TEXTO,
+        **{campo: TEXTO for campo in _HISTORIAL},
+        **{f"Actividad {n}": TEXTO for n in range(1, 5)},
+    },
+    "Excel_Colaboraciones_2.2.json": {
+        campo: TEXTO for campo in (
+            "Razón social", "NIF", "NIF 2", "Entidad contratante", "País de la entidad",
+            "Localidad", "Provincia", "País de realización",
+        )
+    },
+    "Excel_Facturas_2.2.json": {"Entidad": TEXTO, "Nombre factura": TEXTO, "Importe (€)": NUMERO},
+}
+
+
+def ruta_parquet(ruta_json):
+    """Archivo columnar de una tabla: junto al JSON, con extensión .parquet."""
+    return os.path.splitext(ruta_json)[0] + ".parquet"
+
+
+class ValoresFueraDeEsquema(ValueError):
+    """Una columna del esquema tiene valores que no se pueden convertir a su tipo."""
+
+    def __init__(self, columna, tipo, fallos):
+        self.columna = columna
+        self.fallos = fallos  # [(fila, valor)]
+        muestra = ", ".join(f"fila {fila}: {valor!r}" for fila, valor in fallos[:5])
+        resto = f" y {len(fallos) - 5} más" if len(fallos) > 5 else ""
+        super().__init__(f"'{columna}' debe ser {tipo}: {muestra}{resto}")
+
+
+def _vacio(valor):
+    return valor is None or (isinstance(valor, float) and math.isnan(valor)) or valor is pd.NA or valor is pd.NaT
+
+
+def _a_numero(valor):
+    """float del valor, None si está vacío ("" incluido); ValueError si no es un número."""
+    if _vacio(valor):
+        return None
+    if isinstance(valor, (bool, np.bool_)):
+        raise ValueError(valor)
+    if isinstance(valor, numbers.Real):
+        return float(valor)
+    if isinstance(valor, str):
+        return float(valor) if valor.strip() else None
+    raise ValueError(valor)
+
+
+def _a_texto(valor):
+    """str del valor, None si está vacío; ValueError si es una lista u objeto."""
+    if _vacio(valor):
+        return None
+    if isinstance(valor, str):
+        return valor
+    if isinstance(valor, (dict, list, tuple)):
+        raise ValueError(valor)
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))  # p. ej. un NIF que se leyó como número
+    return str(valor)
+
+
+def _convertir(serie, convertir, tipo):
+    valores, fallos = [], []
+    for fila, valor in enumerate(serie):
+        try:
+            valores.append(convertir(valor))
+        except (ValueError, TypeError):
+            fallos.append((fila, valor))
+    if fallos:
+        raise ValoresFueraDeEsquema(serie.name, tipo, fallos)
+    return valores
+
+
+def _columna_arrow(serie, tipo_esquema):
+    """
+    (array de Arrow, codificación) de una columna. Las columnas del esquema se
+    convierten a su tipo: TEXTO a string; NUMERO a int64 si ya son enteros y
+    si no a float64, con los textos numéricos convertidos y los vacíos ("")
+    como nulos. Si algún valor no se puede convertir se lanza
+    ValoresFueraDeEsquema y no se guarda nada. Las demás columnas conservan el
+    tipo de pandas, y las de tipo object (p. ej. con listas/objetos o tipos
+    mezclados) se guardan como texto JSON valor a valor, para recuperarlas tal
+    cual.
+    """
+    if tipo_esquema == NUMERO:
+        if pd.api.types.is_integer_dtype(serie.dtype):
+            return pa.array(serie, type=pa.int64(), from_pandas=True), None
+        if pd.api.types.is_float_dtype(serie.dtype):
+            return pa.array(serie, type=pa.float64(), from_pandas=True), None
+        return pa.array(_convertir(serie, _a_numero, "un número"), type=pa.float64()), None
+    if tipo_esquema == TEXTO:
+        if pd.api.types.is_string_dtype(serie.dtype) and serie.dtype != object:
+            return pa.array(serie, type=pa.string(), from_pandas=True), None
+        return pa.array(_convertir(serie, _a_texto, "texto"), type=pa.string()), None
+    if serie.dtype == object:
+        valores = [None if v is None else json.dumps(v, ensure_ascii=False, default=str) for v in serie]
+        return pa.array(valores, type=pa.string()), "json"
+    return pa.array(serie, from_pandas=True), None
+
+
+class AlmacenTablas:
+    """
+    Tablas de los proyectos (personal, colaboraciones, facturas) guardadas en
+    formato columnar (Parquet). Se siguen nombrando por la ruta de su JSON de
+    siempre (data/Excel_Personal_2.1.json...), pero lo que hay en disco es el
+    .parquet de al lado: el JSON orient='records' solo se genera al exportar.
+
+    - guardar(ruta, df) escribe el .parquet con un esquema explícito
+      (ESQUEMAS): las columnas conocidas se convierten a su tipo (un valor
+      que no se pueda convertir rechaza la tabla entera con
+      ValoresFueraDeEsquema), las demás conservan el que deduce pandas y las
+      que mezclan tipos van como JSON por valor.
+    - Los .json que ya existían se importan una sola vez: migrar() para una
+      tabla y migrar_todo() para una carpeta (al arrancar el backend). Desde
+      entonces el JSON ya no se lee ni se escribe (se deja donde estaba);
+      mientras no se importa, la tabla se lee de él. Leer nunca escribe.
+    - archivo(ruta) es el archivo que guarda la tabla (para firmas y hashes:
+      cachés, validación, historial) y existe(ruta) dice si hay tabla.
+    - leer(columnas=[...]) lee solo esas columnas y contar() sale de los
+      metadatos del .parquet, sin leer ninguna.
+
+    Otros archivos (Excel, otros .json) o un entorno sin pyarrow se leen y se
+    guardan en JSON como siempre.
+
+    Uso:
+        almacen.guardar(ruta_json, df)
+        df = almacen.leer(ruta_json)
+        nombres = almacen.leer(ruta_json, columnas=["Nombre", "Apellidos"])
+        n = almacen.contar(ruta_json)
+        texto = almacen.exportar_json(ruta_json)
+    """
+
+    def __init__(self, esquemas=ESQUEMAS):
+        self.esquemas = esquemas
+        self.lecturas = 0
+        self.lecturas_json = 0
+        self.escrituras = 0
+        self.migraciones = 0
+        self._lock = threading.Lock()
+        # Una importación comprueba y escribe sin que un guardado se le cuele en medio
+        self._lock_escritura = threading.Lock()
+
+    def es_tabla(self, ruta):
+        return pq is not None and os.path.basename(ruta) in self.esquemas
+
+    def archivo(self, ruta):
+        """Archivo en disco con la tabla: su .parquet si lo tiene; si no, la propia ruta (un JSON aún sin importar, un Excel...)."""
+        if self.es_tabla(ruta):
+            ruta_pq = ruta_parquet(ruta)
+            if os.path.exists(ruta_pq):
+                return ruta_pq
+        return ruta
+
+    def existe(self, ruta):
+        return os.path.exists(self.archivo(ruta))
+
+    def _metadatos(self, ruta_pq):
+        """Metadatos del almacén en el .parquet, o None si no existe o no se puede leer."""
+        try:
+            metadatos = pq.read_schema(ruta_pq).metadata or {}
+        except (OSError, pa.ArrowInvalid):
+            return None
+        try:
+            return json.loads(metadatos[CLAVE_METADATOS])
+        except (KeyError, ValueError):
+            return None
+
+    def _vigente(self, ruta):
+        """
+        Metadatos del .parquet si la tabla está en él (del formato actual, o
+        sin JSON del que importarla); None si hay que leerla del JSON.
+        """
+        metadatos = self._metadatos(ruta_parquet(ruta))
+        if metadatos is not None and (metadatos.get("version") == VERSION_FORMATO or not os.path.exists(ruta)):
+            return metadatos
+        return None
+
+    def _tabla_arrow(self, ruta, df):
+        esquema = self.esquemas.get(os.path.basename(ruta), {})
+        arrays, campos, codificadas = [], [], []
+        for columna in map(str, df.columns):
+            array, codificacion = _columna_arrow(df[columna].rename(columna), esquema.get(columna))
+            arrays.append(array)
+            campos.append(pa.field(columna, array.type))
+            if codificacion == "json":
+                codificadas.append(columna)
+        metadatos = {"version": VERSION_FORMATO, "json": codificadas}
+        return pa.Table.from_arrays(arrays, schema=pa.schema(campos, metadata={
+            CLAVE_METADATOS: json.dumps(metadatos, ensure_ascii=False).encode("utf-8"),
+        }))
+
+    def _escribir(self, ruta, df):
+        tabla = self._tabla_arrow(ruta, df)  # antes de abrir nada: si no cumple el esquema no se toca el archivo
+        with escritura_atomica(ruta_parquet(ruta)) as temporal:
+            pq.write_table(tabla, temporal, compression="zstd")
+
+    def guardar(self, ruta, df):
+        """
+        Guarda la tabla `df` en su .parquet (otros archivos, o sin pyarrow, en
+        JSON orient='records'). Si alguna columna del esquema tiene valores que
+        no son de su tipo lanza ValoresFueraDeEsquema y no escribe nada.
+        """
+        if not self.es_tabla(ruta):
+            with escritura_atomica(ruta) as temporal:
+                df.to_json(temporal, orient='records', force_ascii=False, date_format='iso')
+            return
+        with self._lock_escritura:
+            self._escribir(ruta, df)
+        with self._lock:
+            self.escrituras += 1
+
+    def migrar(self, ruta, forzar=False):
+        """
+        Importa el JSON de la tabla a su .parquet si aún no está importado (o,
+        con `forzar`, aunque lo esté: el JSON sustituye a lo guardado). True
+        si lo ha importado. Si el JSON no cumple el esquema lanza
+        ValoresFueraDeEsquema y la tabla se sigue leyendo del JSON.
+        """
+        if not self.es_tabla(ruta) or not os.path.exists(ruta):
+            return False
+        with self._lock_escritura:
+            if not forzar and self._vigente(ruta) is not None:
+                return False
+            self._escribir(ruta, pd.read_json(ruta))
+        with self._lock:
+            self.migraciones += 1
+        return True
+
+    def _leer_parquet(self, ruta, metadatos, columnas=None):
+        ruta_pq = ruta_parquet(ruta)
+        if columnas is not None:
+            disponibles = set(pq.read_schema(ruta_pq).names)
+            columnas = [c for c in columnas if c in disponibles]
+        tabla = pq.read_table(ruta_pq, columns=columnas)
+        with self._lock:
+            self.lecturas += 1
+        if not tabla.column_names:
+            return pd.DataFrame(index=pd.RangeIndex(tabla.num_rows))
+        df = tabla.to_pandas()
+        for columna in metadatos.get("json", []):
+            if columna in df.columns:
+                df[columna] = pd.Series(
+                    [None if v is None else json.loads(v) for v in tabla.column(columna).to_pylist()],
+                    index=df.index, dtype=object,
+                )
+        return df
+
+    def leer(self, ruta, columnas=None):
+        """
+        DataFrame de la tabla (solo `columnas`, si se indican; las que no
+        existan se omiten): de su .parquet o, si aún no se ha importado, del JSON.
+        """
+        if self.es_tabla(ruta):
+            metadatos = self._vigente(ruta)
+            if metadatos is not None:
+                return self._leer_parquet(ruta, metadatos, columnas)
+            with self._lock:
+                self.lecturas_json += 1
+        df = pd.read_json(ruta) if ruta.lower().endswith(".json") else pd.read_excel(ruta)
+        return df if columnas is None else df[[c for c in columnas if c in df.columns]]
+
+    def contar(self, ruta):
+        """Número de registros de la tabla: de los metadatos del .parquet, o del JSON si aún no se ha importado."""
+        if self.es_tabla(ruta) and self._vigente(ruta) is not None:
+            return pq.read_metadata(ruta_parquet(ruta)).num_rows
+        with open(ruta, encoding="utf-8") as f:
+            return len(json.load(f))
+
+    def exportar_json(self, ruta):
+        """La tabla como JSON orient='records' (el formato de siempre), generado desde el .parquet."""
+        return self.leer(ruta).to_json(orient='records', force_ascii=False, date_format='iso')
+
+    def migrar_todo(self, directorio):
+        """Importa los JSON de tablas bajo `directorio` que aún no lo estén. Devuelve {"tablas", "migradas", "errores"}."""
+        resumen = {"tablas": 0, "migradas": 0, "errores": []}
+        if pq is None:
+            return resumen
+        for carpeta, _, archivos in os.walk(directorio):
+            for nombre in sorted(archivos):
+                if nombre not in self.esquemas:
+                    continue
+                ruta = os.path.join(carpeta, nombre)
+                resumen["tablas"] += 1
+                try:
+                    if self.migrar(ruta):
+                        resumen["migradas"] += 1
+                except (OSError, ValueError, pa.ArrowException) as e:
+                    resumen["errores"].append(f"{os.path.relpath(ruta, directorio)}: {e}")
+        return resumen
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "disponible": pq is not None,
+                "formato": VERSION_FORMATO,
+                "lecturas_parquet": self.lecturas,
+                "lecturas_json": self.lecturas_json,
+                "escrituras": self.escrituras,
+                "migraciones": self.migraciones,
+            }
+
+
+# Almacén compartido por los lectores y escritores de tablas (backend, leer_datos, CacheDatos, validador, historial)
+almacen = AlmacenTablas()
+
+
+if __name__ == "__main__":
+    # python src/almacen_tablas.py proyectos/   → importa los JSON de todos los proyectos
+    directorio = sys.argv[1] if len(sys.argv) > 1 else "proyectos"
+    print(f"📦 Importando tablas de {directorio} a Parquet...")
+    print(almacen.migrar_todo(directorio))
@@ -0,0 +1,137 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+try:
+    from .procesar_anexo import VERSION_EXTRACTOR, ARCHIVOS_SALIDA
+except ImportError:
+    from procesar_anexo import VERSION_EXTRACTOR, ARCHIVOS_SALIDA
+
+TAMANO_BLOQUE = 1024 * 1024
+
+
+def hash_archivo(ruta):
+    """SHA-256 del contenido de un archivo, leído por bloques."""
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+class CacheAnexos:
+    """
+    Caché en disco de anexos ya procesados, direccionada por contenido.
+
+    La clave es el SHA-256 del .xlsx subido más la versión del extractor, de
+    modo que volver a subir exactamente el mismo archivo restaura las tablas y
+    metadata.json sin volver a ejecutar procesar_anexo.
+
+    Cada entrada es una carpeta <directorio>/<clave>/ con los ARCHIVOS_SALIDA.
+    El mtime de la carpeta marca el último uso y sirve para expulsar por LRU
+    cuando el tamaño total supera `max_bytes`.
+
+    Uso:
+        cache = CacheAnexos(os.path.join(BASE_DIR, "cache", "anexos"))
+        clave = cache.clave(ruta_xlsx)
+        metadata = cache.restaurar(clave, output_dir)
+        if metadata is None:
+            metadata = procesar_anexo(...)
+            cache.guardar(clave, output_dir)
+    """
+
+    def __init__(self, directorio, max_bytes=200 * 1024 * 1024, version=VERSION_EXTRACTOR):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def clave(self, ruta_archivo):
+        """Clave de caché: SHA-256 del archivo + versión del extractor."""
+        return f"{hash_archivo(ruta_archivo)}_v{self.version}"
+
+    def _ruta_entrada(self, clave):
+        return os.path.join(self.directorio, clave)
+
+    def restaurar(self, clave, output_dir):
+        """
+        Si la clave está en caché copia sus archivos a `output_dir` y devuelve
+        los metadatos. Si no está (o la entrada está incompleta) devuelve None.
+        """
+        entrada = self._ruta_entrada(clave)
+        with self._lock:
+            if not all(os.path.exists(os.path.join(entrada, f)) for f in ARCHIVOS_SALIDA):
+                self.misses += 1
+                return None
+            os.makedirs(output_dir, exist_ok=True)
+            for nombre in ARCHIVOS_SALIDA:
+                shutil.copyfile(os.path.join(entrada, nombre), os.path.join(output_dir, nombre))
+            with open(os.path.join(entrada, "metadata.json"), encoding="utf-8") as f:
+                metadata = json.load(f)
+            os.utime(entrada)  # marcar como usada recientemente
+            self.hits += 1
+        return metadata
+
+    def guardar(self, clave, output_dir):
+        """
+        Guarda en caché los archivos generados en `output_dir`. La entrada se
+        escribe en una carpeta temporal y se renombra al final para que nunca
+        quede a medias. Devuelve False si faltaba algún archivo.
+        """
+        if not all(os.path.exists(os.path.join(output_dir, f)) for f in ARCHIVOS_SALIDA):
+            return False
+        entrada = self._ruta_entrada(clave)
+        temporal = f"{entrada}.tmp{os.getpid()}_{threading.get_ident()}"
+        with self._lock:
+            shutil.rmtree(temporal, ignore_errors=True)
+            os.makedirs(temporal)
+            for nombre in ARCHIVOS_SALIDA:
+                shutil.copyfile(os.path.join(output_dir, nombre), os.path.join(temporal, nombre))
+            shutil.rmtree(entrada, ignore_errors=True)
+            os.replace(temporal, entrada)
+            self._podar()
+        return True
+
+    def _entradas(self):
+        """Lista de (ultimo_uso, bytes, ruta) de las entradas completas."""
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            if not os.path.isdir(ruta) or ".tmp" in nombre:
+                continue
+            tamano = sum(
+                os.path.getsize(os.path.join(ruta, f))
+                for f in os.listdir(ruta)
+            )
+            entradas.append((os.path.getmtime(ruta), tamano, ruta))
+        return entradas
+
+    def _podar(self):
+        """Expulsa las entradas menos usadas hasta quedar bajo max_bytes."""
+        entradas = sorted(self._entradas())
+        total = sum(tamano for _, tamano, _ in entradas)
+        while entradas and total > self.max_bytes:
+            _, tamano, ruta = entradas.pop(0)
+            shutil.rmtree(ruta, ignore_errors=True)
+            total -= tamano
+            print(f"   🧹 Cache anexos: expulsada {os.path.basename(ruta)} ({tamano} bytes)")
+
+    def estadisticas(self):
+        """Aciertos, fallos y ocupación actual de la caché."""
+        with self._lock:
+            entradas = self._entradas()
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 3) if consultas else 0.0,
+                "entradas": len(entradas),
+                "bytes": sum(tamano for _, tamano, _ in entradas),
+                "max_bytes": self.max_bytes,
+                "version_extractor": self.version,
+            }
@@ -0,0 +1,111 @@
+import os
+import json
+import threading
+
+try:
+    from .cache_anexos import hash_archivo
+except ImportError:
+    from cache_anexos import hash_archivo
+
+
+class CacheExperiencias:
+    """
+    Caché en disco de la experiencia extraída de cada CV en PDF.
+
+    La clave es el SHA-256 del PDF más la versión del parser, así que un CV
+    que no ha cambiado nunca se vuelve a abrir con pdfplumber, aunque se
+    renombre o se cambie de proyecto. Cada entrada es un JSON pequeño
+    <directorio>/<clave>.json con la lista de experiencias. Su mtime marca el
+    último uso y sirve para expulsar por LRU cuando el tamaño total supera
+    `max_bytes`.
+
+    Uso:
+        cache = CacheExperiencias(os.path.join(BASE_DIR, "cache", "cvs"), VERSION_PARSER_CV)
+        clave = cache.clave(ruta_pdf)
+        experiencias = cache.obtener(clave)
+        if experiencias is None:
+            experiencias = extraer_experiencia_pdf(ruta_pdf)
+            cache.guardar(clave, experiencias)
+    """
+
+    def __init__(self, directorio, version, max_bytes=50 * 1024 * 1024):
+        self.directorio = directorio
+        self.version = version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def clave(self, ruta_pdf):
+        """Clave de caché: SHA-256 del PDF + versión del parser."""
+        return f"{hash_archivo(ruta_pdf)}_v{self.version}"
+
+    def _ruta_entrada(self, clave):
+        return os.path.join(self.directorio, f"{clave}.json")
+
+    def obtener(self, clave):
+        """Experiencias guardadas para la clave, o None si no están en caché."""
+        ruta = self._ruta_entrada(clave)
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                experiencias = json.load(f)
+            os.utime(ruta)  # marcar como usada recientemente
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return experiencias
+
+    def guardar(self, clave, experiencias):
+        """Escribe la entrada en un temporal y la renombra (nunca queda a medias)."""
+        ruta = self._ruta_entrada(clave)
+        temporal = f"{ruta}.tmp{os.getpid()}_{threading.get_ident()}"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(experiencias, f, ensure_ascii=False)
+        with self._lock:
+            os.replace(temporal, ruta)
+            self._podar()
+
+    def _entradas(self):
+        """Lista de (ultimo_uso, bytes, ruta) de las entradas completas."""
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            if not nombre.endswith(".json"):
+                continue
+            try:
+                st = os.stat(ruta)
+            except FileNotFoundError:
+                continue
+            entradas.append((st.st_mtime, st.st_size, ruta))
+        return entradas
+
+    def _podar(self):
+        """Expulsa las entradas menos usadas hasta quedar bajo max_bytes."""
+        entradas = sorted(self._entradas())
+        total = sum(tamano for _, tamano, _ in entradas)
+        while entradas and total > self.max_bytes:
+            _, tamano, ruta = entradas.pop(0)
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tamano
+
+    def estadisticas(self):
+        """Aciertos, fallos y ocupación actual de la caché."""
+        with self._lock:
+            entradas = self._entradas()
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 3) if consultas else 0.0,
+                "entradas": len(entradas),
+                "bytes": sum(tamano for _, tamano, _ in entradas),
+                "max_bytes": self.max_bytes,
+                "version_parser": self.version,
+            }
@@ -0,0 +1,148 @@
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from .logica_fichas import leer_datos
+    from .almacen_tablas import almacen
+except ImportError:
+    from logica_fichas import leer_datos
+    from almacen_tablas import almacen
+
+
+def _firma(ruta):
+    """(mtime_ns, tamaño) del archivo que guarda la tabla; lanza FileNotFoundError si no existe."""
+    st = os.stat(almacen.archivo(ruta))
+    return st.st_mtime_ns, st.st_size
+
+
+class CacheDatos:
+    """
+    Caché en memoria, para todo el proceso, de las tablas de los proyectos.
+
+    La clave es la ruta absoluta de la tabla (la de su JSON, o el Excel) y
+    cada entrada recuerda el (mtime, tamaño) del archivo que la guarda (su
+    .parquet, ver almacen_tablas) al leerla: si cambia en disco (otro
+    endpoint, procesar_cvs, un anexo nuevo...) la siguiente lectura lo vuelve
+    a parsear. Las escrituras del propio backend llaman a invalidar() para no
+    depender de la resolución del mtime.
+
+    Los DataFrames ocupan como mucho `max_bytes` (memory_usage(deep=True));
+    al pasarse se expulsan los menos usados. Además se guarda el número de
+    registros de cada archivo, que contar() sirve sin volver a parsearlo.
+    Las lecturas del disco pasan por el almacén columnar (almacen_tablas).
+
+    Uso:
+        cache = CacheDatos(max_bytes=256 * 1024 * 1024)
+        df = cache.leer(ruta_json)          # copia superficial, se puede modificar
+        n = cache.contar(ruta_json)         # None si el archivo no existe
+        nombres = cache.leer_columnas(ruta_json, ["Nombre", "Apellidos"])
+        cache.invalidar(ruta_json, filas=len(df_guardado))
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, lector=leer_datos):
+        self.max_bytes = max_bytes
+        self.lector = lector
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._tablas = OrderedDict()  # ruta -> (firma, DataFrame, bytes)
+        self._conteos = {}            # ruta -> (firma, nº de registros)
+        self._bytes = 0
+
+    def leer(self, ruta):
+        """DataFrame del archivo (del caché si no ha cambiado en disco)."""
+        ruta = os.path.abspath(ruta)
+        firma = _firma(ruta)
+        with self._lock:
+            entrada = self._tablas.get(ruta)
+            if entrada is not None and entrada[0] == firma:
+                self._tablas.move_to_end(ruta)
+                self.hits += 1
+                return entrada[1].copy(deep=False)
+            self.misses += 1
+
+        df = self.lector(ruta)
+        tamano = int(df.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            self._quitar(ruta)
+            self._conteos[ruta] = (firma, len(df))
+            if tamano <= self.max_bytes:
+                self._tablas[ruta] = (firma, df, tamano)
+                self._bytes += tamano
+                while self._bytes > self.max_bytes:
+                    self._quitar(next(iter(self._tablas)))
+        return df.copy(deep=False)
+
+    def leer_columnas(self, ruta, columnas):
+        """
+        Solo `columnas` de la tabla (las que no existan se omiten). Si la tabla
+        entera está en el caché sale de ahí; si no, se leen solo esas columnas
+        del almacén columnar, sin guardarlas en el caché.
+        """
+        ruta = os.path.abspath(ruta)
+        firma = _firma(ruta)
+        with self._lock:
+            entrada = self._tablas.get(ruta)
+            if entrada is not None and entrada[0] == firma:
+                self._tablas.move_to_end(ruta)
+                self.hits += 1
+                df = entrada[1]
+                return df[[c for c in columnas if c in df.columns]].copy(deep=False)
+            self.misses += 1
+        return almacen.leer(ruta, columnas)
+
+    def contar(self, ruta):
+        """Número de registros del archivo, o None si no existe. Solo parsea si no lo conoce."""
+        ruta = os.path.abspath(ruta)
+        try:
+            firma = _firma(ruta)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            conteo = self._conteos.get(ruta)
+            if conteo is not None and conteo[0] == firma:
+                self.hits += 1
+                return conteo[1]
+        if ruta.lower().endswith(".json"):
+            # Sin construir el DataFrame: de los metadatos del .parquet (o del JSON si no es una tabla)
+            filas = almacen.contar(ruta)
+            with self._lock:
+                self.misses += 1
+                self._conteos[ruta] = (firma, filas)
+            return filas
+        return len(self.leer(ruta))
+
+    def invalidar(self, ruta, filas=None):
+        """
+        Olvida la tabla tras escribirla. Si se indica `filas` (los registros
+        que se acaban de guardar) el conteo queda anotado con la firma nueva.
+        """
+        ruta = os.path.abspath(ruta)
+        with self._lock:
+            self._quitar(ruta)
+            self._conteos.pop(ruta, None)
+            if filas is not None:
+                try:
+                    self._conteos[ruta] = (_firma(ruta), int(filas))
+                except FileNotFoundError:
+                    pass
+
+    def _quitar(self, ruta):
+        """Saca la tabla del caché (llamar con _lock)."""
+        entrada = self._tablas.pop(ruta, None)
+        if entrada is not None:
+            self._bytes -= entrada[2]
+
+    def estadisticas(self):
+        """Aciertos, fallos y ocupación actual."""
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 3) if consultas else 0.0,
+                "tablas": len(self._tablas),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,177 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+try:
+    from .logica_fichas import VERSION_GENERADOR
+    from .cache_anexos import hash_archivo
+except ImportError:
+    from logica_fichas import VERSION_GENERADOR
+    from cache_anexos import hash_archivo
+
+
+class CacheFichas:
+    """
+    Caché en disco de fichas ya generadas (.docx y ZIPs de descarga).
+
+    La clave es un SHA-256 de: tipo de ficha, contenido de cada archivo de
+    entrada (JSONs y plantilla .docx), parámetros de generación (año fiscal,
+    cliente...) y la versión del generador. Si nada de eso cambia, la ficha
+    se sirve tal cual sin volver a renderizarla con python-docx.
+
+    Cada entrada es un archivo <directorio>/<clave><extensión>. Su mtime marca
+    el último uso y sirve para expulsar por LRU cuando el tamaño total supera
+    `max_bytes`. El hash de cada entrada se recuerda mientras no cambien su
+    mtime y tamaño, para no releer los JSON en cada descarga.
+
+    Uso:
+        cache = CacheFichas(os.path.join(BASE_DIR, "cache", "fichas"))
+        clave = cache.clave("2.1", [json_personal, plantilla_2_1], {"anio": 2024})
+        if not cache.restaurar(clave, salida_2_1):
+            generar_ficha_2_1(...)
+            cache.guardar(clave, salida_2_1)
+    """
+
+    def __init__(self, directorio, max_bytes=200 * 1024 * 1024, version=VERSION_GENERADOR):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._hashes = {}  # ruta -> ((mtime_ns, tamaño), sha256)
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def _hash_entrada(self, ruta):
+        ruta = os.path.abspath(ruta)
+        st = os.stat(ruta)
+        firma = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            conocido = self._hashes.get(ruta)
+        if conocido is not None and conocido[0] == firma:
+            return conocido[1]
+        sha = hash_archivo(ruta)
+        with self._lock:
+            self._hashes[ruta] = (firma, sha)
+        return sha
+
+    def clave(self, tipo, entradas, parametros=None):
+        """Clave de caché para generar `tipo` a partir de los archivos `entradas` y `parametros`."""
+        sha = hashlib.sha256()
+        sha.update(json.dumps({
+            "tipo": tipo,
+            "version": self.version,
+            "entradas": [self._hash_entrada(ruta) for ruta in entradas],
+            "parametros": parametros or {},
+        }, sort_keys=True, default=str).encode("utf-8"))
+        return sha.hexdigest()
+
+    def _ruta_entrada(self, clave, extension):
+        return os.path.join(self.directorio, f"{clave}{extension}")
+
+    def restaurar(self, clave, salida):
+        """
+        Si la clave está en caché copia la ficha a `salida` y devuelve True;
+        si no, devuelve False (y cuenta un fallo).
+        """
+        entrada = self._ruta_entrada(clave, os.path.splitext(salida)[1])
+        with self._lock:
+            if not os.path.exists(entrada):
+                self.misses += 1
+                return False
+            os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+            shutil.copyfile(entrada, salida)
+            os.utime(entrada)  # marcar como usada recientemente
+            self.hits += 1
+        return True
+
+    def leer(self, clave, extension):
+        """Contenido en bytes de la entrada (p. ej. un ZIP), o None si no está."""
+        entrada = self._ruta_entrada(clave, extension)
+        with self._lock:
+            try:
+                with open(entrada, "rb") as f:
+                    contenido = f.read()
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            os.utime(entrada)
+            self.hits += 1
+        return contenido
+
+    def localizar(self, clave, extension):
+        """
+        Ruta de la entrada en caché (para servirla en trozos sin cargarla en
+        memoria), o None si no está.
+        """
+        entrada = self._ruta_entrada(clave, extension)
+        with self._lock:
+            if not os.path.exists(entrada):
+                self.misses += 1
+                return None
+            os.utime(entrada)
+            self.hits += 1
+        return entrada
+
+    def guardar(self, clave, ruta):
+        """Guarda en caché la ficha generada en `ruta`. Devuelve False si no existe."""
+        if not os.path.exists(ruta):
+            return False
+        self._escribir(self._ruta_entrada(clave, os.path.splitext(ruta)[1]), lambda temporal: shutil.copyfile(ruta, temporal))
+        return True
+
+    def guardar_bytes(self, clave, contenido, extension):
+        """Guarda en caché un contenido ya en memoria (p. ej. el ZIP de descarga)."""
+        def escribir(temporal):
+            with open(temporal, "wb") as f:
+                f.write(contenido)
+        self._escribir(self._ruta_entrada(clave, extension), escribir)
+
+    def _escribir(self, entrada, escribir):
+        """Escribe la entrada en un temporal y la renombra, para que nunca quede a medias."""
+        temporal = f"{entrada}.tmp{os.getpid()}_{threading.get_ident()}"
+        with self._lock:
+            escribir(temporal)
+            os.replace(temporal, entrada)
+            self._podar()
+
+    def _entradas(self):
+        """Lista de (ultimo_uso, bytes, ruta) de las entradas completas."""
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            if ".tmp" in nombre or not os.path.isfile(ruta):
+                continue
+            st = os.stat(ruta)
+            entradas.append((st.st_mtime, st.st_size, ruta))
+        return entradas
+
+    def _podar(self):
+        """Expulsa las entradas menos usadas hasta quedar bajo max_bytes."""
+        entradas = sorted(self._entradas())
+        total = sum(tamano for _, tamano, _ in entradas)
+        while entradas and total > self.max_bytes:
+            _, tamano, ruta = entradas.pop(0)
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue  # abierta por una descarga en curso (Windows): se expulsará más tarde
+            total -= tamano
+            print(f"   🧹 Cache fichas: expulsada {os.path.basename(ruta)} ({tamano} bytes)")
+
+    def estadisticas(self):
+        """Aciertos, fallos y ocupación actual de la caché."""
+        with self._lock:
+            entradas = self._entradas()
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 3) if consultas else 0.0,
+                "entradas": len(entradas),
+                "bytes": sum(tamano for _, tamano, _ in entradas),
+                "max_bytes": self.max_bytes,
+                "version_generador": self.version,
+            }
@@ -0,0 +1,119 @@
+import os
+import copy
+import threading
+from collections import OrderedDict
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+
+try:
+    from .cache_anexos import hash_archivo
+except ImportError:
+    from cache_anexos import hash_archivo
+
+ESTILO_TABLAS = "Table Grid"
+
+
+class _Plantilla:
+    __slots__ = ("firma", "sha", "documento", "compartidas", "estilo_tablas")
+
+    def __init__(self, firma, sha, documento, estilo_tablas):
+        self.firma = firma
+        self.sha = sha
+        self.documento = documento
+        self.estilo_tablas = estilo_tablas
+        # Partes que las copias comparten: todas menos el documento principal
+        self.compartidas = {
+            id(parte): parte for parte in documento.part.package.iter_parts()
+            if parte is not documento.part
+        }
+
+
+class CachePlantillas:
+    """
+    Plantillas .docx (inputs/2.1.docx, 2.2.docx) ya abiertas con python-docx.
+
+    Cada plantilla se lee una vez y se guarda con sus tablas ya en el estilo
+    "Table Grid"; se vuelve a leer solo si cambian su mtime/tamaño y su
+    SHA-256 (si el archivo se reescribe con el mismo contenido se sigue usando
+    la ya abierta). copia() devuelve un Document independiente copiando solo
+    el XML del documento principal: estilos, cabeceras, imágenes y demás
+    partes, que la fusión no modifica, se comparten con la plantilla.
+
+    Uso:
+        doc_base = plantillas.copia("inputs/2.1.docx")
+        ... añadir el contenido generado a doc_base ...
+        for tbl in tablas_generadas:
+            tbl.tblStyle_val = plantillas.estilo_tablas("inputs/2.1.docx")
+    """
+
+    def __init__(self, max_plantillas=16, estilo=ESTILO_TABLAS):
+        self.max_plantillas = max_plantillas
+        self.estilo = estilo
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._plantillas = OrderedDict()  # ruta absoluta -> _Plantilla
+
+    def _obtener(self, ruta):
+        ruta = os.path.abspath(ruta)
+        st = os.stat(ruta)
+        firma = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            plantilla = self._plantillas.get(ruta)
+            if plantilla is not None and plantilla.firma == firma:
+                self._plantillas.move_to_end(ruta)
+                self.hits += 1
+                return plantilla
+
+        sha = hash_archivo(ruta)
+        if plantilla is not None and plantilla.sha == sha:
+            # Mismo contenido con otra fecha: se sigue usando la ya abierta
+            with self._lock:
+                plantilla.firma = firma
+                self.hits += 1
+            return plantilla
+
+        documento = Document(ruta)
+        for table in documento.tables:
+            table.style = self.estilo
+        estilo_tablas = documento.part.get_style_id(self.estilo, WD_STYLE_TYPE.TABLE)
+        plantilla = _Plantilla(firma, sha, documento, estilo_tablas)
+        with self._lock:
+            self.misses += 1
+            self._plantillas[ruta] = plantilla
+            self._plantillas.move_to_end(ruta)
+            while len(self._plantillas) > self.max_plantillas:
+                self._plantillas.popitem(last=False)
+        return plantilla
+
+    def copia(self, ruta):
+        """Document nuevo con el contenido de la plantilla, listo para modificar y guardar."""
+        plantilla = self._obtener(ruta)
+        return copy.deepcopy(plantilla.documento, dict(plantilla.compartidas))
+
+    def estilo_tablas(self, ruta):
+        """Id del estilo "Table Grid" en la plantilla (lo que table.style = "Table Grid" escribiría)."""
+        return self._obtener(ruta).estilo_tablas
+
+    def invalidar(self, ruta=None):
+        with self._lock:
+            if ruta is None:
+                self._plantillas.clear()
+            else:
+                self._plantillas.pop(os.path.abspath(ruta), None)
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 3) if consultas else 0.0,
+                "plantillas": [os.path.basename(ruta) for ruta in self._plantillas],
+                "max_plantillas": self.max_plantillas,
+            }
+
+
+# Caché compartida por los generadores de fichas (ver fusionar_y_guardar)
+plantillas = CachePlantillas()
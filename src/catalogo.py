@@ -0,0 +1,242 @@
+import os
+import json
+import sqlite3
+import threading
+
+PREFIJO_CLIENTE = "Cliente_"
+CARPETAS_NO_PROYECTO = {"data", "history", "cvs"}
+
+# Sube cuando cambia ESQUEMA: un índice de otra versión se descarta y se rehace
+# desde disco (solo es un índice de las carpetas, no guarda nada propio).
+VERSION_ESQUEMA = 2
+
+# Búsqueda: las tablas *_busqueda (FTS5, tokenizador trigram) indexan cada
+# secuencia de 3 caracteres de NIF, nombre y acrónimo, así que buscar un texto
+# dentro del nombre no recorre la tabla entera. Se mantienen con triggers.
+# Los textos de 1-2 caracteres no tienen trigramas: se buscan por el principio
+# del campo, con los índices NOCASE en clientes (en proyectos basta el índice
+# por cliente, solo se miran los proyectos de uno).
+ESQUEMA = """
+CREATE TABLE clientes (
+    id     INTEGER PRIMARY KEY,
+    nif    TEXT NOT NULL UNIQUE,
+    nombre TEXT
+);
+CREATE INDEX clientes_nif_nocase ON clientes (nif COLLATE NOCASE);
+CREATE INDEX clientes_nombre_nocase ON clientes (nombre COLLATE NOCASE);
+CREATE TABLE proyectos (
+    id       INTEGER PRIMARY KEY,
+    nif      TEXT NOT NULL REFERENCES clientes(nif) ON DELETE CASCADE,
+    acronimo TEXT NOT NULL,
+    UNIQUE (nif, acronimo)
+);
+
+CREATE VIRTUAL TABLE clientes_busqueda USING fts5(
+    nif, nombre, content='clientes', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER clientes_alta AFTER INSERT ON clientes BEGIN
+    INSERT INTO clientes_busqueda (rowid, nif, nombre) VALUES (new.id, new.nif, new.nombre);
+END;
+CREATE TRIGGER clientes_baja AFTER DELETE ON clientes BEGIN
+    INSERT INTO clientes_busqueda (clientes_busqueda, rowid, nif, nombre) VALUES ('delete', old.id, old.nif, old.nombre);
+END;
+CREATE TRIGGER clientes_cambio AFTER UPDATE ON clientes BEGIN
+    INSERT INTO clientes_busqueda (clientes_busqueda, rowid, nif, nombre) VALUES ('delete', old.id, old.nif, old.nombre);
+    INSERT INTO clientes_busqueda (rowid, nif, nombre) VALUES (new.id, new.nif, new.nombre);
+END;
+
+CREATE VIRTUAL TABLE proyectos_busqueda USING fts5(
+    acronimo, content='proyectos', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER proyectos_alta AFTER INSERT ON proyectos BEGIN
+    INSERT INTO proyectos_busqueda (rowid, acronimo) VALUES (new.id, new.acronimo);
+END;
+CREATE TRIGGER proyectos_baja AFTER DELETE ON proyectos BEGIN
+    INSERT INTO proyectos_busqueda (proyectos_busqueda, rowid, acronimo) VALUES ('delete', old.id, old.acronimo);
+END;
+"""
+
+BORRAR_ESQUEMA = """
+DROP TABLE IF EXISTS proyectos_busqueda;
+DROP TABLE IF EXISTS clientes_busqueda;
+DROP TABLE IF EXISTS proyectos;
+DROP TABLE IF EXISTS clientes;
+"""
+
+MIN_TRIGRAMA = 3
+
+
+def leer_nombre_cliente(client_dir):
+    """Nombre del cliente según config.json (o el personal.json antiguo); None si no lo hay."""
+    config_file = os.path.join(client_dir, "config.json")
+    if os.path.exists(config_file):
+        try:
+            with open(config_file, "r", encoding="utf-8") as f:
+                nombre = json.load(f).get("nombre")
+            if nombre:
+                return nombre
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"   ❌ Error leyendo {config_file}: {e}")
+
+    personal_file = os.path.join(client_dir, "data", "personal.json")
+    if os.path.exists(personal_file):
+        try:
+            with open(personal_file, "r", encoding="utf-8") as f:
+                filas = json.load(f)
+            if filas and filas[0].get("Nombre"):
+                return filas[0]["Nombre"]
+        except (OSError, ValueError, AttributeError, IndexError) as e:
+            print(f"   ❌ Error leyendo {personal_file}: {e}")
+    return None
+
+
+def _busqueda(campos, tabla_busqueda, texto):
+    """
+    Condición SQL y parámetros que buscan `texto` literalmente (sin distinguir
+    mayúsculas) en `campos`: dentro del campo con el índice de trigramas, o por
+    el principio del campo con los índices NOCASE si es demasiado corto.
+    """
+    if len(texto) >= MIN_TRIGRAMA:
+        frase = '"' + texto.replace('"', '""') + '"'
+        return f"id IN (SELECT rowid FROM {tabla_busqueda} WHERE {tabla_busqueda} MATCH ?)", [frase]
+    prefijo = texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    condicion = " OR ".join(f"{campo} LIKE ? ESCAPE '\\'" for campo in campos)
+    return f"({condicion})", [prefijo] * len(campos)
+
+
+def es_carpeta_proyecto(client_dir, carpeta):
+    return carpeta not in CARPETAS_NO_PROYECTO and os.path.isdir(os.path.join(client_dir, carpeta))
+
+
+class CatalogoProyectos:
+    """
+    Índice persistente (SQLite) de clientes y proyectos de PROYECTOS_DIR.
+
+    Evita recorrer las carpetas y abrir el config.json de cada cliente al
+    listar: los endpoints que crean, renombran o borran clientes/proyectos
+    actualizan el índice, y reconstruir() lo rehace desde disco (al arrancar
+    con un índice nuevo o bajo demanda si las carpetas se tocan a mano).
+
+    Los listados se paginan por cursor (el último NIF/acrónimo devuelto), de
+    modo que cada página es una búsqueda por índice independiente de cuántos
+    clientes haya antes. La búsqueda de texto va por los índices de trigramas
+    (ver ESQUEMA): su coste depende de cuántos coincidan, no del total.
+
+    Uso:
+        catalogo = CatalogoProyectos(os.path.join(PROYECTOS_DIR, "catalogo.sqlite3"), PROYECTOS_DIR)
+        pagina, siguiente = catalogo.listar_clientes(buscar="acme", limite=50)
+        catalogo.registrar_proyecto("B12345678", "PROY1")
+    """
+
+    def __init__(self, ruta_db, proyectos_dir):
+        self.ruta_db = ruta_db
+        self.proyectos_dir = proyectos_dir
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta_db, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        with self._lock, self._conexion:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute("PRAGMA foreign_keys=ON")
+            nueva = self._conexion.execute("PRAGMA user_version").fetchone()[0] != VERSION_ESQUEMA
+            if nueva:
+                # Índice nuevo o de un esquema anterior: se crea de cero
+                self._conexion.executescript(BORRAR_ESQUEMA + ESQUEMA + f"PRAGMA user_version = {VERSION_ESQUEMA};")
+        if nueva:
+            self.reconstruir()
+
+    def reconstruir(self):
+        """Rehace el índice recorriendo PROYECTOS_DIR. Devuelve (nº clientes, nº proyectos)."""
+        clientes, proyectos = [], []
+        if os.path.isdir(self.proyectos_dir):
+            for carpeta in os.listdir(self.proyectos_dir):
+                client_dir = os.path.join(self.proyectos_dir, carpeta)
+                if not carpeta.startswith(PREFIJO_CLIENTE) or not os.path.isdir(client_dir):
+                    continue
+                nif = carpeta[len(PREFIJO_CLIENTE):]
+                clientes.append((nif, leer_nombre_cliente(client_dir)))
+                proyectos.extend((nif, p) for p in os.listdir(client_dir) if es_carpeta_proyecto(client_dir, p))
+
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM proyectos")
+            self._conexion.execute("DELETE FROM clientes")
+            self._conexion.executemany("INSERT INTO clientes (nif, nombre) VALUES (?, ?)", clientes)
+            self._conexion.executemany("INSERT INTO proyectos (nif, acronimo) VALUES (?, ?)", proyectos)
+        print(f"📇 Catálogo reconstruido: {len(clientes)} clientes, {len(proyectos)} proyectos")
+        return len(clientes), len(proyectos)
+
+    def registrar_cliente(self, nif, nombre=None):
+        """Da de alta el cliente (si ya existía, solo actualiza el nombre si se indica)."""
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT INTO clientes (nif, nombre) VALUES (?, ?) "
+                "ON CONFLICT(nif) DO UPDATE SET nombre = COALESCE(excluded.nombre, nombre)",
+                (nif, nombre),
+            )
+
+    def registrar_proyecto(self, nif, acronimo):
+        with self._lock, self._conexion:
+            self._conexion.execute("INSERT OR IGNORE INTO clientes (nif) VALUES (?)", (nif,))
+            self._conexion.execute("INSERT OR IGNORE INTO proyectos (nif, acronimo) VALUES (?, ?)", (nif, acronimo))
+
+    def eliminar_cliente(self, nif):
+        """Quita el cliente y sus proyectos del índice."""
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM clientes WHERE nif = ?", (nif,))
+
+    def eliminar_proyecto(self, nif, acronimo):
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM proyectos WHERE nif = ? AND acronimo = ?", (nif, acronimo))
+
+    def listar_clientes(self, buscar=None, despues_de=None, limite=None):
+        """
+        Clientes ordenados por NIF: lista de {nif, nombre, folder} y el cursor
+        para la página siguiente (None si no hay más). `buscar` filtra por NIF
+        o nombre sin distinguir mayúsculas: los que lo contienen, o los que
+        empiezan por él si tiene menos de 3 caracteres.
+        """
+        condiciones, parametros = [], []
+        if buscar:
+            condicion, parametros = _busqueda(["nif", "nombre"], "clientes_busqueda", buscar)
+            condiciones.append(condicion)
+        filas, siguiente = self._pagina("SELECT nif, nombre FROM clientes", "nif", condiciones, parametros, despues_de, limite)
+        clientes = [
+            {"nif": f["nif"], "nombre": f["nombre"] or f["nif"], "folder": f"{PREFIJO_CLIENTE}{f['nif']}"}
+            for f in filas
+        ]
+        return clientes, siguiente
+
+    def listar_proyectos(self, nif, buscar=None, despues_de=None, limite=None):
+        """Acrónimos de los proyectos del cliente, ordenados, y el cursor de la página siguiente."""
+        condiciones, parametros = ["nif = ?"], [nif]
+        if buscar:
+            condicion, extra = _busqueda(["acronimo"], "proyectos_busqueda", buscar)
+            condiciones.append(condicion)
+            parametros += extra
+        filas, siguiente = self._pagina("SELECT acronimo FROM proyectos", "acronimo", condiciones, parametros, despues_de, limite)
+        return [f["acronimo"] for f in filas], siguiente
+
+    def existe_cliente(self, nif):
+        with self._lock:
+            return self._conexion.execute("SELECT 1 FROM clientes WHERE nif = ?", (nif,)).fetchone() is not None
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
+
+    def _pagina(self, consulta, clave, condiciones, parametros, despues_de, limite):
+        if despues_de is not None:
+            condiciones = condiciones + [f"{clave} > ?"]
+            parametros = parametros + [despues_de]
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+        consulta += f" ORDER BY {clave}"
+        if limite is not None:
+            # Una fila de más para saber si hay página siguiente
+            consulta += " LIMIT ?"
+            parametros = parametros + [limite + 1]
+        with self._lock:
+            filas = self._conexion.execute(consulta, parametros).fetchall()
+        if limite is not None and len(filas) > limite:
+            filas = filas[:limite]
+            return filas, filas[-1][clave]
+        return filas, None
@@ -0,0 +1,258 @@
+import os
+import time
+import uuid
+import threading
+import traceback
+import multiprocessing
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Contexto de los pools de procesos (CVs, fichas): forkserver, o spawn donde no
+# existe (Windows). El servidor tiene hilos de peticiones y de trabajos en marcha;
+# un fork desde él copia al hijo los bloqueos (de imports, de memoria) que otro
+# hilo tuviera cogidos y el hijo se queda colgado esperándolos.
+CONTEXTO_PROCESOS = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+# Estados de un trabajo
+EN_COLA = "en_cola"
+EJECUTANDO = "ejecutando"
+COMPLETADO = "completado"
+ERROR = "error"
+CANCELADO = "cancelado"
+ESTADOS_FINALES = {COMPLETADO, ERROR, CANCELADO}
+
+
+class TrabajoCancelado(Exception):
+    """Se lanza dentro de un trabajo cuando se ha pedido su cancelación."""
+
+
+class Trabajo:
+    """
+    Un trabajo en segundo plano: estado, progreso (0-100), resultado y error.
+
+    La función del trabajo recibe este objeto como primer argumento y puede
+    informar del progreso con avanzar() y comprobar con comprobar_cancelacion()
+    si debe detenerse (la cancelación de un trabajo en marcha es cooperativa).
+    Con avanzar(..., cancelable=False) el trabajo indica que ya no puede
+    detenerse sin dejar datos a medias: desde ahí no se admite cancelarlo.
+    """
+
+    def __init__(self, tipo, claves, funcion, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.claves = tuple(claves)
+        self.estado = EN_COLA
+        self.progreso = 0
+        self.mensaje = "En cola"
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.iniciado = None
+        self.terminado = None
+        self.version = 0  # sube con cada cambio, para los suscriptores SSE
+        self.archivos = []  # archivos de resultado, se borran al salir del historial
+        self._funcion = funcion
+        self._args = args
+        self._kwargs = kwargs
+        self.cancelable = True
+        self._cancelar = threading.Event()
+        self._lock_cancelacion = threading.Lock()
+
+    def avanzar(self, progreso, mensaje=None, cancelable=True):
+        """Actualiza el progreso y comprueba si se ha pedido cancelar."""
+        with self._lock_cancelacion:
+            self.comprobar_cancelacion()
+            self.cancelable = cancelable
+        self.progreso = max(0, min(100, int(progreso)))
+        if mensaje:
+            self.mensaje = mensaje
+        self.version += 1
+
+    def comprobar_cancelacion(self):
+        if self._cancelar.is_set():
+            raise TrabajoCancelado()
+
+    def _pedir_cancelacion(self):
+        """Marca el trabajo para cancelarlo; False si ya no es cancelable."""
+        with self._lock_cancelacion:
+            if not self.cancelable:
+                return False
+            self._cancelar.set()
+            return True
+
+    @property
+    def finalizado(self):
+        return self.estado in ESTADOS_FINALES
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "claves": list(self.claves),
+            "estado": self.estado,
+            "progreso": self.progreso,
+            "mensaje": self.mensaje,
+            "error": self.error,
+            "cancelable": self.cancelable and not self.finalizado,
+            "tiene_resultado": self.resultado is not None,
+            "creado": self.creado,
+            "iniciado": self.iniciado,
+            "terminado": self.terminado,
+            "version": self.version,
+        }
+
+
+class _Reserva:
+    """Turno de un hilo que no es un trabajo de la cola (ver ColaTrabajos.reservar)."""
+
+    def __init__(self, claves):
+        self.claves = tuple(claves)
+        self.concedida = threading.Event()
+
+
+class ColaTrabajos:
+    """
+    Cola de trabajos en proceso, sin broker externo.
+
+    - Los trabajos se ejecutan en un ThreadPoolExecutor de `max_workers` hilos.
+    - Cada trabajo declara unas claves (p. ej. el data/ del proyecto). Dos
+      trabajos que comparten alguna clave nunca se ejecutan a la vez, y entre
+      ellos se respeta el orden de llegada.
+    - Con reservar(claves) un hilo de fuera de la cola (un endpoint síncrono)
+      toma su turno sobre esas claves como si fuera un trabajo más.
+    - Se conservan los últimos `max_historial` trabajos terminados.
+
+    Uso:
+        cola = ColaTrabajos(max_workers=2)
+        trabajo = cola.enviar("generate-fichas", ["Cliente_X/P1"], funcion, arg1)
+        cola.obtener(trabajo.id).to_dict()
+        with cola.reservar(["Cliente_X/P1"]):
+            ...  # escribir en el data/ del proyecto
+    """
+
+    def __init__(self, max_workers=2, max_historial=200):
+        self.max_workers = max_workers
+        self.max_historial = max_historial
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trabajo")
+        self._lock = threading.Lock()
+        self._trabajos = OrderedDict()
+        self._pendientes = []
+        self._claves_ocupadas = set()
+
+    def enviar(self, tipo, claves, funcion, *args, **kwargs):
+        """Encola funcion(trabajo, *args, **kwargs) y devuelve el Trabajo."""
+        trabajo = Trabajo(tipo, claves, funcion, args, kwargs)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+            self._pendientes.append(trabajo)
+            self._despachar()
+        return trabajo
+
+    @contextmanager
+    def reservar(self, claves):
+        """
+        Espera su turno sobre `claves` (detrás de los trabajos y reservas que
+        ya las esperan) y las mantiene ocupadas hasta salir del with. No usar
+        dentro de un trabajo con las mismas claves: se esperaría a sí mismo.
+        """
+        reserva = _Reserva(claves)
+        with self._lock:
+            self._pendientes.append(reserva)
+            self._despachar()
+        reserva.concedida.wait()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._claves_ocupadas.difference_update(reserva.claves)
+                self._despachar()
+
+    def obtener(self, trabajo_id):
+        return self._trabajos.get(trabajo_id)
+
+    def listar(self, clave=None):
+        """Trabajos (más recientes primero), opcionalmente filtrados por clave."""
+        with self._lock:
+            trabajos = list(self._trabajos.values())
+        if clave:
+            trabajos = [t for t in trabajos if clave in t.claves]
+        return list(reversed(trabajos))
+
+    def cancelar(self, trabajo_id):
+        """
+        Cancela un trabajo. Si está en cola no llega a ejecutarse; si está en
+        marcha se detiene en su siguiente punto de control. Devuelve False si
+        no existe, ya había terminado o ha pasado su último punto de control
+        (avanzar(..., cancelable=False)).
+        """
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            if trabajo is None or trabajo.finalizado or not trabajo._pedir_cancelacion():
+                return False
+            if trabajo in self._pendientes:
+                self._pendientes.remove(trabajo)
+                self._terminar(trabajo, CANCELADO, mensaje="Cancelado antes de empezar")
+        return True
+
+    def _despachar(self):
+        """Lanza los pendientes cuyas claves están libres (llamar con _lock)."""
+        reservadas = set(self._claves_ocupadas)
+        for trabajo in list(self._pendientes):
+            if reservadas.intersection(trabajo.claves):
+                # Espera su turno y bloquea a los posteriores con sus claves
+                reservadas.update(trabajo.claves)
+                continue
+            reservadas.update(trabajo.claves)
+            self._claves_ocupadas.update(trabajo.claves)
+            self._pendientes.remove(trabajo)
+            if isinstance(trabajo, _Reserva):
+                trabajo.concedida.set()
+            else:
+                self._executor.submit(self._ejecutar, trabajo)
+
+    def _ejecutar(self, trabajo):
+        trabajo.estado = EJECUTANDO
+        trabajo.iniciado = time.time()
+        trabajo.mensaje = "En ejecución"
+        trabajo.version += 1
+        try:
+            trabajo.comprobar_cancelacion()
+            resultado = trabajo._funcion(trabajo, *trabajo._args, **trabajo._kwargs)
+            # Último punto de control: si se pidió cancelar hasta aquí, se descarta el resultado
+            trabajo.avanzar(100, cancelable=False)
+            estado, error = COMPLETADO, None
+        except TrabajoCancelado:
+            resultado, estado, error = None, CANCELADO, None
+        except Exception as e:
+            print(f"❌ Trabajo {trabajo.tipo} ({trabajo.id[:8]}) falló: {e}")
+            print(traceback.format_exc())
+            resultado, estado, error = None, ERROR, getattr(e, "detail", None) or str(e)
+        with self._lock:
+            trabajo.resultado = resultado
+            self._terminar(trabajo, estado, error=error)
+            self._claves_ocupadas.difference_update(trabajo.claves)
+            self._despachar()
+
+    def _terminar(self, trabajo, estado, error=None, mensaje=None):
+        trabajo.estado = estado
+        trabajo.error = error
+        trabajo.terminado = time.time()
+        if estado == COMPLETADO:
+            trabajo.progreso = 100
+        trabajo.mensaje = mensaje or {COMPLETADO: "Completado", ERROR: "Error", CANCELADO: "Cancelado"}[estado]
+        trabajo.version += 1
+        self._podar_historial()
+
+    def _podar_historial(self):
+        terminados = [t for t in self._trabajos.values() if t.finalizado]
+        for trabajo in terminados[:max(0, len(terminados) - self.max_historial)]:
+            del self._trabajos[trabajo.id]
+            for ruta in trabajo.archivos:
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+
+    def cerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
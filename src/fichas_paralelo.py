@@ -0,0 +1,172 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from lxml import etree
+
+try:
+    from .logica_fichas import (
+        leer_datos, personas_2_1, renderizar_bloques_2_1,
+        generar_ficha_2_2, fusionar_y_guardar
+    )
+    from .cola_trabajos import CONTEXTO_PROCESOS
+except ImportError:
+    from logica_fichas import (
+        leer_datos, personas_2_1, renderizar_bloques_2_1,
+        generar_ficha_2_2, fusionar_y_guardar
+    )
+    from cola_trabajos import CONTEXTO_PROCESOS
+
+# Procesos para generar fichas (0 = uno por CPU) y personas por trozo de la Ficha 2.1
+FICHAS_WORKERS = int(os.environ.get("FICHAS_WORKERS", "0")) or (os.cpu_count() or 1)
+TROZO_2_1 = int(os.environ.get("FICHAS_TROZO_2_1", "50"))
+
+
+def _renderizar_trozo_2_1(personas, salto_final):
+    """
+    (En un proceso del pool) Renderiza los bloques de `personas` y devuelve
+    el XML de cada elemento del cuerpo: los elementos de lxml no se pueden
+    enviar entre procesos, el XML serializado sí.
+    """
+    doc = Document()
+    renderizar_bloques_2_1(doc, personas, salto_final=salto_final)
+    return [etree.tostring(e) for e in doc.element.body if e.tag != qn('w:sectPr')]
+
+
+def _capturar(tarea):
+    """(resultado, None) o (None, excepción) de tarea()."""
+    try:
+        return tarea(), None
+    except Exception as e:
+        return None, e
+
+
+class GeneradorFichas:
+    """
+    Genera las fichas Word en un pool de procesos:
+
+    - La Ficha 2.1 se reparte en trozos de `trozo` personas que se renderizan
+      a la vez y se unen en un único cuerpo, en el mismo orden y con el mismo
+      XML que renderizar_bloques_2_1 sobre la plantilla completa.
+    - La Ficha 2.2 se genera entera en otro proceso.
+    - en_paralelo() lanza varias fichas a la vez (p. ej. 2.1 y 2.2), de modo
+      que la latencia total es la de la ficha (o el trozo) más lenta.
+    - a_medida_que() hace lo mismo con muchas tareas (p. ej. los proyectos de
+      un lote) y entrega cada resultado en cuanto está.
+
+    Con workers <= 1 todo se hace en el propio proceso, como antes. El pool se
+    crea al primer uso y se comparte entre peticiones.
+
+    Uso:
+        generador = GeneradorFichas()
+        resultados = generador.en_paralelo([
+            lambda: generador.ficha_2_1(json_personal, plantilla_2_1, salida_2_1, 2024, 'ACR'),
+            lambda: generador.ficha_2_2(json_colaboraciones, json_facturas, plantilla_2_2, salida_2_2, anio=2024),
+        ])
+    """
+
+    def __init__(self, workers=None, trozo=TROZO_2_1):
+        self.workers = workers or FICHAS_WORKERS
+        self.trozo = max(1, trozo)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                print(f"   ⚙️ Pool de generación de fichas: {self.workers} procesos")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=CONTEXTO_PROCESOS)
+            return self._executor
+
+    def _ejecutar(self, llamadas):
+        """
+        Ejecuta en el pool cada (funcion, args, kwargs) de `llamadas` y devuelve
+        sus resultados en orden. Si un proceso murió, descarta el pool para que
+        el siguiente uso cree uno nuevo.
+        """
+        pool = self._pool()
+        try:
+            futuros = [pool.submit(funcion, *args, **kwargs) for funcion, args, kwargs in llamadas]
+            return [futuro.result() for futuro in futuros]
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is pool:
+                    self._executor = None
+            raise
+
+    def documento_2_1(self, personas):
+        """Documento con los bloques de la Ficha 2.1, renderizado por trozos en paralelo."""
+        doc_master = Document()
+        trozos = [personas[i:i + self.trozo] for i in range(0, len(personas), self.trozo)]
+        if self.workers <= 1 or len(trozos) <= 1:
+            renderizar_bloques_2_1(doc_master, personas)
+            return doc_master
+
+        print(f"   ⚙️ Ficha 2.1: {len(personas)} personas en {len(trozos)} trozos")
+        resultados = self._ejecutar([
+            (_renderizar_trozo_2_1, (trozo, i < len(trozos) - 1), {})
+            for i, trozo in enumerate(trozos)
+        ])
+
+        body = doc_master.element.body
+        sectPr = body.find(qn('w:sectPr'))
+        for elementos in resultados:
+            for xml in elementos:
+                sectPr.addprevious(parse_xml(xml))
+        return doc_master
+
+    def ficha_2_1(self, ruta_excel, ruta_plantilla_base, ruta_salida_final, anio, acronimus, lector=None):
+        """Igual que generar_ficha_2_1, con el renderizado repartido entre los procesos."""
+        print(f"Leyendo datos: {ruta_excel}")
+        df_ficha = (lector or leer_datos)(ruta_excel)
+        doc_master = self.documento_2_1(personas_2_1(df_ficha, anio))
+        fusionar_y_guardar(doc_master, ruta_plantilla_base, ruta_salida_final)
+
+    def ficha_2_2(self, *args, **kwargs):
+        """
+        generar_ficha_2_2 en un proceso del pool. El `lector` no viaja al
+        proceso (suele ser un caché en memoria): allí se leen los datos de disco.
+        """
+        if self.workers <= 1:
+            return generar_ficha_2_2(*args, **kwargs)
+        kwargs.pop("lector", None)
+        return self._ejecutar([(generar_ficha_2_2, args, kwargs)])[0]
+
+    def en_paralelo(self, tareas):
+        """
+        Ejecuta a la vez las funciones de `tareas` (sin argumentos) y devuelve,
+        en el mismo orden, (resultado, None) o (None, excepción) de cada una.
+        """
+        if self.workers <= 1 or len(tareas) <= 1:
+            return [_capturar(tarea) for tarea in tareas]
+        with ThreadPoolExecutor(max_workers=len(tareas)) as hilos:
+            return list(hilos.map(_capturar, tareas))
+
+    def a_medida_que(self, tareas, simultaneas=None):
+        """
+        Como en_paralelo, pero va devolviendo (índice, resultado, error) de cada
+        tarea según termina, con como mucho `simultaneas` tareas a la vez (por
+        defecto, tantas como procesos). Si se deja de consumir, las tareas que
+        no habían empezado se cancelan.
+        """
+        if self.workers <= 1 or len(tareas) <= 1:
+            for indice, tarea in enumerate(tareas):
+                yield (indice,) + _capturar(tarea)
+            return
+        hilos = ThreadPoolExecutor(max_workers=min(len(tareas), simultaneas or self.workers))
+        try:
+            futuros = {hilos.submit(_capturar, tarea): indice for indice, tarea in enumerate(tareas)}
+            for futuro in as_completed(futuros):
+                yield (futuros[futuro],) + futuro.result()
+        finally:
+            hilos.shutdown(wait=False, cancel_futures=True)
+
+    def cerrar(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
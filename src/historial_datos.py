@@ -0,0 +1,564 @@
+import os
+import re
+import json
+import uuid
+import bisect
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    from .almacen_tablas import almacen
+except ImportError:
+    from almacen_tablas import almacen
+
+# Tablas editables y su ruta dentro de data/ (ver almacen_tablas)
+ARCHIVOS_TABLAS = {
+    "personal": "Excel_Personal_2.1.json",
+    "colaboraciones": "Excel_Colaboraciones_2.2.json",
+    "facturas": "Excel_Facturas_2.2.json",
+}
+
+# Tipos de entrada del registro de cambios
+BASE = "base"
+CAMBIOS = "cambios"
+
+# Lotes de cambios entre dos copias completas (acota el coste de restaurar)
+CADA = 50
+
+
+def nuevo_id():
+    """Id de fila estable (no depende de la posición)."""
+    return uuid.uuid4().hex[:12]
+
+
+def _firma(ruta):
+    """(mtime_ns, tamaño) del archivo que guarda la tabla, o None si no existe."""
+    try:
+        st = os.stat(almacen.archivo(ruta))
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def leer_filas(ruta):
+    """
+    Registros de la tabla (orient='records'), tal y como los exporta el
+    almacén, sin las columnas vacías: en una tabla columnar todas las filas
+    tienen todas las columnas, y una columna nueva en una fila no debe
+    aparecer como cambio en las demás.
+    """
+    return [{k: v for k, v in fila.items() if v is not None} for fila in json.loads(almacen.exportar_json(ruta))]
+
+
+def escribir_filas(ruta, filas):
+    """
+    Guarda los registros en el almacén (de una vez, nunca queda a medias).
+    Lanza ValoresFueraDeEsquema, sin escribir nada, si alguno no cumple el esquema.
+    """
+    almacen.guardar(ruta, pd.DataFrame(filas))
+
+
+def diferencias(ids, antes, despues):
+    """
+    Operaciones que convierten `antes` en `despues` comparando por posición:
+    las filas comunes que cambian se actualizan (solo las columnas distintas),
+    las que sobran al final se insertan con id nuevo y las que faltan se borran.
+    """
+    operaciones = []
+    for id_fila, vieja, nueva in zip(ids, antes, despues):
+        if vieja == nueva:
+            continue
+        operacion = {"op": "update", "id": id_fila,
+                     "valores": {k: v for k, v in nueva.items() if k not in vieja or vieja[k] != v}}
+        quitar = [k for k in vieja if k not in nueva]
+        if quitar:
+            operacion["quitar"] = quitar
+        operaciones.append(operacion)
+    for fila in despues[len(antes):]:
+        operaciones.append({"op": "insert", "id": nuevo_id(), "valores": fila})
+    for id_fila in ids[len(despues):]:
+        operaciones.append({"op": "delete", "id": id_fila})
+    return operaciones
+
+
+def aplicar_operaciones(ids, filas, operaciones):
+    """
+    Aplica operaciones por id sobre copias de (ids, filas) y las devuelve.
+
+    - {"op": "update", "id": ..., "valores": {...}, "quitar": [...]}
+    - {"op": "insert", "id": ..., "valores": {...}, "antes_de": id}  (sin antes_de: al final)
+    - {"op": "delete", "id": ...}
+
+    Lanza ValueError si una operación no es válida; en ese caso no se aplica ninguna.
+    """
+    ids, filas = list(ids), list(filas)
+    posiciones = {id_fila: i for i, id_fila in enumerate(ids)}
+    for operacion in operaciones:
+        op, id_fila = operacion.get("op"), operacion.get("id")
+        if op == "insert":
+            if id_fila in posiciones:
+                raise ValueError(f"Ya existe una fila con id {id_fila}")
+            antes_de = operacion.get("antes_de")
+            if antes_de is not None and antes_de not in posiciones:
+                raise ValueError(f"No existe la fila {antes_de}")
+            pos = len(ids) if antes_de is None else posiciones[antes_de]
+            ids.insert(pos, id_fila)
+            filas.insert(pos, dict(operacion.get("valores") or {}))
+        elif op in ("update", "delete"):
+            if id_fila not in posiciones:
+                raise ValueError(f"No existe la fila {id_fila}")
+            pos = posiciones[id_fila]
+            if op == "delete":
+                del ids[pos]
+                del filas[pos]
+            else:
+                fila = {**filas[pos], **(operacion.get("valores") or {})}
+                for columna in operacion.get("quitar") or []:
+                    fila.pop(columna, None)
+                filas[pos] = fila
+                continue
+        else:
+            raise ValueError(f"Operación desconocida: {op}. Use insert, update o delete")
+        # Inserciones y borrados desplazan las posiciones siguientes
+        posiciones = {id_fila: i for i, id_fila in enumerate(ids)}
+    return ids, filas
+
+
+def quitar_cambios_nulos(ids, filas, operaciones):
+    """Quita de los update las columnas que ya tienen ese valor (y los update que quedan vacíos)."""
+    posiciones = None
+    tocadas = {}  # id -> fila tras las operaciones anteriores del lote
+    resultado = []
+    for operacion in operaciones:
+        op, id_fila = operacion.get("op"), operacion.get("id")
+        if op == "update":
+            if posiciones is None:
+                posiciones = {id_fila: i for i, id_fila in enumerate(ids)}
+            fila = tocadas[id_fila] if id_fila in tocadas else (
+                filas[posiciones[id_fila]] if id_fila in posiciones else None)
+            if fila is not None:
+                valores = {k: v for k, v in (operacion.get("valores") or {}).items() if k not in fila or fila[k] != v}
+                quitar = [k for k in operacion.get("quitar") or [] if k in fila]
+                if not valores and not quitar:
+                    continue
+                operacion = {k: v for k, v in operacion.items() if k != "quitar"}
+                operacion["valores"] = valores
+                if quitar:
+                    operacion["quitar"] = quitar
+                fila = {k: v for k, v in {**fila, **valores}.items() if k not in quitar}
+            tocadas[id_fila] = fila
+        elif op == "insert":
+            tocadas[id_fila] = dict(operacion.get("valores") or {})
+        elif op == "delete":
+            tocadas[id_fila] = None
+        resultado.append(operacion)
+    return resultado
+
+
+class ConflictoVersion(Exception):
+    """El lote se preparó sobre una versión de la tabla que ya no es la actual."""
+
+
+class PoliticaRetencion:
+    """
+    Cuánto historial se conserva.
+
+    - versiones_completas: las últimas N versiones se pueden restaurar todas;
+      de las anteriores solo queda la copia completa con la que empieza cada
+      tramo (una cada CADA lotes).
+    - max_copias: copias completas antiguas (fuera de esas N versiones) que
+      se conservan como mucho; las más viejas se borran.
+    """
+
+    def __init__(self, versiones_completas=500, max_copias=100):
+        self.versiones_completas = versiones_completas
+        self.max_copias = max_copias
+
+
+class HistorialTabla:
+    """
+    Tabla de datos (filas orient='records') con ids de fila estables y un
+    historial compacto de versiones.
+
+    El historial vive en history/<tabla>/ y se divide en tramos
+    <versión>.jsonl: cada tramo empieza con una copia completa (BASE) y
+    sigue con lotes de operaciones insert/update/delete por id. Las copias
+    se guardan por contenido en copias/<sha256>.json, así que dos versiones
+    idénticas comparten archivo, y los lotes que no cambian nada no crean
+    versión. Se abre un tramo nuevo cada `cada` lotes o cuando los cambios
+    acumulados pesan más que la propia tabla.
+
+    Restaurar una versión solo lee su tramo (una copia y como mucho `cada`
+    lotes), sin importar cuántas versiones haya. La PoliticaRetencion
+    recorta los tramos antiguos a su copia y borra las copias sobrantes.
+
+    La tabla de data/ (en el almacén de tablas) sigue siendo la que leen las
+    fichas y el validador. Si otro proceso la reescribe (procesar_cvs, un
+    anexo nuevo, /update-*), la diferencia con la última versión conocida se
+    registra como un lote más.
+    Las copias sueltas antiguas (<tabla>_<fecha>.json) se importan al abrir
+    el historial por primera vez y se borran.
+
+    Uso:
+        historial = HistorialTabla(ruta_json, os.path.join(carpeta, "history", "personal"))
+        version, ids, filas = historial.estado()
+        version, nuevos = historial.aplicar([{"op": "update", "id": ids[0], "valores": {"Horas totales": 120}}])
+        ids, filas = historial.reconstruir(version - 1)
+        historial.restaurar(version - 1)
+    """
+
+    def __init__(self, ruta_datos, directorio, cada=CADA, retencion=None):
+        self.ruta_datos = ruta_datos
+        self.directorio = directorio
+        self.dir_copias = os.path.join(directorio, "copias")
+        self.nombre = os.path.basename(os.path.normpath(directorio))
+        self.cada = cada
+        self.retencion = retencion or PoliticaRetencion()
+        self._lock = threading.Lock()
+        self._cargado = False
+        self.version = 0
+        self.ids = []
+        self.filas = []
+        self.firma = None
+        self._tramos = []      # versión con la que empieza cada tramo, ordenadas
+        self._lotes_tramo = 0  # lotes de cambios en el tramo actual
+        self._ops_tramo = 0    # operaciones en el tramo actual
+
+    # ==========================================
+    # ALMACENAMIENTO
+    # ==========================================
+
+    def _ruta_tramo(self, inicio):
+        return os.path.join(self.directorio, f"{inicio:08d}.jsonl")
+
+    def _listar_tramos(self):
+        return sorted(int(n[:-6]) for n in os.listdir(self.directorio)
+                      if n.endswith(".jsonl") and n[:-6].isdigit())
+
+    def _entradas_tramo(self, inicio):
+        with open(self._ruta_tramo(inicio), encoding="utf-8") as f:
+            for linea in f:
+                if linea.strip():
+                    yield json.loads(linea)
+
+    def _guardar_copia(self, ids, filas):
+        """Guarda (ids, filas) por contenido y devuelve su hash; si ya existía no escribe nada."""
+        contenido = json.dumps({"ids": ids, "filas": filas}, ensure_ascii=False, separators=(",", ":"))
+        clave = hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+        ruta = os.path.join(self.dir_copias, f"{clave}.json")
+        if not os.path.exists(ruta):
+            os.makedirs(self.dir_copias, exist_ok=True)
+            temporal = f"{ruta}.tmp{os.getpid()}_{threading.get_ident()}"
+            with open(temporal, "w", encoding="utf-8") as f:
+                f.write(contenido)
+            os.replace(temporal, ruta)
+        return clave
+
+    def _leer_copia(self, clave):
+        with open(os.path.join(self.dir_copias, f"{clave}.json"), encoding="utf-8") as f:
+            copia = json.load(f)
+        return copia["ids"], copia["filas"]
+
+    def _anotar(self, entrada, fecha=None):
+        version = self.version + 1
+        entrada = {"version": version, "fecha": fecha or datetime.now().isoformat(timespec="seconds"), **entrada}
+        if entrada["tipo"] == BASE:
+            self._tramos.append(version)
+            self._lotes_tramo = self._ops_tramo = 0
+        with open(self._ruta_tramo(self._tramos[-1]), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entrada, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.version = version
+
+    def _nueva_copia(self, origen, fecha=None):
+        """Abre un tramo con una copia completa del estado actual."""
+        clave = self._guardar_copia(self.ids, self.filas)
+        self._anotar({"tipo": BASE, "origen": origen, "hash": clave, "filas": len(self.filas),
+                      "firma": self.firma}, fecha)
+        self._compactar()
+
+    def _registrar(self, operaciones, resultado, firma, origen, fecha=None):
+        self.firma = firma
+        if not operaciones:
+            return
+        self.ids, self.filas = resultado
+        if (not self._tramos or self._lotes_tramo >= self.cada
+                or self._ops_tramo + len(operaciones) > max(len(self.filas), 1)):
+            self._nueva_copia(origen, fecha)
+            return
+        self._anotar({"tipo": CAMBIOS, "origen": origen, "operaciones": operaciones, "firma": firma}, fecha)
+        self._lotes_tramo += 1
+        self._ops_tramo += len(operaciones)
+
+    # ==========================================
+    # CARGA, IMPORTACIÓN Y COMPACTACIÓN
+    # ==========================================
+
+    def _cargar(self, origen="externo"):
+        """Lee el último tramo (solo la primera vez) y lo pone al día con la tabla de data/."""
+        if not self._cargado:
+            os.makedirs(self.directorio, exist_ok=True)
+            self._tramos = self._listar_tramos()
+            if not self._tramos:
+                self._importar_antiguos()
+            else:
+                for entrada in self._entradas_tramo(self._tramos[-1]):
+                    if entrada["tipo"] == BASE:
+                        self.ids, self.filas = self._leer_copia(entrada["hash"])
+                    else:
+                        self.ids, self.filas = aplicar_operaciones(self.ids, self.filas, entrada["operaciones"])
+                        self._lotes_tramo += 1
+                        self._ops_tramo += len(entrada["operaciones"])
+                    self.version = entrada["version"]
+                    self.firma = entrada.get("firma")
+            self._cargado = True
+
+        firma = _firma(self.ruta_datos)
+        if firma is None or firma == self.firma:
+            return
+        filas = leer_filas(self.ruta_datos)
+        if not self.version:
+            self.ids, self.filas, self.firma = [nuevo_id() for _ in filas], filas, firma
+            self._nueva_copia("inicial")
+        else:
+            operaciones = diferencias(self.ids, self.filas, filas)
+            self._registrar(operaciones, aplicar_operaciones(self.ids, self.filas, operaciones), firma, origen)
+
+    def _importar_antiguos(self):
+        """
+        Pasa al historial por tramos las copias sueltas <tabla>_<AAAAMMDD_HHMMSS>.json
+        (saltando las idénticas a la anterior) y el registro <tabla>.cambios.jsonl,
+        y después los borra.
+
+        Los tramos se escriben en una carpeta temporal que sustituye a la del
+        historial solo cuando se ha importado todo: si algo falla a medias no
+        queda ningún tramo, los archivos antiguos siguen ahí y la siguiente
+        carga vuelve a empezar la importación.
+        """
+        carpeta = os.path.dirname(os.path.normpath(self.directorio))
+        patron = re.compile(rf"^{re.escape(self.nombre)}_(\d{{8}}_\d{{6}})\.json$")
+        copias = sorted((m.group(1), m.group(0)) for m in map(patron.match, os.listdir(carpeta)) if m)
+        registro = os.path.join(carpeta, f"{self.nombre}.cambios.jsonl")
+        hay_registro = os.path.exists(registro)
+        if not copias and not hay_registro:
+            return
+
+        destino = self.directorio
+        temporal = f"{destino}.importando"
+        shutil.rmtree(temporal, ignore_errors=True)  # restos de una importación interrumpida
+        os.makedirs(temporal)
+        self.directorio, self.dir_copias = temporal, os.path.join(temporal, "copias")
+        try:
+            self._importar_en_curso(carpeta, copias, registro if hay_registro else None)
+        except Exception:
+            self.version, self.ids, self.filas, self.firma = 0, [], [], None
+            self._tramos, self._lotes_tramo, self._ops_tramo = [], 0, 0
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+        finally:
+            self.directorio, self.dir_copias = destino, os.path.join(destino, "copias")
+        shutil.rmtree(destino)
+        os.replace(temporal, destino)
+
+        for _, nombre in copias:
+            os.remove(os.path.join(carpeta, nombre))
+        if hay_registro:
+            os.remove(registro)
+        print(f"   🗜️ Historial {self.nombre}: {len(copias)} copia(s) antigua(s) → {self.version} versión(es)")
+
+    def _importar_en_curso(self, carpeta, copias, registro):
+        """Importa las copias sueltas y el registro antiguo en self.directorio."""
+        ultimo_hash = None
+        for marca, nombre in copias:
+            ruta = os.path.join(carpeta, nombre)
+            with open(ruta, "rb") as f:
+                contenido = f.read()
+            clave = hashlib.sha256(contenido).hexdigest()
+            if clave == ultimo_hash:
+                continue
+            ultimo_hash = clave
+            filas = json.loads(contenido.decode("utf-8"))
+            fecha = datetime.strptime(marca, "%Y%m%d_%H%M%S").isoformat()
+            if not self.version:
+                self.ids, self.filas = [nuevo_id() for _ in filas], filas
+                self._nueva_copia("importado", fecha)
+            else:
+                operaciones = diferencias(self.ids, self.filas, filas)
+                self._registrar(operaciones, aplicar_operaciones(self.ids, self.filas, operaciones),
+                                None, "importado", fecha)
+
+        if registro:
+            with open(registro, encoding="utf-8") as f:
+                for entrada in (json.loads(linea) for linea in f if linea.strip()):
+                    if entrada["tipo"] == BASE:
+                        self.ids, self.filas, self.firma = entrada["ids"], entrada["filas"], entrada.get("firma")
+                        self._nueva_copia(entrada.get("origen") or "importado", entrada["fecha"])
+                    else:
+                        operaciones = entrada["operaciones"]
+                        self._registrar(operaciones, aplicar_operaciones(self.ids, self.filas, operaciones),
+                                        entrada.get("firma"), entrada.get("origen"), entrada["fecha"])
+
+    def _compactar(self):
+        """Aplica la política de retención a los tramos cerrados y borra las copias huérfanas."""
+        limite = self.version - self.retencion.versiones_completas
+        antiguos = [inicio for inicio, siguiente in zip(self._tramos, self._tramos[1:]) if siguiente - 1 <= limite]
+        if not antiguos:
+            return
+        sobran = antiguos[:max(0, len(antiguos) - self.retencion.max_copias)]
+        for inicio in sobran:
+            os.remove(self._ruta_tramo(inicio))
+            self._tramos.remove(inicio)
+        for inicio in antiguos[len(sobran):]:
+            # Solo queda la copia con la que empieza el tramo
+            ruta = self._ruta_tramo(inicio)
+            with open(ruta, encoding="utf-8") as f:
+                primera = f.readline()
+                resto = f.read(1)
+            if resto:
+                temporal = f"{ruta}.tmp{os.getpid()}_{threading.get_ident()}"
+                with open(temporal, "w", encoding="utf-8") as f:
+                    f.write(primera)
+                os.replace(temporal, ruta)
+        if sobran:
+            usadas = {next(self._entradas_tramo(inicio))["hash"] for inicio in self._tramos}
+            for nombre in os.listdir(self.dir_copias):
+                if nombre.endswith(".json") and nombre[:-5] not in usadas:
+                    os.remove(os.path.join(self.dir_copias, nombre))
+
+    def _reconstruir(self, version):
+        if not 1 <= version <= self.version:
+            raise ValueError(f"Versión {version} fuera de rango (1-{self.version})")
+        i = bisect.bisect_right(self._tramos, version) - 1
+        if i < 0:
+            raise ValueError(f"La versión {version} ya no se conserva (política de retención)")
+        ids, filas, ultima = [], [], None
+        for entrada in self._entradas_tramo(self._tramos[i]):
+            if entrada["version"] > version:
+                break
+            if entrada["tipo"] == BASE:
+                ids, filas = self._leer_copia(entrada["hash"])
+            else:
+                ids, filas = aplicar_operaciones(ids, filas, entrada["operaciones"])
+            ultima = entrada["version"]
+        if ultima != version:
+            raise ValueError(f"La versión {version} se ha compactado; la más cercana es la {ultima}")
+        return ids, filas
+
+    # ==========================================
+    # API
+    # ==========================================
+
+    def estado(self):
+        """(versión, ids, filas) actuales."""
+        with self._lock:
+            self._cargar()
+            return self.version, list(self.ids), list(self.filas)
+
+    def sincronizar(self, origen="update"):
+        """Registra lo que haya cambiado en la tabla desde la última versión. Devuelve la versión."""
+        with self._lock:
+            self._cargar(origen)
+            return self.version
+
+    def aplicar(self, operaciones, version_base=None):
+        """
+        Aplica un lote de operaciones por id, reescribe la tabla y lo anota en
+        el historial. Las inserciones sin id reciben uno nuevo y los cambios
+        a un valor igual al actual se descartan (un lote nulo no crea versión).
+        Con `version_base` el lote se rechaza (ConflictoVersion) si la tabla
+        ha cambiado desde esa versión. Devuelve (versión, ids insertados).
+        """
+        with self._lock:
+            self._cargar()
+            if version_base is not None and version_base != self.version:
+                raise ConflictoVersion(f"La tabla está en la versión {self.version}, no en la {version_base}")
+            operaciones = [dict(operacion) for operacion in operaciones]
+            insertados = []
+            for operacion in operaciones:
+                if operacion.get("op") == "insert":
+                    operacion["id"] = operacion.get("id") or nuevo_id()
+                    insertados.append(operacion["id"])
+            resultado = aplicar_operaciones(self.ids, self.filas, operaciones)
+            operaciones = quitar_cambios_nulos(self.ids, self.filas, operaciones)
+            if operaciones:
+                escribir_filas(self.ruta_datos, resultado[1])
+                self._registrar(operaciones, resultado, _firma(self.ruta_datos), origen="patch")
+            return self.version, insertados
+
+    def versiones(self, limite=None):
+        """Versiones que se conservan (sin los datos), de la más antigua a la más reciente."""
+        with self._lock:
+            self._cargar()
+            versiones = []
+            for inicio in reversed(self._tramos):
+                tramo = [{
+                    "version": e["version"],
+                    "fecha": e["fecha"],
+                    "tipo": e["tipo"],
+                    "origen": e.get("origen"),
+                    "operaciones": len(e["operaciones"]) if e["tipo"] == CAMBIOS else e["filas"],
+                } for e in self._entradas_tramo(inicio)]
+                versiones[:0] = tramo
+                if limite and len(versiones) >= limite:
+                    break
+            return versiones[-limite:] if limite else versiones
+
+    def reconstruir(self, version):
+        """(ids, filas) de la tabla tal y como estaba en `version`."""
+        with self._lock:
+            self._cargar()
+            return self._reconstruir(version)
+
+    def restaurar(self, version):
+        """Vuelve a poner en data/ la tabla de `version` (como una versión nueva). Devuelve la versión."""
+        with self._lock:
+            self._cargar()
+            ids, filas = self._reconstruir(version)
+            escribir_filas(self.ruta_datos, filas)
+            self.ids, self.filas, self.firma = ids, filas, _firma(self.ruta_datos)
+            self._nueva_copia(f"restaurar:{version}")
+            return self.version
+
+
+class AlmacenHistoriales:
+    """
+    Un HistorialTabla por (carpeta de cliente/proyecto, tabla), creado bajo
+    demanda y con LRU: cada uno guarda en memoria los ids y filas de su tabla,
+    así que se conservan como mucho `max_historiales` (se expulsan los menos
+    usados que no estén en plena operación; al volver a pedirlos se recargan
+    de disco).
+    """
+
+    def __init__(self, cada=CADA, retencion=None, max_historiales=64):
+        self.cada = cada
+        self.retencion = retencion or PoliticaRetencion()
+        self.max_historiales = max_historiales
+        self._lock = threading.Lock()
+        self._historiales = OrderedDict()
+
+    def obtener(self, carpeta, tabla):
+        if tabla not in ARCHIVOS_TABLAS:
+            raise ValueError(f"Tabla desconocida: {tabla}. Use una de {', '.join(ARCHIVOS_TABLAS)}")
+        clave = (os.path.abspath(carpeta), tabla)
+        with self._lock:
+            if clave not in self._historiales:
+                self._historiales[clave] = HistorialTabla(
+                    os.path.join(carpeta, "data", ARCHIVOS_TABLAS[tabla]),
+                    os.path.join(carpeta, "history", tabla),
+                    cada=self.cada,
+                    retencion=self.retencion,
+                )
+            self._historiales.move_to_end(clave)
+            historial = self._historiales[clave]
+            sobran = len(self._historiales) - self.max_historiales
+            for antigua in list(self._historiales)[:-1]:
+                if sobran <= 0:
+                    break
+                if not self._historiales[antigua]._lock.locked():
+                    del self._historiales[antigua]
+                    sobran -= 1
+            return historial
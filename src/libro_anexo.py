@@ -0,0 +1,163 @@
+import math
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+
+# Valores que pd.read_excel interpreta como NaN por defecto (na_values)
+VALORES_NA = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null",
+}
+
+NAN = float("nan")
+
+
+def es_vacia(valor):
+    """Celda vacía a efectos de recortar filas (igual que pandas: None o '')."""
+    return valor is None or valor == ""
+
+
+def convertir_celda(valor):
+    """
+    Convierte un valor crudo de openpyxl al escalar que produciría pd.read_excel:
+    vacíos, errores y textos tipo 'N/A' pasan a NaN y los float enteros a int.
+    """
+    if valor is None:
+        return NAN
+    if isinstance(valor, str):
+        if valor in VALORES_NA or valor in ERROR_CODES:
+            return NAN
+        return valor
+    if isinstance(valor, float) and not math.isnan(valor) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def _es_numero(valor):
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool)
+
+
+def _tipar_columnas(filas):
+    """
+    Replica la inferencia de tipos por columna de pandas: una columna solo
+    numérica con huecos (o con algún decimal) se convierte entera a float, y
+    en una columna solo de fechas los huecos pasan a NaT.
+    """
+    if not filas:
+        return filas
+    for j in range(len(filas[0])):
+        columna = [fila[j] for fila in filas]
+        presentes = [v for v in columna if not (isinstance(v, float) and math.isnan(v))]
+        if presentes and all(isinstance(v, datetime) for v in presentes):
+            for fila in filas:
+                if not isinstance(fila[j], datetime):
+                    fila[j] = pd.NaT
+            continue
+        if not presentes or not all(_es_numero(v) for v in presentes):
+            continue
+        if len(presentes) < len(columna) or any(isinstance(v, float) for v in presentes):
+            for fila in filas:
+                fila[j] = float(fila[j])
+    return filas
+
+
+class LibroAnexo:
+    """
+    Sesión de lectura de un Anexo II.
+
+    Abre el .xlsx una única vez con openpyxl en modo read_only (zip +
+    sharedStrings se parsean al crear la sesión) y sirve las hojas a todas las
+    etapas de extracción.
+
+    Dos formas de leer:
+      - filas()/tabla(): motor en streaming con iter_rows(values_only=True).
+        Solo recorre las filas pedidas y no construye DataFrames.
+      - hoja(): DataFrame completo de pandas (cacheado), por compatibilidad.
+
+    Uso:
+        with LibroAnexo(ruta) as libro:
+            for fila in libro.filas("C.Externas (Otros)", hasta=30):
+                ...
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._book = load_workbook(ruta, read_only=True, data_only=True, keep_links=False)
+        self._excel = None
+        self._hojas = {}
+        self._tablas = {}
+        self._dimensiones_reseteadas = set()
+
+    @property
+    def sheet_names(self):
+        """Nombres de todas las hojas del libro."""
+        return self._book.sheetnames
+
+    def _worksheet(self, nombre):
+        ws = self._book[nombre]
+        if nombre not in self._dimensiones_reseteadas:
+            # La dimensión declarada en el XML no es fiable: leer hasta el final real
+            ws.reset_dimensions()
+            self._dimensiones_reseteadas.add(nombre)
+        return ws
+
+    def filas(self, nombre, desde=1, hasta=None):
+        """
+        Itera las filas `desde`..`hasta` (1-based, inclusive) de la hoja.
+
+        Cada fila es una lista de valores convertidos como en pd.read_excel
+        (ver convertir_celda), sin las celdas vacías del final. Las filas
+        vacías se devuelven como lista vacía. Con `hasta` la lectura se
+        detiene en esa fila sin parsear el resto de la hoja.
+        """
+        ws = self._worksheet(nombre)
+        for fila in ws.iter_rows(min_row=desde, max_row=hasta, values_only=True):
+            fin = len(fila)
+            while fin and es_vacia(fila[fin - 1]):
+                fin -= 1
+            yield [convertir_celda(v) for v in fila[:fin]]
+
+    def tabla(self, nombre):
+        """
+        Devuelve la hoja completa como lista de filas del mismo ancho, con los
+        tipos por columna que tendría pd.read_excel(header=None). Pensado para
+        hojas pequeñas de etiquetas (p. ej. 'Datos solicitud'); se cachea.
+        """
+        if nombre not in self._tablas:
+            filas = list(self.filas(nombre))
+            while filas and not filas[-1]:
+                filas.pop()
+            ancho = max((len(f) for f in filas), default=0)
+            filas = [f + [NAN] * (ancho - len(f)) for f in filas]
+            self._tablas[nombre] = _tipar_columnas(filas)
+        return self._tablas[nombre]
+
+    def hoja(self, nombre, header=None):
+        """
+        Devuelve la hoja `nombre` como DataFrame (equivalente a
+        pd.read_excel(ruta, sheet_name=nombre, header=header)).
+
+        El resultado se guarda en memoria: no modificar el DataFrame devuelto.
+        """
+        clave = (nombre, tuple(header) if isinstance(header, list) else header)
+        if clave not in self._hojas:
+            if self._excel is None:
+                self._excel = pd.ExcelFile(self._book, engine="openpyxl")
+            self._hojas[clave] = self._excel.parse(sheet_name=nombre, header=header)
+        return self._hojas[clave]
+
+    def cerrar(self):
+        """Libera el fichero y las hojas cacheadas."""
+        self._hojas.clear()
+        self._tablas.clear()
+        self._book.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cerrar()
+        return False
@@ -5,6 +5,7 @@ from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.oxml import OxmlElement, ns
 from docx.oxml.ns import qn
 import os
+import copy
 import re  # Asegúrate de importar re al principio del archivo
 
 # Importamos las utilidades (import flexible para ambos contextos)
@@ -12,251 +13,342 @@ try:
     from .utilidades_docx import (
         formatea_euro, get_value_or_default, add_text_to_cell, 
         set_cell_color, set_text_format, create_titled_box, cm_to_pt,
-        set_cell_format, crear_tabla_coste_colaboracion
+        set_cell_format, crear_tabla_coste_colaboracion, IndiceFacturas
     )
+    from .vista_fichas import PersonaFicha, ordenar_personal_2_1, personas_2_1, colaboraciones_2_2
+    from .cache_plantillas import plantillas
+    from .almacen_tablas import almacen
 except ImportError:
     from utilidades_docx import (
         formatea_euro, get_value_or_default, add_text_to_cell, 
         set_cell_color, set_text_format, create_titled_box, cm_to_pt,
-        set_cell_format, crear_tabla_coste_colaboracion
+        set_cell_format, crear_tabla_coste_colaboracion, IndiceFacturas
     )
+    from vista_fichas import PersonaFicha, ordenar_personal_2_1, personas_2_1, colaboraciones_2_2
+    from cache_plantillas import plantillas
+    from almacen_tablas import almacen
+
+# Versión del generador de fichas (este módulo y utilidades_docx). Cambiarla
+# cuando cambie el documento generado, para invalidar la caché de fichas.
+VERSION_GENERADOR = "1.0"
 
 
 # ==========================================
 # FICHA 2.1 (Personal)
 # ==========================================
-def generar_ficha_2_1(ruta_excel, ruta_plantilla_base, ruta_salida_final, anio, acronimus):
-    """Genera la Ficha 2.1 replicando exactamente la lógica del notebook."""
-    print(f"Leyendo datos: {ruta_excel}")
-    _, ext = os.path.splitext(ruta_excel)
-    ext = ext.lower()
-    if ext == '.json':
-        df_ficha = pd.read_json(ruta_excel)
-    else:
-        df_ficha = pd.read_excel(ruta_excel)
-
-    # Ordenar por nombre si es necesario
-    if not df_ficha['Nombre'].is_monotonic_increasing:
-        df_ficha = df_ficha.sort_values(by='Nombre').reset_index(drop=True)
+def datos_persona_2_1(df_ficha, index, anio):
+    """
+    Calcula los textos de la ficha de una persona: las filas de la tabla 1
+    (fields1) y los textos de las secciones 3 (frase) y 4 (actividad_4_1).
+    Versión de referencia fila a fila: los generadores usan personas_2_1
+    (vista_fichas.py), que da el mismo PersonaFicha leyendo cada columna una vez.
+    """
+    # Rellenar Datos Tabla 1
+    fields1 = [
+        ("Nombre", get_value_or_default(df_ficha, index, "Nombre"), "", ""),
+        ("Apellidos", get_value_or_default(df_ficha, index, "Apellidos"), "", ""),
+        ("Coste horario (€/hora)", formatea_euro(get_value_or_default(df_ficha, index, 'Coste horario (€/hora)', 0), "€/h"), "", ""),
+        ("Coste total (€)", formatea_euro(get_value_or_default(df_ficha, index, 'Coste total (€)', 0)), "Horas totales", int(get_value_or_default(df_ficha, index, "Horas totales", 0))),
+        ("Coste I+D (€)", formatea_euro(get_value_or_default(df_ficha, index, 'Coste I+D (€)', 0)), "Horas I+D", get_value_or_default(df_ficha, index, "Horas I+D")),
+        ("Coste IT (€)", formatea_euro(get_value_or_default(df_ficha, index, 'Coste total (€)', 0)), "Horas IT", int(get_value_or_default(df_ficha, index, "Horas totales", 0))),
+        ("Departamento", get_value_or_default(df_ficha, index, "Departamento"), "Puesto actual", get_value_or_default(df_ficha, index, "Puesto actual")),
+        ("Titulación 1", get_value_or_default(df_ficha, index, "Titulación 1"), "Titulación 2", get_value_or_default(df_ficha, index, "Titulación 2"))
+    ]
+
+    # 1. Extracción de variables desde el Excel
+    nombre = str(get_value_or_default(df_ficha, index, "Nombre", "")).strip()
+    apellidos = str(get_value_or_default(df_ficha, index, "Apellidos", "")).strip()
+    titulacion = str(get_value_or_default(df_ficha, index, "Titulación 1", "")).strip()
+    puesto = str(get_value_or_default(df_ficha, index, "Puesto actual", "")).strip()
+    departamento = str(get_value_or_default(df_ficha, index, "Departamento", "")).strip()
+    horas = int(get_value_or_default(df_ficha, index, "Horas totales", 0))
+    coste_total_val = get_value_or_default(df_ficha, index, "Coste total (€)", 0)
+    
+    # Variables de Empresas Anteriores (Historial)
+    empresa1 = str(get_value_or_default(df_ficha, index, "EMPRESA 1", "")).strip()
+    periodo1 = str(get_value_or_default(df_ficha, index, "PERIODO 1", "")).strip()
+    cargo1 = str(get_value_or_default(df_ficha, index, "PUESTO 1", "")).strip()
+    
+    empresa2 = str(get_value_or_default(df_ficha, index, "EMPRESA 2", "")).strip()
+    periodo2 = str(get_value_or_default(df_ficha, index, "PERIODO 2", "")).strip()
+    cargo2 = str(get_value_or_default(df_ficha, index, "PUESTO 2", "")).strip()
+    
+    empresa3 = str(get_value_or_default(df_ficha, index, "EMPRESA 3", "")).strip()
+    periodo3 = str(get_value_or_default(df_ficha, index, "PERIODO 3", "")).strip()
+    cargo3 = str(get_value_or_default(df_ficha, index, "PUESTO 3", "")).strip()
 
-    doc_master = Document()
+    # 2. Construcción de la frase (Sección 3)
+    frase = f"{nombre} {apellidos} ha trabajado en {empresa1} durante el periodo de {periodo1} ocupando el cargo de {cargo1}."
+    
+    if empresa2:
+        frase += f" También trabajó en {empresa2} durante el periodo de {periodo2} ocupando el cargo de {cargo2}."
+    if empresa3:
+        frase += f" Por último, trabajó en {empresa3} durante el periodo de {periodo3} ocupando el cargo de {cargo3}."
+
+    # 3. Construcción de actividades y costes (Sección 4)
+    texto_actividades = ""
+    for n in range(1, 5):
+        act = str(get_value_or_default(df_ficha, index, f"Actividad {n}", "")).strip()
+        if act: 
+            texto_actividades += f"{act}\n"
+
+    # Formateo manual del coste para texto (estilo europeo 1.234,56)
+    try: 
+        coste_total = f"{float(coste_total_val):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    except: 
+        coste_total = "0,00"
+        
+    # Extraer año de inicio del periodo 1 (ej: "2010" de "2010-2015")
+    match_anio = re.search(r'\d{4}', str(periodo1))
+    anio_inicio = match_anio.group(0) if match_anio else "?????"
+
+    actividad_4_1 = (
+        f"{nombre} {apellidos}, con titulación en {titulacion} ocupa el puesto de {puesto} "
+        f"dentro del Departamento de {departamento}, empresa de la que forma parte desde {anio_inicio} "
+        f"y participa de manera activa durante la ejecución del proyecto. Concretamente participa durante "
+        f"{horas} horas en {anio}, lo que supone un gasto de {coste_total} €.\n\n"
+        f"Su participación se considera esencial para la correcta ejecución del presente proyecto llevado "
+        f"a cabo durante la anualidad {anio}, participando concretamente en las siguientes fases y tareas del mismo:\n\n"
+        f"{texto_actividades.strip()}"
+    )
 
-    for index in range(len(df_ficha)):
-        # --- TABLA 1: PERSONAL PARTICIPANTE ---
-        title1 = doc_master.add_paragraph()
-        run = title1.add_run("1. IDENTIFICACIÓN DE PERSONAL PARTICIPANTE DE ENTIDAD SOLICITANTE:")
-        run.bold = True
-        run.font.name = "Arial"
-        run.font.size = Pt(10)
-        title1.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-        title1.paragraph_format.left_indent = Cm(-1)
-        title1.paragraph_format.right_indent = Cm(-0.75)
-        title1.paragraph_format.line_spacing = 1.0
+    fields1 = [(etiqueta, str(valor), etiqueta_2, str(valor_2)) for etiqueta, valor, etiqueta_2, valor_2 in fields1]
+    return PersonaFicha(fields1, frase, actividad_4_1)
 
-        table1 = doc_master.add_table(rows=8, cols=4)
-        table1.style = 'Table Grid'
-        
-        # XML Tabla 1
-        tbl = table1._element
-        tblPr = tbl.find(ns.qn('w:tblPr'))
-        if tblPr is None: tblPr = OxmlElement('w:tblPr'); tbl.insert(0, tblPr)
-        jc = OxmlElement('w:jc'); jc.set(ns.qn('w:val'), 'left'); tblPr.append(jc)
-        tblInd = OxmlElement('w:tblInd'); tblInd.set(ns.qn('w:w'), str(int(-0.83 * 567))); tblInd.set(ns.qn('w:type'), 'dxa'); tblPr.append(tblInd)
-        tblW = OxmlElement('w:tblW'); tblW.set(ns.qn('w:w'), str(int(18.33 * 567))); tblW.set(ns.qn('w:type'), 'dxa'); tblPr.append(tblW)
 
-        for row in table1.rows: row.height = Cm(0.5)
-        
-        column_widths = [Cm(4.32), Cm(6.5), Cm(3.25), Cm(4.5)]
-        for row in table1.rows:
-            for j, width in enumerate(column_widths):
-                row.cells[j].width = width
-
-        # Fusiones y Formato Tabla 1
-        table1.rows[0].cells[1].merge(table1.rows[0].cells[3])
-        table1.rows[1].cells[1].merge(table1.rows[1].cells[3])
-        
-        for row in table1.rows:
-            set_cell_color(row.cells[0], "F2F2F2")
-            set_text_format(row.cells[0], bold=True)
-        for fila in [2, 3, 4, 5, 6, 7]:
-            set_cell_color(table1.rows[fila].cells[2], "F2F2F2")
-            set_text_format(table1.rows[fila].cells[2], bold=True)
-
-        # Rellenar Datos Tabla 1
-        fields1 = [
-            ("Nombre", get_value_or_default(df_ficha, index, "Nombre"), "", ""),
-            ("Apellidos", get_value_or_default(df_ficha, index, "Apellidos"), "", ""),
-            ("Coste horario (€/hora)", formatea_euro(get_value_or_default(df_ficha, index, 'Coste horario (€/hora)', 0), "€/h"), "", ""),
-            ("Coste total (€)", formatea_euro(get_value_or_default(df_ficha, index, 'Coste total (€)', 0)), "Horas totales", int(get_value_or_default(df_ficha, index, "Horas totales", 0))),
-            ("Coste I+D (€)", formatea_euro(get_value_or_default(df_ficha, index, 'Coste I+D (€)', 0)), "Horas I+D", get_value_or_default(df_ficha, index, "Horas I+D")),
-            ("Coste IT (€)", formatea_euro(get_value_or_default(df_ficha, index, 'Coste total (€)', 0)), "Horas IT", int(get_value_or_default(df_ficha, index, "Horas totales", 0))),
-            ("Departamento", get_value_or_default(df_ficha, index, "Departamento"), "Puesto actual", get_value_or_default(df_ficha, index, "Puesto actual")),
-            ("Titulación 1", get_value_or_default(df_ficha, index, "Titulación 1"), "Titulación 2", get_value_or_default(df_ficha, index, "Titulación 2"))
-        ]
-
-        for i, row_data in enumerate(fields1):
-            row_cells = table1.rows[i].cells
-            add_text_to_cell(row_cells[0], row_data[0], bold=True)
-            if i < 2:
-                add_text_to_cell(row_cells[1], row_data[1])
-            else:
-                add_text_to_cell(row_cells[1], str(row_data[1]))
-                add_text_to_cell(row_cells[2], row_data[2], bold=True)
-                add_text_to_cell(row_cells[3], str(row_data[3]))
+def construir_bloque_2_1(doc_master, datos):
+    """
+    Añade a doc_master el bloque de una persona (tablas 1 y 2 y secciones 3
+    y 4) celda a celda con python-docx. Es la construcción de referencia:
+    renderizar_bloques_2_1 la usa una sola vez para sacar el esqueleto.
+    """
+    fields1 = datos.fields1
+    frase = datos.frase
+    actividad_4_1 = datos.actividad_4_1
+
+    # --- TABLA 1: PERSONAL PARTICIPANTE ---
+    title1 = doc_master.add_paragraph()
+    run = title1.add_run("1. IDENTIFICACIÓN DE PERSONAL PARTICIPANTE DE ENTIDAD SOLICITANTE:")
+    run.bold = True
+    run.font.name = "Arial"
+    run.font.size = Pt(10)
+    title1.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+    title1.paragraph_format.left_indent = Cm(-1)
+    title1.paragraph_format.right_indent = Cm(-0.75)
+    title1.paragraph_format.line_spacing = 1.0
+
+    table1 = doc_master.add_table(rows=8, cols=4)
+    table1.style = 'Table Grid'
+    
+    # XML Tabla 1
+    tbl = table1._element
+    tblPr = tbl.find(ns.qn('w:tblPr'))
+    if tblPr is None: tblPr = OxmlElement('w:tblPr'); tbl.insert(0, tblPr)
+    jc = OxmlElement('w:jc'); jc.set(ns.qn('w:val'), 'left'); tblPr.append(jc)
+    tblInd = OxmlElement('w:tblInd'); tblInd.set(ns.qn('w:w'), str(int(-0.83 * 567))); tblInd.set(ns.qn('w:type'), 'dxa'); tblPr.append(tblInd)
+    tblW = OxmlElement('w:tblW'); tblW.set(ns.qn('w:w'), str(int(18.33 * 567))); tblW.set(ns.qn('w:type'), 'dxa'); tblPr.append(tblW)
+
+    for row in table1.rows: row.height = Cm(0.5)
+    
+    column_widths = [Cm(4.32), Cm(6.5), Cm(3.25), Cm(4.5)]
+    for row in table1.rows:
+        for j, width in enumerate(column_widths):
+            row.cells[j].width = width
+
+    # Fusiones y Formato Tabla 1
+    table1.rows[0].cells[1].merge(table1.rows[0].cells[3])
+    table1.rows[1].cells[1].merge(table1.rows[1].cells[3])
+    
+    for row in table1.rows:
+        set_cell_color(row.cells[0], "F2F2F2")
+        set_text_format(row.cells[0], bold=True)
+    for fila in [2, 3, 4, 5, 6, 7]:
+        set_cell_color(table1.rows[fila].cells[2], "F2F2F2")
+        set_text_format(table1.rows[fila].cells[2], bold=True)
+
+    for i, row_data in enumerate(fields1):
+        row_cells = table1.rows[i].cells
+        add_text_to_cell(row_cells[0], row_data[0], bold=True)
+        if i < 2:
+            add_text_to_cell(row_cells[1], row_data[1])
+        else:
+            add_text_to_cell(row_cells[1], str(row_data[1]))
+            add_text_to_cell(row_cells[2], row_data[2], bold=True)
+            add_text_to_cell(row_cells[3], str(row_data[3]))
+
+    doc_master.add_paragraph()
+
+    # =========================================================================
+    # TABLA 2: COLABORACIÓN EXTERNA
+    # =========================================================================
+    title2 = doc_master.add_paragraph()
+    run = title2.add_run("2. IDENTIFICACIÓN DE PERSONAL PARTICIPANTE DE COLABORACIÓN EXTERNA:")
+    run.bold = True
+    run.font.name = "Arial"
+    run.font.size = Pt(10)
+    title2.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+    title2.paragraph_format.left_indent = Cm(-1)
+    title2.paragraph_format.right_indent = Cm(-0.75)
+    title2.paragraph_format.line_spacing = 1.0
+
+    table2 = doc_master.add_table(rows=8, cols=5)
+    table2.style = 'Table Grid'
+    
+    # XML Tabla 2
+    tbl = table2._element
+    tblPr = tbl.find(ns.qn('w:tblPr'))
+    if tblPr is None: tblPr = OxmlElement('w:tblPr'); tbl.insert(0, tblPr)
+    jc = OxmlElement('w:jc'); jc.set(ns.qn('w:val'), 'left'); tblPr.append(jc)
+    tblInd = OxmlElement('w:tblInd'); tblInd.set(ns.qn('w:w'), str(int(-0.83 * 567))); tblInd.set(ns.qn('w:type'), 'dxa'); tblPr.append(tblInd)
+    tblW = OxmlElement('w:tblW'); tblW.set(ns.qn('w:w'), str(int(18.33 * 567))); tblW.set(ns.qn('w:type'), 'dxa'); tblPr.append(tblW)
+
+    column_widths_2 = [Cm(4.32), Cm(4.75), Cm(4), Cm(1.76), Cm(2.23)]
+    for row in table2.rows:
+        for j, width in enumerate(column_widths_2):
+            row.cells[j].width = width
+
+    # Fusiones y Estilo Tabla 2
+    table2.cell(0, 1).merge(table2.cell(0, 2))
+    table2.cell(1, 1).merge(table2.cell(1, 4))
+    table2.cell(2, 1).merge(table2.cell(2, 4))
+    table2.cell(3, 1).merge(table2.cell(3, 4))
+    for r in range(4, 8): table2.cell(r, 3).merge(table2.cell(r, 4))
+
+    for row in table2.rows:
+        set_cell_color(row.cells[0], "F2F2F2")
+        set_text_format(row.cells[0], bold=True)
+    for fila in [4, 5, 6, 7]:
+        set_cell_color(table2.rows[fila].cells[2], "F2F2F2")
+        set_text_format(table2.rows[fila].cells[2], bold=True)
+    set_cell_color(table2.rows[0].cells[-2], "F2F2F2")
+
+    headers_2 = [
+        ("Entidad Colaboradora", "", "", "NIF", ""),
+        ("Nombre", "", "", "", ""),
+        ("Apellidos", "", "", "", ""),
+        ("Perfil profesional", "", "", "", ""),
+        ("Número de personas", "", "Coste horario (€/hora)", "", ""),
+        ("Coste total (€)", "", "Horas totales", "", ""),
+        ("Titulación 1", "", "Titulación 2", "", ""),
+        ("Titulación 3", "", "Titulación 4", "", "")
+    ]
+
+    for row_idx, header in enumerate(headers_2):
+        for col_idx, text in enumerate(header):
+            cell = table2.cell(row_idx, col_idx)
+            if text:
+                cell.text = "" 
+                p = cell.paragraphs[0]
+                run = p.add_run(text)
+                run.font.name = "Arial"
+                run.font.size = Pt(10)
+                run.bold = True
+                p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+
+    doc_master.add_paragraph()
+
+    # ==========================================
+    # SECCIÓN 3 y 4 (TEXTOS DINÁMICOS COMPLETOS)
+    # ==========================================
+    
+    # 4. Inserción en el documento
+    doc_master.add_paragraph()
+    create_titled_box(
+        doc_master, 
+        "3. EXPERIENCIA PROFESIONAL RELACIONADA CON LA ACTIVIDAD DESARROLLADA EN EL PROYECTO:", 
+        frase,
+        height=cm_to_pt(2.28), 
+        width=cm_to_pt(18.24)
+    )
+    
+    doc_master.add_paragraph()
+    create_titled_box(
+        doc_master, 
+        "4. FUNCIONES ASIGNADAS/DESARROLLADAS EN EL PROYECTO.", 
+        actividad_4_1,
+        height=cm_to_pt(2.28), 
+        width=cm_to_pt(18.24)
+    )
 
-        doc_master.add_paragraph()
 
-        # =========================================================================
-        # TABLA 2: COLABORACIÓN EXTERNA
-        # =========================================================================
-        title2 = doc_master.add_paragraph()
-        run = title2.add_run("2. IDENTIFICACIÓN DE PERSONAL PARTICIPANTE DE COLABORACIÓN EXTERNA:")
-        run.bold = True
-        run.font.name = "Arial"
-        run.font.size = Pt(10)
-        title2.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-        title2.paragraph_format.left_indent = Cm(-1)
-        title2.paragraph_format.right_indent = Cm(-0.75)
-        title2.paragraph_format.line_spacing = 1.0
+def _ultimo_run(tc):
+    """Run con el texto de una celda rellenada con add_text_to_cell / create_titled_box."""
+    return tc.find(qn('w:p')).findall(qn('w:r'))[-1]
 
-        table2 = doc_master.add_table(rows=8, cols=5)
-        table2.style = 'Table Grid'
-        
-        # XML Tabla 2
-        tbl = table2._element
-        tblPr = tbl.find(ns.qn('w:tblPr'))
-        if tblPr is None: tblPr = OxmlElement('w:tblPr'); tbl.insert(0, tblPr)
-        jc = OxmlElement('w:jc'); jc.set(ns.qn('w:val'), 'left'); tblPr.append(jc)
-        tblInd = OxmlElement('w:tblInd'); tblInd.set(ns.qn('w:w'), str(int(-0.83 * 567))); tblInd.set(ns.qn('w:type'), 'dxa'); tblPr.append(tblInd)
-        tblW = OxmlElement('w:tblW'); tblW.set(ns.qn('w:w'), str(int(18.33 * 567))); tblW.set(ns.qn('w:type'), 'dxa'); tblPr.append(tblW)
 
-        column_widths_2 = [Cm(4.32), Cm(4.75), Cm(4), Cm(1.76), Cm(2.23)]
-        for row in table2.rows:
-            for j, width in enumerate(column_widths_2):
-                row.cells[j].width = width
-
-        # Fusiones y Estilo Tabla 2
-        table2.cell(0, 1).merge(table2.cell(0, 2))
-        table2.cell(1, 1).merge(table2.cell(1, 4))
-        table2.cell(2, 1).merge(table2.cell(2, 4))
-        table2.cell(3, 1).merge(table2.cell(3, 4))
-        for r in range(4, 8): table2.cell(r, 3).merge(table2.cell(r, 4))
-
-        for row in table2.rows:
-            set_cell_color(row.cells[0], "F2F2F2")
-            set_text_format(row.cells[0], bold=True)
-        for fila in [4, 5, 6, 7]:
-            set_cell_color(table2.rows[fila].cells[2], "F2F2F2")
-            set_text_format(table2.rows[fila].cells[2], bold=True)
-        set_cell_color(table2.rows[0].cells[-2], "F2F2F2")
-
-        headers_2 = [
-            ("Entidad Colaboradora", "", "", "NIF", ""),
-            ("Nombre", "", "", "", ""),
-            ("Apellidos", "", "", "", ""),
-            ("Perfil profesional", "", "", "", ""),
-            ("Número de personas", "", "Coste horario (€/hora)", "", ""),
-            ("Coste total (€)", "", "Horas totales", "", ""),
-            ("Titulación 1", "", "Titulación 2", "", ""),
-            ("Titulación 3", "", "Titulación 4", "", "")
-        ]
-
-        for row_idx, header in enumerate(headers_2):
-            for col_idx, text in enumerate(header):
-                cell = table2.cell(row_idx, col_idx)
-                if text:
-                    cell.text = "" 
-                    p = cell.paragraphs[0]
-                    run = p.add_run(text)
-                    run.font.name = "Arial"
-                    run.font.size = Pt(10)
-                    run.bold = True
-                    p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+def _esqueleto_bloque_2_1(fields1):
+    """
+    Construye una vez el bloque de una persona con las etiquetas de fields1
+    y los valores vacíos. Devuelve (elementos del bloque, salto de página)
+    listos para clonar.
+    """
+    vacio = PersonaFicha([(etiqueta, "", etiqueta_2, "") for etiqueta, _, etiqueta_2, _ in fields1], "", "")
+    doc = Document()
+    construir_bloque_2_1(doc, vacio)
+    doc.add_page_break()
+    body = doc.element.body
+    elementos = [e for e in body if e.tag != qn('w:sectPr')]
+    return elementos[:-1], elementos[-1]
 
-        doc_master.add_paragraph()
 
-        # ==========================================
-        # SECCIÓN 3 y 4 (TEXTOS DINÁMICOS COMPLETOS)
-        # ==========================================
-        
-        # 1. Extracción de variables desde el Excel
-        nombre = str(get_value_or_default(df_ficha, index, "Nombre", "")).strip()
-        apellidos = str(get_value_or_default(df_ficha, index, "Apellidos", "")).strip()
-        titulacion = str(get_value_or_default(df_ficha, index, "Titulación 1", "")).strip()
-        puesto = str(get_value_or_default(df_ficha, index, "Puesto actual", "")).strip()
-        departamento = str(get_value_or_default(df_ficha, index, "Departamento", "")).strip()
-        horas = int(get_value_or_default(df_ficha, index, "Horas totales", 0))
-        coste_total_val = get_value_or_default(df_ficha, index, "Coste total (€)", 0)
-        
-        # Variables de Empresas Anteriores (Historial)
-        empresa1 = str(get_value_or_default(df_ficha, index, "EMPRESA 1", "")).strip()
-        periodo1 = str(get_value_or_default(df_ficha, index, "PERIODO 1", "")).strip()
-        cargo1 = str(get_value_or_default(df_ficha, index, "PUESTO 1", "")).strip()
-        
-        empresa2 = str(get_value_or_default(df_ficha, index, "EMPRESA 2", "")).strip()
-        periodo2 = str(get_value_or_default(df_ficha, index, "PERIODO 2", "")).strip()
-        cargo2 = str(get_value_or_default(df_ficha, index, "PUESTO 2", "")).strip()
-        
-        empresa3 = str(get_value_or_default(df_ficha, index, "EMPRESA 3", "")).strip()
-        periodo3 = str(get_value_or_default(df_ficha, index, "PERIODO 3", "")).strip()
-        cargo3 = str(get_value_or_default(df_ficha, index, "PUESTO 3", "")).strip()
+def renderizar_bloques_2_1(doc_master, personas, salto_final=False):
+    """
+    Añade a doc_master los bloques de todas las personas clonando el
+    esqueleto (deepcopy del XML) y rellenando solo las celdas de valor.
+    El XML resultante es el mismo que llamar a construir_bloque_2_1 por
+    persona, sin pasar por el acceso a celdas de python-docx.
+    Con `salto_final` también se añade el salto de página tras la última
+    persona (para renderizar la plantilla por trozos y unirlos después).
+    """
+    if not personas:
+        return
+    esqueleto, salto_pagina = _esqueleto_bloque_2_1(personas[0].fields1)
+    body = doc_master.element.body
+    sectPr = body.find(qn('w:sectPr'))
+
+    def insertar(elemento):
+        if sectPr is not None:
+            sectPr.addprevious(elemento)
+        else:
+            body.append(elemento)
+
+    for index, datos in enumerate(personas):
+        bloque = [copy.deepcopy(e) for e in esqueleto]
+        tablas = [e for e in bloque if e.tag == qn('w:tbl')]
+        tabla1, caja3, caja4 = tablas[0], tablas[2], tablas[3]
+
+        # Tabla 1: columna 1 (y 3 desde la fila 2, ya fusionadas las anteriores)
+        for i, row_data in enumerate(datos.fields1):
+            celdas = tabla1.findall(qn('w:tr'))[i].findall(qn('w:tc'))
+            _ultimo_run(celdas[1]).text = row_data[1]
+            if i >= 2:
+                _ultimo_run(celdas[3]).text = row_data[3]
+
+        # Secciones 3 y 4 (mismo texto por defecto que create_titled_box)
+        for caja, texto in ((caja3, datos.frase), (caja4, datos.actividad_4_1)):
+            _ultimo_run(caja.find(qn('w:tr')).find(qn('w:tc'))).text = texto or " "
+
+        for elemento in bloque:
+            insertar(elemento)
+        if salto_final or index < len(personas) - 1:
+            insertar(copy.deepcopy(salto_pagina))
+
+
+def leer_datos(ruta):
+    """Lee una tabla de datos: JSON (records) o Excel según la extensión. Las tablas de los proyectos salen de su .parquet (ver almacen_tablas)."""
+    return almacen.leer(ruta)
+
+
+def generar_ficha_2_1(ruta_excel, ruta_plantilla_base, ruta_salida_final, anio, acronimus, lector=None):
+    """
+    Genera la Ficha 2.1 replicando exactamente la lógica del notebook.
+    `lector` (ruta -> DataFrame) permite leer los datos de un caché; por defecto leer_datos.
+    """
+    print(f"Leyendo datos: {ruta_excel}")
+    df_ficha = (lector or leer_datos)(ruta_excel)
 
-        # 2. Construcción de la frase (Sección 3)
-        frase = f"{nombre} {apellidos} ha trabajado en {empresa1} durante el periodo de {periodo1} ocupando el cargo de {cargo1}."
-        
-        if empresa2:
-            frase += f" También trabajó en {empresa2} durante el periodo de {periodo2} ocupando el cargo de {cargo2}."
-        if empresa3:
-            frase += f" Por último, trabajó en {empresa3} durante el periodo de {periodo3} ocupando el cargo de {cargo3}."
-
-        # 3. Construcción de actividades y costes (Sección 4)
-        texto_actividades = ""
-        for n in range(1, 5):
-            act = str(get_value_or_default(df_ficha, index, f"Actividad {n}", "")).strip()
-            if act: 
-                texto_actividades += f"{act}\n"
-
-        # Formateo manual del coste para texto (estilo europeo 1.234,56)
-        try: 
-            coste_total = f"{float(coste_total_val):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-        except: 
-            coste_total = "0,00"
-            
-        # Extraer año de inicio del periodo 1 (ej: "2010" de "2010-2015")
-        match_anio = re.search(r'\d{4}', str(periodo1))
-        anio_inicio = match_anio.group(0) if match_anio else "?????"
-
-        actividad_4_1 = (
-            f"{nombre} {apellidos}, con titulación en {titulacion} ocupa el puesto de {puesto} "
-            f"dentro del Departamento de {departamento}, empresa de la que forma parte desde {anio_inicio} "
-            f"y participa de manera activa durante la ejecución del proyecto. Concretamente participa durante "
-            f"{horas} horas en {anio}, lo que supone un gasto de {coste_total} €.\n\n"
-            f"Su participación se considera esencial para la correcta ejecución del presente proyecto llevado "
-            f"a cabo durante la anualidad {anio}, participando concretamente en las siguientes fases y tareas del mismo:\n\n"
-            f"{texto_actividades.strip()}"
-        )
-
-        # 4. Inserción en el documento
-        doc_master.add_paragraph()
-        create_titled_box(
-            doc_master, 
-            "3. EXPERIENCIA PROFESIONAL RELACIONADA CON LA ACTIVIDAD DESARROLLADA EN EL PROYECTO:", 
-            frase,
-            height=cm_to_pt(2.28), 
-            width=cm_to_pt(18.24)
-        )
-        
-        doc_master.add_paragraph()
-        create_titled_box(
-            doc_master, 
-            "4. FUNCIONES ASIGNADAS/DESARROLLADAS EN EL PROYECTO.", 
-            actividad_4_1,
-            height=cm_to_pt(2.28), 
-            width=cm_to_pt(18.24)
-        )
-
-        if index < len(df_ficha) - 1:
-            doc_master.add_page_break()
+    doc_master = Document()
+    renderizar_bloques_2_1(doc_master, personas_2_1(df_ficha, anio))
 
     # Fusión Ficha 2.1
     fusionar_y_guardar(doc_master, ruta_plantilla_base, ruta_salida_final)
@@ -265,31 +357,24 @@ def generar_ficha_2_1(ruta_excel, ruta_plantilla_base, ruta_salida_final, anio,
 # ==========================================
 # FICHA 2.2 (Colaboraciones)
 # ==========================================
-def generar_ficha_2_2(ruta_colaboraciones, ruta_facturas, ruta_plantilla_base, ruta_salida_final, cliente_nombre=None, cliente_nif=None, anio=None):
+def generar_ficha_2_2(ruta_colaboraciones, ruta_facturas, ruta_plantilla_base, ruta_salida_final, cliente_nombre=None, cliente_nif=None, anio=None, lector=None):
     """Genera la Ficha 2.2 replicando exactamente la lógica del notebook.
     Opcionalmente puede recibir `cliente_nombre` y `cliente_nif` para completar
     los campos de entidad solicitante y NIF 2 en la ficha 2.2.
     Opcionalmente puede recibir `anio` para establecer el año fiscal a usar.
+    `lector` (ruta -> DataFrame) permite leer los datos de un caché; por defecto leer_datos.
     """
+    lector = lector or leer_datos
     print(f"Leyendo datos: {ruta_colaboraciones}")
-    _, ext_col = os.path.splitext(ruta_colaboraciones)
-    ext_col = ext_col.lower()
-    if ext_col == '.json':
-        df_colab = pd.read_json(ruta_colaboraciones)
-    else:
-        df_colab = pd.read_excel(ruta_colaboraciones)
+    df_colab = lector(ruta_colaboraciones)
     
     print(f"Leyendo datos: {ruta_facturas}")
-    _, ext_fact = os.path.splitext(ruta_facturas)
-    ext_fact = ext_fact.lower()
-    if ext_fact == '.json':
-        df_facturas = pd.read_json(ruta_facturas)
-    else:
-        df_facturas = pd.read_excel(ruta_facturas)
+    df_facturas = lector(ruta_facturas)
+    colaboraciones = colaboraciones_2_2(df_colab, df_facturas, cliente_nombre, cliente_nif)
 
     doc_master = Document()
 
-    for i, row_data in df_colab.iterrows():
+    for i, colaboracion in enumerate(colaboraciones):
         
         # --- TABLA 1: IDENTIFICACIÓN ENTIDAD ---
         title = doc_master.add_paragraph()
@@ -355,17 +440,8 @@ def generar_ficha_2_2(ruta_colaboraciones, ruta_facturas, ruta_plantilla_base, r
         for key, (_, _, r_v, c_v) in fields.items():
             cell = table.cell(r_v, c_v)
 
-            # Valor por defecto desde el dataframe (si existe)
-            val = ""
-            if key in df_colab.columns and not pd.isna(row_data.get(key)):
-                val = str(row_data.get(key))
-
-            # Si el usuario ha proporcionado datos del cliente, los usamos
-            if key == "Entidad contratante" and cliente_nombre:
-                val = str(cliente_nombre)
-            if key == "NIF 2" and cliente_nif:
-                val = str(cliente_nif)
-
+            # Texto ya preparado (con entidad contratante / NIF 2 del cliente si se indicaron)
+            val = colaboracion.valores[key]
             if val:
                 cell.text = val
                 if cell.paragraphs and cell.paragraphs[0].runs:
@@ -414,35 +490,102 @@ def generar_ficha_2_2(ruta_colaboraciones, ruta_facturas, ruta_plantilla_base, r
         title2.paragraph_format.left_indent = Cm(-1)
         title2.paragraph_format.right_indent = Cm(-0.75)
 
-        entidad_actual = row_data.get("Razón social", "")
-        facturas_entidad = df_facturas[df_facturas["Entidad"] == entidad_actual]
-        
-        crear_tabla_coste_colaboracion(doc_master, facturas_entidad)
+        crear_tabla_coste_colaboracion(doc_master, colaboracion.facturas)
 
-        if i < len(df_colab) - 1:
+        if i < len(colaboraciones) - 1:
             doc_master.add_page_break()
 
     # Fusión Ficha 2.2
     fusionar_y_guardar(doc_master, ruta_plantilla_base, ruta_salida_final)
 
 
+# ==========================================
+# FICHAS POR PERSONA / POR COLABORACIÓN
+# ==========================================
+def _nombre_archivo(texto):
+    """Texto apto para nombre de archivo dentro de un ZIP."""
+    limpio = re.sub(r'[^\w\- ]+', '', str(texto)).strip()
+    return re.sub(r'\s+', '_', limpio)[:60] or "sin_nombre"
+
+
+def _una_a_una(tablas_por_fila, generar, directorio):
+    """
+    Para cada (nombre, tablas) genera la ficha con generar(lector, ruta), donde
+    lector devuelve la tabla de cada ruta de datos, y produce (nombre, ruta).
+    La ficha anterior se borra al pedir la siguiente: en disco solo hay una.
+    """
+    ruta = os.path.join(directorio, "ficha_individual.docx")
+    for nombre, tablas in tablas_por_fila:
+        generar(lambda ruta_datos: tablas[ruta_datos], ruta)
+        yield nombre, ruta
+        os.remove(ruta)
+
+
+def fichas_2_1_por_persona(df_ficha, ruta_excel, ruta_plantilla_base, directorio, anio, acronimus):
+    """
+    Una Ficha 2.1 por persona, en el orden de la ficha completa. Produce
+    (nombre de archivo, ruta) con la ficha escrita en `directorio`.
+    """
+    df_ficha = ordenar_personal_2_1(df_ficha)
+
+    def nombre(i):
+        persona = f"{get_value_or_default(df_ficha, i, 'Nombre', '')} {get_value_or_default(df_ficha, i, 'Apellidos', '')}"
+        return f"{i + 1:03d}_{_nombre_archivo(persona)}.docx"
+
+    filas = (
+        (nombre(i), {ruta_excel: df_ficha.iloc[[i]].reset_index(drop=True)})
+        for i in range(len(df_ficha))
+    )
+    return _una_a_una(filas, lambda lector, ruta: generar_ficha_2_1(
+        ruta_excel, ruta_plantilla_base, ruta, anio, acronimus, lector=lector
+    ), directorio)
+
+
+def fichas_2_2_por_colaboracion(df_colab, df_facturas, ruta_colaboraciones, ruta_facturas, ruta_plantilla_base, directorio, **parametros):
+    """
+    Una Ficha 2.2 por colaboración (con sus facturas). Produce (nombre de
+    archivo, ruta) con la ficha escrita en `directorio`. `parametros` son los
+    de generar_ficha_2_2 (cliente_nombre, cliente_nif, anio).
+    """
+    facturas = IndiceFacturas(df_facturas)
+
+    def tablas(i):
+        entidad = df_colab.iloc[i].get("Razón social", "")
+        return {
+            ruta_colaboraciones: df_colab.iloc[[i]].reset_index(drop=True),
+            ruta_facturas: df_facturas.iloc[facturas.posiciones(entidad)],
+        }
+
+    filas = (
+        (f"{i + 1:03d}_{_nombre_archivo(get_value_or_default(df_colab, i, 'Razón social'))}.docx", tablas(i))
+        for i in range(len(df_colab))
+    )
+    return _una_a_una(filas, lambda lector, ruta: generar_ficha_2_2(
+        ruta_colaboraciones, ruta_facturas, ruta_plantilla_base, ruta, lector=lector, **parametros
+    ), directorio)
+
+
 def fusionar_y_guardar(doc_generado, ruta_plantilla, ruta_salida):
-    """Función auxiliar para fusionar con plantilla y guardar."""
+    """
+    Función auxiliar para fusionar con plantilla y guardar. La plantilla sale
+    de la caché de plantillas (ya abierta y con sus tablas en "Table Grid"),
+    así que solo hay que dar estilo a las tablas generadas.
+    """
     if os.path.exists(ruta_plantilla):
-        doc_base = Document(ruta_plantilla)
+        doc_base = plantillas.copia(ruta_plantilla)
         # Sin salto de página forzado (control manual desde Word)
     else:
         print("⚠️ No se encontró plantilla base, usando generado.")
-        doc_base = doc_generado
-        doc_generado = None
-
-    if doc_generado:
-        # Añadir contenido generado al final del base
-        for element in doc_generado.element.body:
-            doc_base.element.body.append(element)
-    
-    # Asegurar bordes en todas las tablas del documento final
-    for table in doc_base.tables: 
-        table.style = "Table Grid"
-    
-    doc_base.save(ruta_salida)
\ No newline at end of file
+        for table in doc_generado.tables:
+            table.style = "Table Grid"
+        doc_generado.save(ruta_salida)
+        return
+
+    # Añadir contenido generado al final del base, con bordes en sus tablas
+    estilo_tablas = plantillas.estilo_tablas(ruta_plantilla)
+    for element in doc_generado.element.body:
+        if element.tag == qn('w:tbl'):
+            element.tblStyle_val = estilo_tablas
+        doc_base.element.body.append(element)
+
+    doc_base.save(ruta_salida)
@@ -0,0 +1,93 @@
+import os
+import json
+import threading
+from datetime import datetime
+
+try:
+    from .salidas import escritura_atomica
+except ImportError:
+    from salidas import escritura_atomica
+
+# Estado de cada proyecto en un lote de fichas (ver /download-fichas-lote)
+GENERADO = "generado"
+SIN_CAMBIOS = "sin_cambios"
+SIN_DATOS = "sin_datos"
+ERROR = "error"
+
+
+class RegistroLotes:
+    """
+    Firma de las entradas (JSONs, plantillas, parámetros y versión del
+    generador; ver CacheFichas.clave) con la que se generó por última vez
+    cada proyecto en un lote, y la clave en la caché de fichas de cada ficha
+    generada. Un proyecto cuya firma no ha cambiado desde el último lote no
+    se vuelve a generar: sus fichas se sirven desde la caché.
+
+    Se guarda en un único JSON
+    ({"Cliente_<nif>/<proyecto>": {"firma", "fecha", "fichas": {nombre: clave}}})
+    que se reescribe de una vez al registrar un lote terminado.
+
+    Uso:
+        registro = RegistroLotes(os.path.join(CACHE_DIR, "lotes.json"))
+        if registro.sin_cambios("Cliente_B1/PROY", firma):
+            claves = registro.fichas("Cliente_B1/PROY")  # servirlas desde la caché
+        registro.registrar({"Cliente_B1/PROY": firma}, {"Cliente_B1/PROY": {"Ficha_2_1.docx": clave}})
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._firmas = self._cargar()
+
+    def _cargar(self):
+        if not os.path.exists(self.ruta):
+            return {}
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Registro de lotes ilegible ({e}); se empieza de cero")
+            return {}
+
+    def firma(self, proyecto):
+        """Firma del último lote del proyecto, o None si nunca ha entrado en uno."""
+        with self._lock:
+            return (self._firmas.get(proyecto) or {}).get("firma")
+
+    def sin_cambios(self, proyecto, firma):
+        return firma is not None and self.firma(proyecto) == firma
+
+    def fichas(self, proyecto):
+        """{nombre: clave en la caché de fichas} del último lote del proyecto, o None si no se conocen."""
+        with self._lock:
+            return (self._firmas.get(proyecto) or {}).get("fichas")
+
+    def registrar(self, firmas, fichas=None):
+        """
+        Guarda las firmas ({proyecto: firma}) de los proyectos generados en un
+        lote y, si se indican, las claves de sus fichas ({proyecto: {nombre: clave}}).
+        """
+        if not firmas:
+            return
+        fecha = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            for proyecto, firma in firmas.items():
+                entrada = {"firma": firma, "fecha": fecha}
+                if fichas is not None:
+                    entrada["fichas"] = fichas.get(proyecto, {})
+                self._firmas[proyecto] = entrada
+            self._guardar()
+
+    def olvidar(self, prefijo):
+        """Descarta las firmas de un proyecto o, con "Cliente_<nif>/", de todo un cliente."""
+        with self._lock:
+            borrar = [p for p in self._firmas if p == prefijo or (prefijo.endswith("/") and p.startswith(prefijo))]
+            for proyecto in borrar:
+                del self._firmas[proyecto]
+            if borrar:
+                self._guardar()
+
+    def _guardar(self):
+        with escritura_atomica(self.ruta) as temporal:
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(self._firmas, f, ensure_ascii=False, indent=2)
@@ -4,8 +4,32 @@ import re
 import json
 import warnings
 
+try:
+    from .libro_anexo import LibroAnexo, NAN
+    from .almacen_tablas import almacen, ruta_parquet
+except ImportError:
+    from libro_anexo import LibroAnexo, NAN
+    from almacen_tablas import almacen, ruta_parquet
+
 warnings.filterwarnings("ignore")
 
+# Versión del extractor: subirla cuando cambie el formato o la lógica de las
+# tablas generadas, para invalidar los resultados guardados en la caché de anexos.
+VERSION_EXTRACTOR = "2.1"
+
+# Tablas que genera procesar_anexo (se guardan en el almacén, ver almacen_tablas)
+TABLAS_SALIDA = [
+    "Excel_Personal_2.1.json",
+    "Excel_Colaboraciones_2.2.json",
+    "Excel_Facturas_2.2.json",
+]
+
+# Archivos que procesar_anexo deja en el directorio de salida
+ARCHIVOS_SALIDA = [
+    *(os.path.basename(ruta_parquet(t)) if almacen.es_tabla(t) else t for t in TABLAS_SALIDA),
+    "metadata.json",
+]
+
 def separar_nombre_completo(nombre_completo):
     """Separa nombre y apellidos según la lógica requerida."""
     partes = str(nombre_completo).strip().split()
@@ -23,7 +47,37 @@ def buscar_archivo_anexo(input_dir):
             return os.path.join(input_dir, file)
     return None
 
-def extraer_anio_fiscal_clean(archivo_anexo):
+def celda(fila, idx):
+    """Valor de la columna `idx` de una fila leída en streaming (NaN si no llega)."""
+    return fila[idx] if 0 <= idx < len(fila) else NAN
+
+def cabecera_multinivel(filas_cabecera, ancho):
+    """
+    Construye las columnas (nivel_0, nivel_1, ...) de una cabecera de varias
+    filas igual que pd.read_excel(header=[...]): las celdas vacías heredan el
+    valor de su izquierda dentro del mismo grupo (celdas combinadas).
+    """
+    filas = [list(f) + [""] * (ancho - len(f)) for f in filas_cabecera]
+    control = [True] * ancho
+    for fila in filas:
+        fila[:] = ["" if pd.isna(v) else v for v in fila]
+        if not fila:
+            continue
+        ultimo = fila[0]
+        for i in range(1, ancho):
+            if not control[i]:
+                ultimo = fila[i]
+            if fila[i] == "":
+                fila[i] = ultimo
+            else:
+                control[i] = False
+                ultimo = fila[i]
+    return [
+        tuple(fila[i] if fila[i] != "" else f"Unnamed: {i}_level_{nivel}" for nivel, fila in enumerate(filas))
+        for i in range(ancho)
+    ]
+
+def extraer_anio_fiscal_clean(archivo_anexo, libro=None):
     """
     Extrae el año fiscal de forma clean desde la pestaña 'Datos Solicitud'.
     
@@ -33,15 +87,21 @@ def extraer_anio_fiscal_clean(archivo_anexo):
     
     Args:
         archivo_anexo: Path al archivo Excel
+        libro: LibroAnexo ya abierto (opcional). Si se pasa, se reutiliza
+               en lugar de volver a leer el archivo.
     
     Returns:
         anio_fiscal (int): Año fiscal extraído, o 2024 como fallback
     """
     try:
-        df = pd.read_excel(archivo_anexo, sheet_name="Datos solicitud", header=None)
+        if libro is not None:
+            filas = libro.tabla("Datos solicitud")
+        else:
+            with LibroAnexo(archivo_anexo) as libro_propio:
+                filas = libro_propio.tabla("Datos solicitud")
         
         # Buscar la fila que contiene "EJERCICIO FISCAL"
-        for i, row in df.iterrows():
+        for row in filas:
             # Convertir fila a strings y buscar patrón
             row_str = [str(cell).upper() if pd.notna(cell) else "" for cell in row]
             
@@ -52,7 +112,7 @@ def extraer_anio_fiscal_clean(archivo_anexo):
                     # La fecha suele estar 2-5 columnas a la derecha
                     for offset in range(2, 8):  # Expandido a 8 para más flexibilidad
                         if j + offset < len(row):
-                            valor = str(row.iloc[j + offset]).strip()
+                            valor = str(row[j + offset]).strip()
                             
                             # Buscar formatos: dd/mm/aaaa o aaaa-mm-dd o aaaa-mm-dd hh:mm:ss
                             # Formato 1: dd/mm/aaaa
@@ -130,19 +190,27 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
     print(f"📖 Leyendo: {os.path.basename(archivo_anexo)}")
     print(f"📁 Ruta completa: {archivo_anexo}")
 
+    # Abrimos el libro una sola vez: todas las etapas leen sus hojas de aquí
+    try:
+        libro = LibroAnexo(archivo_anexo)
+    except Exception as e:
+        # Sin libro no hay nada que extraer: se propaga el error de apertura tal cual
+        print(f"❌ ERROR: No se pudo abrir el libro: {e}")
+        raise
+
     # 1. DETECTAR DATOS GENERALES (AÑO, NIF, RAZÓN SOCIAL)
     # Extraer año fiscal de forma clean desde Datos Solicitud
-    anio_fiscal = extraer_anio_fiscal_clean(archivo_anexo)
+    anio_fiscal = extraer_anio_fiscal_clean(archivo_anexo, libro=libro)
     nif_solicitante = ""
     entidad_solicitante = ""  # Sin valor por defecto, se dejará vacío si no se encuentra
     
     try:
-        df_datos = pd.read_excel(archivo_anexo, sheet_name="Datos solicitud", header=None)
+        filas_datos = libro.tabla("Datos solicitud")
         
-        print(f"   📖 Leyendo hoja 'Datos solicitud' ({len(df_datos)} filas)")
+        print(f"   📖 Leyendo hoja 'Datos solicitud' ({len(filas_datos)} filas)")
         
         # Convertir a string y buscar patrones
-        for i, row in df_datos.iterrows():
+        for row in filas_datos:
             # Convertir cada celda a string de forma segura, manejando NaN
             row_str = [str(cell).upper() if pd.notna(cell) else "" for cell in row]
             row_original = [str(cell) if pd.notna(cell) else "" for cell in row]
@@ -196,9 +264,14 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
     # ==========================================
     try:
         print("👤 Procesando Personal...")
-        df_p = pd.read_excel(archivo_anexo, sheet_name="Personal", header=[12, 13])
+        # Solo se leen las filas hasta la cabecera (filas 13 y 14 de Excel)
+        filas_cabecera = list(libro.filas("Personal", hasta=14))
+        if len(filas_cabecera) < 14:
+            raise ValueError(f"La hoja Personal solo tiene {len(filas_cabecera)} filas, se esperaba cabecera en filas 13-14")
+        ancho_cabecera = max(len(f) for f in filas_cabecera)
+        columnas_p = cabecera_multinivel(filas_cabecera[12:14], ancho_cabecera)
         
-        print(f"   Dimensiones originales: {df_p.shape[0]} filas x {df_p.shape[1]} columnas")
+        print(f"   Columnas en cabecera: {len(columnas_p)}")
         print(f"   Año fiscal objetivo: {anio_fiscal}")
         
         # --- PASO 1: ENCONTRAR COLUMNAS ---
@@ -206,10 +279,11 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
         col_titulacion = None
         col_horas_it = None
         col_coste_it = None
+        idx_columnas = {}
         
         print(f"   Buscando columnas de interés...")
         
-        for col in df_p.columns:
+        for idx_col, col in enumerate(columnas_p):
             try:
                 # Extraer nivel 0 (año o nombre de campo) y nivel 1 (concepto)
                 nivel_0 = str(col[0]).strip() if pd.notna(col[0]) else ""
@@ -222,11 +296,13 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
                 # Buscar columna de Nombre (sin importar el nivel)
                 if "nombre" in nivel_0_lower or "nombre" in nivel_1_lower:
                     col_nombre = col
+                    idx_columnas["nombre"] = idx_col
                     print(f"      OK - Nombre encontrado: {col}")
                 
                 # Buscar columna de Titulación
                 if "titulación" in nivel_0_lower or "titulacion" in nivel_0_lower:
                     col_titulacion = col
+                    idx_columnas["titulacion"] = idx_col
                     print(f"      OK - Titulación encontrada: {col}")
                 
                 # Buscar columnas del AÑO FISCAL ESPECÍFICO
@@ -236,11 +312,13 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
                         # Buscar Horas IT para este año
                         if "horas" in nivel_1_lower and "it" in nivel_1_lower:
                             col_horas_it = col
+                            idx_columnas["horas_it"] = idx_col
                             print(f"      OK - Horas IT ({anio_fiscal}) encontradas: {col}")
                         
                         # Buscar Coste IT para este año
                         if ("coste" in nivel_1_lower or "gasto" in nivel_1_lower) and "it" in nivel_1_lower:
                             col_coste_it = col
+                            idx_columnas["coste_it"] = idx_col
                             print(f"      OK - Coste IT ({anio_fiscal}) encontrado: {col}")
                 except (ValueError, TypeError):
                     pass
@@ -254,18 +332,42 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
             print(f"   WARN - No se encontró columna 'Nombre'")
         if not col_horas_it or not col_coste_it:
             print(f"   WARN - No se encontraron Horas/Coste IT para año {anio_fiscal}")
-            print(f"      Anos disponibles: {[str(c[0]) for c in df_p.columns if str(c[0]).isdigit()]}")
+            print(f"      Anos disponibles: {[str(c[0]) for c in columnas_p if str(c[0]).isdigit()]}")
         
         # --- PASO 3: EXTRAER Y PROCESAR DATOS ---
         if col_nombre and col_horas_it and col_coste_it:
             print(f"   Extrayendo datos...")
             
+            # Recorrer las filas de datos en streaming guardando solo las columnas necesarias
+            valores = {clave: [] for clave in idx_columnas}
+            ultimas = []  # (ancho de la fila, último valor): para columnas heredadas a la derecha
+            ancho = ancho_cabecera
+            for fila in libro.filas("Personal", desde=15):
+                ancho = max(ancho, len(fila))
+                for clave, idx in idx_columnas.items():
+                    valores[clave].append(celda(fila, idx))
+                ultimas.append((len(fila), fila[-1] if fila else NAN))
+            
+            # Quitar filas vacías del final, como hace pd.read_excel
+            n_filas = len(ultimas)
+            while n_filas and ultimas[n_filas - 1][0] == 0:
+                n_filas -= 1
+            
+            # Si la hoja es más ancha que la cabecera, la última columna de la cabecera
+            # se hereda hacia la derecha y la columna efectiva pasa a ser la última de la hoja
+            if ancho > ancho_cabecera:
+                for clave, idx in idx_columnas.items():
+                    if idx == ancho_cabecera - 1:
+                        valores[clave] = [v if n == ancho else NAN for n, v in ultimas]
+            
+            print(f"   Dimensiones originales: {n_filas} filas x {ancho} columnas")
+            
             # Crear DataFrame con columnas necesarias
             df_res = pd.DataFrame({
-                "nombre_completo": df_p[col_nombre],
-                "titulacion": df_p[col_titulacion] if col_titulacion else "",
-                "horas_it": pd.to_numeric(df_p[col_horas_it], errors='coerce').fillna(0),
-                "coste_it": pd.to_numeric(df_p[col_coste_it], errors='coerce').fillna(0)
+                "nombre_completo": valores["nombre"][:n_filas],
+                "titulacion": valores["titulacion"][:n_filas] if col_titulacion else "",
+                "horas_it": pd.to_numeric(pd.Series(valores["horas_it"][:n_filas]), errors='coerce').fillna(0),
+                "coste_it": pd.to_numeric(pd.Series(valores["coste_it"][:n_filas]), errors='coerce').fillna(0)
             })
             
             print(f"   Registros antes de filtrar: {len(df_res)}")
@@ -310,14 +412,14 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
                             "EMPRESA 3", "PERIODO 3", "PUESTO 3"]:
                     df_final_p[col] = ""
                 
-                # Guardar JSON
+                # Guardar la tabla
                 json_path_p = os.path.join(output_dir, "Excel_Personal_2.1.json")
-                df_final_p.to_json(json_path_p, orient='records', force_ascii=False, date_format='iso')
+                almacen.guardar(json_path_p, df_final_p)
                 print(f"   OK - Personal generado: {len(df_final_p)} personas")
-                print(f"   Archivo: {os.path.basename(json_path_p)}")
-                print(f"   ✓ Ruta completa: {json_path_p}")
-                print(f"   ✓ Existe: {os.path.exists(json_path_p)}")
-                print(f"   ✓ Tamaño: {os.path.getsize(json_path_p)} bytes")
+                print(f"   Archivo: {os.path.basename(almacen.archivo(json_path_p))}")
+                print(f"   ✓ Ruta completa: {almacen.archivo(json_path_p)}")
+                print(f"   ✓ Existe: {almacen.existe(json_path_p)}")
+                print(f"   ✓ Tamaño: {os.path.getsize(almacen.archivo(json_path_p))} bytes")
             else:
                 print(f"   WARN - No hay registros validos con datos en el anio {anio_fiscal}")
                 # Crear archivo vacío
@@ -331,8 +433,8 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
                     "EMPRESA 3", "PERIODO 3", "PUESTO 3"
                 ])
                 json_path_p = os.path.join(output_dir, "Excel_Personal_2.1.json")
-                df_final_p.to_json(json_path_p, orient='records', force_ascii=False, date_format='iso')
-                print(f"   Archivo vacio creado: {os.path.basename(json_path_p)}")
+                almacen.guardar(json_path_p, df_final_p)
+                print(f"   Archivo vacio creado: {os.path.basename(almacen.archivo(json_path_p))}")
         else:
             print(f"   WARN - No se encontraron las columnas necesarias para procesar Personal")
             # Crear archivo vacío con estructura
@@ -346,8 +448,8 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
                 "EMPRESA 3", "PERIODO 3", "PUESTO 3"
             ])
             json_path_p = os.path.join(output_dir, "Excel_Personal_2.1.json")
-            df_final_p.to_json(json_path_p, orient='records', force_ascii=False, date_format='iso')
-            print(f"   Archivo vacio creado: {os.path.basename(json_path_p)}")
+            almacen.guardar(json_path_p, df_final_p)
+            print(f"   Archivo vacio creado: {os.path.basename(almacen.archivo(json_path_p))}")
 
     except Exception as e:
         print(f"   ERROR - Procesando Personal: {e}")
@@ -365,7 +467,7 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
                 "EMPRESA 3", "PERIODO 3", "PUESTO 3"
             ])
             json_path_p = os.path.join(output_dir, "Excel_Personal_2.1.json")
-            df_final_p.to_json(json_path_p, orient='records', force_ascii=False, date_format='iso')
+            almacen.guardar(json_path_p, df_final_p)
         except:
             pass
 
@@ -378,8 +480,7 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
         
         # Leer todas las hojas disponibles
         try:
-            excel_file = pd.ExcelFile(archivo_anexo)
-            todas_las_hojas = excel_file.sheet_names
+            todas_las_hojas = libro.sheet_names
         except:
             todas_las_hojas = []
         
@@ -402,15 +503,14 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
         for hoja in hojas_externas:
             try:
                 # Saltar si la hoja no existe
-                if hoja not in excel_file.sheet_names:
+                if hoja not in todas_las_hojas:
                     continue
                     
-                df_raw = pd.read_excel(archivo_anexo, sheet_name=hoja, header=None)
-                
                 # Buscar fila de cabecera - FLEXIBLE con múltiples variantes
+                # Solo se leen las 30 primeras filas; si no hay cabecera no se lee el resto
                 fila_head = -1
-                for i, row in df_raw.head(30).iterrows():  # Buscar hasta 30 filas
-                    row_str = " ".join([str(v).lower() for v in row.values if pd.notna(v)])
+                for i, row in enumerate(libro.filas(hoja, hasta=30)):  # Buscar hasta 30 filas
+                    row_str = " ".join([str(v).lower() for v in row if pd.notna(v)])
                     # Palabras clave para detectar encabezado
                     tiene_razon = "razón" in row_str or "razon" in row_str
                     tiene_social = "social" in row_str
@@ -428,8 +528,10 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
                 if fila_head == -1:
                     continue
 
-                fila_anios = df_raw.iloc[fila_head]
-                fila_conceptos = df_raw.iloc[fila_head + 1]
+                # Segunda lectura en streaming desde la cabecera hasta el final de la hoja
+                filas_hoja = libro.filas(hoja, desde=fila_head + 1)
+                fila_anios = next(filas_hoja)
+                fila_conceptos = next(filas_hoja)
                 
                 idx_entidad = -1
                 idx_nif = -1
@@ -475,9 +577,8 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
                                 break
 
                 if idx_entidad != -1 and idx_total_anio != -1:
-                    for i in range(fila_head + 2, len(df_raw)):
-                        row = df_raw.iloc[i]
-                        entidad = str(row[idx_entidad])
+                    for row in filas_hoja:
+                        entidad = str(celda(row, idx_entidad))
                         
                         # --- FILTROS ---
                         if pd.isna(entidad) or entidad.strip() == "" or "nan" in entidad.lower(): 
@@ -486,12 +587,12 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
                             continue
 
                         try:
-                            importe = float(row[idx_total_anio])
+                            importe = float(celda(row, idx_total_anio))
                         except:
                             importe = 0
                             
                         if importe > 0:
-                            nif_proveedor = str(row[idx_nif]) if idx_nif != -1 and pd.notna(row[idx_nif]) else ""
+                            nif_proveedor = str(celda(row, idx_nif)) if idx_nif != -1 and pd.notna(celda(row, idx_nif)) else ""
                             
                             # 1. Crear Colaboración
                             colaboraciones_list.append({
@@ -520,17 +621,17 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
                 # Silenciar errores - es normal si no hay hojas de colaboraciones
                 pass
 
-        # Generar JSONs (vacíos o con datos)
+        # Guardar las tablas (vacías o con datos)
         df_colab = pd.DataFrame(colaboraciones_list).drop_duplicates(subset="Razón social") if colaboraciones_list else pd.DataFrame()
         json_path_colab = os.path.join(output_dir, "Excel_Colaboraciones_2.2.json")
-        df_colab.to_json(json_path_colab, orient='records', force_ascii=False, date_format='iso')
+        almacen.guardar(json_path_colab, df_colab)
         
         if len(df_colab) > 0:
             print(f"   ✅ Colaboraciones generado: {len(df_colab)} entidades")
         
         df_fact = pd.DataFrame(facturas_list) if facturas_list else pd.DataFrame()
         json_path_fact = os.path.join(output_dir, "Excel_Facturas_2.2.json")
-        df_fact.to_json(json_path_fact, orient='records', force_ascii=False, date_format='iso')
+        almacen.guardar(json_path_fact, df_fact)
         
         if len(df_fact) > 0:
             print(f"   ✅ Facturas generado: {len(df_fact)} registros")
@@ -539,16 +640,16 @@ def procesar_anexo(archivo_especifico=None, cliente_nif=None, proyecto_acronimo=
         print(f"   ❌ Error General en Colaboraciones: {e}")
         import traceback
         print(traceback.format_exc())
+
+    libro.cerrar()
     
     print("\n--- 📋 RESUMEN FINAL ---")
     print(f"📁 Directorio de salida: {output_dir}")
-    output_files = ['Excel_Personal_2.1.json', 'Excel_Colaboraciones_2.2.json', 'Excel_Facturas_2.2.json']
-    for out_file in output_files:
+    for out_file in TABLAS_SALIDA:
         out_path = os.path.join(output_dir, out_file)
-        if os.path.exists(out_path):
-            file_size = os.path.getsize(out_path)
-            with open(out_path, encoding='utf-8') as f:
-                num_records = len(f.read().strip().split('},'))
+        if almacen.existe(out_path):
+            file_size = os.path.getsize(almacen.archivo(out_path))
+            num_records = almacen.contar(out_path)
             print(f"   ✅ {out_file} - {num_records} registros ({file_size} bytes)")
         else:
             print(f"   ❌ {out_file} NO ENCONTRADO")
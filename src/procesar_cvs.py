@@ -2,9 +2,30 @@ import pandas as pd
 import pdfplumber
 import os
 import re
+import time
 import unicodedata
+import multiprocessing.connection
+from collections import defaultdict
 from difflib import SequenceMatcher
 
+try:
+    from .cache_cvs import CacheExperiencias
+    from .cola_trabajos import CONTEXTO_PROCESOS
+    from .almacen_tablas import almacen
+except ImportError:
+    from cache_cvs import CacheExperiencias
+    from cola_trabajos import CONTEXTO_PROCESOS
+    from almacen_tablas import almacen
+
+# Versión del parser de CVs: subirla al cambiar extraer_experiencia_pdf para
+# invalidar las experiencias guardadas en la caché de CVs.
+VERSION_PARSER_CV = "1.0"
+
+# Extracción en paralelo: nº de procesos (CV_WORKERS, por defecto nº de CPUs)
+# y tiempo máximo por PDF antes de darlo por perdido.
+CV_WORKERS = int(os.environ.get("CV_WORKERS", "0")) or (os.cpu_count() or 1)
+TIMEOUT_CV_SEGUNDOS = float(os.environ.get("CV_TIMEOUT", "60"))
+
 def normalizar_texto(texto):
     if not isinstance(texto, str): return ""
     return unicodedata.normalize('NFKD', texto.lower()).encode('ASCII', 'ignore').decode('utf-8').strip()
@@ -71,33 +92,41 @@ def es_ubicacion(texto):
         if c in texto_lower: return True
     return False
 
-def extraer_experiencia_pdf(ruta_pdf):
-    experiencias = []
-    
-    try:
-        with pdfplumber.open(ruta_pdf) as pdf:
-            texto_completo = ""
-            for page in pdf.pages:
-                width = page.width
-                height = page.height
-                try:
-                    left_crop = page.crop((width * 0.3, 0, width, height))
-                    texto_pag = left_crop.extract_text()
-                except:
-                    texto_pag = page.extract_text()
-                
-                if texto_pag: texto_completo += texto_pag + "\n"
-    except Exception as e:
-        print(f"❌ Error PDF: {e}")
-        return []
+PATRON_INICIO_EXPERIENCIA = r'\n(Experiencia|Experience)\n'
+PATRON_FIN_EXPERIENCIA = r'\n(Educación|Education|Licencias|Aptitudes)'
+
+def textos_paginas(pdf):
+    """
+    Genera perezosamente el texto de cada página, sin la columna izquierda
+    (30% del ancho) donde los CVs de LinkedIn ponen contacto y aptitudes.
+    """
+    for page in pdf.pages:
+        width = page.width
+        height = page.height
+        try:
+            left_crop = page.crop((width * 0.3, 0, width, height))
+            texto_pag = left_crop.extract_text()
+        except:
+            texto_pag = page.extract_text()
+        yield texto_pag
 
-    match = re.search(r'\n(Experiencia|Experience)\n', texto_completo, re.IGNORECASE)
+def seccion_experiencia(texto_completo):
+    """
+    Devuelve (texto de la sección Experiencia, cerrada) o (None, False) si no
+    hay sección. `cerrada` indica que se encontró el encabezado que la termina.
+    """
+    match = re.search(PATRON_INICIO_EXPERIENCIA, texto_completo, re.IGNORECASE)
     if not match: match = re.search(r'(Experiencia|Experience)', texto_completo, re.IGNORECASE)
-    if not match: return []
+    if not match: return None, False
     
     texto = texto_completo[match.end():]
-    match_fin = re.search(r'\n(Educación|Education|Licencias|Aptitudes)', texto, re.IGNORECASE)
+    match_fin = re.search(PATRON_FIN_EXPERIENCIA, texto, re.IGNORECASE)
     if match_fin: texto = texto[:match_fin.start()]
+    return texto, bool(match_fin)
+
+def parsear_experiencias(texto):
+    """Extrae hasta 3 experiencias (Empresa, Puesto, Periodo) del texto de la sección."""
+    experiencias = []
 
     lines = [l.strip() for l in texto.split('\n') if l.strip() and not es_basura(l.strip())]
 
@@ -152,7 +181,315 @@ def extraer_experiencia_pdf(ruta_pdf):
 
     return experiencias
 
-def procesar_cvs(cliente_nif=None, proyecto_acronimo=None):
+def extraer_experiencia_pdf(ruta_pdf, completo=False):
+    """
+    Extrae hasta 3 experiencias de un CV en PDF.
+
+    Por defecto lee las páginas una a una y deja de leer en cuanto la sección
+    Experiencia está cerrada (aparece Educación/Licencias/Aptitudes) o ya
+    contiene 3 experiencias: el resultado es el mismo que leyendo el documento
+    entero (completo=True), porque lo que queda por leer no puede cambiarlo.
+    """
+    try:
+        with pdfplumber.open(ruta_pdf) as pdf:
+            texto_completo = ""
+            for texto_pag in textos_paginas(pdf):
+                if texto_pag: texto_completo += texto_pag + "\n"
+                if completo:
+                    continue
+                # Solo con el encabezado en línea propia: la búsqueda laxa
+                # ('Experience' en cualquier parte) depende del documento entero
+                if not re.search(PATRON_INICIO_EXPERIENCIA, texto_completo, re.IGNORECASE):
+                    continue
+                texto, cerrada = seccion_experiencia(texto_completo)
+                if cerrada or len(parsear_experiencias(texto)) >= 3:
+                    break
+    except Exception as e:
+        print(f"❌ Error PDF: {e}")
+        return []
+
+    texto, _ = seccion_experiencia(texto_completo)
+    if texto is None: return []
+    return parsear_experiencias(texto)
+
+def trigramas(texto):
+    """Conjunto de trigramas (subcadenas de 3 caracteres) de un texto."""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def puntuar_cv(nombre_norm, nombre_parts, pdf, pdf_norm):
+    """
+    Puntúa un CV para una persona (mismas reglas de siempre):
+      - +1 por cada parte del nombre (>2 letras) contenida en el archivo
+      - +10 si la similitud global es >= 80%
+      - +5 si coincide alguno de los dos apellidos
+    """
+    # Estrategia 1: Coincidencias exactas de partes
+    coincidencias = sum(1 for p in nombre_parts if p in pdf_norm and len(p)>2)
+
+    # Estrategia 2: Similitud general (80%+)
+    similitud_total = similitud(nombre_norm, pdf_norm)
+
+    # Estrategia 3: Al menos un apellido coincide
+    apellido1 = nombre_parts[-1] if len(nombre_parts) > 0 else ""
+    apellido2 = nombre_parts[-2] if len(nombre_parts) > 1 else ""
+    apellido_coincide = (apellido1 in pdf_norm and len(apellido1) > 2) or \
+                         (apellido2 in pdf_norm and len(apellido2) > 2)
+
+    # Score final
+    score = coincidencias
+    if similitud_total >= 0.8:
+        score += 10  # Bonus por similitud alta
+    if apellido_coincide:
+        score += 5   # Bonus por apellido coincidente
+
+    return {
+        'archivo': pdf,
+        'coincidencias': coincidencias,
+        'similitud': similitud_total,
+        'score': score,
+        'partes_pdf': pdf_norm.split()
+    }
+
+class IndiceCVs:
+    """
+    Índice invertido de trigramas sobre los nombres de archivo de los CVs.
+
+    Cada nombre se normaliza una sola vez. Para una persona solo se puntúan
+    los archivos que contienen alguno de sus apellidos (las dos últimas
+    partes del nombre, >2 letras, como en puntuar_cv): el índice da los
+    archivos que tienen todos los trigramas del apellido y se confirma con
+    una búsqueda de subcadena.
+    """
+
+    def __init__(self, archivos):
+        self.archivos = list(archivos)
+        self.normalizados = [normalizar_texto(a) for a in self.archivos]
+        self._indice = defaultdict(set)
+        for i, norm in enumerate(self.normalizados):
+            for t in trigramas(norm):
+                self._indice[t].add(i)
+
+    def contienen(self, parte):
+        """Posiciones de los archivos cuyo nombre normalizado contiene `parte`."""
+        listas = sorted((self._indice.get(t, set()) for t in trigramas(parte)), key=len)
+        if not listas:
+            return set()
+        posibles = set(listas[0]).intersection(*listas[1:])
+        return {i for i in posibles if parte in self.normalizados[i]}
+
+    def candidatos(self, nombre_norm):
+        """Candidatos puntuados para una persona, en el orden de los archivos."""
+        nombre_parts = nombre_norm.split()
+        posiciones = set()
+        for parte in nombre_parts[-2:]:
+            if len(parte) > 2:
+                posiciones |= self.contienen(parte)
+        return [
+            puntuar_cv(nombre_norm, nombre_parts, self.archivos[i], self.normalizados[i])
+            for i in sorted(posiciones)
+        ]
+
+def emparejar_cvs(nombres, archivos_cv):
+    """
+    Empareja cada nombre con un CV (uno a uno) usando IndiceCVs.
+
+    Devuelve una lista, en el orden de `nombres`, de dicts con
+    'archivo' (o None), 'score' y 'candidatos' (todos los puntuados).
+    Los pares con score >= 2 se asignan de mayor a menor score, así que un
+    mismo PDF nunca se da a dos personas; a igualdad gana la primera fila y,
+    dentro de ella, el primer archivo.
+    """
+    indice = IndiceCVs(archivos_cv)
+    resultados = []
+    pares = []
+    for fila, nombre in enumerate(nombres):
+        candidatos = indice.candidatos(normalizar_texto(nombre))
+        resultados.append({'archivo': None, 'score': 0, 'candidatos': candidatos})
+        for orden, c in enumerate(candidatos):
+            if c['score'] >= 2:
+                pares.append((-c['score'], fila, orden, c['archivo']))
+
+    usados = set()
+    for menos_score, fila, _, archivo in sorted(pares):
+        if resultados[fila]['archivo'] is None and archivo not in usados:
+            resultados[fila]['archivo'] = archivo
+            resultados[fila]['score'] = -menos_score
+            usados.add(archivo)
+    return resultados
+
+def _trabajador_cvs(conexion):
+    """Proceso del lote: avisa de que está listo y extrae los PDFs que le llegan hasta recibir None."""
+    conexion.send(None)
+    try:
+        for ruta in iter(conexion.recv, None):
+            try:
+                conexion.send((True, extraer_experiencia_pdf(ruta)))
+            except Exception as e:
+                conexion.send((False, str(e)))
+    except EOFError:  # el lote se ha cerrado
+        pass
+
+class _ProcesoCV:
+    """Un proceso del lote y el PDF que tiene asignado, con su hora límite."""
+
+    def __init__(self):
+        self.conexion, extremo = CONTEXTO_PROCESOS.Pipe()
+        self.proceso = CONTEXTO_PROCESOS.Process(target=_trabajador_cvs, args=(extremo,), daemon=True)
+        self.proceso.start()
+        extremo.close()
+        self.listo = False
+        self.ruta = None
+        self.limite = None
+
+    def asignar(self, ruta, timeout):
+        self.conexion.send(ruta)
+        self.ruta, self.limite = ruta, time.monotonic() + timeout
+
+    def liberar(self):
+        ruta = self.ruta
+        self.ruta = self.limite = None
+        return ruta
+
+    def cerrar(self, matar=False):
+        if matar:
+            self.proceso.terminate()
+        else:
+            try:
+                self.conexion.send(None)
+            except OSError:
+                pass
+        self.proceso.join(5)
+        if self.proceso.is_alive():
+            self.proceso.kill()
+            self.proceso.join()
+        self.conexion.close()
+
+def _extraer_lote(rutas, workers, timeout):
+    """
+    Extrae los PDFs de `rutas`, en paralelo si workers > 1. Devuelve
+    (resultados, fallidos): fallidos son las rutas que agotaron el timeout o
+    rompieron su proceso, cuyo resultado vacío no debe guardarse en caché.
+
+    Cada proceso lleva un PDF cada vez y el timeout cuenta desde que se le
+    asigna: al agotarse (o si el proceso muere) se mata ese proceso y se
+    arranca otro en su lugar para los PDFs que quedan.
+    """
+    workers = min(workers or CV_WORKERS, len(rutas))
+    if workers <= 1:
+        return {ruta: extraer_experiencia_pdf(ruta) for ruta in rutas}, set()
+
+    print(f"   ⚙️ Extrayendo {len(rutas)} CVs con {workers} procesos (timeout {timeout:.0f}s/CV)")
+    resultados = {}
+    fallidos = set()
+    pendientes = list(reversed(rutas))
+    procesos = [_ProcesoCV() for _ in range(workers)]
+
+    def fallo(proceso, mensaje):
+        ruta = proceso.liberar()
+        print(f"   {mensaje} {os.path.basename(ruta)}: se omite")
+        resultados[ruta] = []
+        fallidos.add(ruta)
+        proceso.cerrar(matar=True)
+        return _ProcesoCV() if pendientes else None
+
+    try:
+        while len(resultados) < len(rutas):
+            for proceso in procesos:
+                if proceso.listo and proceso.ruta is None and pendientes:
+                    proceso.asignar(pendientes.pop(), timeout)
+            ocupados = [p for p in procesos if p.ruta is not None]
+            espera = max(0.0, min(p.limite for p in ocupados) - time.monotonic()) if ocupados else None
+            listos = multiprocessing.connection.wait(
+                [p.conexion for p in procesos] + [p.proceso.sentinel for p in procesos], espera
+            )
+            for n, proceso in enumerate(procesos):
+                if proceso.conexion in listos:
+                    try:
+                        mensaje = proceso.conexion.recv()
+                    except EOFError:
+                        mensaje = None
+                        if not proceso.listo:
+                            raise RuntimeError("Un proceso de extracción de CVs terminó al arrancar")
+                        if proceso.ruta is None:
+                            proceso.cerrar(matar=True)
+                            procesos[n] = _ProcesoCV() if pendientes else None
+                            continue
+                    if proceso.ruta is None:
+                        proceso.listo = True
+                    elif mensaje is None:
+                        procesos[n] = fallo(proceso, "❌ Se cayó el proceso extrayendo")
+                    else:
+                        ok, valor = mensaje
+                        ruta = proceso.liberar()
+                        resultados[ruta] = valor if ok else []
+                        if not ok:
+                            print(f"   ❌ Error extrayendo {os.path.basename(ruta)}: {valor}")
+                            fallidos.add(ruta)
+                elif proceso.ruta is not None and (proceso.proceso.sentinel in listos or time.monotonic() >= proceso.limite):
+                    if proceso.proceso.sentinel in listos:
+                        procesos[n] = fallo(proceso, "❌ Se cayó el proceso extrayendo")
+                    else:
+                        procesos[n] = fallo(proceso, "⏱️ Timeout extrayendo")
+            procesos = [p for p in procesos if p is not None]
+    finally:
+        for proceso in procesos:
+            proceso.cerrar(matar=proceso.ruta is not None)
+    return resultados, fallidos
+
+def extraer_experiencias(rutas_pdf, workers=None, timeout=TIMEOUT_CV_SEGUNDOS, cache=None):
+    """
+    Ejecuta extraer_experiencia_pdf sobre varios PDFs y devuelve un dict
+    {ruta: experiencias}, con las claves en el mismo orden que `rutas_pdf`.
+
+    Con `cache` (CacheExperiencias) solo se abren con pdfplumber los PDFs
+    nuevos o modificados; el resto se sirve desde disco.
+
+    Con workers > 1 los PDFs se reparten entre procesos propios del lote
+    (pdfplumber es CPU-bound). Cada PDF tiene como máximo `timeout` segundos
+    desde que empieza: un PDF que se cuelga o rompe su proceso se registra sin
+    experiencias y no bloquea al resto del lote.
+    """
+    rutas = list(dict.fromkeys(rutas_pdf))
+    resultados = {}
+    claves = {}
+    pendientes = rutas
+    if cache is not None:
+        pendientes = []
+        for ruta in rutas:
+            claves[ruta] = cache.clave(ruta)
+            experiencias = cache.obtener(claves[ruta])
+            if experiencias is None:
+                pendientes.append(ruta)
+            else:
+                resultados[ruta] = experiencias
+        print(f"   ♻️ Cache CVs: {len(rutas) - len(pendientes)} reutilizados, {len(pendientes)} por extraer")
+
+    if pendientes:
+        extraidos, fallidos = _extraer_lote(pendientes, workers, timeout)
+        resultados.update(extraidos)
+        if cache is not None:
+            for ruta in pendientes:
+                if ruta not in fallidos:
+                    cache.guardar(claves[ruta], extraidos[ruta])
+
+    return {ruta: resultados[ruta] for ruta in rutas}
+
+def procesar_cvs(cliente_nif=None, proyecto_acronimo=None, workers=None, timeout_por_cv=TIMEOUT_CV_SEGUNDOS,
+                 usar_cache=True, progreso=None, cache=None):
+    """
+    Empareja cada persona de la tabla de Personal con su CV en PDF y rellena
+    EMPRESA/PUESTO/PERIODO 1-3 y 'Puesto actual'.
+
+    Primero se emparejan todos los perfiles; después se extraen los PDFs
+    emparejados (en paralelo si workers > 1, ver extraer_experiencias) y los
+    resultados se vuelcan en el DataFrame en el orden de sus filas.
+    Con usar_cache, los PDFs ya extraídos se leen de `cache` (CacheExperiencias;
+    por defecto, una sobre cache/cvs/).
+    progreso(porcentaje, mensaje, cancelable=True), si se indica (p. ej.
+    Trabajo.avanzar), se llama entre etapas; antes de guardar, con
+    cancelable=False.
+    """
+    progreso = progreso or (lambda *args, **kwargs: None)
     print("\n--- 🕵️‍♂️ PROCESANDO CVs (CON ACTUALIZACIÓN DE PUESTO ACTUAL) ---")
     
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -214,16 +551,16 @@ def procesar_cvs(cliente_nif=None, proyecto_acronimo=None):
         return
 
     # Verificar si existe Excel Personal
-    if not (os.path.exists(EXCEL_PERSONAL_XLSX) or os.path.exists(EXCEL_PERSONAL_JSON)):
+    if not (os.path.exists(EXCEL_PERSONAL_XLSX) or almacen.existe(EXCEL_PERSONAL_JSON)):
         print(f"❌ NO EXISTE Excel Personal en:")
         print(f"   - {EXCEL_PERSONAL_XLSX}")
         print(f"   - {EXCEL_PERSONAL_JSON}")
         return
 
-    # Leer JSON si existe, si no leer xlsx
-    if os.path.exists(EXCEL_PERSONAL_JSON):
-        print(f"✅ Leyendo JSON: {EXCEL_PERSONAL_JSON}")
-        df = pd.read_json(EXCEL_PERSONAL_JSON)
+    # Leer la tabla del almacén si existe, si no leer xlsx
+    if almacen.existe(EXCEL_PERSONAL_JSON):
+        print(f"✅ Leyendo tabla: {almacen.archivo(EXCEL_PERSONAL_JSON)}")
+        df = almacen.leer(EXCEL_PERSONAL_JSON)
         salida_json = True
     else:
         print(f"✅ Leyendo XLSX: {EXCEL_PERSONAL_XLSX}")
@@ -248,55 +585,21 @@ def procesar_cvs(cliente_nif=None, proyecto_acronimo=None):
 
     archivos_cv = [f for f in archivos_cv_encontrados if f.lower().endswith('.pdf')]
     encontrados = 0
+    asignaciones = []  # (idx, pdf) en el orden de las filas del DataFrame
 
+    progreso(10, f"Emparejando {len(df)} perfiles con {len(archivos_cv)} CVs")
     print(f"👤 Analizando {len(df)} perfiles...")
     print(f"\n{'NOMBRE EXCEL':<40} | {'CV ENCONTRADO':<40} | {'COINCIDENCIAS':<15}")
     print(f"{'-'*40}-+-{'-'*40}-+-{'-'*15}")
     
-    for idx, row in df.iterrows():
-        nombre_completo = f"{row.get('Nombre', '')} {row.get('Apellidos', '')}"
-        nombre_norm = normalizar_texto(nombre_completo)
-        nombre_parts = nombre_norm.split()
-        pdf_match = None
-        max_score = 0
-        candidatos = []
-        
-        for pdf in archivos_cv:
-            pdf_norm = normalizar_texto(pdf)
-            pdf_parts = pdf_norm.split()
-            
-            # Estrategia 1: Coincidencias exactas de partes
-            coincidencias = sum(1 for p in nombre_parts if p in pdf_norm and len(p)>2)
-            
-            # Estrategia 2: Similitud general (80%+)
-            similitud_total = similitud(nombre_norm, pdf_norm)
-            
-            # Estrategia 3: Al menos un apellido coincide
-            apellido1 = nombre_parts[-1] if len(nombre_parts) > 0 else ""
-            apellido2 = nombre_parts[-2] if len(nombre_parts) > 1 else ""
-            apellido_coincide = (apellido1 in pdf_norm and len(apellido1) > 2) or \
-                                 (apellido2 in pdf_norm and len(apellido2) > 2)
-            
-            # Score final
-            score = coincidencias
-            if similitud_total >= 0.8:
-                score += 10  # Bonus por similitud alta
-            if apellido_coincide:
-                score += 5   # Bonus por apellido coincidente
-            
-            # Registrar candidatos
-            candidatos.append({
-                'archivo': pdf,
-                'coincidencias': coincidencias,
-                'similitud': similitud_total,
-                'score': score,
-                'partes_pdf': pdf_parts
-            })
-            
-            # Si el score es suficientemente alto, es match
-            if score >= 2 and score > max_score:
-                pdf_match = pdf
-                max_score = score
+    nombres = [f"{row.get('Nombre', '')} {row.get('Apellidos', '')}" for _, row in df.iterrows()]
+    emparejamientos = emparejar_cvs(nombres, archivos_cv)
+    asignados = {e['archivo'] for e in emparejamientos if e['archivo']}
+
+    for idx, nombre_completo, emparejamiento in zip(df.index, nombres, emparejamientos):
+        pdf_match = emparejamiento['archivo']
+        max_score = emparejamiento['score']
+        candidatos = emparejamiento['candidatos']
         
         # Mostrar resultado
         resultado = f"{pdf_match if pdf_match else '❌ NO ENCONTRADO':<40}"
@@ -311,36 +614,53 @@ def procesar_cvs(cliente_nif=None, proyecto_acronimo=None):
                 print(f"   💡 Candidatos cercanos (score):")
                 for c in candidatos_ordenados[:3]:
                     if c['score'] > 0:
-                        print(f"      - {c['archivo']}: {int(c['score'])} (coincidencias: {c['coincidencias']}, similitud: {c['similitud']:.0%})")
+                        ya_asignado = " [asignado a otra persona]" if c['archivo'] in asignados else ""
+                        print(f"      - {c['archivo']}: {int(c['score'])} (coincidencias: {c['coincidencias']}, similitud: {c['similitud']:.0%}){ya_asignado}")
             continue
         
-        if pdf_match:
-            print(f"      📖 Extrayendo experiencia de: {pdf_match}")
-            datos = extraer_experiencia_pdf(os.path.join(cvs_dir, pdf_match))
-            print(f"      📊 Datos extraídos: {len(datos)} experiencias")
-            
-            for n, exp in enumerate(datos):
-                if n >= 3: break
-                num = n + 1
-                df.at[idx, f'EMPRESA {num}'] = str(exp['Empresa'])
-                df.at[idx, f'PUESTO {num}'] = str(exp['Puesto'])
-                df.at[idx, f'PERIODO {num}'] = str(exp['Periodo'])
-                print(f"         {num}. {exp['Empresa']} - {exp['Puesto']} ({exp['Periodo']})")
-                
-                # --- NUEVA LÓGICA: Si es la Experiencia 1, actualizamos 'Puesto actual' ---
-                if num == 1:
-                    df.at[idx, 'Puesto actual'] = str(exp['Puesto'])
-                    print(f"            → Puesto actual: {exp['Puesto']}")
-                # -------------------------------------------------------------------------
+        asignaciones.append((idx, pdf_match))
+
+    # Extraer la experiencia de los CVs emparejados (cada PDF una sola vez)
+    progreso(20, f"Extrayendo la experiencia de {len(asignaciones)} CVs")
+    if not usar_cache:
+        cache = None
+    elif cache is None:
+        cache = CacheExperiencias(os.path.join(BASE_DIR, 'cache', 'cvs'), VERSION_PARSER_CV)
+    experiencias = extraer_experiencias(
+        [os.path.join(cvs_dir, pdf) for _, pdf in asignaciones],
+        workers=workers,
+        timeout=timeout_por_cv,
+        cache=cache
+    )
+
+    for idx, pdf_match in asignaciones:
+        print(f"      📖 Experiencia de: {pdf_match}")
+        datos = experiencias[os.path.join(cvs_dir, pdf_match)]
+        print(f"      📊 Datos extraídos: {len(datos)} experiencias")
+        
+        for n, exp in enumerate(datos):
+            if n >= 3: break
+            num = n + 1
+            df.at[idx, f'EMPRESA {num}'] = str(exp['Empresa'])
+            df.at[idx, f'PUESTO {num}'] = str(exp['Puesto'])
+            df.at[idx, f'PERIODO {num}'] = str(exp['Periodo'])
+            print(f"         {num}. {exp['Empresa']} - {exp['Puesto']} ({exp['Periodo']})")
             
-            if datos: 
-                encontrados += 1
+            # --- NUEVA LÓGICA: Si es la Experiencia 1, actualizamos 'Puesto actual' ---
+            if num == 1:
+                df.at[idx, 'Puesto actual'] = str(exp['Puesto'])
+                print(f"            → Puesto actual: {exp['Puesto']}")
+            # -------------------------------------------------------------------------
+        
+        if datos: 
+            encontrados += 1
 
-    # Guardar en el mismo formato de entrada (JSON o XLSX)
+    # Guardar en el mismo formato de entrada (tabla del almacén o XLSX)
+    progreso(90, "Guardando Personal", cancelable=False)
     if salida_json:
-        print(f"💾 Guardando JSON: {EXCEL_PERSONAL_JSON}")
-        df.to_json(EXCEL_PERSONAL_JSON, orient='records', force_ascii=False, date_format='iso')
-        print(f"✅ JSON actualizado: {encontrados} perfiles procesados.")
+        almacen.guardar(EXCEL_PERSONAL_JSON, df)
+        print(f"💾 Tabla guardada: {almacen.archivo(EXCEL_PERSONAL_JSON)}")
+        print(f"✅ Personal actualizado: {encontrados} perfiles procesados.")
     else:
         print(f"💾 Guardando XLSX: {EXCEL_PERSONAL_XLSX}")
         df.to_excel(EXCEL_PERSONAL_XLSX, index=False)
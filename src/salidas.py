@@ -0,0 +1,161 @@
+import os
+import re
+import time
+import uuid
+import shutil
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+PATRON_ID = re.compile(r"^\d{8}T\d{12}_[0-9a-f]{6}$")
+
+
+def fecha_id(id):
+    """Fecha de creación de una generación a partir de su id."""
+    return datetime.strptime(id.split("_")[0], "%Y%m%dT%H%M%S%f")
+
+
+@contextmanager
+def escritura_atomica(ruta):
+    """
+    Da una ruta temporal junto a `ruta` (misma extensión) y, si el bloque
+    termina bien, la renombra a `ruta` de una vez: quien lea `ruta` ve el
+    archivo anterior o el nuevo completo, nunca uno a medias. Crea la
+    carpeta de `ruta` si hace falta.
+
+        with escritura_atomica(salida) as temporal:
+            documento.save(temporal)
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    base, extension = os.path.splitext(ruta)
+    temporal = f"{base}.tmp{os.getpid()}_{threading.get_ident()}{extension}"
+    try:
+        yield temporal
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+class Generacion:
+    """
+    Una generación de fichas: carpeta propia dentro del ámbito de su
+    cliente/proyecto. La carpeta se crea al escribir el primer archivo (con
+    escritura_atomica), así que una generación que no escribe nada no deja rastro.
+    """
+
+    def __init__(self, id, directorio):
+        self.id = id
+        self.directorio = directorio
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, os.path.basename(nombre))
+
+    def archivos(self):
+        return sorted(n for n in os.listdir(self.directorio) if ".tmp" not in n)
+
+
+class AlmacenSalidas:
+    """
+    Carpetas de salida de las fichas, una por generación:
+
+        <directorio>/Cliente_<nif>/<proyecto>/<id>/Ficha_2_1.docx
+        <directorio>/Cliente_<nif>/_cliente/<id>/...      (sin proyecto)
+        <directorio>/_inputs/<id>/...                     (sin cliente)
+
+    Dos generaciones simultáneas (del mismo proyecto o de otros) nunca
+    escriben en el mismo archivo, y cada una se puede servir por su id. El id
+    empieza por la fecha, así que ordenar por id es ordenar por antigüedad.
+
+    Limpieza: tras cada generación se conservan las `max_versiones` últimas
+    de su ámbito, y como mucho una vez por hora se borran en todos los
+    ámbitos las de más de `max_dias` días. Las generaciones de menos de
+    `proteccion` segundos no se borran (pueden estar escribiéndose).
+
+    Uso:
+        salidas = AlmacenSalidas(os.path.join(BASE_DIR, "outputs", "fichas"))
+        generacion = salidas.nueva(cliente_nif, proyecto_acronimo)
+        with escritura_atomica(generacion.ruta("Ficha_2_1.docx")) as temporal:
+            generar_ficha_2_1(..., temporal, ...)
+    """
+
+    def __init__(self, directorio, max_versiones=5, max_dias=7, proteccion=300):
+        self.directorio = directorio
+        self.max_versiones = max_versiones
+        self.max_dias = max_dias
+        self.proteccion = proteccion
+        self._lock = threading.Lock()
+        self._ultimo_barrido = 0
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def _ambito(self, cliente_nif=None, proyecto_acronimo=None):
+        if not cliente_nif:
+            return os.path.join(self.directorio, "_inputs")
+        return os.path.join(self.directorio, f"Cliente_{cliente_nif}", proyecto_acronimo or "_cliente")
+
+    def nueva(self, cliente_nif=None, proyecto_acronimo=None):
+        """Generación nueva en el ámbito del cliente/proyecto; antes aplica la política de limpieza."""
+        ambito = self._ambito(cliente_nif, proyecto_acronimo)
+        id = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}_{uuid.uuid4().hex[:6]}"
+        self._podar(ambito)
+        if time.time() - self._ultimo_barrido > 3600:
+            self.barrer()
+        return Generacion(id, os.path.join(ambito, id))
+
+    def obtener(self, id, cliente_nif=None, proyecto_acronimo=None):
+        """Generación `id` del ámbito, o la más reciente si id es None. None si no existe."""
+        ambito = self._ambito(cliente_nif, proyecto_acronimo)
+        if id is None:
+            ids = self._ids(ambito)
+            return Generacion(ids[-1], os.path.join(ambito, ids[-1])) if ids else None
+        if not PATRON_ID.match(id) or not os.path.isdir(os.path.join(ambito, id)):
+            return None
+        return Generacion(id, os.path.join(ambito, id))
+
+    def listar(self, cliente_nif=None, proyecto_acronimo=None):
+        """Generaciones del ámbito, de la más reciente a la más antigua."""
+        ambito = self._ambito(cliente_nif, proyecto_acronimo)
+        generaciones = []
+        for id in reversed(self._ids(ambito)):
+            generacion = Generacion(id, os.path.join(ambito, id))
+            generaciones.append({
+                "id": id,
+                "fecha": fecha_id(id).isoformat(timespec="seconds"),
+                "archivos": generacion.archivos(),
+            })
+        return generaciones
+
+    def _ids(self, ambito):
+        if not os.path.isdir(ambito):
+            return []
+        return sorted(n for n in os.listdir(ambito) if PATRON_ID.match(n))
+
+    def _borrables(self, ambito, ids):
+        """Ids que se pueden borrar (no protegidos por ser recientes)."""
+        limite = time.time() - self.proteccion
+        return [id for id in ids if os.path.getmtime(os.path.join(ambito, id)) < limite]
+
+    def _podar(self, ambito):
+        """Deja sitio para una generación más sin pasar de max_versiones en el ámbito."""
+        with self._lock:
+            ids = self._ids(ambito)
+            sobran = ids[:max(0, len(ids) - self.max_versiones + 1)]
+            for id in self._borrables(ambito, sobran):
+                shutil.rmtree(os.path.join(ambito, id), ignore_errors=True)
+
+    def barrer(self):
+        """Borra en todos los ámbitos las generaciones de más de max_dias días. Devuelve cuántas."""
+        self._ultimo_barrido = time.time()
+        limite = datetime.now().timestamp() - self.max_dias * 86400
+        borradas = 0
+        with self._lock:
+            for raiz, carpetas, _ in os.walk(self.directorio):
+                ids = [c for c in carpetas if PATRON_ID.match(c)]
+                for id in self._borrables(raiz, ids):
+                    if fecha_id(id).timestamp() < limite:
+                        shutil.rmtree(os.path.join(raiz, id), ignore_errors=True)
+                        borradas += 1
+                carpetas[:] = [c for c in carpetas if not PATRON_ID.match(c)]
+        if borradas:
+            print(f"   🧹 Salidas: {borradas} generaciones de más de {self.max_dias} días borradas")
+        return borradas
@@ -1,4 +1,9 @@
+import copy
+from collections import namedtuple
 import pandas as pd
+from docx import Document
+from docx.table import Table
+from docx.text.run import Run
 from docx.shared import Pt, Cm, RGBColor
 from docx.oxml import OxmlElement, ns
 from docx.oxml.ns import qn
@@ -186,20 +191,20 @@ def create_titled_box(doc, title_text, body_text, height=None, width=None):
     
     return table
 
-def crear_tabla_coste_colaboracion(doc, facturas_entidad):
-    """Genera la tabla de costes sumando facturas (Ficha 2.2)."""
-    
-    # Función interna formateo (reutilizamos la global para evitar errores)
-    def formatea_numero_local(valor):
-        try:
-            num = float(valor)
-            return f"{num:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-        except (ValueError, TypeError):
-            return str(valor)
-
-    total_importe = 0
-    num_facturas = len(facturas_entidad)
-    filas_extra = max(num_facturas - 6, 0)
+def formatea_numero_local(valor):
+    """Formato europeo 1.234,56 (o el valor tal cual si no es numérico)."""
+    try:
+        num = float(valor)
+        return f"{num:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    except (ValueError, TypeError):
+        return str(valor)
+
+
+def estructura_tabla_coste(doc, filas_extra=0):
+    """
+    Añade a doc la tabla de costes vacía de la Ficha 2.2 (34 + filas_extra
+    filas): anchos, cabeceras, colores y fusiones, sin facturas ni totales.
+    """
     filas_total = 34 + filas_extra
 
     table = doc.add_table(rows=filas_total, cols=3)
@@ -274,46 +279,133 @@ def crear_tabla_coste_colaboracion(doc, facturas_entidad):
     table.cell(32 + filas_extra, 0).merge(table.cell(32 + filas_extra, 2))
     table.cell(33 + filas_extra, 0).merge(table.cell(33 + filas_extra, 1))
 
-    # Insertar facturas en la sección de PERSONAL (desde fila 2)
-    for i, (_, factura) in enumerate(facturas_entidad.iterrows()):
-        fila_actual = 2 + i
-        table.cell(fila_actual, 1).text = str(factura.get("Nombre factura", ""))
-        if table.cell(fila_actual, 1).paragraphs:
-            run = table.cell(fila_actual, 1).paragraphs[0].runs[0]
-            run.font.name = "Arial"
-            run.font.size = Pt(10)
+    return table
 
-        try:
-            val_imp = factura.get("Importe (€)", 0)
-            importe_num = float(val_imp)
-        except ValueError:
-            importe_num = float(str(val_imp).replace(".", "").replace(",", "."))
 
-        total_importe += importe_num
+_PLANTILLA_TABLA_COSTE = None
 
-        importe_str = f"{formatea_numero_local(importe_num)} €"
-        table.cell(fila_actual, 2).text = importe_str
-        if table.cell(fila_actual, 2).paragraphs:
-            run = table.cell(fila_actual, 2).paragraphs[0].runs[0]
-            run.font.name = "Arial"
-            run.font.size = Pt(10)
 
-    # Insertar total en fila TOTAL PERSONAL
-    fila_total_personal = 7 + filas_extra
-    table.cell(fila_total_personal, 2).text = f"{formatea_numero_local(total_importe)} €"
-    if table.cell(fila_total_personal, 2).paragraphs:
-        run = table.cell(fila_total_personal, 2).paragraphs[0].runs[0]
-        run.font.name = "Arial"
-        run.font.size = Pt(10)
+def _plantilla_tabla_coste():
+    """
+    Tabla de costes vacía para 6 facturas, construida una vez por proceso
+    con estructura_tabla_coste. Se clona para cada entidad.
+    """
+    global _PLANTILLA_TABLA_COSTE
+    if _PLANTILLA_TABLA_COSTE is None:
+        _PLANTILLA_TABLA_COSTE = estructura_tabla_coste(Document(), 0)._element
+    return _PLANTILLA_TABLA_COSTE
+
+
+def _escribir_celda(tc, texto, bold=False):
+    """Equivale a cell.text = texto + Arial 10 en el primer run, sobre el XML de la celda."""
+    tc.clear_content()
+    r = tc.add_p().add_r()
+    r.text = texto
+    run = Run(r, None)
+    run.font.name = "Arial"
+    run.font.size = Pt(10)
+    if bold:
         run.bold = True
 
-    # Insertar total general
-    fila_total_general = 33 + filas_extra
-    table.cell(fila_total_general, 2).text = f"{formatea_numero_local(total_importe)} €"
-    if table.cell(fila_total_general, 2).paragraphs:
-        run = table.cell(fila_total_general, 2).paragraphs[0].runs[0]
-        run.font.name = "Arial"
-        run.font.size = Pt(10)
-        run.bold = True
 
-    return table
\ No newline at end of file
+# Facturas de una entidad ya preparadas para la tabla de costes: nombres (str),
+# importes (float) y su suma
+FacturasEntidad = namedtuple("FacturasEntidad", ["nombres", "importes", "total"])
+
+
+def importe_factura(valor):
+    """Importe de una factura como float; admite texto con formato europeo ("1.234,56")."""
+    try:
+        return float(valor)
+    except ValueError:
+        return float(str(valor).replace(".", "").replace(",", "."))
+
+
+def facturas_de_tabla(facturas):
+    """FacturasEntidad a partir de las filas de factura de una entidad (DataFrame)."""
+    num_facturas = len(facturas)
+    nombres = [str(n) for n in facturas["Nombre factura"]] if "Nombre factura" in facturas.columns else [""] * num_facturas
+    importes = [importe_factura(v) for v in facturas["Importe (€)"]] if "Importe (€)" in facturas.columns else [0.0] * num_facturas
+    return FacturasEntidad(nombres, importes, sum(importes))
+
+
+class IndiceFacturas:
+    """
+    Facturas de la Ficha 2.2 agrupadas por "Entidad" con un único groupby, en
+    vez de filtrar la tabla entera por cada colaboración. Los importes de cada
+    entidad se convierten (y se suman) la primera vez que se piden y se
+    recuerdan; de(entidad) es una búsqueda en un dict.
+
+        facturas = IndiceFacturas(df_facturas)
+        crear_tabla_coste_colaboracion(doc, facturas.de("ACME S.L."))
+    """
+
+    VACIA = FacturasEntidad([], [], 0)
+
+    def __init__(self, df_facturas):
+        if "Entidad" in df_facturas.columns:
+            self._posiciones = df_facturas.groupby("Entidad", sort=False).indices
+        else:
+            self._posiciones = {}
+        columnas = df_facturas.columns
+        self._nombres = df_facturas["Nombre factura"].tolist() if "Nombre factura" in columnas else None
+        self._importes = df_facturas["Importe (€)"].tolist() if "Importe (€)" in columnas else None
+        self._preparadas = {}
+
+    def __len__(self):
+        return len(self._posiciones)
+
+    def posiciones(self, entidad):
+        """Posiciones (iloc) de las facturas de la entidad, en el orden de la tabla."""
+        return self._posiciones.get(entidad, [])
+
+    def de(self, entidad):
+        """FacturasEntidad de la entidad (vacía si no tiene facturas)."""
+        preparadas = self._preparadas.get(entidad)
+        if preparadas is None:
+            posiciones = self.posiciones(entidad)
+            if not len(posiciones):
+                return self.VACIA
+            nombres = [str(self._nombres[p]) for p in posiciones] if self._nombres is not None else [""] * len(posiciones)
+            importes = [importe_factura(self._importes[p]) for p in posiciones] if self._importes is not None else [0.0] * len(posiciones)
+            preparadas = FacturasEntidad(nombres, importes, sum(importes))
+            self._preparadas[entidad] = preparadas
+        return preparadas
+
+
+def crear_tabla_coste_colaboracion(doc, facturas_entidad):
+    """
+    Genera la tabla de costes sumando facturas (Ficha 2.2).
+
+    `facturas_entidad` es un FacturasEntidad (p. ej. de IndiceFacturas.de) o
+    las filas de factura de la entidad como DataFrame.
+
+    Clona la plantilla vacía y, si hay más de 6 facturas, repite la fila
+    central de PERSONAL (ya fusionada en vertical) en vez de volver a fusionar.
+    Las celdas se rellenan por posición en el XML (sin table.cell(), que
+    recorre toda la rejilla), así que el coste es lineal en facturas.
+    """
+    if not isinstance(facturas_entidad, FacturasEntidad):
+        facturas_entidad = facturas_de_tabla(facturas_entidad)
+    num_facturas = len(facturas_entidad.nombres)
+    filas_extra = max(num_facturas - 6, 0)
+
+    tbl = copy.deepcopy(_plantilla_tabla_coste())
+    fila_personal = tbl.tr_lst[3]
+    for _ in range(filas_extra):
+        fila_personal.addnext(copy.deepcopy(fila_personal))
+    filas = tbl.tr_lst
+
+    # Insertar facturas en la sección de PERSONAL (desde fila 2)
+    for i, (nombre, importe_num) in enumerate(zip(facturas_entidad.nombres, facturas_entidad.importes)):
+        celdas = filas[2 + i].tc_lst
+        _escribir_celda(celdas[1], nombre)
+        _escribir_celda(celdas[2], f"{formatea_numero_local(importe_num)} €")
+
+    # Total en la fila TOTAL PERSONAL y total general (columnas 0-1 fusionadas)
+    total = f"{formatea_numero_local(facturas_entidad.total)} €"
+    _escribir_celda(filas[7 + filas_extra].tc_lst[2], total, bold=True)
+    _escribir_celda(filas[33 + filas_extra].tc_lst[1], total, bold=True)
+
+    doc._body._element._insert_tbl(tbl)
+    return Table(tbl, doc._body)
@@ -0,0 +1,390 @@
+import os
+import heapq
+import uuid
+import threading
+from collections import OrderedDict
+from itertools import chain
+
+import pandas as pd
+
+try:
+    from .validador import (ValidadorFichas, CAMPOS_OBLIGATORIOS, TABLA_VACIA,
+                            _vista_filas, _sin_experiencia, leer_tabla, combinar_resumenes)
+    from .almacen_tablas import almacen
+except ImportError:
+    from validador import (ValidadorFichas, CAMPOS_OBLIGATORIOS, TABLA_VACIA,
+                           _vista_filas, _sin_experiencia, leer_tabla, combinar_resumenes)
+    from almacen_tablas import almacen
+
+TABLAS = ("personal", "colaboraciones", "facturas")
+NIVELES = ("errores", "advertencias")
+
+# Reglas que solo miran su propia fila: (nombre, columnas que lee, regla de ValidadorFichas)
+REGLAS_FILA = {
+    "personal": [
+        ("obligatorios", CAMPOS_OBLIGATORIOS["personal"],
+         lambda v, df: v._validar_campos_obligatorios(df, "personal")),
+        ("formatos", ["Nombre", "Apellidos", "Coste horario (€/hora)", "Horas totales"],
+         lambda v, df: v._validar_formatos_personal(df)),
+        ("costes", ["Coste horario (€/hora)", "Horas totales", "Coste total (€)"],
+         lambda v, df: v._validar_consistencia_costes(df)),
+    ],
+    "colaboraciones": [
+        ("obligatorios", CAMPOS_OBLIGATORIOS["colaboraciones"],
+         lambda v, df: v._validar_campos_obligatorios(df, "colaboraciones")),
+        ("nif", ["NIF"], lambda v, df: v._validar_nif(df)),
+    ],
+    "facturas": [
+        ("obligatorios", CAMPOS_OBLIGATORIOS["facturas"],
+         lambda v, df: v._validar_campos_obligatorios(df, "facturas")),
+        ("importes", ["Importe (€)"], lambda v, df: v._validar_importes(df)),
+    ],
+}
+
+# Columnas de los índices hash de las reglas entre filas (duplicados y facturas ↔ colaboraciones)
+COLUMNAS_INDICE = {
+    "personal": ("Nombre", "Apellidos"),
+    "colaboraciones": ("Razón social",),
+    "facturas": ("Entidad",),
+}
+
+
+_NAN = object()
+
+
+def _clave(valor, unificar_huecos):
+    """
+    Valor hashable para los índices. Como en pandas, NaN siempre equivale a
+    NaN, pero None solo se confunde con NaN en duplicated() de varias columnas
+    (en duplicated() de una columna y en isin() son valores distintos).
+    """
+    if isinstance(valor, float) and valor != valor:
+        return _NAN
+    if valor is None and unificar_huecos:
+        return _NAN
+    return valor
+
+
+def _iguales(a, b):
+    """Igualdad de celdas de la vista (mismo tipo y valor, NaN == NaN)."""
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, float) and a != a and b != b:
+        return True
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+def firma_archivos(rutas):
+    """(mtime_ns, tamaño) del archivo de cada tabla (ver almacen_tablas), para saber si ha cambiado en disco."""
+    firma = []
+    for ruta in rutas:
+        try:
+            st = os.stat(almacen.archivo(ruta))
+            firma.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            firma.append(None)
+    return tuple(firma)
+
+
+class _Registro(ValidadorFichas):
+    """ValidadorFichas que guarda los mensajes de cada fila en vez de acumularlos."""
+
+    def __init__(self):
+        super().__init__()
+        self.por_fila = {nivel: {} for nivel in NIVELES}
+
+    def _reportar(self, nivel, df, posiciones, mensajes):
+        filas = self.por_fila["errores" if nivel is self.errores else "advertencias"]
+        for pos, mensaje in zip(df.index[posiciones], mensajes):
+            filas.setdefault(int(pos), []).append(mensaje)
+
+
+class ValidacionIncremental:
+    """
+    Estado de validación de un proyecto que se actualiza celda a celda.
+
+    Guarda las tres tablas en memoria (valores crudos y la vista que usan las
+    reglas), los mensajes de cada regla local por fila y unos índices hash
+    para las reglas entre filas (duplicados, facturas sin colaboración y
+    personas sin experiencia). Al editar celdas solo se vuelven a evaluar las
+    reglas que leen las columnas tocadas, y solo en las filas tocadas; el
+    resumen es el mismo que daría ValidadorFichas sobre las tablas editadas.
+
+    Insertar o borrar filas (o añadir columnas) desplaza los números de fila,
+    así que en ese caso la tabla afectada se recalcula entera.
+
+    Uso:
+        estado = ValidacionIncremental.desde_archivos(ruta_personal, ruta_colab, ruta_facturas)
+        estado.aplicar_cambios("personal", [{"fila": 3, "valores": {"Horas totales": 120}}])
+        es_valido, resumen = estado.resumen()
+    """
+
+    def __init__(self, df_personal, df_colab, df_facturas, firma=None, max_mensajes=None):
+        self.firma = firma
+        self.max_mensajes = max_mensajes
+        self._lock = threading.Lock()
+        self._crudo = {}
+        self._vista = {}
+        self._por_fila = {}  # (tabla, regla, nivel) -> {posición: [mensajes]}
+        self._claves = {}    # tabla -> clave de índice de cada fila
+        self._grupos = {}    # tabla -> {clave: posiciones}
+        self._sin_experiencia = set()
+        for tabla, df in zip(TABLAS, (df_personal, df_colab, df_facturas)):
+            self._cargar_tabla(tabla, df)
+
+    @classmethod
+    def desde_archivos(cls, ruta_personal, ruta_colaboraciones, ruta_facturas, **kwargs):
+        rutas = (ruta_personal, ruta_colaboraciones, ruta_facturas)
+        firma = firma_archivos(rutas)
+        return cls(*(leer_tabla(ruta) for ruta in rutas), firma=firma, **kwargs)
+
+    def _validador(self):
+        return ValidadorFichas() if self.max_mensajes is None else ValidadorFichas(self.max_mensajes)
+
+    # ==========================================
+    # CARGA Y ACTUALIZACIÓN
+    # ==========================================
+
+    def _cargar_tabla(self, tabla, df):
+        """Evalúa desde cero las reglas y los índices de una tabla."""
+        df = df.reset_index(drop=True)
+        self._crudo[tabla] = df.astype(object)
+        vista = _vista_filas(df).astype(object)
+        self._vista[tabla] = vista
+
+        for regla, _, evaluar in REGLAS_FILA[tabla]:
+            registro = _Registro()
+            evaluar(registro, vista)
+            for nivel in NIVELES:
+                self._por_fila[(tabla, regla, nivel)] = registro.por_fila[nivel]
+
+        columnas = COLUMNAS_INDICE[tabla]
+        if len(vista) and any(c not in vista.columns for c in columnas):
+            raise KeyError([c for c in columnas if c not in vista.columns])
+        claves = [self._clave_fila(tabla, fila) for fila in vista.itertuples(index=False)] if len(vista) else []
+        self._claves[tabla] = claves
+        grupos = {}
+        for pos, clave in enumerate(claves):
+            grupos.setdefault(clave, set()).add(pos)
+        self._grupos[tabla] = grupos
+
+        if tabla == "personal":
+            self._sin_experiencia = set(map(int, _sin_experiencia(vista).nonzero()[0]))
+
+    def _clave_fila(self, tabla, fila):
+        """Clave de índice de una fila (namedtuple o Series de la vista)."""
+        if isinstance(fila, pd.Series):
+            valores = [fila[c] for c in COLUMNAS_INDICE[tabla]]
+        else:
+            columnas = self._vista[tabla].columns
+            valores = [fila[columnas.get_loc(c)] for c in COLUMNAS_INDICE[tabla]]
+        if len(valores) == 1:
+            return _clave(valores[0], unificar_huecos=False)
+        return tuple(_clave(v, unificar_huecos=True) for v in valores)
+
+    def aplicar_cambios(self, tabla: str, cambios: list):
+        """
+        Aplica una lista de cambios a `tabla` y actualiza la validación.
+
+        Cada cambio es {"fila": 3, "valores": {"Columna": valor}} (fila 0-based);
+        también se admiten {"op": "insert", "fila": 3, "valores": {...}} y
+        {"op": "delete", "fila": 3}, que recalculan la tabla entera.
+        Devuelve las reglas que se han vuelto a evaluar.
+        """
+        if tabla not in TABLAS:
+            raise ValueError(f"Tabla desconocida: {tabla}. Use una de {', '.join(TABLAS)}")
+        with self._lock:
+            crudo = self._crudo[tabla]
+            estructural = any(c.get("op", "update") != "update" for c in cambios)
+            columnas_nuevas = [col for c in cambios for col in c.get("valores", {}) if col not in crudo.columns]
+            if estructural or columnas_nuevas:
+                self._cargar_tabla(tabla, self._reconstruir(crudo, cambios))
+                return ["todas"]
+
+            filas = sorted({int(c["fila"]) for c in cambios})
+            if filas and (filas[0] < 0 or filas[-1] >= len(crudo)):
+                raise IndexError(f"Fila fuera de rango en {tabla} ({len(crudo)} filas)")
+            for cambio in cambios:
+                for columna, valor in cambio["valores"].items():
+                    crudo.iat[int(cambio["fila"]), crudo.columns.get_loc(columna)] = valor
+            return self._reevaluar(tabla, filas)
+
+    @staticmethod
+    def _reconstruir(crudo, cambios):
+        """Aplica inserciones/borrados sobre los registros y devuelve el DataFrame nuevo."""
+        registros = crudo.to_dict("records")
+        columnas = list(crudo.columns)
+        for cambio in cambios:
+            op = cambio.get("op", "update")
+            fila = cambio.get("fila")
+            if fila is None:
+                fila = len(registros)
+            if op == "delete":
+                del registros[int(fila)]
+                continue
+            valores = cambio.get("valores", {})
+            columnas.extend(c for c in valores if c not in columnas)
+            if op == "insert":
+                registros.insert(int(fila), dict(valores))
+            else:
+                registros[int(fila)].update(valores)
+        return pd.DataFrame(registros, columns=columnas)
+
+    def _reevaluar(self, tabla, filas):
+        """Recalcula la vista de `filas` y las reglas cuyas columnas han cambiado."""
+        if not filas:
+            return []
+        vista = self._vista[tabla]
+        nueva = _vista_filas(self._crudo[tabla].iloc[filas])
+        cambiadas = {}
+        for i, pos in enumerate(filas):
+            antes, despues = vista.iloc[pos], nueva.iloc[i]
+            cambiadas[pos] = {c for c in vista.columns if not _iguales(antes[c], despues[c])}
+        vista.iloc[filas] = nueva.to_numpy()
+
+        reevaluadas = []
+        for regla, columnas, evaluar in REGLAS_FILA[tabla]:
+            afectadas = [pos for pos in filas if cambiadas[pos].intersection(columnas)]
+            if not afectadas:
+                continue
+            reevaluadas.append(regla)
+            registro = _Registro()
+            evaluar(registro, vista.iloc[afectadas])
+            for nivel in NIVELES:
+                por_fila = self._por_fila[(tabla, regla, nivel)]
+                for pos in afectadas:
+                    por_fila.pop(pos, None)
+                por_fila.update(registro.por_fila[nivel])
+
+        grupos, claves = self._grupos[tabla], self._claves[tabla]
+        for pos in filas:
+            if not cambiadas[pos].intersection(COLUMNAS_INDICE[tabla]):
+                continue
+            nueva_clave = self._clave_fila(tabla, vista.iloc[pos])
+            grupo = grupos[claves[pos]]
+            grupo.discard(pos)
+            if not grupo:
+                del grupos[claves[pos]]
+            grupos.setdefault(nueva_clave, set()).add(pos)
+            claves[pos] = nueva_clave
+
+        if tabla == "personal":
+            tocadas = [pos for pos in filas if "EMPRESA 1" in cambiadas[pos]]
+            if tocadas:
+                vacias = _sin_experiencia(vista.iloc[tocadas])
+                for pos, vacia in zip(tocadas, vacias):
+                    (self._sin_experiencia.add if vacia else self._sin_experiencia.discard)(pos)
+        return reevaluadas
+
+    # ==========================================
+    # RESUMEN
+    # ==========================================
+
+    def _volcar(self, validador, tabla, regla):
+        """Pasa al validador los mensajes de una regla local, en orden de fila."""
+        for nivel in NIVELES:
+            por_fila = self._por_fila[(tabla, regla, nivel)]
+            lista = getattr(validador, nivel)
+            primeras = heapq.nsmallest(lista.limite, por_fila)
+            lista.agregar(sum(map(len, por_fila.values())),
+                          chain.from_iterable(por_fila[pos] for pos in primeras))
+
+    def _duplicadas(self, tabla):
+        """Posiciones (ordenadas) de las filas con clave repetida."""
+        return sorted(pos for grupo in self._grupos[tabla].values() if len(grupo) > 1 for pos in grupo)
+
+    def _resumen_personal(self):
+        validador = self._validador()
+        if self._vista["personal"].empty:
+            validador.errores.append(TABLA_VACIA["personal"])
+            return False, validador.obtener_resumen()
+        for regla in ("obligatorios", "formatos", "costes"):
+            self._volcar(validador, "personal", regla)
+        validador._avisar_duplicados(self._vista["personal"], self._duplicadas("personal"),
+                                     COLUMNAS_INDICE["personal"])
+        validador._avisar_sin_experiencia(len(self._sin_experiencia))
+        return len(validador.errores) == 0, validador.obtener_resumen()
+
+    def _resumen_colaboraciones(self):
+        validador = self._validador()
+        for tabla in ("colaboraciones", "facturas"):
+            if self._vista[tabla].empty:
+                validador.errores.append(TABLA_VACIA[tabla])
+                return False, validador.obtener_resumen()
+        self._volcar(validador, "colaboraciones", "obligatorios")
+        self._volcar(validador, "facturas", "obligatorios")
+        self._volcar(validador, "colaboraciones", "nif")
+        validador._avisar_duplicados(self._vista["colaboraciones"], self._duplicadas("colaboraciones"),
+                                     COLUMNAS_INDICE["colaboraciones"])
+        # Entidades de facturas sin colaboración, por orden de primera aparición
+        razones = self._grupos["colaboraciones"]
+        sin_colab = sorted(min(grupo) for clave, grupo in self._grupos["facturas"].items() if clave not in razones)
+        entidades = self._vista["facturas"]["Entidad"]
+        validador._avisar_facturas_sin_colab([entidades.iat[pos] for pos in sin_colab])
+        self._volcar(validador, "facturas", "importes")
+        return len(validador.errores) == 0, validador.obtener_resumen()
+
+    def resumen(self):
+        """(es_valido, resumen) con la misma forma que validar_antes_generar."""
+        with self._lock:
+            valido_personal, resumen_personal = self._resumen_personal()
+            valido_colab, resumen_colab = self._resumen_colaboraciones()
+        return valido_personal and valido_colab, combinar_resumenes(
+            valido_personal, resumen_personal, valido_colab, resumen_colab)
+
+
+class AlmacenValidaciones:
+    """
+    Estados de ValidacionIncremental por sesión de edición, en memoria y con LRU.
+
+    Cada sesión parte de los JSON del proyecto y acumula solo los cambios que
+    le llegan con su token, así que lo que un usuario edita sin guardar no
+    afecta a la validación de otro, ni a la suya si empieza de nuevo. Si los
+    JSON del proyecto cambian en disco (mtime o tamaño) la sesión se vuelve a
+    cargar de ellos y los cambios que solo se habían validado se pierden.
+
+    Uso:
+        sesion, estado = validaciones.crear(data_dir, rutas)
+        estado = validaciones.obtener(sesion, data_dir, rutas)  # None si no existe o ha caducado
+        validaciones.olvidar(sesion)
+    """
+
+    def __init__(self, max_sesiones=32):
+        self.max_sesiones = max_sesiones
+        self._lock = threading.Lock()
+        self._sesiones = OrderedDict()  # sesion -> (clave, estado)
+
+    def crear(self, clave, rutas):
+        """Nueva sesión sobre los JSON de `rutas`. Devuelve (token, estado)."""
+        sesion = uuid.uuid4().hex
+        estado = ValidacionIncremental.desde_archivos(*rutas)
+        with self._lock:
+            self._sesiones[sesion] = (clave, estado)
+            while len(self._sesiones) > self.max_sesiones:
+                self._sesiones.popitem(last=False)
+        return sesion, estado
+
+    def obtener(self, sesion, clave, rutas):
+        """Estado de la sesión, o None si no existe, ha caducado o es de otro proyecto."""
+        with self._lock:
+            entrada = self._sesiones.get(sesion)
+            if entrada is None or entrada[0] != clave:
+                return None
+            self._sesiones.move_to_end(sesion)
+        estado = entrada[1]
+        if estado.firma != firma_archivos(rutas):
+            estado = ValidacionIncremental.desde_archivos(*rutas)
+            with self._lock:
+                if sesion in self._sesiones:
+                    self._sesiones[sesion] = (clave, estado)
+        return estado
+
+    def olvidar(self, sesion):
+        """Descarta la sesión y sus cambios. False si no existía."""
+        with self._lock:
+            return self._sesiones.pop(sesion, None) is not None
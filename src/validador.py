@@ -4,22 +4,153 @@ Detecta inconsistencias, datos faltantes y formatos inválidos.
 """
 
 import pandas as pd
-import re
+import numpy as np
+from itertools import islice
 from typing import Dict, List, Tuple
 
+try:
+    from .almacen_tablas import almacen
+except ImportError:
+    from almacen_tablas import almacen
+
+# Mensajes que se formatean por nivel (obtener_resumen devuelve los 20 primeros)
+MAX_MENSAJES = 20
+
+CAMPOS_OBLIGATORIOS = {
+    "personal": ["Nombre", "Apellidos", "Titulación 1", "Coste horario (€/hora)", "Horas totales"],
+    "colaboraciones": ["Razón social", "NIF", "País de la entidad"],
+    "facturas": ["Entidad", "Nombre factura", "Importe (€)"]
+}
+
+TABLA_VACIA = {
+    "personal": "❌ [CRÍTICO] El DataFrame de Personal está vacío",
+    "colaboraciones": "❌ [CRÍTICO] El DataFrame de Colaboraciones está vacío",
+    "facturas": "❌ [CRÍTICO] El DataFrame de Facturas está vacío",
+}
+
+
+class ListaMensajes:
+    """
+    Errores o advertencias en orden de detección.
+
+    Cuenta todas las violaciones pero solo formatea las primeras `limite`:
+    len() es el total y la indexación/slicing se hace sobre las formateadas.
+    """
+
+    def __init__(self, limite=MAX_MENSAJES):
+        self.limite = limite
+        self.total = 0
+        self.mensajes = []
+
+    def append(self, mensaje):
+        self.agregar(1, [mensaje])
+
+    def agregar(self, total, mensajes):
+        """Suma `total` violaciones y consume de `mensajes` (iterable perezoso) solo las que caben."""
+        self.total += int(total)
+        hueco = self.limite - len(self.mensajes)
+        if hueco > 0:
+            self.mensajes.extend(islice(mensajes, hueco))
+
+    def __len__(self):
+        return self.total
+
+    def __bool__(self):
+        return self.total > 0
+
+    def __getitem__(self, item):
+        return self.mensajes[item]
+
+    def __iter__(self):
+        return iter(self.mensajes)
+
+
+_es_none = np.frompyfunc(lambda v: v is None, 1, 1)
+
+
+def _vista_filas(df):
+    """
+    Copia de df con los valores tal y como los veían las reglas fila a fila
+    (iterrows): cada fila sale de df.values, así que un frame solo numérico
+    pasa entero a float, y pandas infiere 'str' en las filas que solo tienen
+    texto y huecos, con lo que en ellas None pasa a NaN.
+    """
+    valores = df.to_numpy(copy=True)
+    if valores.dtype != object or not valores.size:
+        return pd.DataFrame(valores, index=df.index, columns=df.columns)
+    nones = _es_none(valores).astype(bool)
+    for i in np.flatnonzero(nones.any(axis=1)):
+        fila = valores[i]
+        texto = [isinstance(v, str) for v in fila]
+        if any(texto) and all(t or v is None or (isinstance(v, float) and v != v) for t, v in zip(texto, fila)):
+            fila[nones[i]] = np.nan
+    return pd.DataFrame(valores, index=df.index, columns=df.columns, dtype=object)
+
+
+def _como_texto(df, campo, defecto=""):
+    """Columna como str(valor) por celda (lo que daba str(row.get(campo, defecto)))."""
+    if campo not in df.columns:
+        return pd.Series([str(defecto)] * len(df), index=df.index, dtype=object)
+    col = df[campo]
+    texto = col.astype(str)
+    faltan = texto.isna()
+    if faltan.any():
+        # astype(str) deja los huecos como NaN; str() da 'nan', 'None', 'NaT'...
+        texto = texto.astype(object)
+        texto[faltan] = col[faltan].map(str)
+    return texto
+
+
+def _como_numero(df, campo, defecto=0):
+    """
+    Columna convertida como float(row.get(campo, defecto)).
+    Devuelve (valores, invalidos): invalidos marca las celdas en las que
+    float() lanzaría ValueError/TypeError.
+    """
+    n = len(df)
+    if campo not in df.columns:
+        return np.full(n, float(defecto)), np.zeros(n, dtype=bool)
+    col = df[campo]
+    if pd.api.types.is_numeric_dtype(col) or pd.api.types.is_bool_dtype(col):
+        return col.to_numpy(dtype=float, na_value=np.nan), np.zeros(n, dtype=bool)
+    valores = pd.to_numeric(col, errors="coerce").to_numpy(dtype=float, na_value=np.nan, copy=True)
+    invalidos = np.zeros(n, dtype=bool)
+    # Solo las celdas que to_numeric no ha sabido leer (y los ceros, por el
+    # signo de '-0') se comprueban una a una
+    for pos in np.flatnonzero(np.isnan(valores) | (valores == 0)):
+        try:
+            valor = float(col.iat[pos])
+        except (ValueError, TypeError):
+            invalidos[pos] = True
+        else:
+            valores[pos] = valor
+    return valores, invalidos
+
+
+def _sin_experiencia(df):
+    """Máscara de las filas con EMPRESA 1 vacío (o sin esa columna)."""
+    return (_como_texto(df, "EMPRESA 1").str.strip() == "").to_numpy(dtype=bool)
+
 
 class ValidadorFichas:
-    """Valida datos de personal y colaboraciones antes de generar fichas."""
+    """
+    Valida datos de personal y colaboraciones antes de generar fichas.
+
+    Cada regla se evalúa sobre columnas enteras (máscaras de pandas/numpy) y
+    solo se formatean los mensajes de las primeras `max_mensajes` violaciones
+    de cada nivel; los contadores siempre son los totales.
+    """
     
-    def __init__(self):
-        self.errores = []
-        self.advertencias = []
+    def __init__(self, max_mensajes=MAX_MENSAJES):
+        self.max_mensajes = max_mensajes
+        self.errores = ListaMensajes(max_mensajes)
+        self.advertencias = ListaMensajes(max_mensajes)
         self.info = []
     
     def limpiar(self):
         """Reinicia los contadores de validación."""
-        self.errores = []
-        self.advertencias = []
+        self.errores = ListaMensajes(self.max_mensajes)
+        self.advertencias = ListaMensajes(self.max_mensajes)
         self.info = []
     
     def validar_personal(self, df_personal: pd.DataFrame) -> bool:
@@ -30,10 +161,11 @@ class ValidadorFichas:
         self.limpiar()
         
         if df_personal.empty:
-            self.errores.append("❌ [CRÍTICO] El DataFrame de Personal está vacío")
+            self.errores.append(TABLA_VACIA["personal"])
             return False
         
         print(f"\n🔍 Validando {len(df_personal)} registros de Personal...\n")
+        df_personal = _vista_filas(df_personal)
         
         # Validaciones generales
         self._validar_campos_obligatorios(df_personal, "personal")
@@ -56,14 +188,16 @@ class ValidadorFichas:
         self.limpiar()
         
         if df_colab.empty:
-            self.errores.append("❌ [CRÍTICO] El DataFrame de Colaboraciones está vacío")
+            self.errores.append(TABLA_VACIA["colaboraciones"])
             return False
         
         if df_facturas.empty:
-            self.errores.append("❌ [CRÍTICO] El DataFrame de Facturas está vacío")
+            self.errores.append(TABLA_VACIA["facturas"])
             return False
         
         print(f"\n🔍 Validando {len(df_colab)} colaboraciones y {len(df_facturas)} facturas...\n")
+        df_colab = _vista_filas(df_colab)
+        df_facturas = _vista_filas(df_facturas)
         
         # Validaciones generales
         self._validar_campos_obligatorios(df_colab, "colaboraciones")
@@ -81,128 +215,119 @@ class ValidadorFichas:
     # VALIDACIONES ESPECÍFICAS
     # ==========================================
     
+    @staticmethod
+    def _filas(df, posiciones):
+        """Número de fila (índice + 1) de cada posición."""
+        return df.index[posiciones] + 1
+
+    def _reportar(self, nivel, df, posiciones, mensajes):
+        """
+        Registra en `nivel` (self.errores o self.advertencias) una violación por
+        posición de df; `mensajes` genera los textos en el mismo orden.
+        """
+        nivel.agregar(len(posiciones), mensajes)
+
     def _validar_campos_obligatorios(self, df: pd.DataFrame, tipo: str):
         """Verifica que los campos requeridos no estén vacíos."""
         
-        campos_obligatorios = {
-            "personal": ["Nombre", "Apellidos", "Titulación 1", "Coste horario (€/hora)", "Horas totales"],
-            "colaboraciones": ["Razón social", "NIF", "País de la entidad"],
-            "facturas": ["Entidad", "Nombre factura", "Importe (€)"]
-        }
-        
-        requeridos = campos_obligatorios.get(tipo, [])
-        
-        for idx, row in df.iterrows():
-            fila_num = idx + 1
-            for campo in requeridos:
-                if campo not in df.columns:
-                    continue
-                
-                val = row[campo]
-                # Consideramos vacío: NaN, cadena vacía, None
-                if pd.isna(val) or (isinstance(val, str) and val.strip() == ""):
-                    self.errores.append(
-                        f"❌ Fila {fila_num}: Campo '{campo}' está vacío (obligatorio)"
-                    )
+        requeridos = [c for c in CAMPOS_OBLIGATORIOS.get(tipo, []) if c in df.columns]
+        if not requeridos or df.empty:
+            return
+
+        # Matriz filas × campos; vacío: NaN, None o texto en blanco
+        vacias = np.column_stack([
+            (df[campo].isna() | (_como_texto(df, campo).str.strip() == "")).to_numpy(dtype=bool)
+            for campo in requeridos
+        ])
+        posiciones, campos = np.nonzero(vacias)  # en orden fila a fila, como antes
+        filas = self._filas(df, posiciones)
+        self._reportar(self.errores, df, posiciones, (
+            f"❌ Fila {fila}: Campo '{requeridos[c]}' está vacío (obligatorio)"
+            for fila, c in zip(filas, campos)
+        ))
     
     def _validar_formatos_personal(self, df: pd.DataFrame):
         """Valida formatos en datos de Personal."""
         
-        for idx, row in df.iterrows():
-            fila_num = idx + 1
-            
-            # Validar nombre y apellidos (no números)
-            nombre = str(row.get("Nombre", ""))
-            apellidos = str(row.get("Apellidos", ""))
-            
-            if nombre and re.search(r'\d', nombre):
-                self.advertencias.append(
-                    f"⚠️ Fila {fila_num}: Nombre contiene números: '{nombre}'"
-                )
-            
-            if apellidos and re.search(r'\d', apellidos):
-                self.advertencias.append(
-                    f"⚠️ Fila {fila_num}: Apellidos contienen números: '{apellidos}'"
-                )
-            
-            # Validar coste horario > 0
-            try:
-                coste_horario = float(row.get("Coste horario (€/hora)", 0))
-                if coste_horario <= 0:
-                    self.errores.append(
-                        f"❌ Fila {fila_num}: Coste horario debe ser > 0, se encontró: {coste_horario}"
-                    )
-            except (ValueError, TypeError):
-                self.errores.append(
-                    f"❌ Fila {fila_num}: Coste horario no es un número válido"
-                )
-            
-            # Validar horas totales > 0
-            try:
-                horas = float(row.get("Horas totales", 0))
-                if horas <= 0:
-                    self.errores.append(
-                        f"❌ Fila {fila_num}: Horas totales debe ser > 0, se encontró: {horas}"
-                    )
-            except (ValueError, TypeError):
-                self.errores.append(
-                    f"❌ Fila {fila_num}: Horas totales no es un número válido"
-                )
+        # Nombre y apellidos (no números)
+        nombre = _como_texto(df, "Nombre")
+        apellidos = _como_texto(df, "Apellidos")
+        con_numeros = np.column_stack([
+            nombre.str.contains(r'\d', regex=True).to_numpy(dtype=bool),
+            apellidos.str.contains(r'\d', regex=True).to_numpy(dtype=bool),
+        ])
+        posiciones, cual = np.nonzero(con_numeros)
+        self._reportar(self.advertencias, df, posiciones, (
+            f"⚠️ Fila {fila}: Nombre contiene números: '{nombre.iat[pos]}'" if c == 0
+            else f"⚠️ Fila {fila}: Apellidos contienen números: '{apellidos.iat[pos]}'"
+            for pos, fila, c in zip(posiciones, self._filas(df, posiciones), cual)
+        ))
+        
+        # Coste horario y horas totales > 0
+        coste, coste_invalido = _como_numero(df, "Coste horario (€/hora)")
+        horas, horas_invalido = _como_numero(df, "Horas totales")
+        with np.errstate(invalid="ignore"):
+            fallos = np.column_stack([coste_invalido | (coste <= 0), horas_invalido | (horas <= 0)])
+        posiciones, cual = np.nonzero(fallos)
+
+        def mensajes():
+            for pos, fila, c in zip(posiciones, self._filas(df, posiciones), cual):
+                if c == 0:
+                    yield (f"❌ Fila {fila}: Coste horario no es un número válido" if coste_invalido[pos]
+                           else f"❌ Fila {fila}: Coste horario debe ser > 0, se encontró: {float(coste[pos])}")
+                else:
+                    yield (f"❌ Fila {fila}: Horas totales no es un número válido" if horas_invalido[pos]
+                           else f"❌ Fila {fila}: Horas totales debe ser > 0, se encontró: {float(horas[pos])}")
+
+        self._reportar(self.errores, df, posiciones, mensajes())
     
     def _validar_consistencia_costes(self, df: pd.DataFrame):
         """Verifica que Coste total ≈ Coste horario × Horas totales."""
         
-        for idx, row in df.iterrows():
-            fila_num = idx + 1
-            
-            try:
-                coste_horario = float(row.get("Coste horario (€/hora)", 0))
-                horas = float(row.get("Horas totales", 0))
-                coste_total = float(row.get("Coste total (€)", 0))
-                
-                if horas > 0 and coste_horario > 0:
-                    coste_calculado = coste_horario * horas
-                    diferencia_pct = abs(coste_total - coste_calculado) / coste_calculado * 100
-                    
-                    if diferencia_pct > 1:  # Tolerancia del 1%
-                        self.advertencias.append(
-                            f"⚠️ Fila {fila_num}: Inconsistencia en costes. "
-                            f"Coste total ({coste_total}€) ≠ {coste_horario}€/h × {horas}h = {coste_calculado}€ "
-                            f"(diferencia: {diferencia_pct:.1f}%)"
-                        )
-            except (ValueError, TypeError):
-                pass
+        coste_horario, inv_coste = _como_numero(df, "Coste horario (€/hora)")
+        horas, inv_horas = _como_numero(df, "Horas totales")
+        coste_total, inv_total = _como_numero(df, "Coste total (€)")
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            coste_calculado = coste_horario * horas
+            diferencia_pct = np.abs(coste_total - coste_calculado) / coste_calculado * 100
+            # Tolerancia del 1%; las filas con algún valor no numérico se ignoran
+            inconsistentes = ~(inv_coste | inv_horas | inv_total) & (horas > 0) & (coste_horario > 0) & (diferencia_pct > 1)
+
+        posiciones = np.flatnonzero(inconsistentes)
+        self._reportar(self.advertencias, df, posiciones, (
+            f"⚠️ Fila {fila}: Inconsistencia en costes. "
+            f"Coste total ({float(coste_total[pos])}€) ≠ {float(coste_horario[pos])}€/h × {float(horas[pos])}h = {float(coste_calculado[pos])}€ "
+            f"(diferencia: {diferencia_pct[pos]:.1f}%)"
+            for pos, fila in zip(posiciones, self._filas(df, posiciones))
+        ))
     
     def _validar_duplicados(self, df: pd.DataFrame, *columnas):
         """Detecta duplicados en las columnas especificadas."""
         
+        duplicados = df.duplicated(subset=list(columnas), keep=False).to_numpy()
+        self._avisar_duplicados(df, np.flatnonzero(duplicados), columnas)
+
+    def _avisar_duplicados(self, df: pd.DataFrame, posiciones, columnas):
+        """Advertencias para las filas duplicadas (posiciones ordenadas)."""
         if len(columnas) == 1:
-            duplicados = df[df.duplicated(subset=columnas, keep=False)]
-            if not duplicados.empty:
-                for idx, row in duplicados.iterrows():
-                    val = row[columnas[0]]
-                    self.advertencias.append(
-                        f"⚠️ Fila {idx + 1}: '{val}' está duplicado en el listado"
-                    )
-        else:
-            duplicados = df[df.duplicated(subset=list(columnas), keep=False)]
-            if not duplicados.empty:
-                self.advertencias.append(
-                    f"⚠️ Se encontraron {len(duplicados)} registros duplicados "
-                    f"por {', '.join(columnas)}"
-                )
+            valores = df[columnas[0]]
+            self._reportar(self.advertencias, df, posiciones, (
+                f"⚠️ Fila {fila}: '{valores.iat[pos]}' está duplicado en el listado"
+                for pos, fila in zip(posiciones, self._filas(df, posiciones))
+            ))
+        elif len(posiciones):
+            self.advertencias.append(
+                f"⚠️ Se encontraron {len(posiciones)} registros duplicados "
+                f"por {', '.join(columnas)}"
+            )
     
     def _validar_experiencia_laboral(self, df: pd.DataFrame):
         """Valida que al menos haya experiencia laboral documentada."""
         
-        personas_sin_experiencia = 0
-        
-        for idx, row in df.iterrows():
-            empresa1 = str(row.get("EMPRESA 1", "")).strip()
-            
-            if not empresa1:
-                personas_sin_experiencia += 1
-        
+        self._avisar_sin_experiencia(int(_sin_experiencia(df).sum()))
+
+    def _avisar_sin_experiencia(self, personas_sin_experiencia: int):
         if personas_sin_experiencia > 0:
             self.advertencias.append(
                 f"⚠️ {personas_sin_experiencia} persona(s) sin experiencia laboral documentada "
@@ -214,41 +339,43 @@ class ValidadorFichas:
         
         patron_nif = r'^[A-Z0-9]{8,9}$'
         
-        for idx, row in df.iterrows():
-            nif = str(row.get("NIF", "")).strip().upper()
-            
-            if nif and not re.match(patron_nif, nif):
-                self.advertencias.append(
-                    f"⚠️ Fila {idx + 1}: NIF con formato sospechoso: '{nif}' "
-                    f"(esperado: 8-9 caracteres alfanuméricos)"
-                )
+        nif = _como_texto(df, "NIF").str.strip().str.upper()
+        sospechosos = ((nif != "") & ~nif.str.match(patron_nif)).to_numpy(dtype=bool)
+        posiciones = np.flatnonzero(sospechosos)
+        self._reportar(self.advertencias, df, posiciones, (
+            f"⚠️ Fila {fila}: NIF con formato sospechoso: '{nif.iat[pos]}' "
+            f"(esperado: 8-9 caracteres alfanuméricos)"
+            for pos, fila in zip(posiciones, self._filas(df, posiciones))
+        ))
     
     def _validar_consistencia_facturas(self, df_colab: pd.DataFrame, df_facturas: pd.DataFrame):
         """Verifica que todas las facturas tengan una colaboración asociada."""
         
-        entidades_colab = set(df_colab["Razón social"].unique())
-        entidades_fact = set(df_facturas["Entidad"].unique())
-        
-        facturas_sin_colab = entidades_fact - entidades_colab
-        
+        # Anti-join entidades de facturas ↔ razones sociales (por hash, no fila a fila)
+        entidades_fact = df_facturas["Entidad"].drop_duplicates()
+        facturas_sin_colab = entidades_fact[~entidades_fact.isin(df_colab["Razón social"])].tolist()
+        self._avisar_facturas_sin_colab(facturas_sin_colab)
+        self._validar_importes(df_facturas)
+
+    def _avisar_facturas_sin_colab(self, facturas_sin_colab: List):
         if facturas_sin_colab:
             self.advertencias.append(
                 f"⚠️ Hay {len(facturas_sin_colab)} factura(s) sin colaboración asociada: "
-                f"{', '.join(list(facturas_sin_colab)[:3])}{'...' if len(facturas_sin_colab) > 3 else ''}"
+                f"{', '.join(map(str, facturas_sin_colab[:3]))}{'...' if len(facturas_sin_colab) > 3 else ''}"
             )
-        
-        # Validar importes > 0
-        for idx, row in df_facturas.iterrows():
-            try:
-                importe = float(row.get("Importe (€)", 0))
-                if importe <= 0:
-                    self.errores.append(
-                        f"❌ Fila {idx + 1} (Facturas): Importe debe ser > 0, se encontró: {importe}"
-                    )
-            except (ValueError, TypeError):
-                self.errores.append(
-                    f"❌ Fila {idx + 1} (Facturas): Importe no es un número válido"
-                )
+
+    def _validar_importes(self, df_facturas: pd.DataFrame):
+        """Valida que los importes de las facturas sean números > 0."""
+
+        importe, invalido = _como_numero(df_facturas, "Importe (€)")
+        with np.errstate(invalid="ignore"):
+            fallos = invalido | (importe <= 0)
+        posiciones = np.flatnonzero(fallos)
+        self._reportar(self.errores, df_facturas, posiciones, (
+            f"❌ Fila {fila} (Facturas): Importe no es un número válido" if invalido[pos]
+            else f"❌ Fila {fila} (Facturas): Importe debe ser > 0, se encontró: {float(importe[pos])}"
+            for pos, fila in zip(posiciones, self._filas(df_facturas, posiciones))
+        ))
     
     # ==========================================
     # REPORTE Y PRESENTACIÓN
@@ -319,24 +446,33 @@ class ValidadorFichas:
 # FUNCIONES AUXILIARES GLOBALES
 # ==========================================
 
+def leer_tabla(ruta) -> pd.DataFrame:
+    """Lee un JSON (records) o un Excel según la extensión (las tablas de los proyectos, de su .parquet)."""
+    return almacen.leer(ruta)
+
+
+def combinar_resumenes(valido_personal, resumen_personal, valido_colab, resumen_colab) -> Dict:
+    """Resumen conjunto de Personal (2.1) y Colaboraciones/Facturas (2.2)."""
+    return {
+        "exitosa": valido_personal and valido_colab,
+        "personal": resumen_personal,
+        "colaboraciones": resumen_colab,
+        "mensaje_general": "✅ LISTO PARA GENERAR FICHAS" if (valido_personal and valido_colab) else "❌ Corrija los errores antes de continuar"
+    }
+
+
 def validar_antes_generar(ruta_personal, ruta_colaboraciones, ruta_facturas) -> Tuple[bool, Dict]:
     """
     Valida todos los archivos antes de generar fichas.
     Retorna (es_valido, resumen_validacion).
     """
-    import os
     validador = ValidadorFichas()
     
     try:
         # Detectar formato
-        _, ext_p = os.path.splitext(ruta_personal)
-        df_personal = pd.read_json(ruta_personal) if ext_p.lower() == '.json' else pd.read_excel(ruta_personal)
-        
-        _, ext_c = os.path.splitext(ruta_colaboraciones)
-        df_colab = pd.read_json(ruta_colaboraciones) if ext_c.lower() == '.json' else pd.read_excel(ruta_colaboraciones)
-        
-        _, ext_f = os.path.splitext(ruta_facturas)
-        df_facturas = pd.read_json(ruta_facturas) if ext_f.lower() == '.json' else pd.read_excel(ruta_facturas)
+        df_personal = leer_tabla(ruta_personal)
+        df_colab = leer_tabla(ruta_colaboraciones)
+        df_facturas = leer_tabla(ruta_facturas)
         
     except Exception as e:
         return False, {
@@ -357,11 +493,6 @@ def validar_antes_generar(ruta_personal, ruta_colaboraciones, ruta_facturas) ->
     resumen_colab = validador.obtener_resumen()
     
     # Resumen combinado
-    resumen_final = {
-        "exitosa": valido_personal and valido_colab,
-        "personal": resumen_personal,
-        "colaboraciones": resumen_colab,
-        "mensaje_general": "✅ LISTO PARA GENERAR FICHAS" if (valido_personal and valido_colab) else "❌ Corrija los errores antes de continuar"
-    }
+    resumen_final = combinar_resumenes(valido_personal, resumen_personal, valido_colab, resumen_colab)
     
     return valido_personal and valido_colab, resumen_final
@@ -0,0 +1,181 @@
+import re
+
+try:
+    from .utilidades_docx import IndiceFacturas
+except ImportError:
+    from utilidades_docx import IndiceFacturas
+
+# Separadores del formato europeo (1.234,56): intercambia "," y "." de una pasada
+_SEPARADORES_ES = str.maketrans(",.", ".,")
+
+# Campos de la tabla 1 de la Ficha 2.2 (identificación de la entidad)
+CAMPOS_COLABORACION = [
+    "Razón social", "País de la entidad", "Entidad contratante", "NIF",
+    "NIF 2", "Localidad", "Provincia", "País de realización",
+]
+
+
+class PersonaFicha:
+    """
+    Textos ya formateados del bloque de una persona en la Ficha 2.1:
+    `fields1` son las filas de la tabla 1 (etiqueta, valor, etiqueta 2,
+    valor 2, todo texto), `frase` la sección 3 y `actividad_4_1` la sección 4.
+    """
+
+    __slots__ = ("fields1", "frase", "actividad_4_1")
+
+    def __init__(self, fields1, frase, actividad_4_1):
+        self.fields1 = fields1
+        self.frase = frase
+        self.actividad_4_1 = actividad_4_1
+
+    def __eq__(self, otra):
+        return isinstance(otra, PersonaFicha) and (
+            (self.fields1, self.frase, self.actividad_4_1) == (otra.fields1, otra.frase, otra.actividad_4_1)
+        )
+
+    def __repr__(self):
+        return f"PersonaFicha({self.fields1[0][1]!r} {self.fields1[1][1]!r})"
+
+
+class ColaboracionFicha:
+    """
+    Datos ya formateados de una colaboración de la Ficha 2.2: `valores` (campo
+    de CAMPOS_COLABORACION -> texto, "" si no hay) y sus `facturas`
+    (FacturasEntidad con nombres, importes y total).
+    """
+
+    __slots__ = ("valores", "facturas")
+
+    def __init__(self, valores, facturas):
+        self.valores = valores
+        self.facturas = facturas
+
+    def __repr__(self):
+        return f"ColaboracionFicha({self.valores.get('Razón social')!r}, {len(self.facturas.nombres)} facturas)"
+
+
+def _columna(df, columna, defecto=""):
+    """Valores de la columna como lista (huecos -> defecto), o defecto en todas las filas si no existe."""
+    if columna not in df.columns:
+        return [defecto] * len(df)
+    huecos = df[columna].isna().tolist()
+    return [defecto if hueco else valor for valor, hueco in zip(df[columna].tolist(), huecos)]
+
+
+def _textos(df, columna):
+    return [str(valor).strip() for valor in _columna(df, columna)]
+
+
+def _numero_es(valor):
+    """1.234,56 a partir de un número (o texto numérico); None si no es numérico."""
+    try:
+        return f"{float(valor):,.2f}".translate(_SEPARADORES_ES)
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def _euros(valores, unidad="€"):
+    """Como formatea_euro sobre cada valor, sin triple replace."""
+    numeros = [_numero_es(valor) for valor in valores]
+    return [f"{numero or '0,00'} {unidad}" for numero in numeros]
+
+
+def ordenar_personal_2_1(df_ficha):
+    """Personal en el orden de la Ficha 2.1 (por nombre)."""
+    if not df_ficha['Nombre'].is_monotonic_increasing:
+        df_ficha = df_ficha.sort_values(by='Nombre').reset_index(drop=True)
+    return df_ficha
+
+
+def personas_2_1(df_ficha, anio):
+    """
+    PersonaFicha de cada persona de la Ficha 2.1, ordenadas por nombre. Cada
+    columna se lee y se formatea una sola vez para todas las filas; el
+    resultado es el mismo que datos_persona_2_1 fila a fila.
+    """
+    df_ficha = ordenar_personal_2_1(df_ficha)
+
+    nombres = _columna(df_ficha, "Nombre")
+    apellidos = _columna(df_ficha, "Apellidos")
+    departamentos = _columna(df_ficha, "Departamento")
+    puestos = _columna(df_ficha, "Puesto actual")
+    titulaciones_1 = _columna(df_ficha, "Titulación 1")
+    titulaciones_2 = _columna(df_ficha, "Titulación 2")
+    horas_id = _columna(df_ficha, "Horas I+D")
+    horas = [int(h) for h in _columna(df_ficha, "Horas totales", 0)]
+    costes_total = _columna(df_ficha, "Coste total (€)", 0)
+
+    euros_hora = _euros(_columna(df_ficha, "Coste horario (€/hora)", 0), "€/h")
+    euros_total = _euros(costes_total)
+    euros_id = _euros(_columna(df_ficha, "Coste I+D (€)", 0))
+    costes_texto = [numero or "0,00" for numero in map(_numero_es, costes_total)]
+
+    historial = [
+        (_textos(df_ficha, f"EMPRESA {n}"), _textos(df_ficha, f"PERIODO {n}"), _textos(df_ficha, f"PUESTO {n}"))
+        for n in range(1, 4)
+    ]
+    actividades = [_textos(df_ficha, f"Actividad {n}") for n in range(1, 5)]
+
+    personas = []
+    for i in range(len(df_ficha)):
+        fields1 = [
+            ("Nombre", str(nombres[i]), "", ""),
+            ("Apellidos", str(apellidos[i]), "", ""),
+            ("Coste horario (€/hora)", euros_hora[i], "", ""),
+            ("Coste total (€)", euros_total[i], "Horas totales", str(horas[i])),
+            ("Coste I+D (€)", euros_id[i], "Horas I+D", str(horas_id[i])),
+            ("Coste IT (€)", euros_total[i], "Horas IT", str(horas[i])),
+            ("Departamento", str(departamentos[i]), "Puesto actual", str(puestos[i])),
+            ("Titulación 1", str(titulaciones_1[i]), "Titulación 2", str(titulaciones_2[i])),
+        ]
+
+        nombre = str(nombres[i]).strip()
+        apellido = str(apellidos[i]).strip()
+        (empresa1, periodo1, cargo1), (empresa2, periodo2, cargo2), (empresa3, periodo3, cargo3) = (
+            (empresas[i], periodos[i], cargos[i]) for empresas, periodos, cargos in historial
+        )
+
+        frase = f"{nombre} {apellido} ha trabajado en {empresa1} durante el periodo de {periodo1} ocupando el cargo de {cargo1}."
+        if empresa2:
+            frase += f" También trabajó en {empresa2} durante el periodo de {periodo2} ocupando el cargo de {cargo2}."
+        if empresa3:
+            frase += f" Por último, trabajó en {empresa3} durante el periodo de {periodo3} ocupando el cargo de {cargo3}."
+
+        texto_actividades = "".join(f"{act[i]}\n" for act in actividades if act[i])
+        match_anio = re.search(r'\d{4}', periodo1)
+        anio_inicio = match_anio.group(0) if match_anio else "?????"
+
+        actividad_4_1 = (
+            f"{nombre} {apellido}, con titulación en {str(titulaciones_1[i]).strip()} ocupa el puesto de {str(puestos[i]).strip()} "
+            f"dentro del Departamento de {str(departamentos[i]).strip()}, empresa de la que forma parte desde {anio_inicio} "
+            f"y participa de manera activa durante la ejecución del proyecto. Concretamente participa durante "
+            f"{horas[i]} horas en {anio}, lo que supone un gasto de {costes_texto[i]} €.\n\n"
+            f"Su participación se considera esencial para la correcta ejecución del presente proyecto llevado "
+            f"a cabo durante la anualidad {anio}, participando concretamente en las siguientes fases y tareas del mismo:\n\n"
+            f"{texto_actividades.strip()}"
+        )
+        personas.append(PersonaFicha(fields1, frase, actividad_4_1))
+    return personas
+
+
+def colaboraciones_2_2(df_colab, df_facturas, cliente_nombre=None, cliente_nif=None):
+    """
+    ColaboracionFicha de cada colaboración de la Ficha 2.2, en orden, con los
+    textos de la tabla 1 (incluidos entidad contratante y NIF 2 del cliente
+    si se indican) y sus facturas ya agrupadas y sumadas (IndiceFacturas).
+    """
+    columnas = {campo: _columna(df_colab, campo, None) for campo in CAMPOS_COLABORACION}
+    # Sin sustituir huecos: una razón social vacía no tiene facturas (NaN no casa con ninguna entidad)
+    entidades = df_colab["Razón social"].tolist() if "Razón social" in df_colab.columns else [""] * len(df_colab)
+    facturas = IndiceFacturas(df_facturas)
+
+    colaboraciones = []
+    for i in range(len(df_colab)):
+        valores = {campo: "" if columna[i] is None else str(columna[i]) for campo, columna in columnas.items()}
+        if cliente_nombre:
+            valores["Entidad contratante"] = str(cliente_nombre)
+        if cliente_nif:
+            valores["NIF 2"] = str(cliente_nif)
+        colaboraciones.append(ColaboracionFicha(valores, facturas.de(entidades[i])))
+    return colaboraciones
@@ -0,0 +1,71 @@
+import io
+import zipfile
+
+TAMANO_TROZO = 64 * 1024
+
+
+class _SalidaZip(io.RawIOBase):
+    """
+    Destino de escritura sin seek para zipfile: acumula lo escrito hasta que
+    se vacía. Al no poder hacer seek, zipfile escribe cada entrada con
+    descriptor de datos (CRC y tamaños tras el contenido), sin volver atrás.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._buffer += datos
+        return len(datos)
+
+    def pendiente(self):
+        return len(self._buffer)
+
+    def vaciar(self):
+        datos = bytes(self._buffer)
+        self._buffer.clear()
+        return datos
+
+
+def zip_en_streaming(entradas, tamano_trozo=TAMANO_TROZO):
+    """
+    Genera un ZIP en trozos de ~`tamano_trozo` bytes a partir de `entradas`,
+    un iterable de (nombre dentro del ZIP, ruta del archivo). Cada archivo se
+    lee y comprime por bloques, así que la memoria usada no depende del
+    tamaño del ZIP, y el primer trozo sale en cuanto se ha comprimido el
+    primer bloque. `entradas` puede ser un generador que cree los archivos
+    sobre la marcha (se pide el siguiente cuando el anterior ya está escrito).
+
+        return StreamingResponse(zip_en_streaming([("Ficha_2_1.docx", salida_2_1)]),
+                                 media_type="application/zip")
+    """
+    salida = _SalidaZip()
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for nombre, ruta in entradas:
+            info = zipfile.ZipInfo.from_file(ruta, nombre)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(ruta, "rb") as origen, zip_file.open(info, "w") as destino:
+                while True:
+                    bloque = origen.read(tamano_trozo)
+                    if not bloque:
+                        break
+                    destino.write(bloque)
+                    if salida.pendiente() >= tamano_trozo:
+                        yield salida.vaciar()
+            if salida.pendiente():
+                yield salida.vaciar()
+    # Directorio central
+    yield salida.vaciar()
+
+
+def leer_en_trozos(ruta, tamano_trozo=TAMANO_TROZO):
+    """Contenido de `ruta` en trozos de `tamano_trozo` bytes (p. ej. un ZIP ya en caché)."""
+    with open(ruta, "rb") as f:
+        while True:
+            trozo = f.read(tamano_trozo)
+            if not trozo:
+                break
+            yield trozo
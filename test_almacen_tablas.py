@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test del almacén columnar de tablas: guardar escribe solo el .parquet; el
+JSON importado da el mismo DataFrame que pd.read_json salvo las columnas del
+esquema, que se convierten a su tipo; los JSON se importan una sola vez y
+leer nunca escribe; lee solo las columnas pedidas y exporta el JSON de
+siempre.
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from almacen_tablas import AlmacenTablas, ValoresFueraDeEsquema, ruta_parquet, CLAVE_METADATOS
+
+INPUTS = os.path.join(os.path.dirname(__file__), 'inputs')
+PERSONAL = 'Excel_Personal_2.1.json'
+
+
+def escribir(ruta, registros):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(registros, f, ensure_ascii=False)
+
+
+def test_fidelidad():
+    """Sin columnas que convertir, el .parquet da el mismo DataFrame que el JSON."""
+    casos = {
+        "anidada": [{"Nombre": "Luis", "Extra": {"a": 1}}, {"Nombre": "Eva", "Extra": [1, 2]}],
+        "extra mezclada": [{"Nombre": "Ana", "Notas": 3}, {"Nombre": "Eva", "Notas": "tres"}],
+        "vacia": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for caso, registros in casos.items():
+            almacen = AlmacenTablas()
+            carpeta = os.path.join(tmp, caso)
+            os.makedirs(carpeta)
+            ruta = os.path.join(carpeta, PERSONAL)
+            escribir(ruta, registros)
+            esperado = pd.read_json(ruta)
+            assert almacen.migrar(ruta)
+            pd.testing.assert_frame_equal(almacen.leer(ruta), esperado)
+            stats = almacen.estadisticas()
+            assert stats["migraciones"] == 1 and stats["lecturas_parquet"] == 1 and stats["lecturas_json"] == 0, caso
+    print("✅ El .parquet da el mismo DataFrame que el JSON (anidados, columnas fuera del esquema y vacío)")
+
+
+def test_esquema():
+    """Las columnas del esquema se guardan con su tipo; lo que no se puede convertir se rechaza."""
+    with tempfile.TemporaryDirectory() as tmp:
+        almacen = AlmacenTablas()
+        ruta = os.path.join(tmp, PERSONAL)
+
+        # El anexo de ejemplo trae "" en columnas numéricas: quedan vacías
+        shutil.copy(os.path.join(INPUTS, PERSONAL), ruta)
+        esperado = pd.read_json(ruta)
+        assert almacen.migrar(ruta)
+        df = almacen.leer(ruta)
+        for columna in ("Coste I+D (€)", "Horas I+D"):
+            assert list(esperado[columna].unique()) == [""]
+            assert df[columna].dtype == "float64" and df[columna].isna().all()
+            esperado[columna] = float("nan")
+        pd.testing.assert_frame_equal(df, esperado)
+
+        almacen.guardar(ruta, pd.DataFrame({
+            "Nombre": [12345678.0, None], "Horas totales": ["1200", 800.5],
+            "Coste total (€)": ["", 900], "Horas IT": [10, 20],
+        }))
+        df = almacen.leer(ruta)
+        assert df["Nombre"].tolist()[0] == "12345678" and pd.isna(df["Nombre"].tolist()[1])
+        assert df["Horas totales"].tolist() == [1200.0, 800.5]
+        assert pd.isna(df["Coste total (€)"][0]) and df["Coste total (€)"][1] == 900.0
+        assert df["Horas IT"].dtype == "int64"
+
+        antes = os.stat(ruta_parquet(ruta)).st_mtime_ns
+        for malo in ({"Coste total (€)": ["1.234,5", 900]}, {"Horas IT": [True, 2]}, {"Nombre": [["Ana"], "Eva"]}):
+            try:
+                almacen.guardar(ruta, pd.DataFrame(malo))
+                raise AssertionError(f"debía rechazarse: {malo}")
+            except ValoresFueraDeEsquema as e:
+                assert e.columna == next(iter(malo)) and e.fallos[0][0] == 0
+        assert os.stat(ruta_parquet(ruta)).st_mtime_ns == antes
+
+        # Un JSON que no cumple el esquema no se importa: se sigue leyendo del JSON
+        otra = os.path.join(tmp, "otro", PERSONAL)
+        os.makedirs(os.path.dirname(otra))
+        escribir(otra, [{"Nombre": "Ana", "Coste total (€)": "1.234,5"}])
+        resumen = almacen.migrar_todo(os.path.dirname(otra))
+        assert resumen["migradas"] == 0 and "Coste total" in resumen["errores"][0]
+        assert not os.path.exists(ruta_parquet(otra)) and almacen.leer(otra)["Coste total (€)"].tolist() == ["1.234,5"]
+    print("✅ Columnas del esquema convertidas a su tipo, valores imposibles rechazados")
+
+
+def test_guardar_sin_json():
+    """guardar() escribe solo el .parquet; archivo() y existe() apuntan a él."""
+    with tempfile.TemporaryDirectory() as tmp:
+        almacen = AlmacenTablas()
+        ruta = os.path.join(tmp, PERSONAL)
+        assert not almacen.existe(ruta) and almacen.archivo(ruta) == ruta
+        almacen.guardar(ruta, pd.DataFrame({"Nombre": ["Ana", "Luis"]}))
+        assert not os.path.exists(ruta) and almacen.existe(ruta) and almacen.archivo(ruta) == ruta_parquet(ruta)
+        assert list(almacen.leer(ruta)["Nombre"]) == ["Ana", "Luis"] and almacen.contar(ruta) == 2
+        assert json.loads(almacen.exportar_json(ruta)) == [{"Nombre": "Ana"}, {"Nombre": "Luis"}]
+
+        # Otros archivos se siguen guardando en JSON
+        otra = os.path.join(tmp, "metadata.json")
+        almacen.guardar(otra, pd.DataFrame({"a": [1]}))
+        assert almacen.archivo(otra) == otra and pd.read_json(otra)["a"].tolist() == [1]
+        stats = almacen.estadisticas()
+        assert stats["escrituras"] == 1 and stats["migraciones"] == 0 and stats["lecturas_json"] == 0
+    print("✅ guardar() escribe el .parquet sin pasar por JSON")
+
+
+def test_leer_no_escribe():
+    with tempfile.TemporaryDirectory() as tmp:
+        almacen = AlmacenTablas()
+        ruta = os.path.join(tmp, PERSONAL)
+        escribir(ruta, [{"Nombre": "Ana"}])
+        assert len(almacen.leer(ruta)) == 1 and almacen.contar(ruta) == 1
+        assert not os.path.exists(ruta_parquet(ruta)) and almacen.archivo(ruta) == ruta
+        assert almacen.estadisticas()["lecturas_json"] == 1
+    print("✅ Leer no escribe: sin importar, la tabla sale del JSON")
+
+
+def test_importa_una_vez():
+    with tempfile.TemporaryDirectory() as tmp:
+        almacen = AlmacenTablas()
+        ruta = os.path.join(tmp, PERSONAL)
+        escribir(ruta, [{"Nombre": "Ana"}])
+        assert almacen.migrar(ruta) and not almacen.migrar(ruta)
+        assert almacen.migrar_todo(tmp) == {"tablas": 1, "migradas": 0, "errores": []}
+
+        # Importado, el JSON ya no cuenta: ni se lee ni se vuelve a importar
+        almacen.guardar(ruta, pd.DataFrame({"Nombre": ["Ana", "Luis"]}))
+        escribir(ruta, [{"Nombre": "Eva"}])
+        assert not almacen.migrar(ruta)
+        assert list(almacen.leer(ruta)["Nombre"]) == ["Ana", "Luis"] and almacen.contar(ruta) == 2
+
+        # Salvo que se fuerce
+        assert almacen.migrar(ruta, forzar=True)
+        assert list(almacen.leer(ruta)["Nombre"]) == ["Eva"]
+        stats = almacen.estadisticas()
+        assert stats["migraciones"] == 2 and stats["lecturas_json"] == 0
+
+        # Un .parquet de un formato anterior (copia del JSON) se vuelve a importar
+        tabla = pq.read_table(ruta_parquet(ruta))
+        pq.write_table(tabla.replace_schema_metadata({CLAVE_METADATOS: json.dumps({"version": "2"}).encode()}),
+                       ruta_parquet(ruta))
+        escribir(ruta, [{"Nombre": "Eva"}, {"Nombre": "Luis"}])
+        assert almacen.contar(ruta) == 2 and almacen.migrar_todo(tmp)["migradas"] == 1
+        assert list(almacen.leer(ruta)["Nombre"]) == ["Eva", "Luis"]
+    print("✅ Los JSON se importan una sola vez (o al forzar, o desde un formato anterior)")
+
+
+def test_columnas_contar_y_exportar():
+    with tempfile.TemporaryDirectory() as tmp:
+        almacen = AlmacenTablas()
+        ruta = os.path.join(tmp, PERSONAL)
+        shutil.copy(os.path.join(INPUTS, PERSONAL), ruta)
+        completo = pd.read_json(ruta)
+        almacen.migrar(ruta)
+
+        nombres = almacen.leer(ruta, columnas=["Nombre", "No existe"])
+        assert list(nombres.columns) == ["Nombre"] and list(nombres["Nombre"]) == list(completo["Nombre"])
+        assert almacen.contar(ruta) == len(completo)
+
+        exportado = almacen.exportar_json(ruta)
+        escribir(os.path.join(tmp, 'copia.json'), json.loads(exportado))
+        pd.testing.assert_frame_equal(pd.read_json(os.path.join(tmp, 'copia.json')), almacen.leer(ruta))
+    print("✅ Lectura por columnas, recuento desde metadatos y exportación a JSON")
+
+
+if __name__ == "__main__":
+    test_fidelidad()
+    test_esquema()
+    test_guardar_sin_json()
+    test_leer_no_escribe()
+    test_importa_una_vez()
+    test_columnas_contar_y_exportar()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la caché de anexos procesados: un mismo archivo debe restaurar los
+JSON sin reprocesar, y la caché no debe pasar de su tamaño máximo.
+"""
+
+import sys
+import os
+import json
+import glob
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from cache_anexos import CacheAnexos
+from procesar_anexo import ARCHIVOS_SALIDA
+
+DATASET_DIR = os.path.join(os.path.dirname(__file__), 'Dataset de Anexos')
+
+
+def _generar_salida(directorio, nif):
+    """Simula la salida de procesar_anexo en `directorio`."""
+    os.makedirs(directorio, exist_ok=True)
+    for nombre in ARCHIVOS_SALIDA:
+        contenido = {"nif_cliente": nif} if nombre == "metadata.json" else [{"Nombre": nif * 50}]
+        with open(os.path.join(directorio, nombre), 'w', encoding='utf-8') as f:
+            json.dump(contenido, f)
+
+
+def test_hit_restaura_archivos():
+    """Tras guardar, la misma clave restaura los JSON en otro proyecto."""
+    anexo = sorted(glob.glob(os.path.join(DATASET_DIR, '*.xlsx')))[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CacheAnexos(os.path.join(tmp, 'cache'))
+        clave = cache.clave(anexo)
+        assert clave == cache.clave(anexo)
+
+        assert cache.restaurar(clave, os.path.join(tmp, 'P1')) is None
+        _generar_salida(os.path.join(tmp, 'P1'), 'B12345678')
+        assert cache.guardar(clave, os.path.join(tmp, 'P1'))
+
+        metadata = cache.restaurar(clave, os.path.join(tmp, 'P2'))
+        assert metadata == {"nif_cliente": "B12345678"}
+        for nombre in ARCHIVOS_SALIDA:
+            assert os.path.exists(os.path.join(tmp, 'P2', nombre))
+
+        stats = cache.estadisticas()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entradas"] == 1
+    print("✅ Cache HIT restaura los JSON")
+
+
+def test_version_distinta_no_reutiliza():
+    """Cambiar la versión del extractor invalida las entradas anteriores."""
+    anexo = sorted(glob.glob(os.path.join(DATASET_DIR, '*.xlsx')))[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        directorio = os.path.join(tmp, 'cache')
+        vieja = CacheAnexos(directorio, version="1")
+        _generar_salida(os.path.join(tmp, 'P1'), 'A')
+        vieja.guardar(vieja.clave(anexo), os.path.join(tmp, 'P1'))
+
+        nueva = CacheAnexos(directorio, version="2")
+        assert nueva.restaurar(nueva.clave(anexo), os.path.join(tmp, 'P2')) is None
+    print("✅ Versión del extractor forma parte de la clave")
+
+
+def test_lru_respeta_tamano_maximo():
+    """Al superar max_bytes se expulsa la entrada usada hace más tiempo."""
+    with tempfile.TemporaryDirectory() as tmp:
+        _generar_salida(os.path.join(tmp, 'P'), 'X')
+        tamano_entrada = sum(os.path.getsize(os.path.join(tmp, 'P', f)) for f in ARCHIVOS_SALIDA)
+        cache = CacheAnexos(os.path.join(tmp, 'cache'), max_bytes=int(tamano_entrada * 2.5))
+
+        for clave in ("a", "b"):
+            cache.guardar(clave, os.path.join(tmp, 'P'))
+            time.sleep(0.05)
+        cache.restaurar("a", os.path.join(tmp, 'Q'))  # "a" pasa a ser la más reciente
+        time.sleep(0.05)
+        cache.guardar("c", os.path.join(tmp, 'P'))
+
+        assert sorted(os.listdir(os.path.join(tmp, 'cache'))) == ["a", "c"]
+        assert cache.estadisticas()["bytes"] <= cache.max_bytes
+    print("✅ LRU expulsa la entrada menos usada")
+
+
+if __name__ == "__main__":
+    test_hit_restaura_archivos()
+    test_version_distinta_no_reutiliza()
+    test_lru_respeta_tamano_maximo()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la caché de experiencias de CVs: un PDF ya extraído no se vuelve a
+abrir con pdfplumber, aunque cambie de nombre, y el resultado es el mismo;
+al pasarse de max_bytes se expulsan las entradas menos usadas.
+"""
+
+import sys
+import os
+import glob
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from cache_cvs import CacheExperiencias
+from procesar_cvs import extraer_experiencias, VERSION_PARSER_CV
+
+CVS_DIR = os.path.join(os.path.dirname(__file__), 'inputs', 'cvs')
+
+
+def test_segunda_pasada_sale_de_cache():
+    """La segunda extracción sirve todos los PDFs desde la caché."""
+    rutas = sorted(glob.glob(os.path.join(CVS_DIR, '*.pdf')))
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CacheExperiencias(tmp, VERSION_PARSER_CV)
+        primera = extraer_experiencias(rutas, workers=1, cache=cache)
+        assert cache.misses == len(rutas) and cache.hits == 0
+
+        segunda = extraer_experiencias(rutas, workers=1, cache=cache)
+        assert segunda == primera
+        assert cache.hits == len(rutas)
+    print(f"✅ {len(rutas)} CVs servidos desde la caché")
+
+
+def test_pdf_renombrado_reutiliza_entrada():
+    """La clave depende del contenido, no del nombre del archivo."""
+    ruta = sorted(glob.glob(os.path.join(CVS_DIR, '*.pdf')))[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        copia = os.path.join(tmp, 'renombrado.pdf')
+        shutil.copyfile(ruta, copia)
+        cache = CacheExperiencias(os.path.join(tmp, 'cache'), VERSION_PARSER_CV)
+        original = extraer_experiencias([ruta], cache=cache)[ruta]
+        assert extraer_experiencias([copia], cache=cache)[copia] == original
+        assert cache.hits == 1
+
+        otra_version = CacheExperiencias(os.path.join(tmp, 'cache'), VERSION_PARSER_CV + "-b")
+        assert otra_version.obtener(otra_version.clave(ruta)) is None
+    print("✅ PDF renombrado reutiliza la entrada; otra versión no")
+
+
+def test_lru_expulsa_la_menos_usada():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CacheExperiencias(tmp, VERSION_PARSER_CV, max_bytes=250)
+        experiencias = [{"EMPRESA": "x" * 80}]
+        for clave in ("a", "b"):
+            cache.guardar(clave, experiencias)
+            time.sleep(0.05)
+        assert cache.obtener("a") is not None  # "a" pasa a ser la más reciente
+        time.sleep(0.05)
+        cache.guardar("c", experiencias)
+        assert cache.obtener("b") is None
+        assert cache.obtener("a") is not None and cache.obtener("c") is not None
+        stats = cache.estadisticas()
+        assert stats["entradas"] == 2 and stats["bytes"] <= 250
+    print("✅ LRU expulsa la entrada menos usada")
+
+
+if __name__ == "__main__":
+    test_segunda_pasada_sale_de_cache()
+    test_pdf_renombrado_reutiliza_entrada()
+    test_lru_expulsa_la_menos_usada()
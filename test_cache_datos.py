@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la caché en memoria de tablas: una tabla se parsea una sola vez
+mientras no cambie en disco, los conteos no construyen el DataFrame y la
+memoria ocupada no pasa del máximo.
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from cache_datos import CacheDatos, leer_datos
+
+
+def _escribir(ruta, n_filas, nombre="Persona"):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump([{"Nombre": f"{nombre} {i}", "Horas totales": i} for i in range(n_filas)], f)
+
+
+class _LectorContado:
+    def __init__(self):
+        self.lecturas = 0
+
+    def __call__(self, ruta):
+        self.lecturas += 1
+        return leer_datos(ruta)
+
+
+def test_invalidacion_por_mtime():
+    """Se reutiliza el DataFrame hasta que el archivo cambia; las copias no ensucian el caché."""
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'Excel_Personal_2.1.json')
+        _escribir(ruta, 10)
+        lector = _LectorContado()
+        cache = CacheDatos(lector=lector)
+
+        df = cache.leer(ruta)
+        df["Nombre"] = ""  # modificar la copia devuelta no toca la del caché
+        assert cache.leer(ruta)["Nombre"].iloc[0] == "Persona 0"
+        assert lector.lecturas == 1
+
+        _escribir(ruta, 12, nombre="Otra")
+        assert len(cache.leer(ruta)) == 12 and lector.lecturas == 2
+
+        # Escritura del propio backend: mismo tamaño y posiblemente mismo mtime
+        _escribir(ruta, 12, nombre="Nueva")
+        cache.invalidar(ruta, filas=12)
+        assert cache.leer(ruta)["Nombre"].iloc[0] == "Nueva 0"
+        print(f"✅ Invalidación por mtime/tamaño y por escritura: {cache.estadisticas()}")
+
+
+def test_contar_sin_parsear():
+    """contar() no construye el DataFrame y usa el conteo anotado al escribir."""
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'Excel_Facturas_2.2.json')
+        _escribir(ruta, 7)
+        lector = _LectorContado()
+        cache = CacheDatos(lector=lector)
+
+        assert cache.contar(ruta) == 7 and cache.contar(ruta) == 7
+        assert cache.contar(os.path.join(tmp, 'no_existe.json')) is None
+        _escribir(ruta, 3)
+        cache.invalidar(ruta, filas=3)
+        assert cache.contar(ruta) == 3
+        assert lector.lecturas == 0
+        print("✅ Conteos sin parsear la tabla")
+
+
+def test_limite_de_memoria():
+    """Al pasarse del máximo se expulsan las tablas menos usadas."""
+    with tempfile.TemporaryDirectory() as tmp:
+        rutas = [os.path.join(tmp, f'tabla_{i}.json') for i in range(4)]
+        for ruta in rutas:
+            _escribir(ruta, 200)
+        tamano = int(leer_datos(rutas[0]).memory_usage(index=True, deep=True).sum())
+        cache = CacheDatos(max_bytes=int(tamano * 2.5))
+
+        cache.leer(rutas[0])
+        cache.leer(rutas[1])
+        cache.leer(rutas[0])  # la 0 pasa a ser la más reciente
+        cache.leer(rutas[2])  # expulsa la 1
+        estadisticas = cache.estadisticas()
+        assert estadisticas["tablas"] == 2 and estadisticas["bytes"] <= cache.max_bytes
+
+        fallos = cache.misses
+        cache.leer(rutas[0])
+        assert cache.misses == fallos
+        cache.leer(rutas[1])
+        assert cache.misses == fallos + 1
+        # Los conteos siguen disponibles aunque la tabla se haya expulsado
+        assert cache.contar(rutas[2]) == 200
+        print(f"✅ LRU dentro del límite: {estadisticas}")
+
+
+if __name__ == "__main__":
+    test_invalidacion_por_mtime()
+    test_contar_sin_parsear()
+    test_limite_de_memoria()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la caché de fichas generadas: la clave cambia con los datos, la
+plantilla, los parámetros o la versión del generador, y la caché no pasa de
+su tamaño máximo.
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from cache_fichas import CacheFichas
+
+
+def _escribir(ruta, contenido):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(contenido, f)
+
+
+def test_clave_y_restaurar():
+    """Mismas entradas y parámetros → misma ficha; cualquier cambio → fallo."""
+    with tempfile.TemporaryDirectory() as tmp:
+        datos = os.path.join(tmp, 'Excel_Personal_2.1.json')
+        plantilla = os.path.join(tmp, '2.1.docx')
+        _escribir(datos, [{"Nombre": "Ana"}])
+        _escribir(plantilla, "plantilla")
+        cache = CacheFichas(os.path.join(tmp, 'cache'))
+
+        clave = cache.clave("2.1", [datos, plantilla], {"anio": 2024})
+        salida = os.path.join(tmp, 'outputs', 'Ficha_2_1.docx')
+        assert not cache.restaurar(clave, salida)
+        os.makedirs(os.path.dirname(salida))
+        _escribir(salida, "ficha generada")
+        assert cache.guardar(clave, salida)
+        os.remove(salida)
+        assert cache.restaurar(clave, salida) and open(salida, encoding='utf-8').read() == '"ficha generada"'
+
+        assert cache.clave("2.1", [datos, plantilla], {"anio": 2024}) == clave
+        assert cache.clave("2.1", [datos, plantilla], {"anio": 2023}) != clave
+        assert CacheFichas(os.path.join(tmp, 'cache'), version="otra").clave("2.1", [datos, plantilla], {"anio": 2024}) != clave
+        _escribir(plantilla, "plantilla nueva")
+        assert cache.clave("2.1", [datos, plantilla], {"anio": 2024}) != clave
+
+        cache.guardar_bytes("zip1", b"PK...", ".zip")
+        assert cache.leer("zip1", ".zip") == b"PK..." and cache.leer("zip2", ".zip") is None
+        assert open(cache.localizar("zip1", ".zip"), 'rb').read() == b"PK..." and cache.localizar("zip2", ".zip") is None
+        print(f"✅ Clave por contenido y parámetros: {cache.estadisticas()}")
+
+
+def test_limite_de_tamano():
+    """Al pasarse del máximo se expulsan las fichas menos usadas."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CacheFichas(os.path.join(tmp, 'cache'), max_bytes=2500)
+        for i in range(3):
+            cache.guardar_bytes(f"f{i}", b"x" * 1000, ".docx")
+            time.sleep(0.02)
+        estadisticas = cache.estadisticas()
+        assert estadisticas["entradas"] == 2 and estadisticas["bytes"] <= 2500
+        assert cache.leer("f0", ".docx") is None and cache.leer("f2", ".docx") is not None
+        print(f"✅ LRU dentro del límite: {estadisticas}")
+
+
+if __name__ == "__main__":
+    test_clave_y_restaurar()
+    test_limite_de_tamano()
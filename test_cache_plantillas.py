@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la caché de plantillas: la plantilla se abre una vez, las copias son
+independientes, se recarga si cambia el archivo y las fichas generadas con la
+caché son iguales generación tras generación.
+"""
+
+import sys
+import os
+import time
+import shutil
+import zipfile
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from cache_plantillas import CachePlantillas, plantillas
+from logica_fichas import generar_ficha_2_1
+
+INPUTS = os.path.join(os.path.dirname(__file__), 'inputs')
+
+
+def test_copias_independientes():
+    cache = CachePlantillas()
+    ruta = os.path.join(INPUTS, '2.1.docx')
+    a = cache.copia(ruta)
+    b = cache.copia(ruta)
+    a.add_paragraph("solo en la copia A")
+    assert "solo en la copia A" not in [p.text for p in b.paragraphs]
+    assert "solo en la copia A" not in [p.text for p in cache.copia(ruta).paragraphs]
+    assert all(t.style.name == "Table Grid" for t in b.tables)
+    assert a.styles.element is b.styles.element  # las partes que no se tocan se comparten
+    assert cache.estilo_tablas(ruta) == b.tables[0]._tbl.tblStyle_val
+    stats = cache.estadisticas()
+    assert stats["misses"] == 1 and stats["hits"] == 3
+    print("✅ Plantilla abierta una vez; copias independientes")
+
+
+def test_recarga_si_cambia():
+    cache = CachePlantillas()
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'plantilla.docx')
+        shutil.copy(os.path.join(INPUTS, '2.1.docx'), ruta)
+        cache.copia(ruta)
+
+        # Mismo contenido con otra fecha: no se vuelve a abrir
+        os.utime(ruta, ns=(time.time_ns(), time.time_ns() + 10**9))
+        cache.copia(ruta)
+        assert cache.estadisticas()["misses"] == 1
+
+        shutil.copy(os.path.join(INPUTS, '2.2.docx'), ruta)
+        os.utime(ruta, ns=(time.time_ns(), time.time_ns() + 2 * 10**9))
+        nueva = cache.copia(ruta)
+        assert cache.estadisticas()["misses"] == 2
+        assert len(nueva.tables) == 1
+    print("✅ Plantilla recargada solo cuando cambia su contenido")
+
+
+def test_fichas_iguales_con_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        salidas = []
+        for i in range(2):
+            salida = os.path.join(tmp, f'ficha_{i}.docx')
+            generar_ficha_2_1(os.path.join(INPUTS, 'Excel_Personal_2.1.json'),
+                              os.path.join(INPUTS, '2.1.docx'), salida, 2024, 'ACR')
+            with zipfile.ZipFile(salida) as z:
+                salidas.append({n: z.read(n) for n in z.namelist()})
+        assert salidas[0] == salidas[1]
+        assert plantillas.estadisticas()["hits"] >= 1
+    print("✅ Fichas generadas con la caché idénticas entre generaciones")
+
+
+if __name__ == "__main__":
+    test_copias_independientes()
+    test_recarga_si_cambia()
+    test_fichas_iguales_con_cache()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test del catálogo de clientes y proyectos: se construye desde las carpetas,
+se mantiene con altas/bajas y pagina por cursor con búsqueda.
+"""
+
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from catalogo import CatalogoProyectos
+
+
+def _crear_cliente(proyectos_dir, nif, nombre=None, proyectos=()):
+    client_dir = os.path.join(proyectos_dir, f"Cliente_{nif}")
+    for carpeta in ('data', 'history', 'cvs', *proyectos):
+        os.makedirs(os.path.join(client_dir, carpeta), exist_ok=True)
+    if nombre:
+        with open(os.path.join(client_dir, 'config.json'), 'w', encoding='utf-8') as f:
+            json.dump({'nombre': nombre}, f)
+
+
+def test_reconstruir_desde_disco():
+    """Un índice nuevo recoge clientes, nombres y proyectos (sin data/history/cvs)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        _crear_cliente(tmp, "B2", "Beta SL", ["P1", "P2"])
+        _crear_cliente(tmp, "A1")
+        catalogo = CatalogoProyectos(os.path.join(tmp, 'catalogo.sqlite3'), tmp)
+
+        clientes, siguiente = catalogo.listar_clientes()
+        assert [(c["nif"], c["nombre"]) for c in clientes] == [("A1", "A1"), ("B2", "Beta SL")] and siguiente is None
+        assert catalogo.listar_proyectos("B2") == (["P1", "P2"], None)
+
+        # Persiste: otra instancia no vuelve a recorrer las carpetas
+        _crear_cliente(tmp, "C3")
+        otro = CatalogoProyectos(os.path.join(tmp, 'catalogo.sqlite3'), tmp)
+        assert len(otro.listar_clientes()[0]) == 2
+        assert otro.reconstruir() == (3, 2)
+        catalogo.cerrar()
+        otro.cerrar()
+        print("✅ Catálogo reconstruido desde disco y persistente")
+
+
+def test_altas_bajas_y_paginas():
+    """Altas, renombrado y bajas se reflejan; las páginas encadenan con el cursor."""
+    with tempfile.TemporaryDirectory() as tmp:
+        catalogo = CatalogoProyectos(os.path.join(tmp, 'catalogo.sqlite3'), tmp)
+        for i in range(25):
+            catalogo.registrar_cliente(f"N{i:03d}", f"Empresa {i % 5}_{i}")
+        catalogo.registrar_proyecto("N001", "PROY")
+        catalogo.registrar_proyecto("X999", "NUEVO")  # el cliente se da de alta solo
+        catalogo.registrar_cliente("N000", "Renombrada")
+        catalogo.registrar_cliente("N000")  # sin nombre no borra el que había
+
+        vistos, cursor = [], None
+        while True:
+            pagina, cursor = catalogo.listar_clientes(limite=10, despues_de=cursor)
+            vistos += [c["nif"] for c in pagina]
+            if cursor is None:
+                break
+        assert vistos == sorted([f"N{i:03d}" for i in range(25)] + ["X999"])
+
+        assert [c["nif"] for c in catalogo.listar_clientes(buscar="renomb")[0]] == ["N000"]
+        # Desde 3 caracteres se busca dentro del campo, con comodines literales
+        assert len(catalogo.listar_clientes(buscar="a 3_")[0]) == 5
+        assert [c["nif"] for c in catalogo.listar_clientes(buscar="SA 1_1")[0]] == ["N001", "N011", "N016"]
+        pagina, cursor = catalogo.listar_clientes(buscar="empresa", limite=20)
+        assert len(pagina) == 20 and len(catalogo.listar_clientes(buscar="empresa", despues_de=cursor)[0]) == 4
+        # Con menos, por el principio del NIF o del nombre
+        assert [c["nif"] for c in catalogo.listar_clientes(buscar="x9")[0]] == ["X999"]
+        assert [c["nif"] for c in catalogo.listar_clientes(buscar="re")[0]] == ["N000"]
+        assert catalogo.listar_clientes(buscar="_3")[0] == []
+        assert catalogo.listar_clientes(buscar="%")[0] == []
+        assert catalogo.listar_proyectos("X999", buscar="uev") == (["NUEVO"], None)
+        assert catalogo.listar_proyectos("X999", buscar="nu") == (["NUEVO"], None)
+
+        catalogo.eliminar_cliente("N001")
+        assert [c["nif"] for c in catalogo.listar_clientes(buscar="SA 1_1")[0]] == ["N011", "N016"]
+        assert not catalogo.existe_cliente("N001") and catalogo.listar_proyectos("N001") == ([], None)
+        catalogo.eliminar_proyecto("X999", "NUEVO")
+        assert catalogo.listar_proyectos("X999") == ([], None)
+        assert catalogo.listar_proyectos("X999", buscar="uev") == ([], None)
+        catalogo.cerrar()
+        print("✅ Altas, bajas, búsqueda y paginación por cursor")
+
+
+def test_indice_antiguo_se_rehace():
+    """Un catálogo con el esquema anterior (sin índice de búsqueda) se rehace desde disco."""
+    with tempfile.TemporaryDirectory() as tmp:
+        _crear_cliente(tmp, "B2", "Beta SL", ["P1"])
+        ruta_db = os.path.join(tmp, 'catalogo.sqlite3')
+        conexion = sqlite3.connect(ruta_db)
+        conexion.executescript(
+            "CREATE TABLE clientes (nif TEXT PRIMARY KEY, nombre TEXT);"
+            "CREATE TABLE proyectos (nif TEXT, acronimo TEXT, PRIMARY KEY (nif, acronimo));"
+            "INSERT INTO clientes VALUES ('VIEJO', 'Sin carpeta');"
+        )
+        conexion.close()
+
+        catalogo = CatalogoProyectos(ruta_db, tmp)
+        assert [c["nif"] for c in catalogo.listar_clientes(buscar="beta")[0]] == ["B2"]
+        assert not catalogo.existe_cliente("VIEJO")
+        catalogo.cerrar()
+        print("✅ Catálogo de un esquema anterior rehecho")
+
+
+if __name__ == "__main__":
+    test_reconstruir_desde_disco()
+    test_altas_bajas_y_paginas()
+    test_indice_antiguo_se_rehace()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la cola de trabajos en segundo plano: límite de hilos, un solo
+trabajo a la vez por proyecto (también frente a las reservas de los
+endpoints síncronos), cancelación y captura de errores.
+"""
+
+import sys
+import os
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from cola_trabajos import ColaTrabajos
+
+
+def _esperar(cola, trabajos, limite=10):
+    inicio = time.time()
+    while not all(t.finalizado for t in trabajos):
+        assert time.time() - inicio < limite, "Los trabajos no terminan"
+        time.sleep(0.01)
+
+
+def test_mismo_proyecto_en_serie():
+    """Dos trabajos del mismo proyecto no se solapan y respetan el orden."""
+    cola = ColaTrabajos(max_workers=4)
+    en_marcha = {"P1": 0}
+    maximo = {"P1": 0}
+    orden = []
+    lock = threading.Lock()
+
+    def tarea(trabajo, n):
+        with lock:
+            en_marcha["P1"] += 1
+            maximo["P1"] = max(maximo["P1"], en_marcha["P1"])
+        time.sleep(0.05)
+        trabajo.avanzar(50, "mitad")
+        with lock:
+            en_marcha["P1"] -= 1
+            orden.append(n)
+        return n
+
+    trabajos = [cola.enviar("prueba", ["Cliente_X/P1"], tarea, n) for n in range(4)]
+    _esperar(cola, trabajos)
+    assert maximo["P1"] == 1
+    assert orden == [0, 1, 2, 3]
+    assert [t.resultado for t in trabajos] == [0, 1, 2, 3]
+    assert all(t.estado == "completado" and t.progreso == 100 for t in trabajos)
+    cola.cerrar()
+    print("✅ Trabajos del mismo proyecto en serie")
+
+
+def test_proyectos_distintos_en_paralelo_con_limite():
+    """Proyectos distintos corren a la vez, sin superar max_workers."""
+    cola = ColaTrabajos(max_workers=2)
+    activos = []
+    maximo = [0]
+    lock = threading.Lock()
+
+    def tarea(trabajo):
+        with lock:
+            activos.append(trabajo.id)
+            maximo[0] = max(maximo[0], len(activos))
+        time.sleep(0.05)
+        with lock:
+            activos.remove(trabajo.id)
+
+    trabajos = [cola.enviar("prueba", [f"Cliente_X/P{n}"], tarea) for n in range(5)]
+    _esperar(cola, trabajos)
+    assert maximo[0] == 2
+    cola.cerrar()
+    print("✅ Pool acotado a max_workers")
+
+
+def test_cancelacion_y_errores():
+    """Un trabajo en cola se cancela sin ejecutarse; las excepciones quedan en 'error'."""
+    cola = ColaTrabajos(max_workers=1)
+    liberar = threading.Event()
+    ejecutados = []
+
+    def bloqueante(trabajo):
+        liberar.wait(5)
+        trabajo.avanzar(50)  # punto de control: aquí se detiene si se canceló
+        ejecutados.append("bloqueante")
+
+    def falla(trabajo):
+        raise ValueError("boom")
+
+    primero = cola.enviar("prueba", ["P"], bloqueante)
+    segundo = cola.enviar("prueba", ["P"], lambda t: ejecutados.append("segundo"))
+    tercero = cola.enviar("prueba", ["Q"], falla)
+
+    assert cola.cancelar(segundo.id)
+    assert segundo.estado == "cancelado"
+    assert cola.cancelar(primero.id)
+    liberar.set()
+    _esperar(cola, [primero, segundo, tercero])
+
+    assert primero.estado == "cancelado"
+    assert ejecutados == []
+    assert tercero.estado == "error" and tercero.error == "boom"
+    assert not cola.cancelar(tercero.id)
+    cola.cerrar()
+    print("✅ Cancelación y errores")
+
+
+def test_no_cancelable():
+    """Pasado su último punto de control un trabajo no se cancela; antes, sí, aunque no vuelva a avanzar."""
+    cola = ColaTrabajos(max_workers=2)
+    escribiendo, liberar = threading.Event(), threading.Event()
+
+    def escribe(trabajo):
+        trabajo.avanzar(50, "Guardando", cancelable=False)
+        escribiendo.set()
+        liberar.wait(5)
+        return "guardado"
+
+    def sin_mas_puntos_de_control(trabajo):
+        liberar.wait(5)
+        return "descartado"
+
+    primero = cola.enviar("prueba", ["P"], escribe)
+    segundo = cola.enviar("prueba", ["Q"], sin_mas_puntos_de_control)
+    assert escribiendo.wait(5)
+    assert not cola.cancelar(primero.id) and not primero.to_dict()["cancelable"]
+    assert cola.cancelar(segundo.id)
+    liberar.set()
+    _esperar(cola, [primero, segundo])
+    assert primero.estado == "completado" and primero.resultado == "guardado"
+    assert segundo.estado == "cancelado" and segundo.resultado is None
+    cola.cerrar()
+    print("✅ Cancelación rechazada tras el último punto de control")
+
+
+def test_reserva_espera_a_los_trabajos():
+    """Una reserva espera al trabajo en marcha con su clave y el siguiente trabajo la espera a ella."""
+    cola = ColaTrabajos(max_workers=2)
+    orden = []
+    en_marcha, liberar = threading.Event(), threading.Event()
+
+    def tarea(trabajo, nombre, esperar=False):
+        en_marcha.set()
+        if esperar:
+            liberar.wait(5)
+        orden.append(nombre)
+
+    primero = cola.enviar("prueba", ["P1"], tarea, "trabajo 1", esperar=True)
+    assert en_marcha.wait(5)
+
+    def sincrono():
+        with cola.reservar(["P1"]):
+            orden.append("reserva")
+            time.sleep(0.05)
+            orden.append("fin reserva")
+
+    hilo = threading.Thread(target=sincrono)
+    hilo.start()
+    time.sleep(0.05)
+    segundo = cola.enviar("prueba", ["P1"], tarea, "trabajo 2")
+    otro = cola.enviar("prueba", ["P2"], tarea, "otro proyecto")
+    _esperar(cola, [otro])
+    assert orden == ["otro proyecto"]
+    liberar.set()
+    hilo.join(5)
+    _esperar(cola, [primero, segundo])
+    assert orden == ["otro proyecto", "trabajo 1", "reserva", "fin reserva", "trabajo 2"], orden
+    cola.cerrar()
+    print("✅ Las reservas de los endpoints síncronos guardan turno con los trabajos")
+
+
+if __name__ == "__main__":
+    test_mismo_proyecto_en_serie()
+    test_proyectos_distintos_en_paralelo_con_limite()
+    test_cancelacion_y_errores()
+    test_no_cancelable()
+    test_reserva_espera_a_los_trabajos()
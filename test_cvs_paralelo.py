@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la extracción de CVs: la lectura incremental por páginas y la
+extracción en paralelo deben devolver lo mismo que la lectura completa y
+secuencial, y un timeout no debe bloquear el lote.
+"""
+
+import sys
+import os
+import glob
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from procesar_cvs import extraer_experiencias, extraer_experiencia_pdf
+
+CVS_DIR = os.path.join(os.path.dirname(__file__), 'inputs', 'cvs')
+
+
+def _cvs():
+    return sorted(glob.glob(os.path.join(CVS_DIR, '*.pdf')))
+
+
+def test_incremental_igual_que_documento_completo():
+    """Dejar de leer al cerrar la sección no cambia el resultado."""
+    for ruta in _cvs():
+        assert extraer_experiencia_pdf(ruta) == extraer_experiencia_pdf(ruta, completo=True), ruta
+    print(f"✅ {len(_cvs())} CVs: incremental == documento completo")
+
+
+def test_paralelo_igual_que_secuencial():
+    """Mismos resultados y mismo orden con 1 y con 3 procesos."""
+    rutas = _cvs()
+    secuencial = extraer_experiencias(rutas, workers=1)
+    paralelo = extraer_experiencias(rutas, workers=3)
+    assert list(paralelo) == rutas
+    assert paralelo == secuencial
+    assert secuencial[rutas[0]] == extraer_experiencia_pdf(rutas[0])
+    print(f"✅ {len(rutas)} CVs: paralelo == secuencial")
+
+
+def test_timeout_no_bloquea_el_lote():
+    """Con un timeout imposible el primer CV queda vacío y se vuelve enseguida."""
+    rutas = _cvs()
+    inicio = time.perf_counter()
+    resultados = extraer_experiencias(rutas, workers=2, timeout=0.001)
+    assert time.perf_counter() - inicio < 10
+    assert set(resultados) == set(rutas)
+    assert resultados[rutas[0]] == []
+    print("✅ Timeout por CV respetado")
+
+
+def test_timeout_cuenta_desde_que_empieza_cada_cv():
+    """Un PDF que se cuelga al final de la lista agota su timeout sin llevarse por delante a los demás."""
+    if not hasattr(os, "mkfifo"):
+        print("⏭️ Sin os.mkfifo: se omite el CV colgado")
+        return
+    rutas = _cvs()
+    with tempfile.TemporaryDirectory() as tmp:
+        colgado = os.path.join(tmp, "Colgado.pdf")
+        os.mkfifo(colgado)  # abrirlo para leer bloquea hasta que alguien escriba
+        inicio = time.perf_counter()
+        resultados = extraer_experiencias(rutas + [colgado], workers=2, timeout=3)
+        duracion = time.perf_counter() - inicio
+    assert resultados[colgado] == []
+    assert {r: resultados[r] for r in rutas} == extraer_experiencias(rutas, workers=1)
+    assert duracion < 15, duracion
+    print(f"✅ CV colgado omitido en {duracion:.1f}s, el resto extraído")
+
+
+if __name__ == "__main__":
+    test_incremental_igual_que_documento_completo()
+    test_paralelo_igual_que_secuencial()
+    test_timeout_no_bloquea_el_lote()
+    test_timeout_cuenta_desde_que_empieza_cada_cv()
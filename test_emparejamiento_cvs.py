@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test del emparejamiento persona ↔ CV con índice de trigramas.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from procesar_cvs import emparejar_cvs, IndiceCVs
+
+
+def test_empareja_por_apellido_y_tildes():
+    """Encuentra el CV aunque cambien tildes, mayúsculas o separadores."""
+    archivos = ["CV_Cristian_Palau_Tarragó.pdf", "Daniel Clares Martin.pdf", "Otro Candidato.pdf"]
+    resultado = emparejar_cvs(["DANIEL CLARES MARTIN", "CRISTIAN PALAU TARRAGO"], archivos)
+    assert resultado[0]['archivo'] == "Daniel Clares Martin.pdf"
+    assert resultado[1]['archivo'] == "CV_Cristian_Palau_Tarragó.pdf"
+    assert resultado[0]['score'] >= 15
+    print("✅ Emparejamiento básico")
+
+
+def test_un_pdf_no_se_asigna_dos_veces():
+    """Si dos personas apuntan al mismo PDF se lo queda la de mayor score."""
+    archivos = ["David Martinez Planellas.pdf"]
+    resultado = emparejar_cvs(["ELOI VIVAS MARTINEZ", "DAVID MARTINEZ PLANELLAS"], archivos)
+    assert resultado[0]['archivo'] is None
+    assert resultado[1]['archivo'] == "David Martinez Planellas.pdf"
+    # El perdedor conserva el candidato para los diagnósticos
+    assert [c['archivo'] for c in resultado[0]['candidatos']] == archivos
+    print("✅ Asignación uno a uno")
+
+
+def test_indice_busca_subcadenas():
+    """contienen() equivale a buscar la subcadena en el nombre normalizado."""
+    indice = IndiceCVs(["Garcia Perez.pdf", "GarciaLopez.pdf", "Lopez.pdf"])
+    assert indice.contienen("garcia") == {0, 1}
+    assert indice.contienen("lopez") == {1, 2}
+    assert indice.contienen("martin") == set()
+    print("✅ Índice de trigramas")
+
+
+if __name__ == "__main__":
+    test_empareja_por_apellido_y_tildes()
+    test_un_pdf_no_se_asigna_dos_veces()
+    test_indice_busca_subcadenas()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la Ficha 2.1: el renderizado clonando el esqueleto debe dar el mismo
+XML que construir cada bloque celda a celda.
+"""
+
+import sys
+import os
+
+import pandas as pd
+from docx import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from logica_fichas import datos_persona_2_1, construir_bloque_2_1, renderizar_bloques_2_1
+
+RUTA_PERSONAL = os.path.join(os.path.dirname(__file__), 'inputs', 'Excel_Personal_2.1.json')
+
+
+def _personas(df):
+    return [datos_persona_2_1(df, index, 2024) for index in range(len(df))]
+
+
+def _xml_celda_a_celda(personas):
+    doc = Document()
+    for index, datos in enumerate(personas):
+        construir_bloque_2_1(doc, datos)
+        if index < len(personas) - 1:
+            doc.add_page_break()
+    return doc.element.xml
+
+
+def _xml_clonado(personas):
+    doc = Document()
+    renderizar_bloques_2_1(doc, personas)
+    return doc.element.xml
+
+
+def test_clonado_igual_que_celda_a_celda():
+    personas = _personas(pd.read_json(RUTA_PERSONAL))
+    assert _xml_clonado(personas) == _xml_celda_a_celda(personas)
+    print(f"✅ {len(personas)} personas: XML clonado == celda a celda")
+
+
+def test_valores_vacios_y_una_persona():
+    """Huecos en el Excel y una sola persona (sin salto de página)."""
+    df = pd.DataFrame([{"Nombre": "Ana", "Apellidos": "", "Horas totales": 0}])
+    personas = _personas(df)
+    assert _xml_clonado(personas) == _xml_celda_a_celda(personas)
+    assert _xml_clonado([]) == Document().element.xml
+    print("✅ Valores vacíos y plantilla de una persona")
+
+
+if __name__ == "__main__":
+    test_clonado_igual_que_celda_a_celda()
+    test_valores_vacios_y_una_persona()
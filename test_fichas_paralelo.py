@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la generación en paralelo: la Ficha 2.1 renderizada por trozos en un
+pool de procesos debe dar el mismo XML que renderizarla de una vez, y las
+fichas lanzadas a la vez devuelven sus resultados (o errores) en orden.
+"""
+
+import sys
+import os
+import tempfile
+
+import pandas as pd
+from docx import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from logica_fichas import personas_2_1, renderizar_bloques_2_1, generar_ficha_2_2
+from fichas_paralelo import GeneradorFichas
+
+INPUTS = os.path.join(os.path.dirname(__file__), 'inputs')
+
+
+def test_trozos_igual_que_de_una_vez():
+    df = pd.read_json(os.path.join(INPUTS, 'Excel_Personal_2.1.json'))
+    personas = personas_2_1(pd.concat([df] * 3, ignore_index=True), 2024)
+    secuencial = Document()
+    renderizar_bloques_2_1(secuencial, personas)
+
+    generador = GeneradorFichas(workers=2, trozo=4)
+    try:
+        paralelo = generador.documento_2_1(personas)
+    finally:
+        generador.cerrar()
+    assert paralelo.element.xml == secuencial.element.xml
+    print(f"✅ {len(personas)} personas en trozos de 4: XML idéntico al secuencial")
+
+
+def test_fichas_a_la_vez():
+    """2.1 y 2.2 se generan a la vez; un error en una no impide la otra."""
+    with tempfile.TemporaryDirectory() as tmp:
+        generador = GeneradorFichas(workers=2, trozo=2)
+        salida_2_1 = os.path.join(tmp, 'Ficha_2_1.docx')
+        salida_2_2 = os.path.join(tmp, 'Ficha_2_2.docx')
+        try:
+            resultados = generador.en_paralelo([
+                lambda: generador.ficha_2_1(os.path.join(INPUTS, 'Excel_Personal_2.1.json'),
+                                            os.path.join(INPUTS, '2.1.docx'), salida_2_1, 2024, 'ACR'),
+                lambda: generador.ficha_2_2(os.path.join(INPUTS, 'Excel_Colaboraciones_2.2.json'),
+                                            os.path.join(INPUTS, 'Excel_Facturas_2.2.json'),
+                                            os.path.join(INPUTS, '2.2.docx'), salida_2_2, anio=2024),
+                lambda: generador.ficha_2_1(os.path.join(tmp, 'no_existe.json'),
+                                            os.path.join(INPUTS, '2.1.docx'), salida_2_1, 2024, 'ACR'),
+            ])
+        finally:
+            generador.cerrar()
+        assert [error is None for _, error in resultados] == [True, True, False]
+        assert os.path.exists(salida_2_1) and os.path.exists(salida_2_2)
+
+        # La 2.2 generada en otro proceso es la misma que en el propio
+        local = os.path.join(tmp, 'Ficha_2_2_local.docx')
+        generar_ficha_2_2(os.path.join(INPUTS, 'Excel_Colaboraciones_2.2.json'),
+                          os.path.join(INPUTS, 'Excel_Facturas_2.2.json'),
+                          os.path.join(INPUTS, '2.2.docx'), local, anio=2024)
+        assert Document(local).element.xml == Document(salida_2_2).element.xml
+        print("✅ Fichas 2.1 y 2.2 a la vez, con el error de otra aislado")
+
+
+if __name__ == "__main__":
+    test_trozos_igual_que_de_una_vez()
+    test_fichas_a_la_vez()
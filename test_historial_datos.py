@@ -0,0 +1,215 @@
+"""
+Pruebas del historial por filas: operaciones por id estable, historial
+compacto (tramos con copia + lotes, copias por contenido, retención) y
+reconstrucción/restauración de versiones, y el LRU de historiales abiertos.
+"""
+
+import sys
+import os
+import json
+import random
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.historial_datos import (HistorialTabla, AlmacenHistoriales, ConflictoVersion, PoliticaRetencion,
+                                 diferencias, aplicar_operaciones, leer_filas, escribir_filas)
+
+
+def sin_vacios(filas):
+    """leer_filas no devuelve las columnas vacías de cada fila."""
+    return [{k: v for k, v in fila.items() if v is not None} for fila in filas]
+
+
+def crear_tabla(directorio, n_filas=50, **kwargs):
+    ruta = os.path.join(directorio, "data", "Excel_Personal_2.1.json")
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    filas = [{"Nombre": f"Persona {i}", "Apellidos": "García", "Horas totales": 100 + i} for i in range(n_filas)]
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(filas, f)
+    return HistorialTabla(ruta, os.path.join(directorio, "history", "personal"), **kwargs), filas
+
+
+def tamano_historial(historial):
+    return sum(os.path.getsize(os.path.join(raiz, f)) for raiz, _, archivos in os.walk(historial.directorio) for f in archivos)
+
+
+def test_operaciones_por_id_y_versiones():
+    """Cada lote es una versión; todas se reconstruyen igual que estaban."""
+    with tempfile.TemporaryDirectory() as directorio:
+        historial, filas = crear_tabla(directorio, cada=7)
+        version, ids, actuales = historial.estado()
+        assert version == 1 and actuales == filas and len(set(ids)) == len(filas)
+
+        rnd = random.Random(5)
+        fotos = {1: (ids, actuales)}
+        for _ in range(40):
+            _, ids, _ = historial.estado()
+            op = rnd.choice(["update", "insert", "delete"])
+            if op == "update":
+                lote = [{"op": "update", "id": rnd.choice(ids), "valores": {"Horas totales": rnd.randint(0, 9)}}]
+            elif op == "insert":
+                lote = [{"op": "insert", "valores": {"Nombre": "Nueva"}, "antes_de": rnd.choice(ids)}]
+            else:
+                lote = [{"op": "delete", "id": rnd.choice(ids)}]
+            version, _ = historial.aplicar(lote)
+            fotos[version] = historial.estado()[1:]
+
+        assert leer_filas(historial.ruta_datos) == sin_vacios(fotos[version][1])
+        for v, foto in fotos.items():
+            assert historial.reconstruir(v) == foto
+
+        # Otra instancia (p. ej. tras reiniciar el servidor) ve lo mismo
+        otra = HistorialTabla(historial.ruta_datos, historial.directorio, cada=7)
+        assert otra.estado() == historial.estado()
+        assert len(historial._tramos) > 5 and [v["version"] for v in historial.versiones()] == list(range(1, version + 1))
+        print(f"✅ {version} versiones en {len(historial._tramos)} tramos; los ids se mantienen tras insertar y borrar")
+
+
+def test_registro_compacto_y_cambios_externos():
+    """Un cambio de celda ocupa una línea corta; las reescrituras externas se registran como diferencias."""
+    with tempfile.TemporaryDirectory() as directorio:
+        historial, filas = crear_tabla(directorio, n_filas=2000)
+        _, ids, _ = historial.estado()
+        tamano_base = tamano_historial(historial)
+        historial.aplicar([{"op": "update", "id": ids[10], "valores": {"Nombre": "Ana"}}])
+        assert tamano_historial(historial) - tamano_base < 300
+
+        # Guardar lo mismo otra vez no crea versión
+        version = historial.version
+        assert historial.aplicar([{"op": "update", "id": ids[10], "valores": {"Nombre": "Ana"}}])[0] == version
+
+        # Otro proceso reescribe la tabla (como procesar_cvs): se guardan solo las diferencias
+        filas = historial.estado()[2]
+        filas[3] = {**filas[3], "EMPRESA 1": "Empresa"}
+        escribir_filas(historial.ruta_datos, filas)
+        version, ids_despues, actuales = historial.estado()
+        assert actuales == filas and ids_despues == ids
+        assert historial.versiones()[-1]["origen"] == "externo" and historial.versiones()[-1]["operaciones"] == 1
+
+        try:
+            historial.aplicar([{"op": "delete", "id": ids[0]}], version_base=version - 1)
+            assert False, "debería haber conflicto de versión"
+        except ConflictoVersion:
+            pass
+        print("✅ Registro compacto, cambios externos como diferencias y conflicto de versión")
+
+
+def test_retencion_y_restaurar():
+    """Los tramos antiguos se recortan a su copia; restaurar crea una versión nueva que reutiliza la copia."""
+    with tempfile.TemporaryDirectory() as directorio:
+        historial, filas = crear_tabla(directorio, n_filas=20, cada=5,
+                                       retencion=PoliticaRetencion(versiones_completas=20, max_copias=3))
+        _, ids, _ = historial.estado()
+        for i in range(100):
+            historial.aplicar([{"op": "update", "id": ids[i % 20], "valores": {"Horas totales": i}}])
+        versiones = [v["version"] for v in historial.versiones()]
+        # Las 20 últimas siempre; se compacta por tramos, así que pueden quedar algunas más
+        assert versiones[-20:] == list(range(82, 102)) and len(versiones) < 40
+        assert len(os.listdir(historial.dir_copias)) == len(historial._tramos)
+
+        conservada = versiones[0]
+        ids_antes, filas_antes = historial.reconstruir(conservada)
+        copias = len(os.listdir(historial.dir_copias))
+        nueva = historial.restaurar(conservada)
+        assert historial.estado() == (nueva, ids_antes, filas_antes)
+        assert len(os.listdir(historial.dir_copias)) == copias  # misma copia por contenido
+        try:
+            historial.reconstruir(2)
+            assert False, "la versión 2 debería haberse compactado"
+        except ValueError:
+            pass
+        print(f"✅ Retención: {len(versiones)} versiones de 101 conservadas; restaurar reutiliza la copia")
+
+
+def test_importar_copias_antiguas():
+    """Las copias sueltas <tabla>_<fecha>.json se importan (sin repetir las idénticas) y se borran."""
+    with tempfile.TemporaryDirectory() as directorio:
+        historial, filas = crear_tabla(directorio)
+        carpeta = os.path.join(directorio, "history")
+        os.makedirs(carpeta)
+        for i, marca in enumerate(["20240101_100000", "20240101_100500", "20240102_090000"]):
+            copia = [dict(f) for f in filas]
+            copia[0]["Horas totales"] = 1 if i < 2 else 2  # la segunda es idéntica a la primera
+            with open(os.path.join(carpeta, f"personal_{marca}.json"), "w", encoding="utf-8") as f:
+                json.dump(copia, f)
+
+        version, _, actuales = historial.estado()
+        versiones = historial.versiones()
+        assert [v["origen"] for v in versiones] == ["importado", "importado", "externo"] and actuales == filas
+        assert historial.reconstruir(2)[1][0]["Horas totales"] == 2
+        assert not [n for n in os.listdir(carpeta) if n.endswith(".json")]
+        print("✅ Copias antiguas importadas sin duplicados")
+
+
+def test_importacion_fallida_se_reanuda():
+    """Si una copia antigua no se puede leer no queda ningún tramo a medias y, arreglada, se importa todo."""
+    with tempfile.TemporaryDirectory() as directorio:
+        historial, filas = crear_tabla(directorio)
+        carpeta = os.path.join(directorio, "history")
+        os.makedirs(carpeta)
+        marcas = ["20240101_100000", "20240102_090000", "20240103_090000"]
+        for i, marca in enumerate(marcas):
+            copia = [dict(f) for f in filas]
+            copia[0]["Horas totales"] = i
+            with open(os.path.join(carpeta, f"personal_{marca}.json"), "w", encoding="utf-8") as f:
+                f.write("{roto" if i == 1 else json.dumps(copia))
+        try:
+            historial.estado()
+            assert False, "La copia rota debería fallar"
+        except ValueError:
+            pass
+        assert not os.path.exists(os.path.join(carpeta, "personal")) or not os.listdir(os.path.join(carpeta, "personal"))
+        assert sorted(n for n in os.listdir(carpeta) if n.endswith(".json")) == [f"personal_{m}.json" for m in marcas]
+
+        with open(os.path.join(carpeta, f"personal_{marcas[1]}.json"), "w", encoding="utf-8") as f:
+            json.dump(filas, f)
+        historial.estado()  # la misma instancia reintenta la importación
+        assert [v["origen"] for v in historial.versiones()] == ["importado", "importado", "importado", "externo"]
+        assert sorted(os.listdir(carpeta)) == ["personal"]
+        print("✅ Importación fallida sin tramos a medias; se reanuda entera")
+
+
+def test_almacen_acotado():
+    """AlmacenHistoriales guarda como mucho max_historiales, sin expulsar los que están en uso."""
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = AlmacenHistoriales(max_historiales=2)
+        carpetas = [os.path.join(directorio, f"P{i}") for i in range(3)]
+        for carpeta in carpetas:
+            crear_tabla(carpeta)
+        primero = almacen.obtener(carpetas[0], "personal")
+        version, ids, _ = primero.estado()
+        primero.aplicar([{"op": "update", "id": ids[0], "valores": {"Horas totales": 1}}])
+        segundo = almacen.obtener(carpetas[1], "personal")
+        assert almacen.obtener(carpetas[1], "personal") is segundo
+
+        with primero._lock:  # el menos usado, pero en plena operación: se expulsa el siguiente
+            almacen.obtener(carpetas[2], "personal")
+            assert almacen.obtener(carpetas[0], "personal") is primero
+        assert almacen.obtener(carpetas[1], "personal") is not segundo
+        almacen.obtener(carpetas[2], "personal")
+        recargado = almacen.obtener(carpetas[0], "personal")
+        assert recargado is not primero and len(almacen._historiales) == 2
+        assert recargado.estado()[0] == version + 1 and recargado.estado()[2][0]["Horas totales"] == 1
+        print("✅ Historiales abiertos acotados por LRU; los expulsados se recargan de disco")
+
+
+def test_diferencias():
+    """diferencias() + aplicar_operaciones() convierten una lista en la otra."""
+    antes = [{"a": 1, "b": 2}, {"a": 3}, {"a": 4}]
+    despues = [{"a": 1, "b": 5}, {"a": 3, "c": 0}]
+    ids = ["x", "y", "z"]
+    operaciones = diferencias(ids, antes, despues)
+    assert [o["op"] for o in operaciones] == ["update", "update", "delete"]
+    assert aplicar_operaciones(ids, antes, operaciones) == (["x", "y"], despues)
+    print("✅ Diferencias por posición")
+
+
+if __name__ == "__main__":
+    test_operaciones_por_id_y_versiones()
+    test_registro_compacto_y_cambios_externos()
+    test_retencion_y_restaurar()
+    test_importar_copias_antiguas()
+    test_importacion_fallida_se_reanuda()
+    test_almacen_acotado()
+    test_diferencias()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la sesión LibroAnexo: las hojas servidas desde memoria y la lectura
+en streaming deben ser idénticas a lo que devuelve pd.read_excel.
+"""
+
+import sys
+import os
+import glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import pandas as pd
+from libro_anexo import LibroAnexo
+from procesar_anexo import cabecera_multinivel
+
+DATASET_DIR = os.path.join(os.path.dirname(__file__), 'Dataset de Anexos')
+
+
+def _primer_anexo():
+    archivos = sorted(glob.glob(os.path.join(DATASET_DIR, '*.xlsx')))
+    return archivos[0]
+
+
+def test_hojas_identicas_a_read_excel():
+    """Datos solicitud y Personal coinciden con pd.read_excel."""
+    ruta = _primer_anexo()
+    with LibroAnexo(ruta) as libro:
+        pd.testing.assert_frame_equal(
+            libro.hoja("Datos solicitud"),
+            pd.read_excel(ruta, sheet_name="Datos solicitud", header=None)
+        )
+        pd.testing.assert_frame_equal(
+            libro.hoja("Personal", header=[12, 13]),
+            pd.read_excel(ruta, sheet_name="Personal", header=[12, 13])
+        )
+        assert libro.sheet_names == pd.ExcelFile(ruta).sheet_names
+    print(f"✅ Hojas idénticas en {os.path.basename(ruta)}")
+
+
+def test_hoja_se_lee_una_sola_vez():
+    """La segunda petición de una hoja devuelve el mismo objeto cacheado."""
+    with LibroAnexo(_primer_anexo()) as libro:
+        assert libro.hoja("Datos solicitud") is libro.hoja("Datos solicitud")
+        assert libro.hoja("Personal", header=[12, 13]) is libro.hoja("Personal", header=[12, 13])
+    print("✅ Hojas servidas desde memoria")
+
+
+def test_streaming_identico_a_read_excel():
+    """tabla() y la cabecera de Personal en streaming coinciden con pandas."""
+    ruta = _primer_anexo()
+    with LibroAnexo(ruta) as libro:
+        df = pd.read_excel(ruta, sheet_name="Datos solicitud", header=None)
+        tabla = libro.tabla("Datos solicitud")
+        assert len(tabla) == len(df)
+        for fila, esperado in zip(tabla, df.itertuples(index=False)):
+            assert [str(v) for v in fila] == [str(v) for v in esperado]
+
+        df_personal = pd.read_excel(ruta, sheet_name="Personal", header=[12, 13])
+        filas_cabecera = list(libro.filas("Personal", hasta=14))[12:14]
+        columnas = cabecera_multinivel(filas_cabecera, len(df_personal.columns))
+        assert [tuple(str(x) for x in c) for c in columnas] == \
+            [tuple(str(x) for x in c) for c in df_personal.columns]
+    print("✅ Lectura en streaming idéntica a pd.read_excel")
+
+
+if __name__ == "__main__":
+    test_hojas_identicas_a_read_excel()
+    test_hoja_se_lee_una_sola_vez()
+    test_streaming_identico_a_read_excel()
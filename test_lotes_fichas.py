@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test del lote de fichas: el registro de lotes recuerda la firma de cada
+proyecto entre reinicios y a_medida_que entrega cada tarea en cuanto termina.
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from lotes_fichas import RegistroLotes
+from fichas_paralelo import GeneradorFichas
+
+
+def test_registro_lotes():
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'lotes.json')
+        registro = RegistroLotes(ruta)
+        assert registro.firma("Cliente_A/P1") is None and not registro.sin_cambios("Cliente_A/P1", None)
+        registro.registrar({"Cliente_A/P1": "f1", "Cliente_A/P12": "f12", "Cliente_B/P1": "g1"})
+
+        registro = RegistroLotes(ruta)  # tras reiniciar
+        assert registro.sin_cambios("Cliente_A/P1", "f1") and not registro.sin_cambios("Cliente_A/P1", "f2")
+        assert registro.fichas("Cliente_A/P1") is None  # sin claves: se regenera
+        registro.registrar({"Cliente_A/P1": "f1"}, {"Cliente_A/P1": {"Ficha_2_1.docx": "c21"}})
+        assert RegistroLotes(ruta).fichas("Cliente_A/P1") == {"Ficha_2_1.docx": "c21"}
+
+        registro.olvidar("Cliente_A/P1")
+        assert registro.firma("Cliente_A/P1") is None and registro.firma("Cliente_A/P12") == "f12"
+        registro.olvidar("Cliente_A/")
+        assert RegistroLotes(ruta).firma("Cliente_A/P12") is None and RegistroLotes(ruta).firma("Cliente_B/P1") == "g1"
+
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write("{roto")
+        assert RegistroLotes(ruta).firma("Cliente_B/P1") is None
+    print("✅ Registro de lotes: firmas y fichas persistentes, olvido por proyecto/cliente y JSON roto")
+
+
+def test_a_medida_que():
+    def tarea(segundos, valor):
+        def ejecutar():
+            time.sleep(segundos)
+            if valor is None:
+                raise ValueError("sin datos")
+            return valor
+        return ejecutar
+
+    generador = GeneradorFichas(workers=3)
+    resultados = list(generador.a_medida_que([tarea(0.3, "lento"), tarea(0.0, "rápido"), tarea(0.1, None)]))
+    assert [indice for indice, _, _ in resultados] == [1, 2, 0]
+    assert resultados[0][1] == "rápido" and isinstance(resultados[1][2], ValueError) and resultados[2][1] == "lento"
+
+    secuencial = list(GeneradorFichas(workers=1).a_medida_que([tarea(0, "a"), tarea(0, "b")]))
+    assert secuencial == [(0, "a", None), (1, "b", None)]
+    print("✅ a_medida_que entrega cada tarea al terminar y captura sus errores")
+
+
+if __name__ == "__main__":
+    test_registro_lotes()
+    test_a_medida_que()
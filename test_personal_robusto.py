@@ -10,6 +10,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from procesar_anexo import procesar_anexo
+from almacen_tablas import almacen
 import json
 
 def test_procesar_anexo():
@@ -38,9 +39,8 @@ def test_procesar_anexo():
         
         for archivo in archivos_json:
             archivo_path = os.path.join(output_dir, archivo)
-            if os.path.exists(archivo_path):
-                with open(archivo_path, 'r', encoding='utf-8') as f:
-                    datos = json.load(f)
+            if almacen.existe(archivo_path):
+                datos = json.loads(almacen.exportar_json(archivo_path))
                 print(f"✅ {archivo}: {len(datos)} registros")
                 
                 # Mostrar primeros 2 registros para verificar estructura
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de las carpetas de salida por generación: escrituras atómicas, una
+carpeta por cliente/proyecto y generación, y política de limpieza.
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from salidas import AlmacenSalidas, escritura_atomica
+
+
+def _escribir(generacion, nombre="Ficha_2_1.docx", contenido="ficha"):
+    with escritura_atomica(generacion.ruta(nombre)) as temporal:
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(contenido)
+
+
+def test_escritura_atomica():
+    """Si la generación falla, el archivo anterior queda intacto y no quedan temporales."""
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'sub', 'Ficha_2_1.docx')
+        with escritura_atomica(ruta) as temporal:
+            assert temporal.endswith('.docx') and temporal != ruta
+            with open(temporal, 'w', encoding='utf-8') as f:
+                f.write("v1")
+        try:
+            with escritura_atomica(ruta) as temporal:
+                with open(temporal, 'w', encoding='utf-8') as f:
+                    f.write("v2 a medias")
+                raise RuntimeError("fallo generando")
+        except RuntimeError:
+            pass
+        assert open(ruta, encoding='utf-8').read() == "v1"
+        assert os.listdir(os.path.dirname(ruta)) == ['Ficha_2_1.docx']
+        print("✅ Escritura atómica: nunca queda un archivo a medias")
+
+
+def test_generaciones_por_ambito():
+    """Cada cliente/proyecto tiene sus generaciones; se sirven por id o la última."""
+    with tempfile.TemporaryDirectory() as tmp:
+        salidas = AlmacenSalidas(tmp)
+        a = salidas.nueva("B1", "P1")
+        b = salidas.nueva("B1", "P2")
+        assert a.id != b.id
+        _escribir(a, contenido="P1")
+        _escribir(b, contenido="P2")
+        assert not os.path.exists(salidas.nueva("B1", "P3").directorio)  # sin escribir no deja carpeta
+
+        assert salidas.obtener(a.id, "B1", "P1").ruta("Ficha_2_1.docx") == a.ruta("Ficha_2_1.docx")
+        assert salidas.obtener(a.id, "B1", "P2") is None
+        assert salidas.obtener("../P2", "B1", "P1") is None
+        c = salidas.nueva("B1", "P1")
+        _escribir(c)
+        assert salidas.obtener(None, "B1", "P1").id == c.id
+        assert [g["id"] for g in salidas.listar("B1", "P1")] == [c.id, a.id]
+        print("✅ Generaciones separadas por cliente/proyecto y servidas por id")
+
+
+def test_limpieza():
+    """Se conservan las max_versiones últimas por ámbito y se borran las de más de max_dias."""
+    with tempfile.TemporaryDirectory() as tmp:
+        salidas = AlmacenSalidas(tmp, max_versiones=3, max_dias=7, proteccion=0)
+        for _ in range(6):
+            _escribir(salidas.nueva("B1", "P1"))
+        assert len(salidas.listar("B1", "P1")) == 3
+
+        # Una generación de hace 10 días en otro ámbito
+        antigua = (datetime.now() - timedelta(days=10)).strftime('%Y%m%dT%H%M%S%f') + "_abcdef"
+        os.makedirs(os.path.join(tmp, "_inputs", antigua))
+        assert salidas.barrer() == 1
+        assert salidas.listar() == [] and len(salidas.listar("B1", "P1")) == 3
+        print("✅ Limpieza por número de versiones y por antigüedad")
+
+
+if __name__ == "__main__":
+    test_escritura_atomica()
+    test_generaciones_por_ambito()
+    test_limpieza()
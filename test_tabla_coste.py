@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la tabla de costes de la Ficha 2.2: la tabla clonada de la
+plantilla debe tener el mismo XML que la construcción anterior celda a celda
+(crear_tabla_antigua, en referencia_tabla_coste.py).
+"""
+
+import sys
+import os
+
+import pandas as pd
+from docx import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utilidades_docx import crear_tabla_coste_colaboracion, IndiceFacturas
+from referencia_tabla_coste import crear_tabla_antigua, generar_facturas
+
+
+def _xml(funcion, facturas):
+    return funcion(Document(), facturas)._element.xml
+
+
+def test_igual_que_antes():
+    """Sin facturas extra (0-6) y con filas extra en PERSONAL (7, 25)."""
+    for n in [0, 1, 6, 7, 25]:
+        facturas = generar_facturas(n)
+        assert _xml(crear_tabla_coste_colaboracion, facturas) == _xml(crear_tabla_antigua, facturas), n
+    print("✅ Tabla de coste idéntica con 0, 1, 6, 7 y 25 facturas")
+
+
+def test_importes_en_texto_y_huecos():
+    """Importes con formato europeo en texto y facturas sin nombre."""
+    facturas = pd.DataFrame({
+        "Entidad": ["X", "X", "X"],
+        "Nombre factura": ["F-1", None, "F-3"],
+        "Importe (€)": ["1.234,50", 10, "7"],
+    })
+    assert _xml(crear_tabla_coste_colaboracion, facturas) == _xml(crear_tabla_antigua, facturas)
+    tabla = crear_tabla_coste_colaboracion(Document(), facturas)
+    assert tabla.cell(33, 2).text == "1.251,50 €"
+    assert len(tabla.rows) == 34
+    print("✅ Importes en texto y huecos: mismo XML y total 1.251,50 €")
+
+
+def test_indice_facturas():
+    """El índice por entidad da la misma tabla que filtrar las facturas de cada colaboración."""
+    facturas = pd.DataFrame({
+        "Entidad": ["A", "B", "A", None, "B", "A"],
+        "Nombre factura": ["A-1", "B-1", "A-2", "N-1", "B-2", "A-3"],
+        "Importe (€)": [100, "2.000,10", "3,5", 1, 4, 5],
+    })
+    indice = IndiceFacturas(facturas)
+    assert len(indice) == 2 and indice.de("A") is indice.de("A")
+    for entidad in ["A", "B", "C", None]:
+        filtradas = facturas[facturas["Entidad"] == entidad]
+        assert (_xml(crear_tabla_coste_colaboracion, indice.de(entidad))
+                == _xml(crear_tabla_coste_colaboracion, filtradas)), entidad
+    assert indice.de("B").total == 2004.1 and indice.de("C").nombres == []
+    print("✅ Índice de facturas por entidad: mismas tablas que el filtrado por colaboración")
+
+
+if __name__ == "__main__":
+    test_igual_que_antes()
+    test_importes_en_texto_y_huecos()
+    test_indice_facturas()
@@ -77,6 +77,25 @@ def test_validacion_correcta():
     print(f"   - Mensaje: {resumen['mensaje']}")
 
 
+def test_resumen_igual_que_fila_a_fila():
+    """Las reglas por columnas dan el mismo obtener_resumen() que las de antes."""
+    from referencia_validacion import ValidadorFilaAFila, generar_plantilla, validar
+
+    personal, colaboraciones, facturas = generar_plantilla(2000)
+    # Huecos y valores raros que iterrows veía de forma particular
+    personal["Horas totales"] = personal["Horas totales"].astype(object)
+    personal.loc[3, "Horas totales"] = "-0"
+    personal.loc[4, "Nombre"] = None
+    facturas.loc[5, "Importe (€)"] = None
+
+    _, *antes = validar(ValidadorFilaAFila, personal, colaboraciones, facturas)
+    _, *ahora = validar(ValidadorFichas, personal, colaboraciones, facturas)
+    assert antes == ahora
+    assert ahora[0]["errores_count"] > len(ahora[0]["errores"]) == 20
+    print(f"✅ Resumen idéntico ({ahora[0]['mensaje']} | {ahora[1]['mensaje']})")
+
+
 if __name__ == "__main__":
     test_validacion_correcta()
     test_validacion_con_errores()
+    test_resumen_igual_que_fila_a_fila()
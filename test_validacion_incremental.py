@@ -0,0 +1,127 @@
+"""
+Pruebas de la validación incremental: tras cada lote de cambios de celdas el
+resumen debe ser el mismo que el de una validación completa de las tablas, y
+los cambios de una sesión de edición no se cuelan en otra.
+"""
+
+import io
+import sys
+import os
+import random
+import tempfile
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.validador import ValidadorFichas, combinar_resumenes
+from src.validacion_incremental import ValidacionIncremental, AlmacenValidaciones
+from referencia_validacion import generar_plantilla
+
+VALORES = {
+    "personal": {
+        "Nombre": ["Ana", "Persona", "Pers0na", "", "  ", None, float("nan")],
+        "Apellidos": ["Apellido A", "Apellido B", "Ruiz 2", "", None],
+        "Titulación 1": ["Ingeniería", " ", None],
+        "Coste horario (€/hora)": [40.0, 0, -3, "55", "n/d", None, "-0"],
+        "Horas totales": [100, 1500, 0, None, "abc", 12.5],
+        "Coste total (€)": [4000.0, 5000, None, "x"],
+        "EMPRESA 1": ["Empresa", "", "  ", None],
+    },
+    "colaboraciones": {
+        "Razón social": ["Entidad 1", "Entidad 2", "Entidad 3", "Nueva SL", "", None],
+        "NIF": ["B00000001", "B-1", "b1234567x", "", None],
+        "País de la entidad": ["España", "", None],
+    },
+    "facturas": {
+        "Entidad": ["Entidad 1", "Entidad 2", "Sin Colab", "Otra", None],
+        "Nombre factura": ["F-1", "", None],
+        "Importe (€)": [100.0, 0, -5, "1.000,00", None, "250"],
+    },
+}
+
+
+def validar_completo(estado):
+    """Resumen de una validación completa de las tablas actuales del estado."""
+    validador = ValidadorFichas()
+    with redirect_stdout(io.StringIO()):
+        valido_personal = validador.validar_personal(estado._crudo["personal"])
+        resumen_personal = validador.obtener_resumen()
+        valido_colab = validador.validar_colaboraciones(estado._crudo["colaboraciones"], estado._crudo["facturas"])
+        resumen_colab = validador.obtener_resumen()
+    return valido_personal and valido_colab, combinar_resumenes(
+        valido_personal, resumen_personal, valido_colab, resumen_colab)
+
+
+def cambio_aleatorio(rnd, tabla, n_filas):
+    columnas = rnd.sample(list(VALORES[tabla]), rnd.randint(1, 2))
+    return {"fila": rnd.randrange(n_filas), "valores": {c: rnd.choice(VALORES[tabla][c]) for c in columnas}}
+
+
+def test_cambios_igual_que_validacion_completa():
+    """Ediciones de celdas al azar: el resumen incremental coincide siempre."""
+    rnd = random.Random(3)
+    estado = ValidacionIncremental(*generar_plantilla(300, semilla=11))
+    assert estado.resumen() == validar_completo(estado)
+
+    for _ in range(300):
+        tabla = rnd.choice(list(VALORES))
+        cambios = [cambio_aleatorio(rnd, tabla, len(estado._crudo[tabla])) for _ in range(rnd.randint(1, 4))]
+        estado.aplicar_cambios(tabla, cambios)
+        assert estado.resumen() == validar_completo(estado), (tabla, cambios)
+    print("✅ 300 lotes de cambios con el mismo resumen que la validación completa")
+
+
+def test_solo_reglas_afectadas():
+    """Cambiar EMPRESA 1 no vuelve a evaluar ninguna regla local."""
+    estado = ValidacionIncremental(*generar_plantilla(50))
+    assert estado.aplicar_cambios("personal", [{"fila": 0, "valores": {"EMPRESA 1": ""}}]) == []
+    assert estado.aplicar_cambios("personal", [{"fila": 0, "valores": {"Horas totales": 0}}]) == ["obligatorios", "formatos", "costes"]
+    assert estado.aplicar_cambios("facturas", [{"fila": 1, "valores": {"Importe (€)": 10}}]) == ["obligatorios", "importes"]
+    print("✅ Solo se reevalúan las reglas que leen las columnas cambiadas")
+
+
+def test_insertar_y_borrar_filas():
+    """Insertar, borrar y añadir columnas recalcula la tabla entera."""
+    estado = ValidacionIncremental(*generar_plantilla(40))
+    estado.aplicar_cambios("personal", [{"op": "insert", "fila": 0, "valores": {"Nombre": "Nueva"}}])
+    estado.aplicar_cambios("facturas", [{"op": "delete", "fila": 3}])
+    estado.aplicar_cambios("colaboraciones", [{"fila": 2, "valores": {"Web": "https://ejemplo.com"}}])
+    assert len(estado._crudo["personal"]) == 41 and len(estado._crudo["facturas"]) == 39
+    assert estado.resumen() == validar_completo(estado)
+
+    estado.aplicar_cambios("facturas", [{"op": "delete", "fila": 0} for _ in range(39)])
+    es_valido, resumen = estado.resumen()
+    assert not es_valido and resumen["colaboraciones"]["errores"] == ["❌ [CRÍTICO] El DataFrame de Facturas está vacío"]
+    print("✅ Inserciones y borrados coinciden con la validación completa")
+
+
+def test_sesiones_independientes():
+    """Lo validado sin guardar en una sesión no afecta a otra ni a una nueva, y se puede descartar."""
+    with tempfile.TemporaryDirectory() as tmp:
+        rutas = [os.path.join(tmp, nombre) for nombre in
+                 ("Excel_Personal_2.1.json", "Excel_Colaboraciones_2.2.json", "Excel_Facturas_2.2.json")]
+        for ruta, df in zip(rutas, generar_plantilla(30)):
+            df.to_json(ruta, orient="records", force_ascii=False)
+        almacen = AlmacenValidaciones(max_sesiones=2)
+        with redirect_stdout(io.StringIO()):
+            sesion_a, estado_a = almacen.crear(tmp, rutas)
+            sesion_b, estado_b = almacen.crear(tmp, rutas)
+            inicial = estado_b.resumen()
+            estado_a.aplicar_cambios("personal", [{"fila": 0, "valores": {"Nombre": ""}}])
+            assert estado_a.resumen() != inicial
+            assert almacen.obtener(sesion_b, tmp, rutas).resumen() == inicial
+            assert almacen.obtener(sesion_a, tmp, rutas) is estado_a
+            assert almacen.obtener(sesion_a, "otro proyecto", rutas) is None
+
+            assert almacen.olvidar(sesion_a) and almacen.obtener(sesion_a, tmp, rutas) is None
+            almacen.crear(tmp, rutas)
+            almacen.crear(tmp, rutas)
+            assert almacen.obtener(sesion_b, tmp, rutas) is None  # expulsada por LRU
+    print("✅ Sesiones de validación independientes, descartables y acotadas")
+
+
+if __name__ == "__main__":
+    test_cambios_igual_que_validacion_completa()
+    test_solo_reglas_afectadas()
+    test_insertar_y_borrar_filas()
+    test_sesiones_independientes()
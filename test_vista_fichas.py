@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de la vista de las fichas: personas_2_1 (columna a columna) debe dar
+los mismos textos que datos_persona_2_1 fila a fila, también con huecos,
+columnas que faltan e importes en texto; colaboraciones_2_2 prepara los
+textos de la tabla 1 y las facturas de cada colaboración.
+"""
+
+import sys
+import os
+import pickle
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from logica_fichas import datos_persona_2_1
+from vista_fichas import personas_2_1, ordenar_personal_2_1, colaboraciones_2_2
+
+RUTA_PERSONAL = os.path.join(os.path.dirname(__file__), 'inputs', 'Excel_Personal_2.1.json')
+
+
+def _referencia(df, anio):
+    df = ordenar_personal_2_1(df)
+    return [datos_persona_2_1(df, index, anio) for index in range(len(df))]
+
+
+def test_personas_igual_que_fila_a_fila():
+    df = pd.read_json(RUTA_PERSONAL)
+    assert personas_2_1(df, 2024) == _referencia(df, 2024)
+
+    raro = df.head(4).copy().astype(object)
+    raro.loc[0, "Coste total (€)"] = None
+    raro.loc[1, "Coste horario (€/hora)"] = "1.234,5"
+    raro.loc[2, "EMPRESA 2"] = "  Otra  "
+    raro.loc[3, "PERIODO 1"] = None
+    raro = raro.drop(columns=["Titulación 2", "Actividad 3"], errors="ignore")
+    personas = personas_2_1(raro, 2023)
+    assert personas == _referencia(raro, 2023)
+    assert all(isinstance(valor, str) for p in personas for fila in p.fields1 for valor in fila)
+    assert pickle.loads(pickle.dumps(personas)) == personas  # viajan a los procesos del pool
+    print(f"✅ Vista de {len(df)} personas idéntica a datos_persona_2_1 (también con huecos)")
+
+
+def test_colaboraciones():
+    df_colab = pd.DataFrame({
+        "Razón social": ["A S.L.", None, "B S.A."],
+        "NIF": ["A1", "X", None],
+        "Localidad": ["Madrid", "Bilbao", "Sevilla"],
+    })
+    df_facturas = pd.DataFrame({
+        "Entidad": ["B S.A.", "A S.L.", "B S.A."],
+        "Nombre factura": ["B-1", "A-1", "B-2"],
+        "Importe (€)": [10, "1.000,50", 5.5],
+    })
+    a, sin_razon, b = colaboraciones_2_2(df_colab, df_facturas, cliente_nif="B12345678")
+    assert a.valores["NIF"] == "A1" and b.valores["NIF"] == "" and a.valores["Provincia"] == ""
+    assert a.valores["NIF 2"] == "B12345678" and a.valores["Entidad contratante"] == ""
+    assert a.facturas.total == 1000.5 and b.facturas.nombres == ["B-1", "B-2"]
+    assert sin_razon.valores["Razón social"] == "" and sin_razon.facturas.nombres == []
+    print("✅ Colaboraciones con textos de la tabla 1 y sus facturas ya preparadas")
+
+
+if __name__ == "__main__":
+    test_personas_igual_que_fila_a_fila()
+    test_colaboraciones()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test del ZIP en streaming: el ZIP emitido en trozos es válido, los trozos no
+crecen con el tamaño de los archivos y las entradas se pueden generar
+mientras se envía.
+"""
+
+import sys
+import os
+import io
+import zipfile
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from zip_streaming import zip_en_streaming
+
+
+def test_zip_valido_en_trozos_acotados():
+    with tempfile.TemporaryDirectory() as tmp:
+        grande = os.path.join(tmp, 'grande.bin')
+        with open(grande, 'wb') as f:
+            f.write(os.urandom(1024 * 1024))  # no comprimible
+        pequeno = os.path.join(tmp, 'pequeno.txt')
+        with open(pequeno, 'w', encoding='utf-8') as f:
+            f.write("ficha " * 100)
+
+        trozos = list(zip_en_streaming([('a/grande.bin', grande), ('pequeno.txt', pequeno)], tamano_trozo=16 * 1024))
+        assert len(trozos) > 50 and max(len(t) for t in trozos) < 2 * 16 * 1024
+        zip_file = zipfile.ZipFile(io.BytesIO(b''.join(trozos)))
+        assert zip_file.testzip() is None
+        assert zip_file.read('a/grande.bin') == open(grande, 'rb').read()
+        assert zip_file.read('pequeno.txt') == b"ficha " * 100
+        print(f"✅ ZIP válido en {len(trozos)} trozos de como mucho {max(len(t) for t in trozos)} bytes")
+
+
+def test_entradas_generadas_sobre_la_marcha():
+    """La siguiente entrada solo se genera cuando la anterior ya se ha enviado."""
+    with tempfile.TemporaryDirectory() as tmp:
+        enviados = []
+
+        def entradas():
+            for i in range(3):
+                ruta = os.path.join(tmp, 'ficha.docx')
+                with open(ruta, 'w', encoding='utf-8') as f:
+                    f.write(f"ficha {i}")
+                yield f"Ficha_2_1/{i:03d}.docx", ruta
+                os.remove(ruta)
+                enviados.append(i)
+
+        trozos = zip_en_streaming(entradas())
+        primero = next(trozos)
+        assert primero and enviados == []
+        contenido = primero + b''.join(trozos)
+        assert enviados == [0, 1, 2] and os.listdir(tmp) == []
+        zip_file = zipfile.ZipFile(io.BytesIO(contenido))
+        assert [zip_file.read(n) for n in zip_file.namelist()] == [b"ficha 0", b"ficha 1", b"ficha 2"]
+        print("✅ Entradas generadas una a una mientras se envía el ZIP")
+
+
+if __name__ == "__main__":
+    test_zip_valido_en_trozos_acotados()
+    test_entradas_generadas_sobre_la_marcha()